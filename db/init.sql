@@ -110,8 +110,197 @@ CREATE TABLE IF NOT EXISTS participant_embeddings (
   id TEXT PRIMARY KEY REFERENCES participants(id) ON DELETE CASCADE,
   embedding vector(1536),
   metadata JSONB NOT NULL DEFAULT '{}'::jsonb, -- Store filterable fields here
+  document TEXT, -- the indexed AI profile text, for the full-text leg of hybrid search
+  document_tsv tsvector GENERATED ALWAYS AS (to_tsvector('english'::regconfig, coalesce(document, ''))) STORED,
+  content_hash TEXT, -- sha256 of the embedded text; with embedding_model, lets unchanged profiles skip re-embedding
+  embedding_model TEXT,
   created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
-CREATE INDEX IF NOT EXISTS idx_participant_embeddings_vec ON participant_embeddings USING ivfflat (embedding vector_l2_ops) WITH (lists = 100);
+-- The ANN index operator class must match the distance operator used by search_service
+-- (SEARCH_DISTANCE_METRIC, cosine by default); search_service rebuilds it on startup if the metric changes.
+CREATE INDEX IF NOT EXISTS idx_participant_embeddings_vec_hnsw_cosine ON participant_embeddings USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
 CREATE INDEX IF NOT EXISTS idx_participant_embeddings_meta ON participant_embeddings USING gin (metadata);
+-- Smaller, faster GIN for the @> containment that search filters compile to ($exists still uses the one above)
+CREATE INDEX IF NOT EXISTS idx_participant_embeddings_meta_path ON participant_embeddings USING gin (metadata jsonb_path_ops);
+CREATE INDEX IF NOT EXISTS idx_participant_embeddings_tsv ON participant_embeddings USING gin (document_tsv);
+-- Bounding boxes of `$near` radius filters over the indexed coordinates (search_service src/services/geo.py)
+CREATE INDEX IF NOT EXISTS idx_participant_embeddings_geo ON participant_embeddings (((metadata #>> '{coordinates,latitude}')::double precision), ((metadata #>> '{coordinates,longitude}')::double precision));
+
+-- Facet counts for searches (search_service src/services/facets.py): participants per region /
+-- certification / primary crop, and the same counts among the participants having one facet value.
+-- Kept current by statement-level triggers the service installs on participant_embeddings at startup.
+CREATE TABLE IF NOT EXISTS participant_embeddings_facets (
+  field TEXT NOT NULL,
+  value TEXT NOT NULL,
+  n BIGINT NOT NULL,
+  PRIMARY KEY (field, value)
+);
+CREATE TABLE IF NOT EXISTS participant_embeddings_facet_pairs (
+  field TEXT NOT NULL,
+  value TEXT NOT NULL,
+  facet TEXT NOT NULL,
+  facet_value TEXT NOT NULL,
+  n BIGINT NOT NULL,
+  PRIMARY KEY (field, value, facet, facet_value)
+);
+
+-- One embedding per markdown section of the AI profile, for multi-vector (max-sim) search.
+-- References participants rather than participant_embeddings so a re-index swap can replace that table.
+CREATE TABLE IF NOT EXISTS participant_embeddings_chunks (
+  id TEXT NOT NULL REFERENCES participants(id) ON DELETE CASCADE,
+  chunk_no INT NOT NULL,
+  heading TEXT, -- "Section > Subsection" path of the chunk
+  content TEXT NOT NULL,
+  embedding vector(1536) NOT NULL,
+  content_hash TEXT, -- hash of the whole profile the chunks were cut from
+  embedding_model TEXT,
+  PRIMARY KEY (id, chunk_no)
+);
+CREATE INDEX IF NOT EXISTS idx_participant_embeddings_chunks_vec_hnsw_cosine ON participant_embeddings_chunks USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
+
+-- Full re-index jobs run by search_service (checkpoint + progress); the job rebuilds
+-- participant_embeddings in participant_embeddings__reindex and swaps it in when done
+CREATE TABLE IF NOT EXISTS search_reindex_jobs (
+  id TEXT PRIMARY KEY,
+  target_table TEXT NOT NULL,
+  status TEXT NOT NULL,
+  phase TEXT NOT NULL,
+  last_id TEXT,
+  total BIGINT NOT NULL DEFAULT 0,
+  processed BIGINT NOT NULL DEFAULT 0,
+  skipped BIGINT NOT NULL DEFAULT 0,
+  catchup_since TIMESTAMPTZ,
+  run_started_at TIMESTAMPTZ,
+  run_processed BIGINT NOT NULL DEFAULT 0,
+  error TEXT,
+  started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  finished_at TIMESTAMPTZ
+);
+
+-- Batch matching (search_service POST /matches/runs): each participant's best counterparties of
+-- another type, replaced per pair of types by every run
+CREATE TABLE IF NOT EXISTS search_matches (
+  participant_id TEXT NOT NULL REFERENCES participants(id) ON DELETE CASCADE,
+  counterparty_type TEXT NOT NULL,
+  rank INT NOT NULL,
+  counterparty_id TEXT NOT NULL,
+  participant_type TEXT NOT NULL,
+  score DOUBLE PRECISION NOT NULL,
+  run_id TEXT NOT NULL,
+  PRIMARY KEY (participant_id, counterparty_type, rank)
+);
+
+CREATE TABLE IF NOT EXISTS search_match_runs (
+  id TEXT PRIMARY KEY,
+  buyer_type TEXT NOT NULL,
+  seller_type TEXT NOT NULL,
+  top_k INT NOT NULL,
+  status TEXT NOT NULL,
+  buyers BIGINT NOT NULL DEFAULT 0,
+  sellers BIGINT NOT NULL DEFAULT 0,
+  matches BIGINT NOT NULL DEFAULT 0,
+  error TEXT,
+  started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  finished_at TIMESTAMPTZ
+);
+
+-- ANN index maintenance (search_service src/services/index_maintenance_service.py): concurrent
+-- rebuilds of the vector indexes as the tables grow, with build duration and recall@10 before/after
+CREATE TABLE IF NOT EXISTS search_index_maintenance (
+  id BIGSERIAL PRIMARY KEY,
+  table_name TEXT NOT NULL,
+  index_name TEXT NOT NULL,
+  index_oid BIGINT,
+  index_type TEXT NOT NULL,
+  lists INT,
+  reason TEXT NOT NULL,
+  status TEXT NOT NULL,
+  row_count BIGINT NOT NULL,
+  changes_counter BIGINT NOT NULL,
+  duration_s DOUBLE PRECISION,
+  recall_before DOUBLE PRECISION,
+  recall_after DOUBLE PRECISION,
+  error TEXT,
+  started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  finished_at TIMESTAMPTZ
+);
+CREATE INDEX IF NOT EXISTS idx_search_index_maintenance_table ON search_index_maintenance (table_name, started_at DESC);
+
+-- Saved searches (search_service standing queries): newly indexed participants probe the ANN index
+-- on the saved query embeddings, and hits are recorded once per (saved search, participant)
+CREATE TABLE IF NOT EXISTS search_saved_searches (
+  id TEXT PRIMARY KEY,
+  owner_id TEXT NOT NULL REFERENCES participants(id) ON DELETE CASCADE,
+  query TEXT NOT NULL,
+  filters JSONB,
+  min_score DOUBLE PRECISION NOT NULL,
+  embedding vector(1536) NOT NULL,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_search_saved_searches_owner ON search_saved_searches (owner_id);
+CREATE INDEX IF NOT EXISTS idx_search_saved_searches_vec_hnsw_cosine ON search_saved_searches USING hnsw (embedding vector_cosine_ops);
+
+CREATE TABLE IF NOT EXISTS search_notifications (
+  id BIGSERIAL PRIMARY KEY,
+  saved_search_id TEXT NOT NULL REFERENCES search_saved_searches(id) ON DELETE CASCADE,
+  owner_id TEXT NOT NULL,
+  participant_id TEXT NOT NULL REFERENCES participants(id) ON DELETE CASCADE,
+  score DOUBLE PRECISION NOT NULL,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  read_at TIMESTAMPTZ,
+  UNIQUE (saved_search_id, participant_id)
+);
+CREATE INDEX IF NOT EXISTS idx_search_notifications_owner ON search_notifications (owner_id, created_at DESC);
+
+-- Embedding versions (search_service src/services/migration_service.py): the model every stored
+-- embedding was made with, and migrations to another model through participant_embeddings__migrate,
+-- dual-written until an atomic cut-over; shadow searches compare the two rankings meanwhile
+CREATE TABLE IF NOT EXISTS search_embedding_versions (
+  model TEXT PRIMARY KEY,
+  service_name TEXT NOT NULL,
+  dimension INT NOT NULL,
+  status TEXT NOT NULL,
+  canary REAL[],
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  activated_at TIMESTAMPTZ,
+  retired_at TIMESTAMPTZ
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_search_embedding_versions_active ON search_embedding_versions (status) WHERE status = 'active';
+
+CREATE TABLE IF NOT EXISTS search_embedding_migrations (
+  id TEXT PRIMARY KEY,
+  live_table TEXT NOT NULL,
+  target_table TEXT NOT NULL,
+  source_model TEXT NOT NULL,
+  target_model TEXT NOT NULL,
+  target_service TEXT NOT NULL,
+  target_dimension INT NOT NULL,
+  status TEXT NOT NULL,
+  phase TEXT NOT NULL,
+  last_id TEXT,
+  total BIGINT NOT NULL DEFAULT 0,
+  processed BIGINT NOT NULL DEFAULT 0,
+  skipped BIGINT NOT NULL DEFAULT 0,
+  run_started_at TIMESTAMPTZ,
+  run_processed BIGINT NOT NULL DEFAULT 0,
+  error TEXT,
+  started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  finished_at TIMESTAMPTZ
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_search_embedding_migrations_open ON search_embedding_migrations (live_table) WHERE status IN ('running', 'shadow');
+
+CREATE TABLE IF NOT EXISTS search_migration_shadow (
+  id BIGSERIAL PRIMARY KEY,
+  migration_id TEXT NOT NULL REFERENCES search_embedding_migrations(id) ON DELETE CASCADE,
+  query TEXT NOT NULL,
+  live_ids TEXT[] NOT NULL,
+  target_ids TEXT[] NOT NULL,
+  overlap DOUBLE PRECISION NOT NULL,
+  rbo DOUBLE PRECISION NOT NULL,
+  target_ms DOUBLE PRECISION NOT NULL,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_search_migration_shadow_migration ON search_migration_shadow (migration_id, created_at DESC);
@@ -15,10 +15,121 @@ class Settings:
     # Embeddings
     EMBEDDING_DIMENSION: int = int(os.getenv("EMBEDDING_DIMENSION") or 1536)
 
+    # Search (pgvector). The distance metric drives both the ORDER BY operator and
+    # the operator class of the ANN index, so the two can never drift apart.
+    SEARCH_DISTANCE_METRIC: str = (os.getenv("SEARCH_DISTANCE_METRIC") or "cosine").lower()  # cosine | inner_product | l2
+    SEARCH_INDEX_TYPE: str = (os.getenv("SEARCH_INDEX_TYPE") or "hnsw").lower()  # hnsw | ivfflat | auto
+    SEARCH_HNSW_M: int = int(os.getenv("SEARCH_HNSW_M") or 16)
+    SEARCH_HNSW_EF_CONSTRUCTION: int = int(os.getenv("SEARCH_HNSW_EF_CONSTRUCTION") or 64)
+    # 0 sizes IVFFlat lists from the row count at build time (rows / 1000, sqrt(rows) past 1M)
+    SEARCH_IVFFLAT_LISTS: int = int(os.getenv("SEARCH_IVFFLAT_LISTS") or 0)
+    # Index maintenance (src/services/index_maintenance_service.py): every INTERVAL seconds (0 = off),
+    # rebuild an IVFFlat index concurrently once its lists are off the size target or more than MAX_DRIFT
+    # of its build-time rows have changed since; "auto" switches it to HNSW at HNSW_ROWS rows.
+    # Each rebuild is logged with its duration and the recall@10 of RECALL_QUERIES sampled rows before and after.
+    SEARCH_MAINTENANCE_INTERVAL: int = int(os.getenv("SEARCH_MAINTENANCE_INTERVAL") or 3600)
+    SEARCH_MAINTENANCE_MIN_ROWS: int = int(os.getenv("SEARCH_MAINTENANCE_MIN_ROWS") or 1000)
+    SEARCH_MAINTENANCE_MAX_DRIFT: float = float(os.getenv("SEARCH_MAINTENANCE_MAX_DRIFT") or 0.2)
+    SEARCH_MAINTENANCE_HNSW_ROWS: int = int(os.getenv("SEARCH_MAINTENANCE_HNSW_ROWS") or 1_000_000)
+    SEARCH_MAINTENANCE_RECALL_QUERIES: int = int(os.getenv("SEARCH_MAINTENANCE_RECALL_QUERIES") or 20)
+    # Search profiles (`profile` on search): hnsw.ef_search / ivfflat.probes per named recall/latency
+    # trade-off, applied with SET LOCAL. SEARCH_PROFILES is JSON overriding or adding profiles
+    # (src/services/search_profiles.py), e.g. {"balanced": {"ef_search": 80, "probes": 8}}
+    SEARCH_PROFILES: str = os.getenv("SEARCH_PROFILES", "")
+    SEARCH_DEFAULT_PROFILE: str = os.getenv("SEARCH_DEFAULT_PROFILE", "balanced")  # fast | balanced | exhaustive
+    SEARCH_MANAGE_INDEX: bool = (os.getenv("SEARCH_MANAGE_INDEX") or "true").lower() == "true"
+    # Precision of the ANN candidate pass: "full" (vector), "half" (halfvec expression index) or "binary"
+    # (binary_quantize, Hamming). Reduced modes fetch top_k x SEARCH_RERANK_OVERSAMPLE candidates and
+    # rescore them against the stored full-precision vectors. Needs pgvector >= 0.7.
+    SEARCH_VECTOR_PRECISION: str = (os.getenv("SEARCH_VECTOR_PRECISION") or "full").lower()
+    SEARCH_RERANK_OVERSAMPLE: float = float(os.getenv("SEARCH_RERANK_OVERSAMPLE") or 4)
+    # Vector store: "pgvector" (Postgres) or "memory" (in-process NumPy matrix, for development,
+    # offline benchmarks and small markets). SEARCH_MEMORY_PATH persists the memory store; empty keeps it in RAM only.
+    SEARCH_VECTOR_BACKEND: str = os.getenv("SEARCH_VECTOR_BACKEND", "pgvector")
+    SEARCH_MEMORY_PATH: str = os.getenv("SEARCH_MEMORY_PATH", "")
+    SEARCH_MEMORY_INDEX: str = os.getenv("SEARCH_MEMORY_INDEX", "exact")  # exact | ivf
+    SEARCH_MEMORY_IVF_LISTS: int = int(os.getenv("SEARCH_MEMORY_IVF_LISTS") or 0)  # 0 = sqrt(rows)
+    SEARCH_MEMORY_IVF_PROBES: int = int(os.getenv("SEARCH_MEMORY_IVF_PROBES") or 8)
+    # Hybrid (full-text + vector) search
+    # Must match the config document_tsv is generated with in db/init.sql (checked at startup)
+    SEARCH_TEXT_SEARCH_CONFIG: str = os.getenv("SEARCH_TEXT_SEARCH_CONFIG", "english")
+    SEARCH_HYBRID_OVERSAMPLE: int = int(os.getenv("SEARCH_HYBRID_OVERSAMPLE") or 4)
+    # Metadata filters: which fields hold arrays, which get range (expression) indexes, and when
+    # a filtered search ranks the filtered rows exactly ("pre") instead of filtering ANN results ("post")
+    SEARCH_ARRAY_FILTER_FIELDS: str = os.getenv("SEARCH_ARRAY_FILTER_FIELDS", "certifications,primary_crops")
+    SEARCH_RANGE_FILTER_FIELDS: str = os.getenv("SEARCH_RANGE_FILTER_FIELDS", "")
+    SEARCH_PREFILTER_MAX_ROWS: int = int(os.getenv("SEARCH_PREFILTER_MAX_ROWS") or 20000)
+    SEARCH_POSTFILTER_OVERSAMPLE: float = float(os.getenv("SEARCH_POSTFILTER_OVERSAMPLE") or 1.5)
+    SEARCH_POSTFILTER_MAX_CANDIDATES: int = int(os.getenv("SEARCH_POSTFILTER_MAX_CANDIDATES") or 1000)
+    # Hydrated results (`include` on search): AI-profile excerpt length and public images per hit
+    SEARCH_EXCERPT_CHARS: int = int(os.getenv("SEARCH_EXCERPT_CHARS") or 280)
+    SEARCH_THUMBNAILS_PER_RESULT: int = int(os.getenv("SEARCH_THUMBNAILS_PER_RESULT") or 3)
+    # Full re-index job: rows embedded and upserted per checkpoint; resume an interrupted job on startup
+    SEARCH_REINDEX_BATCH_SIZE: int = int(os.getenv("SEARCH_REINDEX_BATCH_SIZE") or 256)
+    SEARCH_REINDEX_AUTO_RESUME: bool = (os.getenv("SEARCH_REINDEX_AUTO_RESUME") or "true").lower() == "true"
+    # Multi-vector profiles: one embedding per markdown section in <table>_chunks, ranked per participant
+    # by max-sim or top-n mean (`mode="chunks"`). Candidates = chunk hits fetched per requested result.
+    SEARCH_CHUNKS_ENABLED: bool = (os.getenv("SEARCH_CHUNKS_ENABLED") or "true").lower() == "true"
+    SEARCH_CHUNK_MAX_CHARS: int = int(os.getenv("SEARCH_CHUNK_MAX_CHARS") or 1200)
+    SEARCH_CHUNK_MAX_PER_PROFILE: int = int(os.getenv("SEARCH_CHUNK_MAX_PER_PROFILE") or 24)
+    SEARCH_CHUNK_CANDIDATES: int = int(os.getenv("SEARCH_CHUNK_CANDIDATES") or 8)
+    # Diversity reranking (`mmr_lambda` on search): default candidate pool the MMR stage reorders
+    SEARCH_MMR_CANDIDATES: int = int(os.getenv("SEARCH_MMR_CANDIDATES") or 50)
+    # Distance-weighted ranking (`distance_weight` on search): similarity hits reordered per result
+    SEARCH_GEO_OVERSAMPLE: int = int(os.getenv("SEARCH_GEO_OVERSAMPLE") or 10)
+    # Facet counts (`facets` on search): most frequent values returned per facet field
+    SEARCH_FACET_LIMIT: int = int(os.getenv("SEARCH_FACET_LIMIT") or 20)
+    # Batch matching (POST /matches/runs): best counterparties per participant across two types,
+    # pairs restricted to shared values of the overlap fields, scored in blocks of rows x cols
+    SEARCH_MATCH_BUYER_TYPE: str = os.getenv("SEARCH_MATCH_BUYER_TYPE", "importer")
+    SEARCH_MATCH_SELLER_TYPE: str = os.getenv("SEARCH_MATCH_SELLER_TYPE", "exporter")
+    SEARCH_MATCH_TOP_K: int = int(os.getenv("SEARCH_MATCH_TOP_K") or 20)
+    SEARCH_MATCH_OVERLAP_FIELDS: str = os.getenv("SEARCH_MATCH_OVERLAP_FIELDS", "primary_crops")
+    SEARCH_MATCH_BLOCK_ROWS: int = int(os.getenv("SEARCH_MATCH_BLOCK_ROWS") or 1024)
+    SEARCH_MATCH_BLOCK_COLS: int = int(os.getenv("SEARCH_MATCH_BLOCK_COLS") or 16384)
+    # Saved searches (standing queries): each newly indexed vector probes the saved-search ANN index
+    # for its nearest CANDIDATES searches; a hit needs the search's min_score (default below) and filters
+    SEARCH_STANDING_QUERIES_ENABLED: bool = (os.getenv("SEARCH_STANDING_QUERIES_ENABLED") or "true").lower() == "true"
+    SEARCH_STANDING_CANDIDATES: int = int(os.getenv("SEARCH_STANDING_CANDIDATES") or 200)
+    SEARCH_STANDING_MIN_SCORE: float = float(os.getenv("SEARCH_STANDING_MIN_SCORE") or 0.75)
+    # Max texts sent to the orchestrator in one embeddings call
+    SEARCH_EMBED_BATCH_SIZE: int = int(os.getenv("SEARCH_EMBED_BATCH_SIZE") or 128)
+    # Pooled async client used by search_service to reach the orchestrator's embeddings API
+    SEARCH_EMBED_TIMEOUT: float = float(os.getenv("SEARCH_EMBED_TIMEOUT") or 30)
+    SEARCH_EMBED_CONNECT_TIMEOUT: float = float(os.getenv("SEARCH_EMBED_CONNECT_TIMEOUT") or 5)
+    SEARCH_EMBED_MAX_CONNECTIONS: int = int(os.getenv("SEARCH_EMBED_MAX_CONNECTIONS") or 50)
+    SEARCH_EMBED_MAX_KEEPALIVE: int = int(os.getenv("SEARCH_EMBED_MAX_KEEPALIVE") or 20)
+    SEARCH_EMBED_MAX_CONCURRENCY: int = int(os.getenv("SEARCH_EMBED_MAX_CONCURRENCY") or 32)
+    # Query-embedding cache: in-process LRU with TTL, plus an optional shared Redis tier.
+    # SEARCH_EMBEDDING_MODEL is part of every cache key so a model change never serves stale vectors.
+    SEARCH_EMBEDDING_MODEL: str = os.getenv("SEARCH_EMBEDDING_MODEL", "openai/text-embedding-3-small")
+    # Orchestrator service (config.json `services`) that embeds for search. SEARCH_EMBEDDING_MODEL,
+    # SEARCH_EMBEDDING_SERVICE and EMBEDDING_DIMENSION only seed the first embedding version; the
+    # active version in search_embedding_versions wins after that, and changes by migration
+    SEARCH_EMBEDDING_SERVICE: str = os.getenv("SEARCH_EMBEDDING_SERVICE", "embeddings")
+    # Embedding model migrations (src/services/migration_service.py): share of searches repeated against
+    # the target model once its backfill is done, and how often replicas re-read the active version
+    # (a cut-over also notifies them at once)
+    SEARCH_MIGRATION_SHADOW_RATE: float = float(os.getenv("SEARCH_MIGRATION_SHADOW_RATE") or 0.1)
+    SEARCH_MIGRATION_POLL_INTERVAL: int = int(os.getenv("SEARCH_MIGRATION_POLL_INTERVAL") or 30)
+    SEARCH_EMBED_CACHE_SIZE: int = int(os.getenv("SEARCH_EMBED_CACHE_SIZE") or 2048)
+    SEARCH_EMBED_CACHE_TTL: int = int(os.getenv("SEARCH_EMBED_CACHE_TTL") or 3600)
+    SEARCH_EMBED_CACHE_REDIS: bool = (os.getenv("SEARCH_EMBED_CACHE_REDIS") or "true").lower() == "true"
+    # Search result cache: pages keyed by the normalized request and an index version that every
+    # vector-store write bumps (shared through Redis across replicas), so a cached page is never stale
+    SEARCH_RESULT_CACHE_ENABLED: bool = (os.getenv("SEARCH_RESULT_CACHE_ENABLED") or "true").lower() == "true"
+    SEARCH_RESULT_CACHE_SIZE: int = int(os.getenv("SEARCH_RESULT_CACHE_SIZE") or 1024)
+    SEARCH_RESULT_CACHE_TTL: int = int(os.getenv("SEARCH_RESULT_CACHE_TTL") or 600)
+    SEARCH_RESULT_CACHE_REDIS: bool = (os.getenv("SEARCH_RESULT_CACHE_REDIS") or "true").lower() == "true"
+
+    # Redis (optional shared cache tier)
+    REDIS_URL: str | None = os.getenv("REDIS_URL")
+
     # Service internal URLs 
     PROFILE_SERVICE_URL: str = os.getenv("PROFILE_SERVICE_URL", "http://profile_service:5000/profile/api")
     ASSET_SERVICE_URL: str = os.getenv("ASSET_SERVICE_URL", "http://asset_service:5001/asset")
     SEARCH_SERVICE_URL: str = os.getenv("SEARCH_SERVICE_URL", "http://search_service:5002")
+    LLM_ORCHESTRATION_URL: str = os.getenv("LLM_ORCHESTRATION_URL", "http://llm_orchestration_service:8000")
 
     # Object storage (S3/MinIO). Canonical names with backward-compatible fallbacks
     S3_BUCKET: str | None = (
@@ -40,6 +40,10 @@ class EmbeddingRequest(BaseModel):
     text: str
     service_name: str = "embeddings"
 
+class EmbeddingBatchRequest(BaseModel):
+    texts: List[str]
+    service_name: str = "embeddings"
+
 # --- Endpoints ---
 
 # Configuration Management Endpoints
@@ -122,6 +126,31 @@ async def embeddings_endpoint(req: EmbeddingRequest):
         msg = str(e)
         raise HTTPException(status_code=500, detail=f"Unexpected error: {msg[:300]}")
 
+@router.post("/embeddings/batch", response_model=LLMServiceResponse)
+async def embeddings_batch_endpoint(req: EmbeddingBatchRequest):
+    logger.info(f"POST /embeddings/batch for service: {req.service_name}, {len(req.texts)} texts")
+    try:
+        vectors = await services.create_embeddings(texts=req.texts, service_name=req.service_name)
+        return LLMServiceResponse(result=vectors)
+    except ConfigurationException as e:
+        logger.error(f"Configuration error in /embeddings/batch for service '{req.service_name}': {e}")
+        try:
+            os.environ["EMBEDDINGS_MODE"] = "fallback"
+            vectors = await services.create_embeddings(texts=req.texts, service_name=req.service_name)
+            logger.info("Returned deterministic fallback embeddings due to configuration error.")
+            return LLMServiceResponse(result=vectors)
+        except Exception as inner:
+            raise HTTPException(status_code=400, detail=f"Configuration error: {e}; fallback failed: {inner}")
+    except LLMOrchestrationException as e:
+        logger.error(f"LLM Orchestration error in /embeddings/batch for service '{req.service_name}': {e}")
+        raise HTTPException(status_code=502, detail=str(e))
+    except RetryError as e:
+        cause = e.last_attempt.exception() if hasattr(e, 'last_attempt') else e
+        logger.error(f"Retry exhausted in /embeddings/batch for service '{req.service_name}': {cause}")
+        raise HTTPException(status_code=502, detail=f"Embeddings upstream retry exhausted: {cause}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)[:300]}")
+
 @router.post("/translate", response_model=LLMServiceResponse)
 async def translate_endpoint(req: TranslateRequest):
     logger.info(f"POST /translate for service: {req.service_name}, target: {req.target_language}, text: '{req.text[:50]}...'")
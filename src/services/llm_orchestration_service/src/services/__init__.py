@@ -4,7 +4,7 @@ from .translate import translate
 from .llm_call import direct_llm_call
 from .metadata_extraction import extract_textual_metadata_from_file
 from .profile_generation import generate_structured_profile
-from .embeddings import create_embedding
+from .embeddings import create_embedding, create_embeddings
 
 # This __init__.py makes it easier to import service functions
 # e.g., from ..services import translate
@@ -11,10 +11,17 @@ from ..core.logging import get_logger
 logger = get_logger(__name__)
 
 
-async def create_embedding(text: str, service_name: str = "embeddings") -> List[float]:
-    """
-    Generate an embedding vector for the given text using the configured provider for the embeddings service.
-    """
+def fallback_embedding(txt: str, dim_hint: int | None = None) -> List[float]:
+    """Deterministic, unit-normalised pseudo-embedding seeded from the text hash."""
+    dim = int(dim_hint or 1536)
+    seed_int = int(hashlib.sha256(txt.encode('utf-8')).hexdigest(), 16) % (2**31 - 1)
+    rng = random.Random(seed_int)
+    vec = [rng.uniform(-1.0, 1.0) for _ in range(dim)]
+    norm = sum(x*x for x in vec) ** 0.5 or 1.0
+    return [x / norm for x in vec]
+
+
+async def _resolve_embedding_service(service_name: str) -> tuple[ServiceConfig, ProviderConfig, int | None]:
     app_config: AppConfig = await get_config()
 
     if service_name not in app_config.services:
@@ -34,27 +41,38 @@ async def create_embedding(text: str, service_name: str = "embeddings") -> List[
     llm_params = (opts.get("llm_params") or {})
     # dimensions may be provided in options.llm_params.dimensions
     dimensions = llm_params.get("dimensions")
+    return service_cfg, provider_cfg, dimensions
 
-    def _fallback_vec(txt: str, dim_hint: int | None) -> List[float]:
-        dim = int(dim_hint or 1536)
-        seed_int = int(hashlib.sha256(txt.encode('utf-8')).hexdigest(), 16) % (2**31 - 1)
-        rng = random.Random(seed_int)
-        vec = [rng.uniform(-1.0, 1.0) for _ in range(dim)]
-        norm = sum(x*x for x in vec) ** 0.5 or 1.0
-        return [x / norm for x in vec]
+
+async def create_embedding(text: str, service_name: str = "embeddings") -> List[float]:
+    """
+    Generate an embedding vector for the given text using the configured provider for the embeddings service.
+    """
+    vectors = await create_embeddings([text], service_name=service_name)
+    return vectors[0]
+
+
+async def create_embeddings(texts: List[str], service_name: str = "embeddings") -> List[List[float]]:
+    """
+    Generate embedding vectors for many texts with a single provider call.
+    Vectors are returned in the same order as the input texts.
+    """
+    service_cfg, provider_cfg, dimensions = await _resolve_embedding_service(service_name)
+    if not texts:
+        return []
 
     mode = (os.getenv("EMBEDDINGS_MODE") or "fallback").lower()
     if mode != "provider":
         # Immediate deterministic fallback mode
-        logger.info(f"EMBEDDINGS_MODE={mode}. Returning deterministic fallback embedding.")
-        return _fallback_vec(text, dimensions)
+        logger.info(f"EMBEDDINGS_MODE={mode}. Returning {len(texts)} deterministic fallback embedding(s).")
+        return [fallback_embedding(t, dimensions) for t in texts]
 
     try:
         client = await get_llm_provider_client(service_cfg.client, provider_cfg)
-        vectors = await client.create_embedding([text], dimensions=dimensions)
-        if not vectors:
-            raise ValueError("No embedding returned from provider")
-        return vectors[0]
+        vectors = await client.create_embedding(list(texts), dimensions=dimensions)
+        if len(vectors) != len(texts):
+            raise ValueError(f"Provider returned {len(vectors)} embeddings for {len(texts)} inputs")
+        return vectors
     except Exception as e:
-        logger.warning("Provider embeddings failed; falling back to deterministic vector: %s", e)
-        return _fallback_vec(text, dimensions)
+        logger.warning("Provider embeddings failed; falling back to deterministic vectors: %s", e)
+        return [fallback_embedding(t, dimensions) for t in texts]
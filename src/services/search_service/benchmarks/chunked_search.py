@@ -0,0 +1,160 @@
+"""
+Benchmark: one vector per profile vs per-section chunk vectors (max-sim / top-n mean).
+
+    python -m benchmarks.chunked_search [--participants 2000] [--queries 200] [--top-k 10] [--database-url postgresql://...]
+
+Profiles are simulated as a handful of sections, each about one topic (a crop, a certification,
+a logistics detail) on top of a shared "farm profile" direction, blurred with a few other topics
+(sections and queries share vocabulary with neighbouring subjects). The whole-profile embedding is
+the normalized mean of its sections, which is what embedding one long document tends towards;
+each chunk embedding is its section. A query is about one topic, and the relevant participants
+are those with a section on it. Quality is precision@k against that ground truth, computed
+exactly in NumPy.
+
+With --database-url the corpus is also written through VectorService (participants with ids
+prefixed "bench-", removed afterwards) and the real SQL of `mode="vector"` and `mode="chunks"`
+is timed, so the latency cost of the chunk table and per-participant aggregation is measured
+on the ANN indexes. Use a development database.
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from src.core.config import settings
+
+PREFIX = "bench-"
+
+
+def _unit(x: np.ndarray) -> np.ndarray:
+    return x / np.linalg.norm(x, axis=-1, keepdims=True)
+
+
+def _confusers(rng: np.random.Generator, topic_vecs: np.ndarray, count: int, mix: int = 3) -> np.ndarray:
+    """`count` unit blends of `mix` random topics; random Gaussian noise is near-orthogonal in 1536-d and hides nothing."""
+    return _unit(topic_vecs[rng.integers(0, len(topic_vecs), size=(count, mix))].sum(axis=1))
+
+
+def build_corpus(participants: int, topics: int, dim: int, seed: int = 0):
+    """(profile vectors, chunk vectors, chunk owner row, topics per participant, topic vectors)."""
+    rng = np.random.default_rng(seed)
+    topic_vecs = _unit(rng.standard_normal((topics, dim)).astype(np.float32))
+    shared = _unit(rng.standard_normal(dim).astype(np.float32))
+    chunks, owners, topic_sets, profiles = [], [], [], []
+    for p in range(participants):
+        own = rng.choice(topics, size=int(rng.integers(4, 15)), replace=False)
+        sections = _unit(topic_vecs[own] + shared + _confusers(rng, topic_vecs, len(own)))
+        chunks.append(sections)
+        owners.extend([p] * len(own))
+        topic_sets.append(set(own.tolist()))
+        profiles.append(_unit(sections.mean(axis=0)))
+    return np.stack(profiles), np.concatenate(chunks), np.asarray(owners), topic_sets, topic_vecs
+
+
+def make_queries(topic_vecs: np.ndarray, count: int, seed: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    topics = rng.integers(0, len(topic_vecs), size=count)
+    return _unit(topic_vecs[topics] + _confusers(rng, topic_vecs, count)), topics
+
+
+def rank_single(profiles: np.ndarray, query: np.ndarray, k: int) -> List[int]:
+    return np.argsort(-(profiles @ query))[:k].tolist()
+
+
+def rank_chunks(chunks: np.ndarray, owners: np.ndarray, participants: int, query: np.ndarray, k: int, top_n: int = 1) -> List[int]:
+    scores = chunks @ query
+    order = np.lexsort((-scores, owners))  # chunks grouped by owner, best first
+    sorted_owners, sorted_scores = owners[order], scores[order]
+    starts = np.searchsorted(sorted_owners, np.arange(participants))
+    ends = np.append(starts[1:], len(sorted_owners))
+    agg = np.array([sorted_scores[s:min(e, s + top_n)].mean() for s, e in zip(starts, ends)])
+    return np.argsort(-agg)[:k].tolist()
+
+
+def precision_at_k(ranked: List[int], topic: int, topic_sets: List[set]) -> float:
+    return sum(topic in topic_sets[p] for p in ranked) / max(len(ranked), 1)
+
+
+def _percentiles(samples: List[float]) -> str:
+    p50, p95 = np.percentile(samples, [50, 95])
+    return f"p50={p50:7.2f} ms  p95={p95:7.2f} ms"
+
+
+async def _database_run(args, profiles, chunks, owners, queries, topics, topic_sets) -> Dict[str, Tuple[float, List[float]]]:
+    import asyncpg
+    from src.services.vector_service import VectorService
+
+    settings.DATABASE_URL = args.database_url
+    ids = [f"{PREFIX}{p:06d}" for p in range(len(profiles))]
+    conn = await asyncpg.connect(args.database_url)
+    svc = VectorService()
+    try:
+        await conn.execute("DELETE FROM participants WHERE id LIKE $1", PREFIX + "%")
+        await conn.executemany("INSERT INTO participants (id, type) VALUES ($1, 'exporter')", [(i,) for i in ids])
+        await svc.ensure_schema()
+        await svc.upsert_many([(i, profiles[p], {}, None, None) for p, i in enumerate(ids)])
+        by_owner: Dict[int, list] = {}
+        for vec, owner in zip(chunks, owners):
+            by_owner.setdefault(int(owner), []).append(("", "", vec))
+        await svc.replace_chunks([(ids[p], rows, None) for p, rows in by_owner.items()])
+        await svc.ensure_index()
+        await conn.execute(f"ANALYZE {svc.table}; ANALYZE {svc.chunk_table}")
+
+        results = {}
+        for label, kwargs in (
+            ("vector (one per profile)", {"mode": "vector"}),
+            ("chunks max-sim", {"mode": "chunks"}),
+            (f"chunks mean top-{args.top_n}", {"mode": "chunks", "chunk_aggregate": "mean", "chunk_top_n": args.top_n}),
+        ):
+            await svc.query(queries[0], args.top_k, **kwargs)  # warm the pool and plan cache
+            latencies, precision = [], []
+            for query, topic in zip(queries, topics):
+                start = time.perf_counter()
+                hits = await svc.query(query, args.top_k, **kwargs)
+                latencies.append((time.perf_counter() - start) * 1000)
+                precision.append(precision_at_k([int(h["id"][len(PREFIX):]) for h in hits], topic, topic_sets))
+            results[label] = (float(np.mean(precision)), latencies)
+        return results
+    finally:
+        await conn.execute("DELETE FROM participants WHERE id LIKE $1", PREFIX + "%")
+        await conn.close()
+        await svc.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--participants", type=int, default=2000)
+    parser.add_argument("--topics", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--top-n", type=int, default=2)
+    parser.add_argument("--dim", type=int, default=settings.EMBEDDING_DIMENSION)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    profiles, chunks, owners, topic_sets, topic_vecs = build_corpus(args.participants, args.topics, args.dim)
+    queries, topics = make_queries(topic_vecs, args.queries)
+    print(f"participants={args.participants} chunks={len(chunks)} topics={args.topics} queries={args.queries} k={args.top_k}")
+
+    exact = {
+        "vector (one per profile)": lambda q: rank_single(profiles, q, args.top_k),
+        "chunks max-sim": lambda q: rank_chunks(chunks, owners, args.participants, q, args.top_k),
+        f"chunks mean top-{args.top_n}": lambda q: rank_chunks(chunks, owners, args.participants, q, args.top_k, args.top_n),
+    }
+    print("\nexact ranking (NumPy)")
+    for label, rank in exact.items():
+        precision = np.mean([precision_at_k(rank(q), t, topic_sets) for q, t in zip(queries, topics)])
+        print(f"  {label:<26} precision@{args.top_k}={precision:.3f}")
+
+    if args.database_url:
+        print("\npgvector (ANN indexes, VectorService.query)")
+        for label, (precision, latencies) in asyncio.run(
+            _database_run(args, profiles, chunks, owners, queries, topics, topic_sets)
+        ).items():
+            print(f"  {label:<26} precision@{args.top_k}={precision:.3f}  {_percentiles(latencies)}")
+
+
+if __name__ == "__main__":
+    main()
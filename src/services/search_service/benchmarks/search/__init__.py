@@ -0,0 +1,11 @@
+"""
+Search benchmark suite: latency percentiles, QPS under concurrency and recall@k against exact search.
+
+    python -m benchmarks.search --sizes 10000,100000 --backends pgvector,memory-exact,memory-ivf \
+        [--database-url postgresql://...] [--queries 200] [--top-k 10] [--concurrency 16] \
+        [--output search-benchmark.json] [--baseline previous.json]
+
+Participants are synthetic but deterministic: participant i always has the same profile text, and
+its vector is the orchestrator's deterministic fallback embedding of that text, so two runs (or
+two releases) search the same corpus. See `corpus.py`, `runner.py` for what is measured.
+"""
@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks.search import __doc__ as usage
+from benchmarks.search.corpus import build_queries, build_vectors, exact_top_k
+from benchmarks.search.runner import BACKENDS, close_backend, find_regressions, load_backend, measure
+from src.core.config import settings
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def _run(args, backends, sizes) -> list:
+    _, queries = build_queries(args.queries, args.dim)
+    results = []
+    for size in sizes:
+        start = time.perf_counter()
+        vectors = build_vectors(args.work_dir, size, args.dim, args.workers)
+        print(f"[{size}] corpus ready in {time.perf_counter() - start:.1f}s", flush=True)
+        truth = exact_top_k(vectors, queries, args.top_k, settings.SEARCH_DISTANCE_METRIC)
+        for backend in backends:
+            svc, load_s, index_s = await load_backend(backend, vectors, args.work_dir, args.database_url)
+            try:
+                result = await measure(svc, queries, truth, args.top_k, args.concurrency, args.qps_seconds)
+            finally:
+                await close_backend(backend, svc)
+            result = {"backend": backend, "size": size, "load_seconds": round(load_s, 2), "index_seconds": round(index_s, 2), **result}
+            print(
+                f"[{size}] {backend:<13} p50={result['latency_ms']['p50']:.2f} p95={result['latency_ms']['p95']:.2f} "
+                f"p99={result['latency_ms']['p99']:.2f} ms  qps={result['qps']:.0f}  "
+                f"recall@{args.top_k}={result[f'recall_at_{args.top_k}']:.3f}  load={load_s:.1f}s index={index_s:.1f}s",
+                flush=True,
+            )
+            results.append(result)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=usage, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000", help="comma-separated corpus sizes, e.g. 10000,100000,1000000")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--database-url", default=None, help="scratch database for the pgvector backend")
+    parser.add_argument("--dim", type=int, default=settings.EMBEDDING_DIMENSION)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--qps-seconds", type=float, default=10.0, help="duration of the concurrent QPS run per backend")
+    parser.add_argument("--workers", type=int, default=0, help="processes generating embeddings (default: all cores)")
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "search-benchmark"), help="corpus and memory-store files, reused across runs")
+    parser.add_argument("--output", default="search-benchmark.json")
+    parser.add_argument("--baseline", default=None, help="earlier result file; exit 1 on regressions beyond --tolerance")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    unknown = set(backends) - set(BACKENDS)
+    if unknown:
+        parser.error(f"unknown backend(s) {sorted(unknown)}; expected any of {list(BACKENDS)}")
+    if "pgvector" in backends and not args.database_url:
+        parser.error("the pgvector backend needs --database-url")
+    # The pgvector schema helpers size vector columns from this setting
+    settings.EMBEDDING_DIMENSION = args.dim
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "dim": args.dim,
+            "top_k": args.top_k,
+            "queries": args.queries,
+            "metric": settings.SEARCH_DISTANCE_METRIC,
+            "index_type": settings.SEARCH_INDEX_TYPE,
+            "precision": settings.SEARCH_VECTOR_PRECISION,
+            "rerank_oversample": settings.SEARCH_RERANK_OVERSAMPLE,
+            "hnsw": {"m": settings.SEARCH_HNSW_M, "ef_construction": settings.SEARCH_HNSW_EF_CONSTRUCTION},
+            "ivfflat_lists": settings.SEARCH_IVFFLAT_LISTS,
+            "memory_ivf": {"lists": settings.SEARCH_MEMORY_IVF_LISTS, "probes": settings.SEARCH_MEMORY_IVF_PROBES},
+        },
+        "results": asyncio.run(_run(args, backends, sizes)),
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = find_regressions(report, json.load(f), args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
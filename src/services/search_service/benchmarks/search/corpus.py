@@ -0,0 +1,110 @@
+"""
+Deterministic synthetic corpus: participant profiles, their embeddings, queries and exact top-k.
+
+Vectors are built in worker processes and written to a float32 memmap in the work directory, so
+a 1M x 1536 corpus (about 6 GB) never has to fit in RAM and is reused by later runs of the same
+size and dimension.
+"""
+import hashlib
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+PREFIX = "bench-"
+
+_REGIONS = ["Saskatchewan", "Alberta", "Manitoba", "Ontario", "Quebec", "Oromia", "Amhara", "Sidama", "Punjab", "Victoria"]
+_CROPS = ["durum wheat", "lentils", "chickpeas", "canola", "oats", "barley", "coffee", "sesame", "teff", "yellow peas", "flax", "sorghum"]
+_CERTS = ["organic", "fair-trade", "rainforest-alliance", "non-gmo", "globalgap", "haccp"]
+
+
+def fallback_embedding(txt: str, dim_hint: int | None = None) -> List[float]:
+    """
+    Same vectors as `fallback_embedding` in llm_orchestration_service/src/services/embeddings.py
+    (EMBEDDINGS_MODE=fallback). Kept in step by hand: that module cannot be imported from here.
+    """
+    dim = int(dim_hint or 1536)
+    seed_int = int(hashlib.sha256(txt.encode('utf-8')).hexdigest(), 16) % (2**31 - 1)
+    rng = random.Random(seed_int)
+    vec = [rng.uniform(-1.0, 1.0) for _ in range(dim)]
+    norm = sum(x*x for x in vec) ** 0.5 or 1.0
+    return [x / norm for x in vec]
+
+
+def participant(i: int) -> Tuple[str, str, Dict[str, Any]]:
+    """(id, AI profile text, metadata) of synthetic participant i."""
+    rng = random.Random(i)
+    region = rng.choice(_REGIONS)
+    crops = rng.sample(_CROPS, rng.randint(1, 3))
+    certs = rng.sample(_CERTS, rng.randint(0, 2))
+    _id = f"{PREFIX}{i:07d}"
+    text = (
+        f"Farm {i} in {region} grows {', '.join(crops)}"
+        + (f", certified {', '.join(certs)}" if certs else "")
+        + f". Annual volume {rng.randint(10, 5000)} t."
+    )
+    metadata = {"region": region, "certifications": certs, "primary_crops": crops, "producer_id": _id}
+    return _id, text, metadata
+
+
+def query_text(j: int) -> str:
+    rng = random.Random(-1 - j)
+    return f"buyer {j} looking for {rng.choice(_CROPS)} from {rng.choice(_REGIONS)}"
+
+
+def _embed_block(args: Tuple[int, int, int]) -> np.ndarray:
+    start, stop, dim = args
+    return np.asarray([fallback_embedding(f"AI Profile: {participant(i)[1]}", dim) for i in range(start, stop)], dtype=np.float32)
+
+
+def build_vectors(work_dir: str, size: int, dim: int, workers: int = 0, block: int = 2000) -> np.memmap:
+    """The (size, dim) corpus matrix, generated once per (size, dim) and memory-mapped afterwards."""
+    os.makedirs(work_dir, exist_ok=True)
+    path = os.path.join(work_dir, f"corpus-{size}-{dim}.f32")
+    meta_path = path + ".json"
+    if os.path.exists(meta_path) and json.load(open(meta_path)).get("complete"):
+        return np.memmap(path, dtype=np.float32, mode="r", shape=(size, dim))
+    matrix = np.memmap(path, dtype=np.float32, mode="w+", shape=(size, dim))
+    ranges = [(start, min(start + block, size), dim) for start in range(0, size, block)]
+    with ProcessPoolExecutor(max_workers=workers or None) as pool:
+        for (start, stop, _), vectors in zip(ranges, pool.map(_embed_block, ranges)):
+            matrix[start:stop] = vectors
+    matrix.flush()
+    with open(meta_path, "w") as f:
+        json.dump({"size": size, "dim": dim, "complete": True}, f)
+    return np.memmap(path, dtype=np.float32, mode="r", shape=(size, dim))
+
+
+def build_queries(count: int, dim: int) -> Tuple[List[str], np.ndarray]:
+    texts = [query_text(j) for j in range(count)]
+    return texts, np.asarray([fallback_embedding(t, dim) for t in texts], dtype=np.float32)
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int, metric: str, block: int = 65536) -> np.ndarray:
+    """
+    Row numbers of the exact top `k` per query under `metric`, best first, scanning the corpus
+    in blocks and merging a running top-k so memory stays at one block.
+    """
+    q = queries.astype(np.float32)
+    if metric == "cosine":
+        q = q / np.maximum(np.linalg.norm(q, axis=1, keepdims=True), 1e-12)
+    best_scores = np.full((len(q), 0), -np.inf, dtype=np.float32)
+    best_rows = np.empty((len(q), 0), dtype=np.int64)
+    for start in range(0, len(vectors), block):
+        chunk = np.asarray(vectors[start:start + block], dtype=np.float32)
+        if metric == "cosine":
+            chunk = chunk / np.maximum(np.linalg.norm(chunk, axis=1, keepdims=True), 1e-12)
+        scores = q @ chunk.T
+        if metric == "l2":
+            # -|x - q|^2 up to a per-query constant
+            scores = 2 * scores - (chunk * chunk).sum(axis=1)[None, :]
+        scores = np.concatenate([best_scores, scores], axis=1)
+        rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, start + len(chunk)), (len(q), len(chunk)))], axis=1)
+        keep = np.argpartition(-scores, min(k, scores.shape[1]) - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, keep, axis=1)
+        best_rows = np.take_along_axis(rows, keep, axis=1)
+    order = np.argsort(-best_scores, axis=1)
+    return np.take_along_axis(best_rows, order, axis=1)
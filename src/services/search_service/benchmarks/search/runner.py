@@ -0,0 +1,171 @@
+"""
+Load a corpus into a backend and measure it.
+
+Backends:
+  pgvector      VectorService over a scratch table (`search_bench_embeddings`, dropped afterwards),
+                bulk-loaded with upsert_many, ANN index built after the load as in production
+  memory-exact  MemoryVectorService, exact top-k
+  memory-ivf    MemoryVectorService, IVF lists trained after the load
+
+Per backend and corpus size: load and index-build seconds, sequential latency (p50/p95/p99),
+QPS with `concurrency` queries in flight, and recall@k of the returned ids against exact search.
+"""
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from benchmarks.search.corpus import PREFIX, participant
+from src.core.config import settings
+
+BACKENDS = ("pgvector", "memory-exact", "memory-ivf")
+BENCH_TABLE = "search_bench_embeddings"
+
+
+def latency_summary(samples_ms: List[float]) -> Dict[str, float]:
+    p50, p95, p99 = np.percentile(samples_ms, [50, 95, 99])
+    return {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3), "mean": round(float(np.mean(samples_ms)), 3)}
+
+
+def recall_at_k(returned: List[List[str]], truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    hits = [len(set(ids[:k]) & {f"{PREFIX}{row:07d}" for row in expected}) for ids, expected in zip(returned, truth)]
+    return round(sum(hits) / (k * len(truth)), 4)
+
+
+def _rows(vectors: np.ndarray, start: int, stop: int) -> List[Tuple[str, np.ndarray, Dict[str, Any], str, None]]:
+    rows = []
+    for i in range(start, stop):
+        _id, text, metadata = participant(i)
+        rows.append((_id, vectors[i], metadata, text, None))
+    return rows
+
+
+async def _create_pgvector(dim: int, database_url: str):
+    import asyncpg
+    from src.services.vector_service import VectorService
+
+    settings.DATABASE_URL = database_url
+    conn = await asyncpg.connect(database_url)
+    try:
+        await conn.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}_chunks, {BENCH_TABLE}")
+        # Same columns as participant_embeddings, without the participants foreign key
+        await conn.execute(
+            f"""
+            CREATE TABLE {BENCH_TABLE} (
+                id TEXT PRIMARY KEY,
+                embedding vector({int(dim)}),
+                metadata JSONB NOT NULL DEFAULT '{{}}'::jsonb,
+                document TEXT,
+                content_hash TEXT,
+                embedding_model TEXT,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+            """
+        )
+    finally:
+        await conn.close()
+    return VectorService(table=BENCH_TABLE)
+
+
+async def _drop_pgvector(svc) -> None:
+    pool = await svc._pool_or_create()
+    async with pool.acquire() as conn:
+        await conn.execute(f"DROP TABLE IF EXISTS {svc.chunk_table}, {svc.table}")
+    await svc.close()
+
+
+async def load_backend(backend: str, vectors: np.ndarray, work_dir: str, database_url: Optional[str], batch_size: int = 2000):
+    """(service, load_seconds, index_seconds) with every corpus row loaded and the index built."""
+    size, dim = vectors.shape
+    if backend == "pgvector":
+        if not database_url:
+            raise ValueError("The pgvector backend needs --database-url (a scratch database; the benchmark creates and drops its own table).")
+        svc = await _create_pgvector(dim, database_url)
+    elif backend in ("memory-exact", "memory-ivf"):
+        from src.services.memory_vector_service import MemoryVectorService
+        path = os.path.join(work_dir, f"{backend}-{size}-{dim}")
+        svc = MemoryVectorService(path=path, index_mode=backend.split("-")[1])
+        await svc.delete_all()
+    else:
+        raise ValueError(f"Unknown backend '{backend}'. Expected one of {list(BACKENDS)}")
+
+    start = time.perf_counter()
+    for offset in range(0, size, batch_size):
+        await svc.upsert_many(_rows(vectors, offset, min(offset + batch_size, size)))
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await svc.ensure_schema()
+    await svc.ensure_index()
+    if backend == "pgvector":
+        pool = await svc._pool_or_create()
+        async with pool.acquire() as conn:
+            await conn.execute(f"ANALYZE {svc.table}")
+    index_seconds = time.perf_counter() - start
+    return svc, load_seconds, index_seconds
+
+
+async def close_backend(backend: str, svc) -> None:
+    if backend == "pgvector":
+        await _drop_pgvector(svc)
+    else:
+        await svc.close()
+
+
+async def measure(svc, queries: np.ndarray, truth: np.ndarray, top_k: int, concurrency: int, qps_seconds: float) -> Dict[str, Any]:
+    """Sequential latency and recall over every query, then QPS with `concurrency` queries in flight."""
+    await svc.query(queries[0], top_k)  # warm-up: pool, plan cache, lazily trained lists
+    latencies, returned = [], []
+    for q in queries:
+        start = time.perf_counter()
+        hits = await svc.query(q, top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        returned.append([h["id"] for h in hits])
+
+    done = 0
+    deadline = time.perf_counter() + qps_seconds
+
+    async def worker(offset: int) -> None:
+        nonlocal done
+        i = offset
+        while time.perf_counter() < deadline:
+            await svc.query(queries[i % len(queries)], top_k)
+            done += 1
+            i += concurrency
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "latency_ms": latency_summary(latencies),
+        "qps": round(done / elapsed, 2),
+        "concurrency": concurrency,
+        f"recall_at_{top_k}": recall_at_k(returned, truth),
+    }
+
+
+def find_regressions(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    Compare two result files: p95/p99 latency up, or QPS down, by more than `tolerance` (a
+    fraction), or recall down by more than 0.01, for any (backend, size) present in both.
+    """
+    previous = {(r["backend"], r["size"]): r for r in baseline.get("results", [])}
+    problems = []
+    for result in current["results"]:
+        old = previous.get((result["backend"], result["size"]))
+        if not old:
+            continue
+        label = f"{result['backend']} @ {result['size']}"
+        for pct in ("p95", "p99"):
+            before, after = old["latency_ms"][pct], result["latency_ms"][pct]
+            if after > before * (1 + tolerance):
+                problems.append(f"{label}: {pct} latency {before} -> {after} ms")
+        if result["qps"] < old["qps"] * (1 - tolerance):
+            problems.append(f"{label}: QPS {old['qps']} -> {result['qps']}")
+        for key in result:
+            if key.startswith("recall_at_") and key in old and result[key] < old[key] - 0.01:
+                problems.append(f"{label}: {key} {old[key]} -> {result[key]}")
+    return problems
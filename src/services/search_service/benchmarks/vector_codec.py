@@ -0,0 +1,84 @@
+"""
+Micro-benchmark: text vector literals vs the binary pgvector codec.
+
+    python -m benchmarks.vector_codec [--dim 1536] [--iterations 2000] [--database-url postgresql://...]
+
+Without a database it measures client-side encode/decode cost and wire size. With
+--database-url it also times `SELECT $1::vector` round trips over both paths, which
+includes the server-side parse/format work the text path forces on Postgres.
+"""
+import argparse
+import asyncio
+import time
+from typing import Callable, List
+
+import numpy as np
+
+from src.database.pgvector_codec import decode_vector, encode_vector, register_vector
+
+
+def text_literal(embedding: List[float]) -> str:
+    # The path VectorService used before the binary codec
+    return "[" + ",".join(str(float(x)) for x in embedding) + "]"
+
+
+def parse_text_literal(literal: str) -> List[float]:
+    return [float(x) for x in literal[1:-1].split(",")]
+
+
+def _per_call_us(fn: Callable[[], object], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+async def _round_trip_us(database_url: str, payload, binary: bool, iterations: int) -> float:
+    import asyncpg
+
+    conn = await asyncpg.connect(database_url)
+    try:
+        if binary:
+            await register_vector(conn)
+        stmt = await conn.prepare("SELECT $1::vector")
+        await stmt.fetchval(payload)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await stmt.fetchval(payload)
+        return (time.perf_counter() - start) / iterations * 1e6
+    finally:
+        await conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vec = rng.standard_normal(args.dim).astype(np.float32)
+    as_list = vec.tolist()
+    literal = text_literal(as_list)
+    wire = encode_vector(vec)
+
+    rows = [
+        ("encode text literal (list)", _per_call_us(lambda: text_literal(as_list), args.iterations)),
+        ("encode binary (float32 array)", _per_call_us(lambda: encode_vector(vec), args.iterations)),
+        ("encode binary (list)", _per_call_us(lambda: encode_vector(as_list), args.iterations)),
+        ("decode text literal", _per_call_us(lambda: parse_text_literal(literal), args.iterations)),
+        ("decode binary", _per_call_us(lambda: decode_vector(wire), args.iterations)),
+    ]
+    if args.database_url:
+        rows.append(("round trip text", asyncio.run(_round_trip_us(args.database_url, literal, False, args.iterations))))
+        rows.append(("round trip binary", asyncio.run(_round_trip_us(args.database_url, vec, True, args.iterations))))
+
+    print(f"dim={args.dim} iterations={args.iterations}")
+    print(f"wire size: text={len(literal.encode())} B, binary={len(wire)} B")
+    for name, micros in rows:
+        print(f"{name:<32} {micros:10.1f} us/call")
+
+
+if __name__ == "__main__":
+    main()
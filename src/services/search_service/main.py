@@ -1,7 +1,15 @@
 import logging
 from fastapi import FastAPI
 
+from src.core.config import settings
+from src.database.redis import close_redis
 from src.routes.search_route import router as search_routes
+from src.services.embedding_service import embedding_service
+from src.services.index_maintenance_service import index_maintenance_service
+from src.services.matching_service import matching_service
+from src.services.migration_service import migration_service
+from src.services.reindex_service import reindex_service
+from src.services.vector_service import vector_service
 from fastapi.middleware.cors import CORSMiddleware
 
 logging.basicConfig(level=logging.INFO)
@@ -23,6 +31,39 @@ app.include_router(search_routes, prefix="/api")
 @app.on_event("startup")
 async def startup_event():
     logger.info("Application startup.")
+    await embedding_service.startup()
+    if settings.SEARCH_VECTOR_BACKEND == "pgvector":
+        # Embed with the active embedding version (and its dimension) before anything is built or searched
+        try:
+            await migration_service.startup()
+        except Exception as e:
+            logger.error(f"Could not load the active embedding version: {e}")
+    if settings.SEARCH_MANAGE_INDEX:
+        try:
+            await vector_service.ensure_schema()
+            await vector_service.ensure_facets()
+            await vector_service.ensure_index()
+            await vector_service.verify_index_usage()
+        except Exception as e:
+            logger.error(f"Vector index self-check failed: {e}")
+    if settings.SEARCH_REINDEX_AUTO_RESUME and settings.SEARCH_VECTOR_BACKEND == "pgvector":
+        try:
+            await reindex_service.resume_unfinished()
+        except Exception as e:
+            logger.error(f"Could not resume the re-index job: {e}")
+    if settings.SEARCH_MANAGE_INDEX and settings.SEARCH_VECTOR_BACKEND == "pgvector":
+        await index_maintenance_service.start_scheduler()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await index_maintenance_service.shutdown()
+    await migration_service.shutdown()
+    await reindex_service.shutdown()
+    await matching_service.shutdown()
+    await embedding_service.shutdown()
+    await vector_service.close()
+    await close_redis()
 
 
 @app.get("/healthz")
@@ -1,4 +1,5 @@
 from pydantic import BaseModel, Field
+from datetime import datetime
 from typing import List, Optional, Dict, Any
 
 class ProducerProfile(BaseModel):
@@ -30,6 +31,137 @@ class IndexResponse(BaseModel):
     message: str
     error: Optional[str] = None
     indexed_id: Optional[str] = None
+    skipped: bool = False  # the stored embedding already matched this text and model
+
+class BatchIndexResponse(BaseModel):
+    success: bool
+    message: str
+    indexed: int = 0
+    skipped: int = 0  # unchanged profiles whose stored embedding was reused
+    failed: Dict[str, str] = Field(default_factory=dict)  # profile_id -> reason
+
+class ReindexJobStatus(BaseModel):
+    id: str
+    target_table: str
+    status: str  # running | interrupted | completed | failed
+    phase: str  # copy | catchup | done
+    last_id: Optional[str] = None  # checkpoint the job resumes after
+    total: int = 0
+    processed: int = 0
+    skipped: int = 0  # rows whose stored embedding was reused
+    percent: Optional[float] = None
+    throughput_per_sec: Optional[float] = None
+    eta_seconds: Optional[int] = None
+    error: Optional[str] = None
+    started_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+class EmbeddingVersionInfo(BaseModel):
+    model: str
+    service_name: str  # orchestrator embeddings service (config.json)
+    dimension: int
+    status: str  # active | candidate | retired
+    created_at: datetime
+    activated_at: Optional[datetime] = None
+    retired_at: Optional[datetime] = None
+
+class ShadowComparison(BaseModel):
+    queries: int = 0  # searches repeated against the target version
+    mean_overlap: Optional[float] = None  # share of the live page the target also returned
+    min_overlap: Optional[float] = None
+    mean_rbo: Optional[float] = None  # rank-biased overlap, 1 = identical rankings
+    mean_target_ms: Optional[float] = None  # target embedding + search latency
+
+class EmbeddingMigrationStatus(BaseModel):
+    id: str
+    source_model: str
+    target_model: str
+    target_service: str
+    target_dimension: int
+    status: str  # running | interrupted | shadow | completed | failed | cancelled
+    phase: str  # copy | sync | shadow | done
+    last_id: Optional[str] = None  # checkpoint the copy resumes after
+    total: int = 0
+    processed: int = 0
+    skipped: int = 0  # live rows without profile text, left out of the target
+    percent: Optional[float] = None
+    throughput_per_sec: Optional[float] = None
+    eta_seconds: Optional[int] = None
+    shadow: ShadowComparison = Field(default_factory=ShadowComparison)
+    error: Optional[str] = None
+    started_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+class IndexMaintenanceEntry(BaseModel):
+    id: int
+    table_name: str
+    index_name: str
+    index_type: str  # hnsw | ivfflat
+    lists: Optional[int] = None
+    reason: str  # missing | switch | untracked | lists | drift | forced
+    status: str  # running | completed | failed
+    row_count: int
+    changes_counter: int  # table's insert/update/delete counter when the build started
+    duration_s: Optional[float] = None
+    recall_before: Optional[float] = None  # recall@10 of the search pass on the old index
+    recall_after: Optional[float] = None
+    error: Optional[str] = None
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+
+class IndexTableState(BaseModel):
+    table: str
+    rows: int
+    changes: int
+    index: Optional[Dict[str, Any]] = None  # name, method, opclass, lists of the ANN index
+    planned: Optional[Dict[str, Any]] = None  # reason, index_type, lists of the rebuild the next check runs
+
+class IndexMaintenanceStatus(BaseModel):
+    running: bool
+    tables: List[IndexTableState] = Field(default_factory=list)
+    log: List[IndexMaintenanceEntry] = Field(default_factory=list)  # most recent first
+
+class MatchRunStatus(BaseModel):
+    id: str
+    buyer_type: str
+    seller_type: str
+    top_k: int
+    status: str  # running | interrupted | completed | failed
+    buyers: int = 0
+    sellers: int = 0
+    matches: int = 0  # rows written, both directions
+    error: Optional[str] = None
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+
+class Match(BaseModel):
+    id: str  # the counterparty
+    counterparty_type: str
+    rank: int
+    score: float
+    run_id: str
+
+class MatchesResponse(BaseModel):
+    participant_id: str
+    results: List[Match] = Field(default_factory=list)
+
+class SavedSearch(BaseModel):
+    id: str
+    owner_id: str
+    query: str
+    filters: Optional[Dict[str, Any]] = None
+    min_score: float
+    created_at: datetime
+
+class Notification(BaseModel):
+    id: int
+    saved_search_id: str
+    participant_id: str  # the newly indexed participant
+    score: float
+    created_at: datetime
+    read_at: Optional[datetime] = None
 
 class ProducerSimilarity(BaseModel):
     """
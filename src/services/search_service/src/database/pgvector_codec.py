@@ -0,0 +1,33 @@
+import struct
+from typing import Any
+import asyncpg
+import numpy as np
+
+# pgvector binary wire format: uint16 dimension, uint16 reserved (0), then `dim` big-endian float32
+_HEADER = struct.Struct(">HH")
+_WIRE_DTYPE = np.dtype(">f4")
+
+
+def encode_vector(value: Any) -> bytes:
+    """Encode a 1-D sequence (NumPy array, array('f'), list) into pgvector's binary format."""
+    arr = np.asarray(value, dtype=_WIRE_DTYPE)
+    if arr.ndim != 1:
+        raise ValueError(f"vector must be 1-dimensional, got shape {arr.shape}")
+    return _HEADER.pack(arr.shape[0], 0) + arr.tobytes()
+
+
+def decode_vector(data: bytes) -> np.ndarray:
+    """Decode pgvector's binary format into a native-endian float32 NumPy array."""
+    dim, _ = _HEADER.unpack_from(data)
+    return np.frombuffer(data, dtype=_WIRE_DTYPE, count=dim, offset=_HEADER.size).astype(np.float32)
+
+
+async def register_vector(conn: asyncpg.Connection) -> None:
+    """
+    Register the binary `vector` codec on a connection; pass as `init=` to asyncpg.create_pool.
+    Once registered, `vector` parameters take arrays directly and `vector` columns come back
+    as float32 NumPy arrays, with no text formatting or parsing on either side.
+    """
+    await conn.set_type_codec(
+        "vector", schema="public", encoder=encode_vector, decoder=decode_vector, format="binary"
+    )
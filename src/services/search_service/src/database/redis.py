@@ -0,0 +1,28 @@
+import logging
+from typing import Optional
+from src.core.config import settings
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis is optional; caches fall back to in-process only
+    aioredis = None
+
+
+logger = logging.getLogger(__name__)
+
+_client = None
+
+
+def get_redis() -> Optional["aioredis.Redis"]:
+    """Shared Redis client, or None when REDIS_URL is unset or the redis package is missing."""
+    global _client
+    if _client is None and settings.REDIS_URL and aioredis is not None:
+        _client = aioredis.from_url(settings.REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+    return _client
+
+
+async def close_redis() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -1,12 +1,32 @@
+import asyncio
 from fastapi import APIRouter, HTTPException, status, Query
-from typing import List
+from typing import List, Optional
 from pydantic import ValidationError
-from src.schema.search_schema import SearchResponse, QueryRequest, ProducerSimilarity, IndexRequest
+from src.core.config import settings
+from src.schema.search_schema import SearchResponse, QueryRequest, EmbeddingMigrationRequest, SimilarRequest, BatchSearchRequest, BatchSearchResponse, QueryResults, MatchRunRequest, SavedSearchRequest, MarkReadRequest, ProducerSimilarity, IndexRequest, BatchIndexRequest
+from src.database.models.search_model import BatchIndexResponse, EmbeddingMigrationStatus, EmbeddingVersionInfo, IndexMaintenanceStatus, MatchesResponse, MatchRunStatus, Notification, ReindexJobStatus, SavedSearch
 from src.services.embedding_service import embedding_service
-from src.services.index_service import index_producer
+from src.services.filter_compiler import FilterError
+from src.services.index_service import index_producer, index_producers
+from src.services.index_maintenance_service import index_maintenance_service
+from src.services.matching_service import matching_service
+from src.services.migration_service import migration_service
+from src.services.mmr import mmr_rerank
+from src.services.result_cache import result_cache
+from src.services.reindex_service import reindex_service
+from src.services.standing_query_service import standing_query_service
 from src.services.vector_service import vector_service
 router = APIRouter()
 
+def _ranking(rows: List[dict]) -> List[dict]:
+    """A result page as cached: the ranking only, since `include` fields can change without an index write."""
+    return [{"id": row["id"], "score": row["score"]} for row in rows]
+
+async def _revalidated(pages: List[List[dict]], include: List[str]) -> List[List[dict]]:
+    """Cached pages with current `include` fields, minus participants no longer indexed."""
+    current = await vector_service.revalidate([row["id"] for page in pages for row in page], include)
+    return [[{**row, "fields": current[row["id"]]} for row in page if row["id"] in current] for page in pages]
+
 @router.post("/index", response_model=dict)
 async def index_producer_data(request: IndexRequest):
     """
@@ -15,44 +35,91 @@ async def index_producer_data(request: IndexRequest):
     """
     try:
         result = await index_producer(request.profile_id, request.ai_profile, 
-                                      request.region, request.certifications, request.primary_crops)
-        return {"success": result.success, "message": result.message}
+                                      request.region, request.certifications, request.primary_crops,
+                                      request.coordinates.model_dump() if request.coordinates else None)
+        return {"success": result.success, "message": result.message, "skipped": result.skipped}
     
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An error occurred while indexing: {str(e)}"
         )
+
+@router.post("/index/batch", response_model=BatchIndexResponse)
+async def index_producers_batch(request: BatchIndexRequest):
+    """
+    Index up to 1000 producers in one call.
+    Embeddings are requested in batches and written with a single bulk upsert.
+    """
+    return await index_producers(request.items)
+
 @router.post("/search-producers", response_model=SearchResponse)
 async def search_producers(request: QueryRequest):
     """
     Performs a semantic search against the indexed producer data.
     Returns a list of producer_ids ordered by similarity (most similar on top).
     Allows for optional metadata filtering (region, certifications, primary crops).
+    `include` returns the listed profile fields with each hit, so callers need no per-hit profile lookups.
+    `mmr_lambda` reranks a wider candidate pool for diversity (Maximal Marginal Relevance).
+    `near` with `radius_km` keeps participants within that distance; `distance_weight` blends distance decay into the score.
+    `facets` counts participants per region / certification / primary crop among everything the filters match.
+    Identical requests reuse the cached ranking until the index next changes; `include` fields are
+    read fresh for every answer.
     """
     try:
-        # Vectorize the query using the centralized orchestration embeddings
-        query_vector = embedding_service.get_embedding(request.query)
+        cache_key = result_cache.request_key(request.model_dump())
+        version = await result_cache.version()
+        cached = await result_cache.get(cache_key, version)
+        if cached is not None:
+            [rows] = await _revalidated([cached["results"]], request.include)
+            return SearchResponse(
+                success=True,
+                message="Search completed successfully.",
+                results=[ProducerSimilarity(**row) for row in rows],
+                facets=cached["facets"],
+                search_params=vector_service.ann_settings(request.profile),
+            )
 
-        # Prepare metadata filters
-        filters = {}
-        if request.filter_region:
-            filters["region"] = request.filter_region
-        if request.filter_certification:
-            filters["certifications"] = {"$in": [request.filter_certification]}
-        if request.filter_primary_crop:
-            filters["primary_crops"] = {"$in": [request.filter_primary_crop]}
+        # Vectorize the query using the centralized orchestration embeddings
+        query_vector = await embedding_service.get_query_embedding(request.query)
 
-        rows = await vector_service.query(query_vector, request.top_k, filters if filters else None)
+        diversify = request.mmr_lambda is not None
+        fetch_k = max(request.top_k, request.mmr_candidates or settings.SEARCH_MMR_CANDIDATES) if diversify else request.top_k
+        options = dict(
+            mode=request.mode,
+            query_text=request.query,
+            vector_weight=request.vector_weight,
+            lexical_weight=request.lexical_weight,
+            rrf_k=request.rrf_k,
+            filter_strategy=request.filter_strategy,
+            include=request.include,
+            chunk_aggregate=request.chunk_aggregate,
+            chunk_top_n=request.chunk_top_n,
+            geo_blend=request.geo_blend(),
+            profile=request.profile,
+        )
+        search = vector_service.query(query_vector, fetch_k, request.combined_filters(), with_embeddings=diversify, **options)
+        if request.facets:
+            # Counted on a second connection while the ranking runs
+            rows, facets = await asyncio.gather(search, vector_service.facets(request.facets, request.combined_filters()))
+        else:
+            rows, facets = await search, None
+        if diversify:
+            rows = mmr_rerank(query_vector, rows, request.top_k, request.mmr_lambda)
+        else:
+            # During an embedding migration, a sample of searches is compared against the target model
+            migration_service.shadow(request.query, request.top_k, request.combined_filters(), options, [row["id"] for row in rows])
+        rows = [{"id": row["id"], "score": row["score"], "fields": row.get("fields")} for row in rows]
+        await result_cache.set(cache_key, version, {"results": _ranking(rows), "facets": facets})
 
-        results: List[ProducerSimilarity] = [
-            ProducerSimilarity(id=row["id"], score=row["score"]) for row in rows
-        ]
+        results: List[ProducerSimilarity] = [ProducerSimilarity(**row) for row in rows]
 
         return SearchResponse(
             success=True,
             message="Search completed successfully.",
-            results=results
+            results=results,
+            facets=facets,
+            search_params=vector_service.ann_settings(request.profile),
         )
 
     except ValidationError as e:
@@ -60,16 +127,324 @@ async def search_producers(request: QueryRequest):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Invalid search query parameters: {e.errors()}"
         )
+    except FilterError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid filters: {e}")
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         print(f"Error during search: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An unexpected error occurred during search: {str(e)}"
         )
+@router.post("/search/similar/{participant_id}", response_model=SearchResponse)
+async def search_similar(participant_id: str, request: Optional[SimilarRequest] = None):
+    """
+    "More like this": participants ranked by similarity to this participant's stored embedding.
+    No embedding call is made. Takes the same filters as /search-producers (the body is optional),
+    and the participant itself is never among the results.
+    """
+    request = request or SimilarRequest()
+    try:
+        rows = await vector_service.similar(
+            participant_id,
+            request.top_k,
+            request.combined_filters(),
+            filter_strategy=request.filter_strategy,
+            include=request.include,
+            profile=request.profile,
+        )
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except FilterError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid filters: {e}")
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An unexpected error occurred during search: {str(e)}"
+        )
+    return SearchResponse(
+        success=True,
+        message="Search completed successfully.",
+        results=[ProducerSimilarity(id=row["id"], score=row["score"], fields=row.get("fields")) for row in rows],
+        search_params=vector_service.ann_settings(request.profile),
+    )
+
+@router.post("/search/batch", response_model=BatchSearchResponse)
+async def search_batch(request: BatchSearchRequest):
+    """
+    Many vector searches sharing filters, top_k and include, e.g. one per product line of a buyer.
+    The queries are embedded in one orchestrator call (cached ones are reused) and ranked in a
+    single SQL statement; results come back per query, in request order.
+    """
+    try:
+        cache_key = result_cache.request_key(request.model_dump())
+        version = await result_cache.version()
+        pages = await result_cache.get(cache_key, version)
+        if pages is not None:
+            pages = await _revalidated(pages, request.include)
+        else:
+            vectors = await embedding_service.get_query_embeddings(request.queries)
+            hits = await vector_service.query_batch(
+                vectors,
+                request.top_k,
+                request.combined_filters(),
+                filter_strategy=request.filter_strategy,
+                include=request.include,
+                profile=request.profile,
+            )
+            pages = [[{"id": row["id"], "score": row["score"], "fields": row.get("fields")} for row in page] for page in hits]
+            await result_cache.set(cache_key, version, [_ranking(page) for page in pages])
+    except FilterError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid filters: {e}")
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An unexpected error occurred during batch search: {str(e)}"
+        )
+    return BatchSearchResponse(
+        success=True,
+        message=f"{len(pages)} searches completed successfully.",
+        results=[
+            QueryResults(query=query, results=[ProducerSimilarity(**row) for row in page])
+            for query, page in zip(request.queries, pages)
+        ],
+        search_params=vector_service.ann_settings(request.profile),
+    )
+
 @router.delete("/search/clear-index")
 async def clear_index():
     try:
         deleted = await vector_service.delete_all()
         return {"success": True, "message": f"Index cleared. Deleted {deleted} rows."}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to clear index: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to clear index: {e}")
+
+@router.post("/reindex", response_model=ReindexJobStatus, status_code=status.HTTP_202_ACCEPTED)
+async def start_reindex():
+    """
+    Rebuild the search index from every approved participant in the background.
+    Resumes the unfinished job if there is one; the live index keeps serving until the atomic swap.
+    """
+    try:
+        return await reindex_service.start()
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+@router.get("/reindex", response_model=ReindexJobStatus)
+async def latest_reindex():
+    """Progress, throughput and ETA of the most recent re-index job."""
+    try:
+        job = await reindex_service.get_job()
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No re-index job has run yet.")
+    return job
+
+@router.get("/reindex/{job_id}", response_model=ReindexJobStatus)
+async def get_reindex(job_id: str):
+    try:
+        job = await reindex_service.get_job(job_id)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Re-index job '{job_id}' not found.")
+    return job
+
+@router.post("/reindex/{job_id}/resume", response_model=ReindexJobStatus, status_code=status.HTTP_202_ACCEPTED)
+async def resume_reindex(job_id: str):
+    """Continue a failed or interrupted job from its last checkpoint."""
+    try:
+        return await reindex_service.resume(job_id)
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+@router.get("/index/maintenance", response_model=IndexMaintenanceStatus)
+async def get_index_maintenance():
+    """ANN index state of each search table, the rebuild it is due for, and the maintenance log."""
+    try:
+        return await index_maintenance_service.status()
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+@router.post("/index/maintenance", response_model=IndexMaintenanceStatus, status_code=status.HTTP_202_ACCEPTED)
+async def run_index_maintenance(force: bool = Query(False, description="Rebuild every ANN index, due or not")):
+    """Check the ANN indexes now and rebuild those due, concurrently, in the background."""
+    try:
+        return await index_maintenance_service.start(force)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+@router.get("/embedding-versions", response_model=List[EmbeddingVersionInfo])
+async def list_embedding_versions():
+    """Embedding models the index has been built with: the active one, a migration candidate, retired ones."""
+    try:
+        return await migration_service.versions()
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+@router.post("/migrations", response_model=EmbeddingMigrationStatus, status_code=status.HTTP_202_ACCEPTED)
+async def start_migration(request: EmbeddingMigrationRequest):
+    """
+    Move the index to another embedding model without downtime: re-embed every participant into
+    tables of the new version in the background, dual-writing meanwhile, then shadow a sample of
+    searches against it until the cut-over.
+    """
+    try:
+        return await migration_service.start(request.model, request.service_name, request.dimension)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+@router.get("/migrations", response_model=EmbeddingMigrationStatus)
+async def latest_migration():
+    """Progress and shadow-query comparison of the most recent embedding migration."""
+    try:
+        migration = await migration_service.get_migration()
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    if migration is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No embedding migration has run yet.")
+    return migration
+
+@router.get("/migrations/{migration_id}", response_model=EmbeddingMigrationStatus)
+async def get_migration(migration_id: str):
+    try:
+        migration = await migration_service.get_migration(migration_id)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    if migration is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Embedding migration '{migration_id}' not found.")
+    return migration
+
+@router.post("/migrations/{migration_id}/resume", response_model=EmbeddingMigrationStatus, status_code=status.HTTP_202_ACCEPTED)
+async def resume_migration(migration_id: str):
+    """Continue a failed or interrupted migration from its last checkpoint."""
+    try:
+        return await migration_service.resume(migration_id)
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+@router.post("/migrations/{migration_id}/cutover", response_model=EmbeddingMigrationStatus)
+async def cutover_migration(migration_id: str):
+    """Atomically make the migration's model the active embedding version, on every replica."""
+    try:
+        return await migration_service.cutover(migration_id)
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+@router.post("/migrations/{migration_id}/cancel", response_model=EmbeddingMigrationStatus)
+async def cancel_migration(migration_id: str):
+    """Abandon a migration before its cut-over; the active version is untouched."""
+    try:
+        return await migration_service.cancel(migration_id)
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters for the search caches, for sizing them."""
+    return {"embedding": embedding_service.cache.stats(), "results": result_cache.stats()}
+
+@router.post("/matches/runs", response_model=MatchRunStatus, status_code=status.HTTP_202_ACCEPTED)
+async def start_match_run(request: Optional[MatchRunRequest] = None):
+    """
+    Recompute every buyer's best sellers and every seller's best buyers in the background.
+    The previous lists keep being served until the run replaces them in one transaction.
+    """
+    request = request or MatchRunRequest()
+    try:
+        return await matching_service.start(
+            request.buyer_type, request.seller_type, request.top_k, request.buyer_filters, request.seller_filters
+        )
+    except FilterError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid filters: {e}")
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+@router.get("/matches/runs", response_model=MatchRunStatus)
+async def latest_match_run():
+    try:
+        run = await matching_service.get_run()
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    if run is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No matching run has run yet.")
+    return run
+
+@router.get("/matches/runs/{run_id}", response_model=MatchRunStatus)
+async def get_match_run(run_id: str):
+    try:
+        run = await matching_service.get_run(run_id)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    if run is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Matching run '{run_id}' not found.")
+    return run
+
+@router.get("/matches/{participant_id}", response_model=MatchesResponse)
+async def participant_matches(participant_id: str, counterparty_type: Optional[str] = None, limit: int = Query(20, ge=1, le=200)):
+    """Best counterparties of a participant from the last matching run, read straight from the matches table."""
+    try:
+        results = await matching_service.matches_for(participant_id, counterparty_type, limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return MatchesResponse(participant_id=participant_id, results=results)
+
+@router.post("/saved-searches", response_model=SavedSearch, status_code=status.HTTP_201_CREATED)
+async def create_saved_search(request: SavedSearchRequest):
+    """
+    Save a search; participants indexed from now on that match it are recorded as notifications
+    for `owner_id`, so clients need not re-run the search on a timer.
+    """
+    try:
+        return await standing_query_service.create(request.owner_id, request.query, request.filters, request.min_score)
+    except FilterError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid filters: {e}")
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+@router.get("/saved-searches", response_model=List[SavedSearch])
+async def list_saved_searches(owner_id: str):
+    try:
+        return await standing_query_service.saved_searches(owner_id)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+@router.delete("/saved-searches/{saved_search_id}")
+async def delete_saved_search(saved_search_id: str):
+    try:
+        deleted = await standing_query_service.delete(saved_search_id)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    if not deleted:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Saved search '{saved_search_id}' not found.")
+    return {"success": True}
+
+@router.get("/notifications/{owner_id}", response_model=List[Notification])
+async def list_notifications(owner_id: str, unread_only: bool = False, limit: int = Query(50, ge=1, le=500)):
+    """Newly indexed participants that matched the owner's saved searches, newest first."""
+    try:
+        return await standing_query_service.notifications(owner_id, unread_only, limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+@router.post("/notifications/{owner_id}/read")
+async def mark_notifications_read(owner_id: str, request: Optional[MarkReadRequest] = None):
+    try:
+        marked = await standing_query_service.mark_read(owner_id, request.ids if request else None)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return {"success": True, "marked": marked}
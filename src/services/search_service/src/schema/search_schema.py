@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import List, Optional, Dict, Any, Literal, Tuple
+from src.services import search_profiles
 
 
 class ProducerSimilarity(BaseModel):
@@ -9,20 +10,141 @@ class ProducerSimilarity(BaseModel):
     """
     producer_id: str = Field(alias="id") # Map user_id from metadata to producer_id
     score: float
+    # Requested `include` fields, present only when the search asked for them
+    fields: Optional[Dict[str, Any]] = None
 
 class SearchResponse(BaseModel):
     success: bool
     message: str
     error: Optional[str] = None
     results: List[ProducerSimilarity] = Field(default_factory=list)
+    # {field: {value: participants}} over the filtered candidate set, when the search asked for `facets`
+    facets: Optional[Dict[str, Dict[str, int]]] = None
+    # Search profile and the ANN scan parameter it set, e.g. {"profile": "balanced", "index_type": "hnsw", "ef_search": 100}
+    search_params: Optional[Dict[str, Any]] = None
 
-class QueryRequest(BaseModel):
-    query: str
+# Profile fields a search can return with each hit, joined server-side in the ranking query
+IncludeField = Literal[
+    "farm_name", "region", "country", "participant_type",
+    "primary_crops", "certifications", "ai_profile_excerpt", "thumbnails",
+]
+
+# Metadata fields a search can count participants by (`facets`)
+FacetField = Literal["region", "certifications", "primary_crops"]
+
+class Coordinates(BaseModel):
+    # Same shape as CoordinateModel in shared/events.py
+    latitude: float = Field(ge=-90, le=90)
+    longitude: float = Field(ge=-180, le=180)
+
+class NearFilter(Coordinates):
+    radius_km: Optional[float] = Field(default=None, gt=0)  # keep only participants within this great-circle distance
+
+class SearchFilters(BaseModel):
     # Optional filters for search
     filter_region: Optional[str] = None
     filter_certification: Optional[str] = None
     filter_primary_crop: Optional[str] = None
+    # Filter language over indexed metadata ($eq, $in, $all, $gt/$gte/$lt/$lte, $exists, $and, $or)
+    filters: Optional[Dict[str, Any]] = None
+    # "auto" picks pre- or post-filtering from the planner's selectivity estimate
+    filter_strategy: Literal["auto", "pre", "post"] = "auto"
     top_k: int = Field(default=5, ge=1, le=100) # Number of results to return
+    include: List[IncludeField] = Field(default_factory=list)  # hydrate hits with these profile fields
+    # Point searched around: a radius filter with radius_km, and the origin of distance-weighted ranking
+    near: Optional[NearFilter] = None
+    # Recall/latency trade-off of the ANN scan: "fast", "balanced", "exhaustive" or a SEARCH_PROFILES name;
+    # default SEARCH_DEFAULT_PROFILE
+    profile: Optional[str] = None
+
+    @field_validator("profile")
+    @classmethod
+    def _known_profile(cls, value: Optional[str]) -> Optional[str]:
+        return search_profiles.resolve(value) if value is not None else None
+
+    def combined_filters(self) -> Optional[Dict[str, Any]]:
+        """The shorthand filter fields and `filters`, as one filter expression."""
+        combined: Dict[str, Any] = {}
+        if self.filter_region:
+            combined["region"] = self.filter_region
+        if self.filter_certification:
+            combined["certifications"] = {"$in": [self.filter_certification]}
+        if self.filter_primary_crop:
+            combined["primary_crops"] = {"$in": [self.filter_primary_crop]}
+        if self.near and self.near.radius_km:
+            combined["coordinates"] = {"$near": self.near.model_dump()}
+        if self.filters:
+            combined = {"$and": [combined, self.filters]} if combined else self.filters
+        return combined or None
+
+class QueryRequest(SearchFilters):
+    query: str
+    # "hybrid" fuses full-text matches (exact certification codes, varieties, ports) with vector results
+    # "chunks" ranks participants by their best-matching profile sections (multi-vector)
+    mode: Literal["vector", "hybrid", "chunks"] = "vector"
+    vector_weight: float = Field(default=1.0, ge=0)  # reciprocal-rank-fusion weight of the vector leg
+    lexical_weight: float = Field(default=1.0, ge=0)  # reciprocal-rank-fusion weight of the full-text leg
+    rrf_k: int = Field(default=60, ge=1)  # rank damping constant; larger flattens the fusion curve
+    chunk_aggregate: Literal["max", "mean"] = "max"  # per-participant score in "chunks" mode: best section, or mean of the best chunk_top_n
+    chunk_top_n: int = Field(default=3, ge=1, le=10)
+    # Diversity reranking (MMR): 1 = pure relevance, lower values trade relevance for spread among the hits
+    mmr_lambda: Optional[float] = Field(default=None, ge=0, le=1)
+    mmr_candidates: Optional[int] = Field(default=None, ge=1, le=500)  # pool the MMR stage picks from; default SEARCH_MMR_CANDIDATES
+    # Distance-weighted ranking around `near`: (1 - weight) * similarity + weight * exp(-distance_km / distance_scale_km)
+    distance_weight: float = Field(default=0.0, ge=0, le=1)
+    distance_scale_km: float = Field(default=100.0, gt=0)
+    # Participants per value of these fields among everything the filters match, not just the page
+    facets: List[FacetField] = Field(default_factory=list)
+
+    @model_validator(mode="after")
+    def _check_distance_weight(self):
+        if self.distance_weight > 0 and self.near is None:
+            raise ValueError("distance_weight needs a `near` point.")
+        if self.distance_weight > 0 and self.mode == "hybrid":
+            raise ValueError("distance_weight needs a similarity score; use mode 'vector' or 'chunks'.")
+        return self
+
+    def geo_blend(self) -> Optional[Tuple[float, float, float, float]]:
+        """(latitude, longitude, weight, scale_km) for VectorService.query, or None."""
+        if not self.distance_weight:
+            return None
+        return self.near.latitude, self.near.longitude, self.distance_weight, self.distance_scale_km
+
+class BatchSearchRequest(SearchFilters):
+    # One vector search per query, sharing the filters, top_k and include
+    queries: List[str] = Field(..., min_length=1, max_length=50)
+
+class QueryResults(BaseModel):
+    query: str
+    results: List[ProducerSimilarity] = Field(default_factory=list)
+
+class BatchSearchResponse(BaseModel):
+    success: bool
+    message: str
+    results: List[QueryResults] = Field(default_factory=list)  # in the order of the request's queries
+    search_params: Optional[Dict[str, Any]] = None
+
+class SimilarRequest(SearchFilters):
+    """"More like this" over a participant's stored embedding; the participant itself is left out."""
+
+class MatchRunRequest(BaseModel):
+    # Defaults: SEARCH_MATCH_BUYER_TYPE / SEARCH_MATCH_SELLER_TYPE / SEARCH_MATCH_TOP_K
+    buyer_type: Optional[str] = None
+    seller_type: Optional[str] = None
+    top_k: Optional[int] = Field(default=None, ge=1, le=200)
+    # Narrow either side with the search filter language
+    buyer_filters: Optional[Dict[str, Any]] = None
+    seller_filters: Optional[Dict[str, Any]] = None
+
+class SavedSearchRequest(BaseModel):
+    owner_id: str  # participant notified about new matches
+    query: str
+    # Filter language over indexed metadata, checked against each new participant
+    filters: Optional[Dict[str, Any]] = None
+    min_score: Optional[float] = None  # default SEARCH_STANDING_MIN_SCORE
+
+class MarkReadRequest(BaseModel):
+    ids: Optional[List[int]] = None  # None marks every unread notification
 
 class IndexRequest(BaseModel):
     profile_id: str
@@ -30,3 +152,12 @@ class IndexRequest(BaseModel):
     region:str
     certifications: List[str] = Field(default_factory=list)
     primary_crops: List[str] = Field(default_factory=list)
+    coordinates: Optional[Coordinates] = None  # enables radius filters and distance-weighted ranking
+
+class BatchIndexRequest(BaseModel):
+    items: List[IndexRequest] = Field(..., min_length=1, max_length=1000)
+
+class EmbeddingMigrationRequest(BaseModel):
+    model: str  # label stored with every embedding, e.g. "openai/text-embedding-3-large"
+    service_name: str  # orchestrator service (config.json `services`) that embeds with it
+    dimension: int = Field(..., ge=1, le=16000)
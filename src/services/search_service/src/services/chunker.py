@@ -0,0 +1,88 @@
+"""
+Splits markdown AI profiles into sections for multi-vector indexing.
+
+Each chunk is one heading section, prefixed with its heading path ("Products > Pulses") so the
+embedding knows what the text is about. Sections longer than `max_chars` are split between
+paragraphs (or sentences, for a single huge paragraph).
+"""
+import re
+from typing import List, NamedTuple
+from src.core.config import settings
+
+
+class Chunk(NamedTuple):
+    heading: str  # "Parent > Child" path of the section, "" before the first heading
+    content: str  # section text, without the heading line
+
+    @property
+    def text(self) -> str:
+        """What gets embedded."""
+        return f"{self.heading}\n\n{self.content}" if self.heading else self.content
+
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def _pack(pieces: List[str], max_chars: int, joiner: str) -> List[str]:
+    """Greedily join pieces into strings of at most max_chars (a single oversized piece is cut)."""
+    packed, current = [], ""
+    for piece in pieces:
+        while len(piece) > max_chars:
+            if current:
+                packed.append(current)
+                current = ""
+            packed.append(piece[:max_chars])
+            piece = piece[max_chars:]
+        candidate = f"{current}{joiner}{piece}" if current else piece
+        if len(candidate) <= max_chars:
+            current = candidate
+        else:
+            packed.append(current)
+            current = piece
+    if current:
+        packed.append(current)
+    return packed
+
+
+def _split_long(body: str, max_chars: int) -> List[str]:
+    if len(body) <= max_chars:
+        return [body]
+    pieces = []
+    for paragraph in re.split(r"\n\s*\n", body):
+        paragraph = paragraph.strip()
+        if len(paragraph) > max_chars:
+            pieces.extend(_pack(_SENTENCE_RE.split(paragraph), max_chars, " "))
+        elif paragraph:
+            pieces.append(paragraph)
+    return _pack(pieces, max_chars, "\n\n")
+
+
+def split_profile(markdown: str, max_chars: int = None, max_chunks: int = None) -> List[Chunk]:
+    """Heading-aware chunks of a markdown profile; empty sections are dropped."""
+    max_chars = max(200, max_chars or settings.SEARCH_CHUNK_MAX_CHARS)
+    max_chunks = max_chunks or settings.SEARCH_CHUNK_MAX_PER_PROFILE
+    sections, path, lines = [], [], []
+
+    def flush():
+        body = "\n".join(lines).strip()
+        if body:
+            sections.append((" > ".join(title for _, title in path), body))
+        lines.clear()
+
+    in_code = False
+    for line in (markdown or "").splitlines():
+        if line.lstrip().startswith("```"):
+            in_code = not in_code
+        match = None if in_code else _HEADING_RE.match(line)
+        if match:
+            flush()
+            level = len(match.group(1))
+            path = [(lvl, title) for lvl, title in path if lvl < level]
+            path.append((level, match.group(2).strip("*_ ")))
+        else:
+            lines.append(line)
+    flush()
+
+    chunks = [Chunk(heading, piece) for heading, body in sections for piece in _split_long(body, max_chars)]
+    return chunks[:max_chunks]
@@ -0,0 +1,123 @@
+import hashlib
+import logging
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from src.core.config import settings
+from src.database.redis import get_redis
+
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(text: str) -> str:
+    """Case-fold and collapse whitespace so trivially different spellings share a cache entry."""
+    return " ".join(text.casefold().split())
+
+
+class LRUTTLCache:
+    """Bounded in-process LRU whose entries also expire `ttl` seconds after being written."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = max(0, maxsize)
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        if self.maxsize == 0:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache for query embeddings keyed by (normalized text, embedding model).
+    The local tier answers repeat queries without leaving the process; the Redis tier is
+    shared by every search_service replica. Redis errors are logged and treated as misses.
+    """
+
+    def __init__(self, model: Optional[str] = None, maxsize: Optional[int] = None, ttl: Optional[int] = None, use_redis: Optional[bool] = None):
+        self.model = model or settings.SEARCH_EMBEDDING_MODEL
+        self.ttl = int(ttl if ttl is not None else settings.SEARCH_EMBED_CACHE_TTL)
+        self.local = LRUTTLCache(maxsize if maxsize is not None else settings.SEARCH_EMBED_CACHE_SIZE, self.ttl)
+        self.use_redis = settings.SEARCH_EMBED_CACHE_REDIS if use_redis is None else use_redis
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.redis_errors = 0
+
+    def key(self, text: str) -> str:
+        digest = hashlib.sha256(f"{self.model}\x00{normalize_query(text)}".encode("utf-8")).hexdigest()
+        return f"search:qemb:{digest}"
+
+    def _redis(self):
+        return get_redis() if self.use_redis else None
+
+    async def get(self, text: str) -> Optional[List[float]]:
+        key = self.key(text)
+        vector = self.local.get(key)
+        if vector is not None:
+            self.local_hits += 1
+            return vector
+        client = self._redis()
+        if client is not None:
+            try:
+                raw = await client.get(key)
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"Embedding cache Redis read failed: {e}")
+                raw = None
+            if raw is not None:
+                vector = array("f", raw).tolist()
+                self.local.set(key, vector)
+                self.redis_hits += 1
+                return vector
+        self.misses += 1
+        return None
+
+    async def set(self, text: str, vector: List[float]) -> None:
+        key = self.key(text)
+        self.local.set(key, vector)
+        client = self._redis()
+        if client is not None:
+            try:
+                await client.set(key, array("f", vector).tobytes(), ex=self.ttl)
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"Embedding cache Redis write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.local_hits + self.redis_hits + self.misses
+        return {
+            "model": self.model,
+            "local_size": len(self.local),
+            "local_maxsize": self.local.maxsize,
+            "ttl_seconds": self.ttl,
+            "redis_enabled": self._redis() is not None,
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "redis_errors": self.redis_errors,
+            "hit_ratio": (self.local_hits + self.redis_hits) / lookups if lookups else 0.0,
+        }
@@ -1,28 +1,133 @@
-from typing import List
+import asyncio
+import copy
+import logging
+from typing import List, Optional
 import httpx
 from src.core.config import settings
+from src.services.embedding_cache import EmbeddingCache
+
+
+logger = logging.getLogger(__name__)
 
 
 class EmbeddingService:
+    """
+    Async client for the orchestrator's embeddings API.
+    A single keep-alive connection pool is shared by every request in the worker, and a
+    semaphore caps how many embedding calls are in flight so a burst of searches queues
+    here instead of overwhelming the orchestrator.
+    Calls go to one embeddings service of the orchestrator's config.json (`service_name`), whose
+    vectors must have `dimension` components; both follow the active embedding version.
+    """
+
     def __init__(self):
+        self.service_name = settings.SEARCH_EMBEDDING_SERVICE
+        self.model = settings.SEARCH_EMBEDDING_MODEL
         self.dimension = settings.EMBEDDING_DIMENSION
-        self.orchestrator_url = "http://llm_orchestration_service:8000"
+        self.orchestrator_url = settings.LLM_ORCHESTRATION_URL.rstrip("/")
+        self.batch_size = max(1, settings.SEARCH_EMBED_BATCH_SIZE)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore = asyncio.Semaphore(max(1, settings.SEARCH_EMBED_MAX_CONCURRENCY))
+        self.cache = EmbeddingCache()
+
+    def use(self, model: str, service_name: str, dimension: int) -> None:
+        """Embed with another model version; the query cache is keyed by model, so it switches too."""
+        if model != self.model:
+            self.cache = EmbeddingCache(model)
+        self.model, self.service_name, self.dimension = model, service_name, int(dimension)
+
+    def variant(self, model: str, service_name: str, dimension: int) -> "EmbeddingService":
+        """A client for another model version sharing this one's connection pool and concurrency cap."""
+        other = copy.copy(self)
+        other.use(model, service_name, dimension)
+        return other
+
+    async def startup(self) -> None:
+        await self._client_or_create()
+
+    async def shutdown(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _client_or_create(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.orchestrator_url,
+                timeout=httpx.Timeout(settings.SEARCH_EMBED_TIMEOUT, connect=settings.SEARCH_EMBED_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=settings.SEARCH_EMBED_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.SEARCH_EMBED_MAX_KEEPALIVE,
+                ),
+            )
+        return self._client
+
+    async def _post(self, path: str, payload: dict):
+        client = await self._client_or_create()
+        async with self._semaphore:
+            r = await client.post(path, json=payload)
+        r.raise_for_status()
+        return r.json().get("result")
 
-    def get_embedding(self, text: str) -> List[float]:
+    def _check_dimension(self, embedding: List[float]) -> None:
+        if len(embedding) != self.dimension:
+            raise ValueError(
+                f"Embedding dimension mismatch: expected {self.dimension}, got {len(embedding)}"
+            )
+
+    async def get_embedding(self, text: str) -> List[float]:
         try:
-            payload = {"text": text, "service_name": "embeddings"}
-            with httpx.Client(timeout=30) as client:
-                r = client.post(f"{self.orchestrator_url}/llm/embeddings", json=payload)
-                r.raise_for_status()
-                data = r.json()
-                embedding = data.get("result")
-            if len(embedding) != self.dimension:
-                raise ValueError(
-                    f"Embedding dimension mismatch: expected {self.dimension}, got {len(embedding)}"
-                )
+            embedding = await self._post("/llm/embeddings", {"text": text, "service_name": self.service_name})
+            self._check_dimension(embedding)
             return embedding
         except Exception as e:
-            print(f"Error getting embedding from OpenRouter via orchestrator: {e}")
+            logger.error(f"Error getting embedding from OpenRouter via orchestrator: {e}")
+            raise
+
+    async def get_query_embedding(self, text: str) -> List[float]:
+        """Embedding for a search query, served from the query-embedding cache when possible."""
+        embedding = await self.cache.get(text)
+        if embedding is None:
+            embedding = await self.get_embedding(text)
+            await self.cache.set(text, embedding)
+        return embedding
+
+    async def get_query_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Embeddings for many search queries: cached ones are reused, the rest embedded in one batch call."""
+        found = {}
+        for text in dict.fromkeys(texts):
+            embedding = await self.cache.get(text)
+            if embedding is not None:
+                found[text] = embedding
+        missing = [text for text in dict.fromkeys(texts) if text not in found]
+        if len(missing) == 1:
+            vectors = [await self.get_embedding(missing[0])]
+        else:
+            vectors = await self.get_embeddings(missing) if missing else []
+        for text, embedding in zip(missing, vectors):
+            found[text] = embedding
+            await self.cache.set(text, embedding)
+        return [found[text] for text in texts]
+
+    async def _embed_chunk(self, chunk: List[str]) -> List[List[float]]:
+        vectors = await self._post("/llm/embeddings/batch", {"texts": chunk, "service_name": self.service_name}) or []
+        if len(vectors) != len(chunk):
+            raise ValueError(f"Expected {len(chunk)} embeddings, got {len(vectors)}")
+        for vector in vectors:
+            self._check_dimension(vector)
+        return vectors
+
+    async def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed many texts with one orchestrator round trip per `batch_size` texts.
+        Batches are sent concurrently (bounded by the client semaphore); vectors come back in input order.
+        """
+        try:
+            chunks = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+            results = await asyncio.gather(*(self._embed_chunk(chunk) for chunk in chunks))
+            return [vector for vectors in results for vector in vectors]
+        except Exception as e:
+            logger.error(f"Error getting batch embeddings from OpenRouter via orchestrator: {e}")
             raise
 
 
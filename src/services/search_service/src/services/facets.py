@@ -0,0 +1,211 @@
+"""
+Facet counts (participants per region, certification and primary crop) over a search's
+filtered candidate set.
+
+Counting the filtered rows reads the metadata of every matching row, which on a large market is
+a full scan of the embeddings table whenever the filter is broad. The common requests, no filter
+or a single facet value (the filter_region / filter_certification / filter_primary_crop
+shorthands), are answered from two summary tables instead, kept current by statement-level
+triggers on the embeddings table (see VectorService.ensure_facets):
+
+  {table}_facets       (field, value, n)                      participants having field = value
+  {table}_facet_pairs  (field, value, facet, facet_value, n)  of those, participants having facet = facet_value
+
+Any other filter counts its matching rows, which the metadata GIN index narrows down.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+FACET_FIELDS = ("region", "certifications", "primary_crops")
+
+# Transition tables of the maintenance triggers
+_NEW, _OLD = "new_rows", "old_rows"
+
+
+def summary_tables(table: str) -> Tuple[str, str]:
+    return f"{table}_facets", f"{table}_facet_pairs"
+
+
+def trigger_names(table: str) -> Tuple[str, str, str]:
+    return f"{table}_facets_ins", f"{table}_facets_upd", f"{table}_facets_del"
+
+
+def values_sql(metadata: str, fields: Sequence[str] = FACET_FIELDS) -> str:
+    """
+    (field, value) rows of one metadata value, for use after CROSS JOIN LATERAL: a scalar is one
+    value, an array each of its distinct elements. Empty strings and missing fields count nowhere.
+    """
+    names = ", ".join(f"'{field}'" for field in fields)
+    item = f"{metadata} -> k.field"
+    return (
+        f"(SELECT DISTINCT k.field, v.value FROM unnest(ARRAY[{names}]::text[]) AS k(field) "
+        f"CROSS JOIN LATERAL jsonb_array_elements_text(CASE "
+        f"WHEN jsonb_typeof({item}) = 'array' THEN {item} "
+        f"WHEN jsonb_typeof({item}) IN ('string', 'number', 'boolean') THEN jsonb_build_array({item}) "
+        f"ELSE '[]'::jsonb END) AS v(value) WHERE v.value <> '')"
+    )
+
+
+def facet_values(metadata: Dict[str, Any], fields: Sequence[str] = FACET_FIELDS) -> List[Tuple[str, str]]:
+    """Python twin of values_sql, for the in-memory backend."""
+    found = []
+    for field in fields:
+        value = metadata.get(field)
+        items = value if isinstance(value, list) else [value] if isinstance(value, (str, int, float)) else []
+        for item in items:
+            if isinstance(item, bool):
+                text = "true" if item else "false"
+            elif isinstance(item, (dict, list)) or item is None:
+                continue
+            else:
+                text = str(item)
+            if text and (field, text) not in found:
+                found.append((field, text))
+    return found
+
+
+def _delta_sql(table: str, sources: Iterable[Tuple[str, int]]) -> List[str]:
+    """Statements adding `sign` per facet value (and pair) of each row in the transition tables."""
+    counts, pairs = summary_tables(table)
+    values = values_sql("r.metadata")
+    singles = " UNION ALL ".join(
+        f"SELECT f.field, f.value, {sign} AS delta FROM {source} r CROSS JOIN LATERAL {values} f"
+        for source, sign in sources
+    )
+    doubles = " UNION ALL ".join(
+        f"SELECT a.field, a.value, b.field AS facet, b.value AS facet_value, {sign} AS delta "
+        f"FROM {source} r CROSS JOIN LATERAL {values} a CROSS JOIN LATERAL {values} b"
+        for source, sign in sources
+    )
+    # Rows are locked in key order so that concurrent writers cannot deadlock on the counters
+    return [
+        f"""
+        INSERT INTO {counts} AS c (field, value, n)
+        SELECT field, value, sum(delta) FROM ({singles}) d
+        GROUP BY field, value HAVING sum(delta) <> 0 ORDER BY field, value
+        ON CONFLICT (field, value) DO UPDATE SET n = c.n + EXCLUDED.n;
+        """,
+        f"""
+        INSERT INTO {pairs} AS c (field, value, facet, facet_value, n)
+        SELECT field, value, facet, facet_value, sum(delta) FROM ({doubles}) d
+        GROUP BY field, value, facet, facet_value HAVING sum(delta) <> 0 ORDER BY field, value, facet, facet_value
+        ON CONFLICT (field, value, facet, facet_value) DO UPDATE SET n = c.n + EXCLUDED.n;
+        """,
+    ]
+
+
+def maintenance_sql(table: str) -> List[str]:
+    """
+    Summary tables, the trigger function and its three statement-level triggers. Transition
+    tables are per event, so INSERT, UPDATE and DELETE each get a trigger; an upsert fires
+    the INSERT one for new rows and the UPDATE one for the rows it replaced.
+    """
+    counts, pairs = summary_tables(table)
+    ins, upd, dele = trigger_names(table)
+    function = f"{table}_facets_delta"
+    body = {
+        "INSERT": _delta_sql(table, [(_NEW, 1)]),
+        "UPDATE": _delta_sql(table, [(_NEW, 1), (_OLD, -1)]),
+        "DELETE": _delta_sql(table, [(_OLD, -1)]),
+    }
+    return [
+        f"CREATE TABLE IF NOT EXISTS {counts} (field TEXT NOT NULL, value TEXT NOT NULL, n BIGINT NOT NULL, PRIMARY KEY (field, value))",
+        f"""
+        CREATE TABLE IF NOT EXISTS {pairs} (
+            field TEXT NOT NULL, value TEXT NOT NULL, facet TEXT NOT NULL, facet_value TEXT NOT NULL, n BIGINT NOT NULL,
+            PRIMARY KEY (field, value, facet, facet_value)
+        )
+        """,
+        f"""
+        CREATE OR REPLACE FUNCTION {function}() RETURNS trigger LANGUAGE plpgsql AS $facets$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                {''.join(body['INSERT'])}
+            ELSIF TG_OP = 'UPDATE' THEN
+                {''.join(body['UPDATE'])}
+            ELSE
+                {''.join(body['DELETE'])}
+            END IF;
+            RETURN NULL;
+        END
+        $facets$
+        """,
+        f"DROP TRIGGER IF EXISTS {ins} ON {table}",
+        f"DROP TRIGGER IF EXISTS {upd} ON {table}",
+        f"DROP TRIGGER IF EXISTS {dele} ON {table}",
+        f"CREATE TRIGGER {ins} AFTER INSERT ON {table} REFERENCING NEW TABLE AS {_NEW} FOR EACH STATEMENT EXECUTE FUNCTION {function}()",
+        f"CREATE TRIGGER {upd} AFTER UPDATE ON {table} REFERENCING OLD TABLE AS {_OLD} NEW TABLE AS {_NEW} FOR EACH STATEMENT EXECUTE FUNCTION {function}()",
+        f"CREATE TRIGGER {dele} AFTER DELETE ON {table} REFERENCING OLD TABLE AS {_OLD} FOR EACH STATEMENT EXECUTE FUNCTION {function}()",
+    ]
+
+
+def rebuild_sql(table: str) -> List[str]:
+    """Recount both summary tables from the embeddings table."""
+    counts, pairs = summary_tables(table)
+    values = values_sql("e.metadata")
+    return [
+        f"DELETE FROM {counts}",
+        f"DELETE FROM {pairs}",
+        f"INSERT INTO {counts} (field, value, n) SELECT f.field, f.value, count(*) FROM {table} e CROSS JOIN LATERAL {values} f GROUP BY 1, 2",
+        f"""
+        INSERT INTO {pairs} (field, value, facet, facet_value, n)
+        SELECT a.field, a.value, b.field, b.value, count(*)
+        FROM {table} e CROSS JOIN LATERAL {values} a CROSS JOIN LATERAL {values} b
+        GROUP BY 1, 2, 3, 4
+        """,
+    ]
+
+
+def single_facet(filters: Optional[Dict[str, Any]]) -> Optional[Tuple[str, str]]:
+    """
+    (field, value) when `filters` is exactly one facet value: {"region": "SK"},
+    {"region": {"$eq": "SK"}} or {"certifications": {"$in": ["organic"]}}. Such a filter is
+    answered from the pair table; anything else needs the filtered rows counted.
+    """
+    if not isinstance(filters, dict) or len(filters) != 1:
+        return None
+    (field, condition), = filters.items()
+    if field not in FACET_FIELDS:
+        return None
+    if isinstance(condition, dict):
+        if list(condition) == ["$eq"] and field == "region":
+            condition = condition["$eq"]
+        elif list(condition) == ["$in"] and isinstance(condition["$in"], list) and len(condition["$in"]) == 1:
+            condition = condition["$in"][0]
+        else:
+            return None
+    elif field != "region":
+        # Plain equality against an array field is containment of the whole array, not membership
+        return None
+    if not isinstance(condition, str) or not condition:
+        return None
+    return field, condition
+
+
+def ranked_sql(source: str, fields_param: str, limit_param: str) -> str:
+    """The `limit_param` most frequent values of each `fields_param` field among (field, value, n) rows, most frequent first."""
+    return (
+        f"SELECT field, value, n FROM (SELECT field, value, n, row_number() OVER (PARTITION BY field ORDER BY n DESC, value) AS rank "
+        f"FROM ({source}) s WHERE n > 0 AND field = ANY({fields_param}::text[])) ranked "
+        f"WHERE rank <= {limit_param} ORDER BY field, n DESC, value"
+    )
+
+
+def collect(rows: Iterable[Tuple[str, str, int]], fields: Sequence[str]) -> Dict[str, Dict[str, int]]:
+    """{field: {value: count}} in the requested field order; values keep the order of `rows`."""
+    result: Dict[str, Dict[str, int]] = {field: {} for field in fields}
+    for field, value, n in rows:
+        if field in result:
+            result[field][value] = int(n)
+    return result
+
+
+def top_counts(counts: Dict[Tuple[str, str], int], fields: Sequence[str], limit: int) -> Dict[str, Dict[str, int]]:
+    """`collect` over Python-side counts, with the ordering and limit of ranked_sql."""
+    rows = sorted(((f, v, n) for (f, v), n in counts.items() if n > 0), key=lambda r: (r[0], -r[2], r[1]))
+    per_field: Dict[str, int] = {}
+    kept = []
+    for field, value, n in rows:
+        per_field[field] = per_field.get(field, 0) + 1
+        if per_field[field] <= limit:
+            kept.append((field, value, n))
+    return collect(kept, fields)
@@ -0,0 +1,285 @@
+"""
+Compiles the search filter language into SQL over `participant_embeddings.metadata`.
+
+Filters are a dict of field -> condition, combined with AND; `$and` / `$or` take lists of
+such dicts. A bare value means `$eq`. Supported operators:
+
+    {"region": "Saskatchewan"}                          equality
+    {"certifications": {"$in": ["organic", "kosher"]}}  any of
+    {"primary_crops": {"$all": ["wheat", "lentils"]}}   all of (array fields)
+    {"farm_size": {"$gte": 100, "$lt": 500}}            ranges ($gt, $gte, $lt, $lte)
+    {"certifications": {"$exists": true}}               key present
+    {"coordinates": {"$near": {"latitude": 49.29, "longitude": -123.11, "radius_km": 300}}}
+                                                        within a great-circle radius
+
+`match_filters` evaluates the same language against an in-memory metadata dict, with
+jsonb semantics, for backends that do not run SQL.
+
+Equality and membership compile to `metadata @> ...` containment, which both the default
+jsonb_ops GIN index and the smaller jsonb_path_ops GIN index serve; `$in` becomes an OR of
+containments so the planner can BitmapOr them. Ranges compare `metadata->'field'` so an
+expression btree index on that path (see SEARCH_RANGE_FILTER_FIELDS) can back them. `$near`
+is a latitude/longitude bounding box, served by the coordinates index, plus the exact
+haversine distance (src/services/geo.py).
+"""
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from src.core.config import settings
+from src.services.geo import bounding_box, coordinate_sql, haversine_km, haversine_sql, point
+
+
+class FilterError(ValueError):
+    """Raised for filters that are not valid in the filter language."""
+
+
+_FIELD_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_RANGE_OPS = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+_OPERATORS = {"$eq", "$in", "$all", "$exists", "$near", *_RANGE_OPS}
+
+
+def _csv(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _field(name: str) -> str:
+    if not isinstance(name, str) or not _FIELD_RE.match(name):
+        raise FilterError(f"Invalid filter field '{name}'.")
+    return name
+
+
+def default_array_fields() -> frozenset:
+    return frozenset(_csv(settings.SEARCH_ARRAY_FILTER_FIELDS))
+
+
+def range_filter_fields() -> List[str]:
+    """Metadata fields that get an expression index for range filters."""
+    return [_field(name) for name in _csv(settings.SEARCH_RANGE_FILTER_FIELDS)]
+
+
+def _scalar(value: Any, field: str) -> Any:
+    if isinstance(value, (dict, list)) or value is None:
+        raise FilterError(f"Filter value for '{field}' must be a string, number or boolean.")
+    return value
+
+
+def _near(value: Any, field: str) -> Tuple[float, float, float]:
+    """(latitude, longitude, radius_km) of a `$near` condition."""
+    if not isinstance(value, dict) or set(value) != {"latitude", "longitude", "radius_km"}:
+        raise FilterError(f"'$near' on '{field}' needs latitude, longitude and radius_km.")
+    center = point(value)
+    radius = value["radius_km"]
+    if center is None or isinstance(radius, bool) or not isinstance(radius, (int, float)):
+        raise FilterError(f"'$near' on '{field}' needs numeric latitude, longitude and radius_km.")
+    if not (-90 <= center[0] <= 90 and -180 <= center[1] <= 180) or radius <= 0:
+        raise FilterError(f"'$near' on '{field}' needs a valid point and a positive radius_km.")
+    return center[0], center[1], float(radius)
+
+
+class _Compiler:
+    def __init__(self, start_param: int, array_fields: Iterable[str], column: str):
+        self.next_param = start_param
+        self.args: List[Any] = []
+        self.array_fields = frozenset(array_fields)
+        self.column = column
+
+    def _param(self, value: Any, cast: str = "jsonb") -> str:
+        self.args.append(value)
+        ref = f"${self.next_param}::{cast}"
+        self.next_param += 1
+        return ref
+
+    def _contains(self, field: str, value: Any) -> str:
+        doc = {field: [value] if field in self.array_fields else value}
+        return f"{self.column} @> {self._param(json.dumps(doc))}"
+
+    def compile(self, filters: Dict[str, Any]) -> List[str]:
+        if not isinstance(filters, dict):
+            raise FilterError("Filters must be an object.")
+        conditions: List[str] = []
+        for key, value in filters.items():
+            if key in ("$and", "$or"):
+                if not isinstance(value, list) or not value:
+                    raise FilterError(f"'{key}' needs a non-empty list of filter objects.")
+                parts = [" AND ".join(self.compile(sub)) or "TRUE" for sub in value]
+                joiner = " AND " if key == "$and" else " OR "
+                conditions.append("(" + joiner.join(f"({p})" for p in parts) + ")")
+            elif isinstance(value, dict):
+                conditions.extend(self._field_conditions(_field(key), value))
+            else:
+                conditions.append(self._contains(_field(key), _scalar(value, key)))
+        return conditions
+
+    def _field_conditions(self, field: str, ops: Dict[str, Any]) -> List[str]:
+        if not ops:
+            raise FilterError(f"Empty condition for '{field}'.")
+        conditions = []
+        for op, value in ops.items():
+            if op not in _OPERATORS:
+                raise FilterError(f"Unsupported operator '{op}' on '{field}'.")
+            if op == "$eq":
+                conditions.append(self._contains(field, _scalar(value, field)))
+            elif op == "$in":
+                if not isinstance(value, list) or not value:
+                    raise FilterError(f"'$in' on '{field}' needs a non-empty list.")
+                ors = [self._contains(field, _scalar(v, field)) for v in value]
+                conditions.append(ors[0] if len(ors) == 1 else "(" + " OR ".join(ors) + ")")
+            elif op == "$all":
+                if not isinstance(value, list) or not value:
+                    raise FilterError(f"'$all' on '{field}' needs a non-empty list.")
+                if field not in self.array_fields and len(value) > 1:
+                    raise FilterError(f"'$all' with several values needs an array field; '{field}' is scalar.")
+                values = [_scalar(v, field) for v in value]
+                doc = {field: values if field in self.array_fields else values[0]}
+                conditions.append(f"{self.column} @> {self._param(json.dumps(doc))}")
+            elif op == "$exists":
+                if not isinstance(value, bool):
+                    raise FilterError(f"'$exists' on '{field}' must be true or false.")
+                check = f"{self.column} ? {self._param(field, 'text')}"
+                conditions.append(check if value else f"NOT ({check})")
+            elif op == "$near":
+                latitude, longitude, radius = _near(value, field)
+                min_lat, max_lat, lon_ranges = bounding_box(latitude, longitude, radius)
+                lat, lon = coordinate_sql(self.column, field)
+                box = [f"{lat} BETWEEN {self._param(min_lat, 'float8')} AND {self._param(max_lat, 'float8')}"]
+                if lon_ranges != [(-180.0, 180.0)]:
+                    box.append("(" + " OR ".join(
+                        f"{lon} BETWEEN {self._param(west, 'float8')} AND {self._param(east, 'float8')}" for west, east in lon_ranges
+                    ) + ")")
+                distance = haversine_sql(lat, lon, self._param(latitude, "float8"), self._param(longitude, "float8"))
+                conditions.append("(" + " AND ".join(box + [f"{distance} <= {self._param(radius, 'float8')}"]) + ")")
+            else:
+                if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+                    raise FilterError(f"'{op}' on '{field}' needs a number or string.")
+                # jsonb orders across types (strings < numbers < booleans), so pin the type first
+                json_type = "string" if isinstance(value, str) else "number"
+                path = f"({self.column} -> '{field}')"
+                conditions.append(
+                    f"(jsonb_typeof{path} = '{json_type}' AND {path} {_RANGE_OPS[op]} {self._param(json.dumps(value))})"
+                )
+        return conditions
+
+
+def compile_filters(
+    filters: Optional[Dict[str, Any]],
+    start_param: int = 1,
+    array_fields: Optional[Iterable[str]] = None,
+    column: str = "metadata",
+) -> Tuple[List[str], List[Any]]:
+    """
+    Compile `filters` into AND-ed SQL conditions and their bind arguments.
+    Placeholders are numbered from `start_param` so the result can be appended to a
+    statement that already binds other parameters.
+    """
+    if not filters:
+        return [], []
+    compiler = _Compiler(start_param, default_array_fields() if array_fields is None else array_fields, column)
+    return compiler.compile(filters), compiler.args
+
+
+def _json_equal(a: Any, b: Any) -> bool:
+    # jsonb keeps booleans and numbers apart, while Python treats True == 1
+    if isinstance(a, bool) or isinstance(b, bool):
+        return isinstance(a, bool) and isinstance(b, bool) and a == b
+    return a == b
+
+
+def _json_contains(haystack: Any, needle: Any) -> bool:
+    """Python rendering of jsonb `haystack @> needle` below the top level."""
+    if isinstance(needle, dict):
+        return isinstance(haystack, dict) and all(
+            key in haystack and _json_contains(haystack[key], value) for key, value in needle.items()
+        )
+    if isinstance(needle, list):
+        return isinstance(haystack, list) and all(
+            any(_json_contains(item, wanted) for item in haystack) for wanted in needle
+        )
+    return not isinstance(haystack, (dict, list)) and _json_equal(haystack, needle)
+
+
+def _json_typeof(value: Any) -> str:
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return "number"
+    return "other"
+
+
+class _Matcher(_Compiler):
+    """Evaluates filters against one metadata dict; shares validation with the SQL compiler."""
+
+    def __init__(self, metadata: Dict[str, Any], array_fields: Iterable[str]):
+        super().__init__(1, array_fields, "metadata")
+        self.metadata = metadata
+
+    def _contains(self, field: str, value: Any) -> bool:
+        return _json_contains(self.metadata, {field: [value] if field in self.array_fields else value})
+
+    def match(self, filters: Dict[str, Any]) -> bool:
+        if not isinstance(filters, dict):
+            raise FilterError("Filters must be an object.")
+        # Every clause is evaluated, not short-circuited, so invalid filters fail on every row
+        results = []
+        for key, value in filters.items():
+            if key in ("$and", "$or"):
+                if not isinstance(value, list) or not value:
+                    raise FilterError(f"'{key}' needs a non-empty list of filter objects.")
+                parts = [self.match(sub) for sub in value]
+                results.append(all(parts) if key == "$and" else any(parts))
+            elif isinstance(value, dict):
+                results.append(self._field_matches(_field(key), value))
+            else:
+                results.append(self._contains(_field(key), _scalar(value, key)))
+        return all(results)
+
+    def _field_matches(self, field: str, ops: Dict[str, Any]) -> bool:
+        if not ops:
+            raise FilterError(f"Empty condition for '{field}'.")
+        results = []
+        for op, value in ops.items():
+            if op not in _OPERATORS:
+                raise FilterError(f"Unsupported operator '{op}' on '{field}'.")
+            if op == "$eq":
+                results.append(self._contains(field, _scalar(value, field)))
+            elif op == "$in":
+                if not isinstance(value, list) or not value:
+                    raise FilterError(f"'$in' on '{field}' needs a non-empty list.")
+                results.append(any([self._contains(field, _scalar(v, field)) for v in value]))
+            elif op == "$all":
+                if not isinstance(value, list) or not value:
+                    raise FilterError(f"'$all' on '{field}' needs a non-empty list.")
+                if field not in self.array_fields and len(value) > 1:
+                    raise FilterError(f"'$all' with several values needs an array field; '{field}' is scalar.")
+                values = [_scalar(v, field) for v in value]
+                results.append(_json_contains(self.metadata, {field: values if field in self.array_fields else values[0]}))
+            elif op == "$exists":
+                if not isinstance(value, bool):
+                    raise FilterError(f"'$exists' on '{field}' must be true or false.")
+                results.append((field in self.metadata) == value)
+            elif op == "$near":
+                latitude, longitude, radius = _near(value, field)
+                stored = point(self.metadata.get(field))
+                results.append(stored is not None and haversine_km(stored[0], stored[1], latitude, longitude) <= radius)
+            else:
+                if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+                    raise FilterError(f"'{op}' on '{field}' needs a number or string.")
+                current = self.metadata.get(field)
+                json_type = "string" if isinstance(value, str) else "number"
+                if _json_typeof(current) != json_type:
+                    results.append(False)
+                    continue
+                results.append({
+                    "$gt": current > value, "$gte": current >= value, "$lt": current < value, "$lte": current <= value,
+                }[op])
+        return all(results)
+
+
+def match_filters(
+    filters: Optional[Dict[str, Any]],
+    metadata: Dict[str, Any],
+    array_fields: Optional[Iterable[str]] = None,
+) -> bool:
+    """True when `metadata` satisfies `filters`, with the same semantics as the compiled SQL."""
+    if not filters:
+        return True
+    return _Matcher(metadata, default_array_fields() if array_fields is None else array_fields).match(filters)
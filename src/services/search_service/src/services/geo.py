@@ -0,0 +1,76 @@
+"""
+Great-circle distance for geo filters and distance-weighted ranking, without PostGIS.
+
+Coordinates are stored in the search metadata as {"latitude": .., "longitude": ..} (the shape of
+`CoordinateModel` in shared/events.py) and read through expressions that a btree index covers
+(the GEO_FIELD ones, see VectorService.ensure_schema). A radius filter is a latitude/longitude bounding box, which that index
+serves, refined by the exact haversine distance on the rows inside the box.
+"""
+import math
+from typing import Any, List, Optional, Tuple
+
+# Metadata key indexing writes coordinates under
+GEO_FIELD = "coordinates"
+EARTH_RADIUS_KM = 6371.0088
+_KM_PER_DEGREE = EARTH_RADIUS_KM * math.pi / 180
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def haversine_sql(lat: str, lon: str, lat_param: str, lon_param: str) -> str:
+    """SQL for the distance in km between the point (lat, lon) and (lat_param, lon_param)."""
+    return (
+        f"(2 * {EARTH_RADIUS_KM} * asin(least(1.0, sqrt("
+        f"power(sin(radians({lat} - {lat_param}) / 2), 2)"
+        f" + cos(radians({lat_param})) * cos(radians({lat})) * power(sin(radians({lon} - {lon_param}) / 2), 2)))))"
+    )
+
+
+def coordinate_sql(column: str, field: str) -> Tuple[str, str]:
+    """(latitude, longitude) expressions over a metadata column; the GEO_FIELD ones are indexed."""
+    return (
+        f"(({column} #>> '{{{field},latitude}}')::double precision)",
+        f"(({column} #>> '{{{field},longitude}}')::double precision)",
+    )
+
+
+def bounding_box(latitude: float, longitude: float, radius_km: float) -> Tuple[float, float, List[Tuple[float, float]]]:
+    """
+    (min_lat, max_lat, longitude ranges) enclosing the circle. Near a pole every longitude is in
+    range; across the antimeridian the longitudes split into two ranges.
+    """
+    dlat = radius_km / _KM_PER_DEGREE
+    min_lat, max_lat = latitude - dlat, latitude + dlat
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90.0), min(max_lat, 90.0), [(-180.0, 180.0)]
+    # Widest longitude span of the circle, at the latitude where it touches its meridians
+    dlon = math.degrees(math.asin(min(1.0, math.sin(math.radians(dlat)) / math.cos(math.radians(latitude)))))
+    west, east = longitude - dlon, longitude + dlon
+    if west < -180:
+        return min_lat, max_lat, [(west + 360, 180.0), (-180.0, east)]
+    if east > 180:
+        return min_lat, max_lat, [(west, 180.0), (-180.0, east - 360)]
+    return min_lat, max_lat, [(west, east)]
+
+
+def blended_score(similarity: float, distance_km: Optional[float], weight: float, scale_km: float) -> float:
+    """
+    (1 - weight) * similarity + weight * exp(-distance / scale): the distance term is 1 at the
+    point and falls by 1/e every `scale_km`. Participants without coordinates get no distance term.
+    """
+    decay = math.exp(-distance_km / scale_km) if distance_km is not None else 0.0
+    return (1 - weight) * similarity + weight * decay
+
+
+def point(value: Any) -> Optional[Tuple[float, float]]:
+    """(latitude, longitude) of a stored coordinates value, or None when it is not a valid point."""
+    if not isinstance(value, dict):
+        return None
+    lat, lon = value.get("latitude"), value.get("longitude")
+    if isinstance(lat, bool) or isinstance(lon, bool) or not isinstance(lat, (int, float)) or not isinstance(lon, (int, float)):
+        return None
+    return float(lat), float(lon)
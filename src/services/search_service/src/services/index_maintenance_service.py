@@ -0,0 +1,325 @@
+"""
+Upkeep of the IVFFlat ANN indexes as the search tables grow.
+
+IVFFlat clusters the rows it finds at build time into `lists` centroids and never moves them:
+an index built on an empty or small table (the first startup) keeps routing every later row
+through centroids that say nothing about the data, and recall degrades as rows arrive. A check
+compares each ANN index (participant_embeddings and its chunk table) with the table it serves:
+
+  missing    no valid ANN index (ensure_index was skipped or a build failed)
+  switch     SEARCH_INDEX_TYPE=auto and the table reached SEARCH_MAINTENANCE_HNSW_ROWS rows
+  untracked  an IVFFlat index this component never built, e.g. on an empty table at startup
+  lists      its lists are off the size target (ivfflat_lists, or a pinned SEARCH_IVFFLAT_LISTS) by more than 2x
+  drift      rows inserted, updated or deleted since the build exceed SEARCH_MAINTENANCE_MAX_DRIFT of the build-time rows
+
+and rebuilds it: CREATE INDEX CONCURRENTLY under a temporary name, DROP INDEX CONCURRENTLY of the
+old one, rename. Searches keep using the old index until the new one is valid. Nothing happens
+below SEARCH_MAINTENANCE_MIN_ROWS rows; HNSW builds its graph incrementally and is left alone.
+
+Every rebuild is logged in `search_index_maintenance` with its duration and the recall@10 of
+the search pass before and after, measured on SEARCH_MAINTENANCE_RECALL_QUERIES sampled stored
+vectors against an exact scan. Checks run every SEARCH_MAINTENANCE_INTERVAL seconds, or on
+POST /index/maintenance; a session advisory lock keeps one runner across replicas.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import asyncpg
+from src.core.config import settings
+from src.database.pgvector_codec import register_vector
+from src.services.vector_service import INDEX_TYPES, VectorService, ivfflat_lists, vector_service
+
+
+logger = logging.getLogger(__name__)
+
+_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS search_index_maintenance (
+      id BIGSERIAL PRIMARY KEY,
+      table_name TEXT NOT NULL,
+      index_name TEXT NOT NULL,
+      index_oid BIGINT,              -- the built index; a later rebuild elsewhere (re-index swap) changes it
+      index_type TEXT NOT NULL,
+      lists INT,
+      reason TEXT NOT NULL,          -- missing | switch | untracked | lists | drift | forced
+      status TEXT NOT NULL,          -- running | completed | failed
+      row_count BIGINT NOT NULL,
+      changes_counter BIGINT NOT NULL,
+      duration_s DOUBLE PRECISION,
+      recall_before DOUBLE PRECISION,
+      recall_after DOUBLE PRECISION,
+      error TEXT,
+      started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+      finished_at TIMESTAMPTZ
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_search_index_maintenance_table ON search_index_maintenance (table_name, started_at DESC)",
+]
+
+# Suffix of the index being built next to the live one; names stop at 63 bytes
+BUILD_SUFFIX = "_rb"
+RECALL_K = 10
+
+
+def plan_rebuild(
+    rows: int,
+    changes: int,
+    index: Optional[Dict[str, Any]],
+    last_build: Optional[Dict[str, Any]],
+    index_type: str = "ivfflat",
+    auto: bool = False,
+    force: bool = False,
+) -> Optional[Tuple[str, str, int]]:
+    """
+    (reason, index type, lists) of the rebuild a table needs, or None. `index` is its ANN index
+    ({"method", "lists"}), `last_build` the completed log entry of that index ({"row_count",
+    "changes_counter"}), `changes` the table's insert/update/delete counter and `index_type`
+    the type the service builds.
+    """
+    if rows < settings.SEARCH_MAINTENANCE_MIN_ROWS and not force:
+        return None
+    method = index["method"] if index else index_type
+    # Only "auto" switches, and never back: an HNSW index stays fine as the table shrinks
+    target = "hnsw" if auto and rows >= settings.SEARCH_MAINTENANCE_HNSW_ROWS else method
+    lists = 0 if target == "hnsw" else int(settings.SEARCH_IVFFLAT_LISTS or ivfflat_lists(rows))
+    if index is None:
+        return "missing", target, lists
+    if target != method:
+        return "switch", target, lists
+    if force:
+        return "forced", target, lists
+    if method == "hnsw":
+        return None
+    if last_build is None:
+        return "untracked", target, lists
+    if not lists / 2 <= (index.get("lists") or 0) <= lists * 2:
+        return "lists", target, lists
+    # The counter restarts when the statistics are reset; count from zero then
+    since = changes - last_build["changes_counter"] if changes >= last_build["changes_counter"] else changes
+    if since > settings.SEARCH_MAINTENANCE_MAX_DRIFT * max(int(last_build["row_count"]), 1):
+        return "drift", target, lists
+    return None
+
+
+def recall(exact: List[Any], approximate: List[Any]) -> float:
+    """Share of the exact neighbours the approximate search also returned."""
+    if not exact:
+        return 1.0
+    return len(set(exact) & set(approximate)) / len(exact)
+
+
+class IndexMaintenanceService:
+    def __init__(self, target: Optional[VectorService] = None):
+        self.target = target
+        self._task: Optional[asyncio.Task] = None
+        self._scheduler: Optional[asyncio.Task] = None
+
+    def _vectors(self) -> VectorService:
+        target = self.target or vector_service
+        if not isinstance(target, VectorService):
+            raise RuntimeError("Index maintenance needs the pgvector backend (SEARCH_VECTOR_BACKEND=pgvector).")
+        return target
+
+    async def _pool(self) -> asyncpg.Pool:
+        pool = await self._vectors()._pool_or_create()
+        async with pool.acquire() as conn:
+            for ddl in _DDL:
+                await conn.execute(ddl)
+        return pool
+
+    def _lock_sql(self, fn: str) -> str:
+        return f"SELECT {fn}(hashtext('search_index_maintenance'), hashtext('{self._vectors().table}'))"
+
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    # --- Inspection ---
+
+    async def _tables(self, conn: asyncpg.Connection) -> List[str]:
+        vectors = self._vectors()
+        tables = [vectors.table]
+        if await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", vectors.chunk_table):
+            tables.append(vectors.chunk_table)
+        return tables
+
+    async def inspect(self, conn: asyncpg.Connection, table: str, force: bool = False) -> Dict[str, Any]:
+        """Size, change counter, ANN index and last logged build of `table`, with the rebuild it needs."""
+        vectors = self._vectors()
+        rows = await vectors.row_estimate(conn, table)
+        changes = await conn.fetchval(
+            "SELECT COALESCE(n_tup_ins + n_tup_upd + n_tup_del, 0) FROM pg_stat_user_tables WHERE relid = $1::regclass", table
+        ) or 0
+        index = None
+        for ix in await vectors.vector_indexes(conn, table):
+            if ix["valid"] and ix["opclass"] == vectors.index_opclass:
+                index = ix
+                break
+        last_build = None
+        if index is not None:
+            row = await conn.fetchrow(
+                "SELECT c.oid::bigint AS oid, c.reloptions FROM pg_class c WHERE c.relname = $1", index["name"]
+            )
+            options = dict(option.split("=", 1) for option in row["reloptions"] or [])
+            index = {**index, "oid": row["oid"], "lists": int(options["lists"]) if "lists" in options else None}
+            build = await conn.fetchrow(
+                "SELECT * FROM search_index_maintenance WHERE table_name = $1 AND index_oid = $2 AND status = 'completed' "
+                "ORDER BY started_at DESC LIMIT 1",
+                table, index["oid"],
+            )
+            last_build = dict(build) if build else None
+        planned = plan_rebuild(rows, changes, index, last_build, vectors.index_type, vectors.auto_index, force)
+        return {
+            "table": table,
+            "rows": rows,
+            "changes": int(changes),
+            "index": index,
+            "last_build": last_build,
+            "planned": dict(zip(("reason", "index_type", "lists"), planned)) if planned else None,
+        }
+
+    async def status(self, limit: int = 20) -> Dict[str, Any]:
+        """Every search table's index state and planned rebuild, and the most recent log entries."""
+        pool = await self._pool()
+        async with pool.acquire() as conn:
+            tables = [await self.inspect(conn, table) for table in await self._tables(conn)]
+            log = await conn.fetch("SELECT * FROM search_index_maintenance ORDER BY started_at DESC, id DESC LIMIT $1", int(limit))
+        for state in tables:
+            state.pop("last_build")
+        return {"running": self.is_running(), "tables": tables, "log": [dict(r) for r in log]}
+
+    # --- Control ---
+
+    async def start(self, force: bool = False) -> Dict[str, Any]:
+        """Check (and rebuild where needed) every search table's ANN index in the background."""
+        if self.is_running():
+            raise RuntimeError("Index maintenance is already running in this worker.")
+        await self._pool()
+        # Dedicated connection: it holds the runner lock, and CREATE INDEX CONCURRENTLY runs outside transactions
+        conn = await asyncpg.connect(settings.DATABASE_URL)
+        if not await conn.fetchval(self._lock_sql("pg_try_advisory_lock")):
+            await conn.close()
+            raise RuntimeError("Index maintenance is already running in another worker.")
+        await register_vector(conn)
+        self._task = asyncio.create_task(self._run(conn, force))
+        return await self.status()
+
+    async def start_scheduler(self) -> None:
+        if settings.SEARCH_MAINTENANCE_INTERVAL > 0 and self._scheduler is None:
+            self._scheduler = asyncio.create_task(self._schedule())
+
+    async def _schedule(self) -> None:
+        while True:
+            await asyncio.sleep(settings.SEARCH_MAINTENANCE_INTERVAL)
+            try:
+                await self.start()
+                await self._task
+            except RuntimeError as e:
+                logger.info(f"Skipping scheduled index maintenance: {e}")
+            except Exception as e:
+                logger.error(f"Scheduled index maintenance failed: {e}")
+
+    async def shutdown(self) -> None:
+        for task in (self._scheduler, self._task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._scheduler = None
+
+    # --- Run ---
+
+    async def _run(self, conn: asyncpg.Connection, force: bool) -> None:
+        try:
+            for table in await self._tables(conn):
+                state = await self.inspect(conn, table, force)
+                if state["planned"]:
+                    await self._rebuild(conn, state)
+        except asyncio.CancelledError:
+            logger.info("Index maintenance stopped.")
+            raise
+        except Exception as e:
+            logger.error(f"Index maintenance failed: {e}")
+        finally:
+            await conn.close()  # also releases the runner lock
+
+    async def _rebuild(self, conn: asyncpg.Connection, state: Dict[str, Any]) -> None:
+        vectors = self._vectors()
+        pool = await self._pool()
+        table, old, planned = state["table"], state["index"], state["planned"]
+        index_type, lists = planned["index_type"], planned["lists"] or None
+        name = vectors._index_name_for(table, index_type)
+        building = f"{name}{BUILD_SUFFIX}" if old and old["name"] == name else name
+        async with pool.acquire() as c:
+            log_id = await c.fetchval(
+                "INSERT INTO search_index_maintenance (table_name, index_name, index_type, lists, reason, status, row_count, changes_counter) "
+                "VALUES ($1, $2, $3, $4, $5, 'running', $6, $7) RETURNING id",
+                table, name, index_type, lists, planned["reason"], state["rows"], state["changes"],
+            )
+        logger.info(f"Rebuilding vector index of {table} as {index_type} (lists={lists}, reason: {planned['reason']}).")
+        try:
+            recall_before = await self.measure_recall(conn, table) if old else None
+            started = time.monotonic()
+            await conn.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{building}"')
+            await conn.execute(vectors._create_index_sql(building, table, lists, index_type))
+            duration = time.monotonic() - started
+            if old:
+                await conn.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{old["name"]}"')
+            if building != name:
+                await conn.execute(f'ALTER INDEX "{building}" RENAME TO "{name}"')
+            if table == vectors.table:
+                vectors.index_type = index_type
+            recall_after = await self.measure_recall(conn, table)
+            oid = await conn.fetchval("SELECT $1::regclass::oid::bigint", name)
+            async with pool.acquire() as c:
+                await c.execute(
+                    "UPDATE search_index_maintenance SET status = 'completed', index_oid = $2, duration_s = $3, "
+                    "recall_before = $4, recall_after = $5, finished_at = NOW() WHERE id = $1",
+                    log_id, oid, duration, recall_before, recall_after,
+                )
+            logger.info(
+                f"Rebuilt {name} in {duration:.1f}s; recall@{RECALL_K} {recall_before if recall_before is not None else '-'} -> {recall_after}."
+            )
+        except (Exception, asyncio.CancelledError) as e:
+            # An interrupted CONCURRENTLY build leaves an invalid index behind; the old one still serves
+            try:
+                await conn.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{building}"')
+            except Exception:
+                pass
+            async with pool.acquire() as c:
+                await c.execute(
+                    "UPDATE search_index_maintenance SET status = 'failed', error = $2, finished_at = NOW() WHERE id = $1",
+                    log_id, str(e) or type(e).__name__,
+                )
+            raise
+
+    async def measure_recall(self, conn: asyncpg.Connection, table: str, queries: Optional[int] = None) -> Optional[float]:
+        """
+        Mean recall@10 of the search pass (SEARCH_DEFAULT_PROFILE, as searches run) against an exact
+        scan, probing with stored vectors sampled from `table`. None when the table is empty.
+        """
+        vectors = self._vectors()
+        queries = int(queries or settings.SEARCH_MAINTENANCE_RECALL_QUERIES)
+        rows = max(await vectors.row_estimate(conn, table), 1)
+        percent = min(100.0, 100.0 * queries * 4 / rows)
+        probes = await conn.fetch(f"SELECT embedding FROM {table} TABLESAMPLE BERNOULLI ($1) LIMIT $2", percent, queries)
+        if not probes:
+            return None
+        exact_sql = f"SELECT ctid FROM {table} ORDER BY {vectors._distance_sql()} LIMIT {RECALL_K}"
+        ann_sql = vectors._nearest_sql(table, RECALL_K, "ctid")
+        scores = []
+        for probe in probes:
+            async with conn.transaction():
+                await conn.execute("SET LOCAL enable_indexscan = off")
+                exact = [r["ctid"] for r in await conn.fetch(exact_sql, probe["embedding"])]
+            async with conn.transaction():
+                await conn.execute("SET LOCAL enable_seqscan = off")
+                await conn.execute(vectors.scan_settings_sql(None, vectors.rerank_candidates(RECALL_K), INDEX_TYPES))
+                approximate = [r["ctid"] for r in await conn.fetch(ann_sql, probe["embedding"])]
+            scores.append(recall(exact, approximate))
+        return round(sum(scores) / len(scores), 4)
+
+
+index_maintenance_service = IndexMaintenanceService()
@@ -1,18 +1,163 @@
+import hashlib
 from fastapi import HTTPException, status
 from pydantic import ValidationError
-from src.database.models.search_model import IndexResponse
-from src.services.embedding_service import embedding_service
-from src.services.vector_service import vector_service
+from typing import Any, Dict, List, Optional, Tuple
+from src.core.config import settings
+from src.database.models.search_model import IndexResponse, BatchIndexResponse
+from src.schema.search_schema import IndexRequest
+from src.services.chunker import split_profile
+from src.services.embedding_service import EmbeddingService, embedding_service
+from src.services.geo import GEO_FIELD, point
+from src.services.standing_query_service import standing_query_service
+from src.services.vector_service import VectorService, vector_service
 import logging
 
 
 logger = logging.getLogger(__name__)
 
 
-async def index_producer(producer_id: str, ai_profile_data: str, region: str, certifications: list, primary_crops: list) -> IndexResponse:
+def _text_to_embed(ai_profile_data: str) -> str:
+    return f"AI Profile: {ai_profile_data}"
+
+
+def _content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _build_metadata(producer_id: str, region: str, certifications: list, primary_crops: list, coordinates: Optional[dict] = None) -> dict:
+    metadata = {
+        "region": region,
+        "certifications": certifications,
+        "primary_crops": primary_crops,
+        "producer_id": producer_id, # Storing producer_id as metadata for filtering
+    }
+    # Only a complete point is stored; `$near` filters and distance ranking read it (src/services/geo.py)
+    location = point(coordinates)
+    if location is not None:
+        metadata[GEO_FIELD] = {"latitude": location[0], "longitude": location[1]}
+    return metadata
+
+
+def _chunks_hash(ai_profile_data: str) -> str:
+    # The chunk size is part of the hash so a new SEARCH_CHUNK_MAX_CHARS re-chunks every profile
+    return _content_hash(f"chunks:{settings.SEARCH_CHUNK_MAX_CHARS}:{ai_profile_data}")
+
+
+async def _index_chunks(entries: List[Tuple[str, str]], target: Optional[VectorService] = None, embedder: Optional[EmbeddingService] = None) -> int:
+    """
+    Re-chunk and embed the (producer_id, ai_profile) entries whose stored chunks were cut from
+    other text or embedded by another model, in one embeddings call. Returns how many
+    participants got new chunks; a no-op when chunking is disabled or the store has no chunks.
+    """
+    target = target or vector_service
+    embedder = embedder or embedding_service
+    if not settings.SEARCH_CHUNKS_ENABLED or not getattr(target, "supports_chunks", False) or not entries:
+        return 0
+    known = await target.chunk_fingerprints([_id for _id, _ in entries])
+    changed = []
+    for _id, ai_profile in entries:
+        digest = _chunks_hash(ai_profile)
+        stored = known.get(_id)
+        if stored and stored["content_hash"] == digest and stored["embedding_model"] == target.model:
+            continue
+        changed.append((_id, split_profile(ai_profile), digest))
+    texts = [chunk.text for _, chunks, _ in changed for chunk in chunks]
+    vectors = iter(await embedder.get_embeddings(texts) if texts else [])
+    await target.replace_chunks([
+        (_id, [(chunk.heading, chunk.content, next(vectors)) for chunk in chunks], digest)
+        for _id, chunks, digest in changed
+    ])
+    return len(changed)
+
+
+async def _notify_saved_searches(rows: List[Tuple[str, List[float], Dict[str, Any]]]) -> None:
+    # The participants are already indexed; a failed match is logged, never surfaced as an indexing error
+    try:
+        await standing_query_service.notify(rows)
+    except Exception as e:
+        logger.error(f"Matching {len(rows)} indexed participant(s) against saved searches failed: {e}")
+
+
+async def _refresh_chunks(entries: List[Tuple[str, str]]) -> None:
+    # The whole profiles are already indexed; stale chunks are re-cut on the next index of the profile
+    try:
+        await _index_chunks(entries)
+    except Exception as e:
+        logger.error(f"Chunking {len(entries)} indexed participant(s) failed; their chunks stay as they were: {e}")
+
+
+async def _mirror_writes(embedded: List[Tuple[str, str, Dict[str, Any], str, str]], metadata_only: List[Tuple[str, Dict[str, Any]]], entries: List[Tuple[str, str]]) -> None:
+    """
+    Dual-write during an embedding migration: re-embed the (id, text, metadata, ai_profile, digest)
+    rows just written with the target model into the target tables, and mirror the metadata
+    updates. A failure is logged; the migration's sync pass repairs the row before its cut-over.
+    """
+    # migration_service builds on this module; imported here to avoid the cycle
+    from src.services.migration_service import migration_service
+
+    mirror = migration_service.mirror()
+    if mirror is None:
+        return
+    target, embedder = mirror
+    try:
+        if embedded:
+            vectors = await embedder.get_embeddings([text for _, text, _, _, _ in embedded])
+            await target.upsert_many([
+                (_id, vector, metadata, ai_profile, digest)
+                for (_id, _, metadata, ai_profile, digest), vector in zip(embedded, vectors)
+            ])
+        await target.update_metadata_many(metadata_only)
+        await _index_chunks(entries, target, embedder)
+    except Exception as e:
+        logger.error(f"Mirroring {len(entries)} indexed participant(s) to the embedding migration target failed: {e}")
+
+
+async def _index_changed(entries: List[Tuple[str, str, Dict[str, Any]]]) -> Tuple[int, int]:
+    """
+    Index (producer_id, ai_profile, metadata) entries, embedding only the ones whose text or
+    embedding model differs from what is stored. Unchanged rows are left alone, or get just a
+    metadata update when that changed. Returns (embedded, skipped).
+    """
+    known = await vector_service.fingerprints([_id for _id, _, _ in entries])
+    to_embed, metadata_only = [], []
+    for _id, ai_profile, metadata in entries:
+        text = _text_to_embed(ai_profile)
+        digest = _content_hash(text)
+        stored = known.get(_id)
+        if stored and stored["content_hash"] == digest and stored["embedding_model"] == vector_service.model:
+            if stored["metadata"] != metadata:
+                metadata_only.append((_id, metadata))
+            continue
+        to_embed.append((_id, text, digest, metadata, ai_profile))
+
+    if len(to_embed) == 1:
+        vectors = [await embedding_service.get_embedding(to_embed[0][1])]
+    elif to_embed:
+        vectors = await embedding_service.get_embeddings([text for _, text, _, _, _ in to_embed])
+    if to_embed:
+        await vector_service.upsert_many([
+            (_id, vector, metadata, ai_profile, digest)
+            for (_id, _, digest, metadata, ai_profile), vector in zip(to_embed, vectors)
+        ])
+    await vector_service.update_metadata_many(metadata_only)
+    if to_embed:
+        await _notify_saved_searches([(_id, vector, metadata) for (_id, _, _, metadata, _), vector in zip(to_embed, vectors)])
+    await _refresh_chunks([(_id, ai_profile) for _id, ai_profile, _ in entries])
+    await _mirror_writes(
+        [(_id, text, metadata, ai_profile, digest) for _id, text, digest, metadata, ai_profile in to_embed],
+        metadata_only,
+        [(_id, ai_profile) for _id, ai_profile, _ in entries],
+    )
+    return len(to_embed), len(entries) - len(to_embed)
+
+
+async def index_producer(
+    producer_id: str, ai_profile_data: str, region: str, certifications: list, primary_crops: list, coordinates: Optional[dict] = None
+) -> IndexResponse:
     """
     Indexes a producer's information and their AI-generated profile into pgvector.
-    Embedding is generated by the orchestration service, then stored in Postgres.
+    Embedding is generated by the orchestration service, then stored in Postgres; it is
+    skipped when the stored embedding was made from the same text by the same model.
     """
     try:
         # 1. Get producer by ID
@@ -27,27 +172,15 @@ async def index_producer(producer_id: str, ai_profile_data: str, region: str, ce
                 detail=f"AI profile for producer ID '{producer_id}' not found via external function call."
             )
 
-        # Combine relevant text for vectorization
-        text_to_embed = (
-            f"AI Profile: {ai_profile_data}"
-        )
-
-        embedding_vector = embedding_service.get_embedding(text_to_embed)
-
-        metadata = {
-            "region": region,
-            "certifications": certifications,
-            "primary_crops": primary_crops,
-            "producer_id": producer_id, # Storing producer_id as metadata for filtering
-
-        }
+        metadata = _build_metadata(producer_id, region, certifications, primary_crops, coordinates)
 
-        await vector_service.upsert(str(producer_id), embedding_vector, metadata)
+        _, skipped = await _index_changed([(str(producer_id), ai_profile_data, metadata)])
 
         return IndexResponse(
             success=True,
-            message=f"Producer '{producer_id}' successfully indexed.",
-            indexed_id=producer_id
+            message=f"Producer '{producer_id}' " + ("unchanged; embedding reused." if skipped else "successfully indexed."),
+            indexed_id=producer_id,
+            skipped=bool(skipped),
         )
 
     except HTTPException as e:
@@ -63,3 +196,43 @@ async def index_producer(producer_id: str, ai_profile_data: str, region: str, ce
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An unexpected error occurred during indexing for producer '{producer_id}': {str(e)}"
         )
+
+
+async def index_producers(items: List[IndexRequest]) -> BatchIndexResponse:
+    """
+    Indexes many producers at once: one orchestrator round trip per embedding batch
+    and a single bulk upsert, instead of one of each per producer.
+    Items without an AI profile are reported as failed and the rest are still indexed;
+    items whose AI profile has not changed are counted as skipped and not re-embedded.
+    """
+    failed = {item.profile_id: "AI profile is empty." for item in items if not item.ai_profile}
+    valid = [item for item in items if item.ai_profile]
+    if not valid:
+        return BatchIndexResponse(success=False, message="No producers with an AI profile to index.", failed=failed)
+
+    try:
+        indexed, skipped = await _index_changed([
+            (
+                str(item.profile_id),
+                item.ai_profile,
+                _build_metadata(
+                    item.profile_id, item.region, item.certifications, item.primary_crops,
+                    item.coordinates.model_dump() if item.coordinates else None,
+                ),
+            )
+            for item in valid
+        ])
+    except Exception as e:
+        logger.error(f"Error during batch indexing of {len(valid)} producers: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An unexpected error occurred during batch indexing: {str(e)}"
+        )
+
+    return BatchIndexResponse(
+        success=True,
+        message=f"Indexed {indexed} producer(s); {skipped} unchanged; {len(failed)} failed.",
+        indexed=indexed,
+        skipped=skipped,
+        failed=failed,
+    )
@@ -0,0 +1,123 @@
+"""
+Blocked many-to-many top-k similarity for batch matching (see matching_service.py).
+
+Every query row is scored against every corpus row, but only a block of query rows against a
+block of corpus rows is in memory at a time, and a running top-k is merged after each block, so
+memory stays at block_rows x (block_cols + k) scores whatever the two matrix sizes. Scores match
+what search returns under the same metric: cosine similarity, inner product, or -(l2 distance).
+
+Metadata constraints are vectorized too: an `Overlap` requires a pair to share at least one
+value of a field (a crop, a certification), computed per block as a product of 0/1 incidence
+matrices. Disallowed pairs score -inf and never make a top-k.
+"""
+from typing import Any, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class Overlap(NamedTuple):
+    query_sets: np.ndarray  # (n_query, vocabulary) 0/1
+    corpus_sets: np.ndarray  # (n_corpus, vocabulary) 0/1
+    query_open: np.ndarray  # (n_query,) bool: no values, so no constraint
+    corpus_open: np.ndarray  # (n_corpus,) bool
+
+    def transposed(self) -> "Overlap":
+        """The same constraint with the query and corpus sides swapped."""
+        return Overlap(self.corpus_sets, self.query_sets, self.corpus_open, self.query_open)
+
+
+def _values(value: Any) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple, set)):
+        return [str(v).casefold() for v in value if v is not None]
+    return [str(value).casefold()]
+
+
+def overlap(query_values: Sequence[Any], corpus_values: Sequence[Any]) -> Overlap:
+    """
+    Constraint that a pair shares at least one value (case-insensitive), from each side's raw
+    metadata value (a list or a scalar). A side with no value is unconstrained.
+    """
+    query_lists = [_values(v) for v in query_values]
+    corpus_lists = [_values(v) for v in corpus_values]
+    vocabulary = {term: i for i, term in enumerate(sorted({t for vs in query_lists + corpus_lists for t in vs}))}
+
+    def incidence(lists: List[List[str]]) -> np.ndarray:
+        sets = np.zeros((len(lists), max(len(vocabulary), 1)), dtype=np.float32)
+        for row, values in enumerate(lists):
+            sets[row, [vocabulary[v] for v in values]] = 1.0
+        return sets
+
+    return Overlap(
+        incidence(query_lists),
+        incidence(corpus_lists),
+        np.array([not vs for vs in query_lists], dtype=bool),
+        np.array([not vs for vs in corpus_lists], dtype=bool),
+    )
+
+
+def _allowed(constraints: Iterable[Overlap], q: slice, c: slice) -> Optional[np.ndarray]:
+    allowed = None
+    for con in constraints:
+        ok = (con.query_sets[q] @ con.corpus_sets[c].T) > 0
+        ok |= con.query_open[q, None]
+        ok |= con.corpus_open[None, c]
+        allowed = ok if allowed is None else allowed & ok
+    return allowed
+
+
+def _inverse_norms(matrix: np.ndarray) -> np.ndarray:
+    return 1.0 / np.maximum(np.sqrt(np.einsum("ij,ij->i", matrix, matrix)), 1e-12)
+
+
+def top_k_matches(
+    queries: np.ndarray,
+    corpus: np.ndarray,
+    k: int,
+    metric: str = "cosine",
+    constraints: Sequence[Overlap] = (),
+    block_rows: int = 1024,
+    block_cols: int = 16384,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (rows, scores), both (n_query, k): for each query row the corpus rows with the highest
+    scores, best first. Slots beyond the allowed pairs hold row -1 and score -inf.
+    """
+    n_query, n_corpus = len(queries), len(corpus)
+    k = max(0, min(int(k), n_corpus))
+    rows = np.full((n_query, k), -1, dtype=np.int64)
+    scores = np.full((n_query, k), -np.inf, dtype=np.float32)
+    if k == 0 or n_query == 0:
+        return rows, scores
+    corpus_squares = np.einsum("ij,ij->i", corpus, corpus) if metric == "l2" else None
+    corpus_inv = _inverse_norms(corpus) if metric == "cosine" else None
+
+    for q0 in range(0, n_query, block_rows):
+        q = slice(q0, min(q0 + block_rows, n_query))
+        block = np.asarray(queries[q], dtype=np.float32)
+        block_inv = _inverse_norms(block) if metric == "cosine" else None
+        block_squares = np.einsum("ij,ij->i", block, block) if metric == "l2" else None
+        best_scores = np.full((len(block), 0), -np.inf, dtype=np.float32)
+        best_rows = np.empty((len(block), 0), dtype=np.int64)
+        for c0 in range(0, n_corpus, block_cols):
+            c = slice(c0, min(c0 + block_cols, n_corpus))
+            sims = block @ np.asarray(corpus[c], dtype=np.float32).T
+            if metric == "cosine":
+                sims *= block_inv[:, None]
+                sims *= corpus_inv[None, c]
+            elif metric == "l2":
+                sims = -np.sqrt(np.maximum(block_squares[:, None] - 2 * sims + corpus_squares[None, c], 0.0))
+            allowed = _allowed(constraints, q, c)
+            if allowed is not None:
+                sims[~allowed] = -np.inf
+            best_scores = np.concatenate([best_scores, sims], axis=1)
+            best_rows = np.concatenate([best_rows, np.broadcast_to(np.arange(c.start, c.stop), sims.shape)], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        scores[q] = np.take_along_axis(best_scores, order, axis=1)
+        rows[q] = np.where(np.isfinite(scores[q]), np.take_along_axis(best_rows, order, axis=1), -1)
+    return rows, scores
@@ -0,0 +1,256 @@
+"""
+Batch buyer/seller matching into a materialized matches table.
+
+A run loads the embedding matrices of both participant types (importers and exporters by
+default) from the search table, scores every pair with the blocked top-k in matching.py under
+the search distance metric, and keeps each participant's best `top_k` counterparties on the
+other side, in both directions. Pairs must also share a value of every SEARCH_MATCH_OVERLAP_FIELDS
+metadata field (a crop), and each side can be narrowed with the search filter language.
+
+Results replace the previous run's rows for the same pair of types in one transaction, so the
+API serves either the old lists or the new ones straight from `search_matches`. Run state lives
+in `search_match_runs`; a session advisory lock keeps one runner per pair of types across
+replicas. Schedule it nightly by POSTing to /matches/runs (cron, a Kubernetes CronJob).
+"""
+import asyncio
+import json
+import logging
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+import asyncpg
+import numpy as np
+from src.core.config import settings
+from src.database.pgvector_codec import register_vector
+from src.services.filter_compiler import _csv, compile_filters
+from src.services.matching import overlap, top_k_matches
+from src.services.vector_service import VectorService, vector_service
+
+
+logger = logging.getLogger(__name__)
+
+_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS search_matches (
+      participant_id TEXT NOT NULL REFERENCES participants(id) ON DELETE CASCADE,
+      counterparty_type TEXT NOT NULL,
+      rank INT NOT NULL,
+      counterparty_id TEXT NOT NULL,
+      participant_type TEXT NOT NULL,
+      score DOUBLE PRECISION NOT NULL,
+      run_id TEXT NOT NULL,
+      PRIMARY KEY (participant_id, counterparty_type, rank)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS search_match_runs (
+      id TEXT PRIMARY KEY,
+      buyer_type TEXT NOT NULL,
+      seller_type TEXT NOT NULL,
+      top_k INT NOT NULL,
+      status TEXT NOT NULL,          -- running | completed | failed
+      buyers BIGINT NOT NULL DEFAULT 0,
+      sellers BIGINT NOT NULL DEFAULT 0,
+      matches BIGINT NOT NULL DEFAULT 0,
+      error TEXT,
+      started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+      finished_at TIMESTAMPTZ
+    )
+    """,
+]
+
+
+class MatchingService:
+    def __init__(self, target: Optional[VectorService] = None):
+        self.target = target
+        self._task: Optional[asyncio.Task] = None
+
+    def _vectors(self) -> VectorService:
+        target = self.target or vector_service
+        if not isinstance(target, VectorService):
+            raise RuntimeError("Batch matching needs the pgvector backend (SEARCH_VECTOR_BACKEND=pgvector).")
+        return target
+
+    async def _pool(self) -> asyncpg.Pool:
+        pool = await self._vectors()._pool_or_create()
+        async with pool.acquire() as conn:
+            for ddl in _DDL:
+                await conn.execute(ddl)
+        return pool
+
+    @staticmethod
+    async def _lock(conn: asyncpg.Connection, fn: str, buyer_type: str, seller_type: str) -> bool:
+        return await conn.fetchval(f"SELECT {fn}(hashtext('search_match'), hashtext($1))", f"{buyer_type}/{seller_type}")
+
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    # --- Status & serving ---
+
+    async def get_run(self, run_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """A run's state; the most recent run when `run_id` is None."""
+        pool = await self._pool()
+        async with pool.acquire() as conn:
+            if run_id:
+                row = await conn.fetchrow("SELECT * FROM search_match_runs WHERE id = $1", run_id)
+            else:
+                row = await conn.fetchrow("SELECT * FROM search_match_runs ORDER BY started_at DESC LIMIT 1")
+            if row is None:
+                return None
+            run = dict(row)
+            if run["status"] == "running" and not self.is_running():
+                # Nobody holds the runner lock: the worker that owned the run died
+                if await self._lock(conn, "pg_try_advisory_lock", run["buyer_type"], run["seller_type"]):
+                    await self._lock(conn, "pg_advisory_unlock", run["buyer_type"], run["seller_type"])
+                    run["status"] = "interrupted"
+        return run
+
+    async def matches_for(self, participant_id: str, counterparty_type: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Stored best counterparties of `participant_id`, best first per counterparty type."""
+        pool = await self._pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT m.counterparty_id AS id, m.counterparty_type, m.rank, m.score, m.run_id
+                FROM search_matches m
+                JOIN participants p ON p.id = m.counterparty_id AND p.status = 'active'
+                WHERE m.participant_id = $1 AND ($2::text IS NULL OR m.counterparty_type = $2)
+                ORDER BY m.counterparty_type, m.rank
+                LIMIT $3
+                """,
+                participant_id, counterparty_type, int(limit or settings.SEARCH_MATCH_TOP_K),
+            )
+        return [dict(r) for r in rows]
+
+    # --- Control ---
+
+    async def start(
+        self,
+        buyer_type: Optional[str] = None,
+        seller_type: Optional[str] = None,
+        top_k: Optional[int] = None,
+        buyer_filters: Optional[Dict[str, Any]] = None,
+        seller_filters: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        buyer_type = buyer_type or settings.SEARCH_MATCH_BUYER_TYPE
+        seller_type = seller_type or settings.SEARCH_MATCH_SELLER_TYPE
+        if buyer_type == seller_type:
+            raise ValueError("Buyers and sellers must be different participant types.")
+        top_k = int(top_k or settings.SEARCH_MATCH_TOP_K)
+        # Compile up front so a bad filter fails the request, not the background run
+        compile_filters(buyer_filters, start_param=2, column="e.metadata")
+        compile_filters(seller_filters, start_param=2, column="e.metadata")
+        if self.is_running():
+            raise RuntimeError("A matching run is already running in this worker.")
+        pool = await self._pool()
+        # Dedicated connection: it holds the runner lock for the run's lifetime
+        conn = await asyncpg.connect(settings.DATABASE_URL)
+        if not await self._lock(conn, "pg_try_advisory_lock", buyer_type, seller_type):
+            await conn.close()
+            raise RuntimeError(f"A {buyer_type}/{seller_type} matching run is already running in another worker.")
+        await register_vector(conn)
+        run_id = uuid.uuid4().hex
+        async with pool.acquire() as c:
+            await c.execute(
+                "INSERT INTO search_match_runs (id, buyer_type, seller_type, top_k, status) VALUES ($1, $2, $3, $4, 'running')",
+                run_id, buyer_type, seller_type, top_k,
+            )
+        self._task = asyncio.create_task(self._run(run_id, conn, buyer_type, seller_type, top_k, buyer_filters, seller_filters))
+        return await self.get_run(run_id)
+
+    async def shutdown(self) -> None:
+        if self.is_running():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    # --- Run ---
+
+    async def _run(self, run_id, conn, buyer_type, seller_type, top_k, buyer_filters, seller_filters) -> None:
+        pool = await self._pool()
+        try:
+            buyer_ids, buyers, buyer_meta = await self._load(conn, buyer_type, buyer_filters)
+            seller_ids, sellers, seller_meta = await self._load(conn, seller_type, seller_filters)
+            async with pool.acquire() as c:
+                await c.execute("UPDATE search_match_runs SET buyers = $2, sellers = $3 WHERE id = $1", run_id, len(buyer_ids), len(seller_ids))
+            fields = _csv(settings.SEARCH_MATCH_OVERLAP_FIELDS)
+            constraints = [overlap(buyer_meta[f], seller_meta[f]) for f in fields]
+            metric = self._vectors().metric_name
+            block = (settings.SEARCH_MATCH_BLOCK_ROWS, settings.SEARCH_MATCH_BLOCK_COLS)
+            # BLAS releases the GIL: the event loop keeps serving searches while a run computes
+            records = []
+            for ids, matrix, other_ids, other, cons, own_type, other_type in (
+                (buyer_ids, buyers, seller_ids, sellers, constraints, buyer_type, seller_type),
+                (seller_ids, sellers, buyer_ids, buyers, [c.transposed() for c in constraints], seller_type, buyer_type),
+            ):
+                rows, scores = await asyncio.to_thread(top_k_matches, matrix, other, top_k, metric, cons, *block)
+                records.extend(
+                    (ids[i], other_type, rank, other_ids[row], own_type, float(score), run_id)
+                    for i in range(len(ids))
+                    for rank, (row, score) in enumerate(zip(rows[i], scores[i]), start=1)
+                    if row >= 0
+                )
+            await self._replace(pool, buyer_type, seller_type, records)
+            async with pool.acquire() as c:
+                await c.execute(
+                    "UPDATE search_match_runs SET status = 'completed', matches = $2, finished_at = NOW() WHERE id = $1",
+                    run_id, len(records),
+                )
+            logger.info(f"Matching run {run_id} completed: {len(buyer_ids)} {buyer_type} x {len(seller_ids)} {seller_type}, {len(records)} matches.")
+        except asyncio.CancelledError:
+            logger.info(f"Matching run {run_id} stopped; the previous matches stay in place.")
+            raise
+        except Exception as e:
+            logger.error(f"Matching run {run_id} failed: {e}")
+            async with pool.acquire() as c:
+                await c.execute("UPDATE search_match_runs SET status = 'failed', error = $2, finished_at = NOW() WHERE id = $1", run_id, str(e))
+        finally:
+            await conn.close()  # also releases the runner lock
+
+    async def _load(self, conn: asyncpg.Connection, participant_type: str, filters: Optional[Dict[str, Any]]) -> Tuple[List[str], np.ndarray, Dict[str, List[Any]]]:
+        """(ids, embedding matrix, overlap-field values) of the indexed active participants of a type."""
+        table = self._vectors().table
+        where, args = compile_filters(filters, start_param=2, column="e.metadata")
+        source = (
+            f"FROM {table} e JOIN participants p ON p.id = e.id "
+            f"WHERE p.type = $1 AND p.status = 'active' AND e.embedding IS NOT NULL"
+            + "".join(f" AND {cond}" for cond in where)
+        )
+        fields = _csv(settings.SEARCH_MATCH_OVERLAP_FIELDS)
+        async with conn.transaction(isolation="repeatable_read", readonly=True):
+            total = await conn.fetchval(f"SELECT count(*) {source}", participant_type, *args)
+            matrix = np.empty((total, self._vectors().dimension), dtype=np.float32)
+            ids: List[str] = []
+            values: Dict[str, List[Any]] = {field: [] for field in fields}
+            cursor = await conn.cursor(f"SELECT e.id, e.embedding, e.metadata {source} ORDER BY e.id", participant_type, *args)
+            while True:
+                batch = await cursor.fetch(5000)
+                if not batch:
+                    break
+                matrix[len(ids):len(ids) + len(batch)] = np.stack([r["embedding"] for r in batch])
+                for r in batch:
+                    metadata = json.loads(r["metadata"]) if isinstance(r["metadata"], str) else (r["metadata"] or {})
+                    for field in fields:
+                        values[field].append(metadata.get(field))
+                ids.extend(r["id"] for r in batch)
+        return ids, matrix, values
+
+    async def _replace(self, pool: asyncpg.Pool, buyer_type: str, seller_type: str, records: List[Tuple]) -> None:
+        """Swap in the new lists for this pair of types; readers see the old rows until commit."""
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    "DELETE FROM search_matches WHERE (participant_type = $1 AND counterparty_type = $2) "
+                    "OR (participant_type = $2 AND counterparty_type = $1)",
+                    buyer_type, seller_type,
+                )
+                if records:
+                    await conn.copy_records_to_table(
+                        "search_matches",
+                        records=records,
+                        columns=["participant_id", "counterparty_type", "rank", "counterparty_id", "participant_type", "score", "run_id"],
+                    )
+
+
+matching_service = MatchingService()
@@ -0,0 +1,508 @@
+"""
+In-process vector search backend: the same upsert / query / delete_all interface as the
+pgvector `VectorService`, over a float32 NumPy matrix kept in memory.
+
+With SEARCH_MEMORY_PATH set, the matrix is a memory-mapped file that new rows are appended to,
+and ids, metadata and documents go to an append-only JSON-lines log (last record per id wins).
+Restarting the service maps the file again instead of re-embedding anything.
+
+Search is exact by default: one matrix-vector product, then `argpartition` for the top k.
+SEARCH_MEMORY_INDEX=ivf clusters the rows with k-means and scans only the SEARCH_MEMORY_IVF_PROBES
+lists nearest to the query, the in-memory counterpart of pgvector's ivfflat.
+"""
+import json
+import logging
+import math
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from src.core.config import settings
+from src.services import search_profiles
+from src.services.facets import FACET_FIELDS, facet_values, top_counts
+from src.services.filter_compiler import match_filters
+from src.services.geo import GEO_FIELD, blended_score, haversine_km, point
+from src.services.result_cache import result_cache
+from src.services.vector_service import METRICS, PROJECTIONS
+
+
+logger = logging.getLogger(__name__)
+
+INDEX_MODES = ("exact", "ivf")
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _tokens(text: Optional[str]) -> List[str]:
+    return _TOKEN_RE.findall((text or "").casefold())
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first."""
+    if k >= scores.shape[0]:
+        return np.argsort(-scores, kind="stable")
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+class _IVF:
+    """Coarse k-means quantizer: centroids plus the row ids assigned to each list."""
+
+    def __init__(self, centroids: np.ndarray, assignments: np.ndarray):
+        self.centroids = centroids
+        self.lists = [np.flatnonzero(assignments == c) for c in range(centroids.shape[0])]
+        self.trained_rows = int(assignments.shape[0])
+
+    @staticmethod
+    def assign(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        # argmin ||p - c||^2 == argmax (p.c - ||c||^2 / 2)
+        return np.argmax(points @ centroids.T - 0.5 * np.einsum("ij,ij->i", centroids, centroids), axis=1)
+
+    @classmethod
+    def train(cls, points: np.ndarray, n_lists: int, iterations: int = 10, seed: int = 0) -> "_IVF":
+        rng = np.random.default_rng(seed)
+        sample = points if points.shape[0] <= 50_000 else points[rng.choice(points.shape[0], 50_000, replace=False)]
+        centroids = sample[rng.choice(sample.shape[0], n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            labels = cls.assign(sample, centroids)
+            for c in range(n_lists):
+                members = sample[labels == c]
+                if members.shape[0]:
+                    centroids[c] = members.mean(axis=0)
+        return cls(centroids, cls.assign(points, centroids))
+
+    def remove(self, rows: np.ndarray) -> None:
+        self.lists = [np.setdiff1d(members, rows, assume_unique=True) for members in self.lists]
+
+    def add(self, rows: np.ndarray, points: np.ndarray) -> None:
+        labels = self.assign(points, self.centroids)
+        for c in np.unique(labels):
+            self.lists[c] = np.concatenate([self.lists[c], rows[labels == c]])
+
+    def probe(self, query: np.ndarray, n_probes: int) -> np.ndarray:
+        nearest = _top_k(-np.einsum("ij,ij->i", self.centroids - query, self.centroids - query), n_probes)
+        return np.concatenate([self.lists[c] for c in nearest])
+
+
+class MemoryVectorService:
+    # Whole-profile vectors only; `mode="chunks"` needs the pgvector backend
+    supports_chunks = False
+
+    def __init__(self, path: Optional[str] = None, metric: Optional[str] = None, index_mode: Optional[str] = None):
+        self.path = settings.SEARCH_MEMORY_PATH if path is None else path
+        self.dimension = settings.EMBEDDING_DIMENSION
+        self.metric_name = (metric or settings.SEARCH_DISTANCE_METRIC).lower()
+        self.index_mode = (index_mode or settings.SEARCH_MEMORY_INDEX).lower()
+        if self.metric_name not in METRICS:
+            raise ValueError(f"Unsupported distance metric '{self.metric_name}'. Expected one of {sorted(METRICS)}")
+        if self.index_mode not in INDEX_MODES:
+            raise ValueError(f"Unsupported memory index '{self.index_mode}'. Expected one of {list(INDEX_MODES)}")
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._metadata: List[Dict[str, Any]] = []
+        self._documents: List[Optional[str]] = []
+        # (content_hash, embedding_model) per row, so unchanged profiles can skip re-embedding
+        self._fingerprints: List[Tuple[Optional[str], Optional[str]]] = []
+        self.model = settings.SEARCH_EMBEDDING_MODEL
+        self._tokens: List[frozenset] = []
+        self._vectors = np.empty((0, self.dimension), dtype=np.float32)
+        # Row norms, kept alongside the matrix so cosine scoring is one product and a divide
+        self._norms = np.empty(0, dtype=np.float32)
+        self._ivf: Optional[_IVF] = None
+        self._log_records = 0
+        if self.path:
+            self._load()
+
+    # --- Persistence ---
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _map_vectors(self) -> None:
+        size = os.path.getsize(self._file("vectors.f32"))
+        rows = size // (4 * self.dimension)
+        self._vectors = (
+            np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r+", shape=(rows, self.dimension))
+            if rows else np.empty((0, self.dimension), dtype=np.float32)
+        )
+
+    def _load(self) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        meta_file = self._file("meta.json")
+        if os.path.exists(meta_file):
+            with open(meta_file) as f:
+                stored = json.load(f)["dimension"]
+            if stored != self.dimension:
+                raise ValueError(f"{self.path} holds {stored}-dimensional vectors, expected {self.dimension}")
+        else:
+            with open(meta_file, "w") as f:
+                json.dump({"dimension": self.dimension}, f)
+        open(self._file("vectors.f32"), "ab").close()
+        self._map_vectors()
+        records: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self._file("rows.jsonl")):
+            with open(self._file("rows.jsonl")) as f:
+                for line in f:
+                    # A torn final line from a crash mid-append is dropped; its vector row is simply unused
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    records[record["id"]] = record
+                    self._log_records += 1
+        for record in sorted(records.values(), key=lambda r: r["row"]):
+            if record["row"] >= self._vectors.shape[0]:
+                continue
+            self._register(
+                record["id"], record["metadata"], record.get("document"),
+                (record.get("content_hash"), record.get("embedding_model")),
+            )
+            if record["row"] != len(self._ids) - 1:
+                # Rows orphaned by a torn append leave a gap; close it so row == position
+                self._vectors[len(self._ids) - 1] = self._vectors[record["row"]]
+        if self._vectors.shape[0] != len(self._ids) or self._log_records > len(self._ids):
+            self._compact()
+        self._norms = np.linalg.norm(self._vectors, axis=1).astype(np.float32)
+
+    def _compact(self) -> None:
+        """Rewrite the log with one record per id and drop vector rows nothing points to."""
+        n = len(self._ids)
+        if isinstance(self._vectors, np.memmap):
+            self._vectors.flush()
+        # The new log goes in first: if we stop before truncating, the extra rows are just orphans again
+        tmp = self._file("rows.jsonl.tmp")
+        with open(tmp, "w") as f:
+            for row, _id in enumerate(self._ids):
+                f.write(json.dumps(self._record(row)) + "\n")
+        os.replace(tmp, self._file("rows.jsonl"))
+        # Unmap before truncating, so nothing can touch pages past the new end of file
+        self._vectors = np.empty((0, self.dimension), dtype=np.float32)
+        with open(self._file("vectors.f32"), "r+b") as f:
+            f.truncate(n * 4 * self.dimension)
+        self._log_records = n
+        self._map_vectors()
+
+    def _persist(self, appended: np.ndarray, changed: List[int]) -> None:
+        if appended.shape[0]:
+            with open(self._file("vectors.f32"), "ab") as f:
+                f.write(np.ascontiguousarray(appended, dtype=np.float32).tobytes())
+        self._map_vectors()
+        with open(self._file("rows.jsonl"), "a") as f:
+            for row in changed:
+                f.write(json.dumps(self._record(row)) + "\n")
+        self._log_records += len(changed)
+
+    def _record(self, row: int) -> Dict[str, Any]:
+        content_hash, model = self._fingerprints[row]
+        return {
+            "id": self._ids[row], "row": row, "metadata": self._metadata[row], "document": self._documents[row],
+            "content_hash": content_hash, "embedding_model": model,
+        }
+
+    # --- Writes ---
+
+    def _register(self, _id: str, metadata: Dict[str, Any], document: Optional[str], fingerprint: Tuple[Optional[str], Optional[str]]) -> int:
+        row = self._rows.get(_id)
+        if row is None:
+            row = len(self._ids)
+            self._rows[_id] = row
+            self._ids.append(_id)
+            self._metadata.append(metadata)
+            self._documents.append(document)
+            self._tokens.append(frozenset(_tokens(document)))
+            self._fingerprints.append(fingerprint)
+        else:
+            self._metadata[row] = metadata
+            self._documents[row] = document
+            self._tokens[row] = frozenset(_tokens(document))
+            self._fingerprints[row] = fingerprint
+        return row
+
+    async def upsert(
+        self, _id: str, embedding: List[float], metadata: Dict[str, Any], document: Optional[str] = None, content_hash: Optional[str] = None
+    ) -> None:
+        await self.upsert_many([(_id, embedding, metadata, document, content_hash)])
+
+    async def fingerprints(self, ids: List[str], with_embedding: bool = False) -> Dict[str, Dict[str, Any]]:
+        found = {}
+        for _id in ids:
+            row = self._rows.get(_id)
+            if row is None:
+                continue
+            content_hash, model = self._fingerprints[row]
+            found[_id] = {"id": _id, "content_hash": content_hash, "embedding_model": model, "metadata": self._metadata[row]}
+            if with_embedding:
+                found[_id]["embedding"] = np.array(self._vectors[row])
+        return found
+
+    async def update_metadata_many(self, rows: List[Tuple[str, Dict[str, Any]]]) -> int:
+        changed = []
+        for _id, metadata in rows:
+            row = self._rows.get(_id)
+            if row is not None:
+                self._metadata[row] = metadata
+                changed.append(row)
+        if self.path and changed:
+            self._persist(np.empty((0, self.dimension), dtype=np.float32), changed)
+        if changed:
+            await result_cache.invalidate()
+        return len(changed)
+
+    async def upsert_many(self, rows: List[Tuple[str, List[float], Dict[str, Any], Optional[str], Optional[str]]]) -> int:
+        latest = {row[0]: row for row in rows}
+        if not latest:
+            return 0
+        matrix = np.asarray([row[1] for row in latest.values()], dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[1] != self.dimension:
+            raise ValueError(f"Embedding dimension mismatch: expected {self.dimension}, got {matrix.shape[-1]}")
+        start = len(self._ids)
+        positions = [
+            self._register(_id, metadata, document, (content_hash, self.model))
+            for _id, _, metadata, document, content_hash in latest.values()
+        ]
+        fresh = np.asarray([p >= start for p in positions])
+        updated = [p for p in positions if p < start]
+        if self.path:
+            self._persist(matrix[fresh], positions)
+        else:
+            self._vectors = np.concatenate([self._vectors, matrix[fresh]])
+        if updated:
+            self._vectors[updated] = matrix[~fresh]
+            if isinstance(self._vectors, np.memmap):
+                self._vectors.flush()
+        self._norms = np.concatenate([self._norms, np.linalg.norm(matrix[fresh], axis=1).astype(np.float32)])
+        self._norms[updated] = np.linalg.norm(matrix[~fresh], axis=1)
+        if self._ivf is not None:
+            if len(self._ids) > 2 * self._ivf.trained_rows:
+                # Centroids trained on under half the rows no longer fit; retrain on the next search
+                self._ivf = None
+            else:
+                if updated:
+                    self._ivf.remove(np.asarray(updated))
+                changed = np.asarray(positions)
+                self._ivf.add(changed, self._space(self._vectors[changed], self._norms[changed]))
+        await result_cache.invalidate()
+        return len(latest)
+
+    async def delete_all(self) -> int:
+        deleted = len(self._ids)
+        self._ids, self._rows, self._metadata, self._documents, self._tokens, self._fingerprints = [], {}, [], [], [], []
+        self._vectors = np.empty((0, self.dimension), dtype=np.float32)
+        self._norms = np.empty(0, dtype=np.float32)
+        self._ivf = None
+        if self.path:
+            self._compact()
+        await result_cache.invalidate()
+        return deleted
+
+    # --- Search ---
+
+    def _space(self, vectors: np.ndarray, norms: np.ndarray) -> np.ndarray:
+        """Vectors as the IVF quantizer sees them: unit length for cosine, raw otherwise."""
+        if self.metric_name == "cosine":
+            return vectors / np.maximum(norms, 1e-12)[:, None]
+        return np.asarray(vectors)
+
+    def _scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Similarity of `query` to each row (all rows when `rows` is None), matching pgvector's score."""
+        vectors = self._vectors if rows is None else self._vectors[rows]
+        norms = self._norms if rows is None else self._norms[rows]
+        dots = vectors @ query
+        if self.metric_name == "cosine":
+            return dots / np.maximum(norms * np.linalg.norm(query), 1e-12)
+        if self.metric_name == "inner_product":
+            return dots
+        # -(l2 distance), from ||v||^2 - 2 v.q + ||q||^2 without materializing v - q
+        return -np.sqrt(np.maximum(norms ** 2 - 2 * dots + float(query @ query), 0.0))
+
+    def _n_lists(self) -> int:
+        configured = settings.SEARCH_MEMORY_IVF_LISTS
+        return max(1, configured if configured > 0 else int(math.sqrt(len(self._ids))))
+
+    async def ensure_index(self) -> str:
+        """Train the IVF lists up front (ivf mode) rather than on the first query. Exact mode has nothing to build."""
+        self._ivf = None
+        self._trained_ivf()
+        return f"memory-{self.index_mode}"
+
+    async def ensure_schema(self) -> None:
+        return None
+
+    def ann_settings(self, profile: Optional[str] = None) -> Dict[str, Any]:
+        """As VectorService.ann_settings; the memory IVF scans SEARCH_MEMORY_IVF_PROBES lists whatever the profile."""
+        name = search_profiles.resolve(profile)
+        if self.index_mode == "ivf":
+            return {"profile": name, "index_type": "memory-ivf", "probes": settings.SEARCH_MEMORY_IVF_PROBES}
+        return {"profile": name, "index_type": "memory-exact"}
+
+    async def ensure_facets(self) -> None:
+        return None
+
+    async def verify_index_usage(self) -> bool:
+        return True
+
+    async def close(self) -> None:
+        if isinstance(self._vectors, np.memmap):
+            self._vectors.flush()
+
+    def _trained_ivf(self) -> Optional[_IVF]:
+        if self.index_mode == "ivf" and self._ivf is None:
+            # k-means needs a few rows per list; below that exact search is as fast anyway
+            if len(self._ids) >= 2 * self._n_lists():
+                self._ivf = _IVF.train(self._space(self._vectors, self._norms), self._n_lists())
+        return self._ivf
+
+    def _ann(self, query: np.ndarray, limit: int, mask: Optional[np.ndarray], strategy: str) -> List[Tuple[int, float]]:
+        """(row, score) of the `limit` best rows passing `mask`, best first."""
+        ivf = self._trained_ivf() if strategy != "pre" else None
+        if ivf is not None:
+            probed = ivf.probe(self._space(query[None, :], np.linalg.norm(query)[None])[0], settings.SEARCH_MEMORY_IVF_PROBES)
+            if mask is not None:
+                probed = probed[mask[probed]]
+            if probed.shape[0] >= limit:
+                scores = self._scores(query, probed)
+                return [(int(probed[i]), float(scores[i])) for i in _top_k(scores, limit)]
+            # The probed lists hold too few (filtered) rows to fill the page: rank exactly instead
+        rows = np.flatnonzero(mask) if mask is not None else None
+        scores = self._scores(query, rows)
+        return [(int(rows[i]) if rows is not None else int(i), float(scores[i])) for i in _top_k(scores, limit)]
+
+    def _lexical(self, text: str, limit: int, mask: Optional[np.ndarray]) -> List[int]:
+        """Rows matching the query terms, most terms matched first (no stemming, unlike the SQL leg)."""
+        terms = set(_tokens(text))
+        matched = [
+            (len(terms & tokens), row) for row, tokens in enumerate(self._tokens)
+            if (mask is None or mask[row]) and terms & tokens
+        ]
+        matched.sort(key=lambda item: -item[0])
+        return [row for _, row in matched[:limit]]
+
+    def _fields(self, row: int, include: List[str]) -> Dict[str, Any]:
+        # Only what the index itself stores; profile columns need the database
+        meta, document = self._metadata[row], self._documents[row]
+        available = {
+            "region": meta.get("region"),
+            "primary_crops": meta.get("primary_crops"),
+            "certifications": meta.get("certifications"),
+            "ai_profile_excerpt": document[:settings.SEARCH_EXCERPT_CHARS] if document is not None else None,
+        }
+        return {name: available.get(name) for name in include}
+
+    async def query(
+        self,
+        embedding: List[float],
+        top_k: int,
+        filters: Optional[Dict[str, Any]] = None,
+        *,
+        mode: str = "vector",
+        query_text: Optional[str] = None,
+        vector_weight: float = 1.0,
+        lexical_weight: float = 1.0,
+        rrf_k: int = 60,
+        filter_strategy: str = "auto",
+        include: Optional[List[str]] = None,
+        chunk_aggregate: str = "max",
+        chunk_top_n: int = 3,
+        with_embeddings: bool = False,
+        geo_blend: Optional[Tuple[float, float, float, float]] = None,
+        profile: Optional[str] = None,
+    ):
+        search_profiles.resolve(profile)  # validated like VectorService; the scan here is set by SEARCH_MEMORY_IVF_PROBES
+        if mode == "chunks":
+            raise ValueError("Chunk (multi-vector) search needs the pgvector backend.")
+        if mode not in ("vector", "hybrid"):
+            raise ValueError(f"Unsupported search mode '{mode}'.")
+        if mode == "hybrid" and not query_text:
+            raise ValueError("Hybrid search needs the query text for the lexical leg.")
+        if geo_blend and mode == "hybrid":
+            raise ValueError("Distance-weighted ranking needs a similarity score; hybrid ranks are not one.")
+        include = list(dict.fromkeys(include or []))
+        unknown = [name for name in include if name not in PROJECTIONS]
+        if unknown:
+            raise ValueError(f"Unknown include field(s) {unknown}. Expected any of {sorted(PROJECTIONS)}")
+        query = np.asarray(embedding, dtype=np.float32)
+        if query.shape != (self.dimension,):
+            raise ValueError(f"Embedding dimension mismatch: expected {self.dimension}, got {query.shape[-1]}")
+        mask = np.fromiter((match_filters(filters, meta) for meta in self._metadata), dtype=bool, count=len(self._ids)) if filters else None
+        if not self._ids or (mask is not None and not mask.any()):
+            return []
+
+        if mode == "vector" and geo_blend:
+            # As in VectorService._geo_blend_sql: reorder a deeper similarity ranking by distance decay
+            latitude, longitude, weight, scale_km = geo_blend
+            ranked = []
+            for row, score in self._ann(query, max(int(top_k) * settings.SEARCH_GEO_OVERSAMPLE, 50), mask, filter_strategy):
+                stored = point(self._metadata[row].get(GEO_FIELD))
+                distance = haversine_km(stored[0], stored[1], latitude, longitude) if stored else None
+                ranked.append((row, blended_score(float(score), distance, weight, scale_km)))
+            ranked = sorted(ranked, key=lambda item: -item[1])[:int(top_k)]
+        elif mode == "vector":
+            ranked = self._ann(query, int(top_k), mask, filter_strategy)
+        else:
+            # Reciprocal-rank fusion, as in VectorService._hybrid_sql
+            leg = max(int(top_k) * settings.SEARCH_HYBRID_OVERSAMPLE, 20)
+            fused: Dict[int, float] = {}
+            for rank, (row, _) in enumerate(self._ann(query, leg, mask, filter_strategy), start=1):
+                fused[row] = fused.get(row, 0.0) + vector_weight / (rrf_k + rank)
+            for rank, row in enumerate(self._lexical(query_text, leg, mask), start=1):
+                fused[row] = fused.get(row, 0.0) + lexical_weight / (rrf_k + rank)
+            ranked = sorted(fused.items(), key=lambda item: -item[1])[:int(top_k)]
+
+        results = []
+        for row, score in ranked:
+            hit = {"id": self._ids[row], "score": float(score)}
+            if include:
+                hit["fields"] = self._fields(row, include)
+            if with_embeddings:
+                hit["embedding"] = self._vectors[row].copy()
+            results.append(hit)
+        return results
+
+    async def query_batch(
+        self,
+        embeddings: List[List[float]],
+        top_k: int,
+        filters: Optional[Dict[str, Any]] = None,
+        *,
+        filter_strategy: str = "auto",
+        include: Optional[List[str]] = None,
+        profile: Optional[str] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        # Each search is a matrix product here already; there is no statement to share
+        return [await self.query(embedding, top_k, filters, filter_strategy=filter_strategy, include=include, profile=profile) for embedding in embeddings]
+
+    async def revalidate(self, ids: List[str], include: Optional[List[str]] = None) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Current `include` fields of the `ids` still indexed."""
+        include = list(dict.fromkeys(include or []))
+        return {_id: self._fields(self._rows[_id], include) if include else None for _id in ids if _id in self._rows}
+
+    async def facets(self, fields: List[str], filters: Optional[Dict[str, Any]] = None, limit: Optional[int] = None) -> Dict[str, Dict[str, int]]:
+        """Facet counts over the rows matching `filters`; counted directly, there are no summary tables here."""
+        fields = list(dict.fromkeys(fields))
+        unknown = [name for name in fields if name not in FACET_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown facet field(s) {unknown}. Expected any of {list(FACET_FIELDS)}")
+        if not fields:
+            return {}
+        counts: Dict[Tuple[str, str], int] = {}
+        for meta in self._metadata:
+            if filters and not match_filters(filters, meta):
+                continue
+            for key in facet_values(meta, fields):
+                counts[key] = counts.get(key, 0) + 1
+        return top_counts(counts, fields, int(limit or settings.SEARCH_FACET_LIMIT))
+
+    async def similar(
+        self,
+        participant_id: str,
+        top_k: int,
+        filters: Optional[Dict[str, Any]] = None,
+        *,
+        filter_strategy: str = "auto",
+        include: Optional[List[str]] = None,
+        profile: Optional[str] = None,
+    ):
+        row = self._rows.get(participant_id)
+        if row is None:
+            raise LookupError(f"Participant '{participant_id}' is not indexed.")
+        hits = await self.query(self._vectors[row], int(top_k) + 1, filters, filter_strategy=filter_strategy, include=include, profile=profile)
+        return [hit for hit in hits if hit["id"] != participant_id][:int(top_k)]
@@ -0,0 +1,916 @@
+"""
+Zero-downtime embedding model migrations.
+
+An embedding version is a model, the orchestrator service (config.json `services`) that embeds
+with it, and its dimension; `search_embedding_versions` holds them, exactly one `active`. Every
+replica embeds queries and profiles with the active version (EmbeddingService follows its
+service and dimension), so editing the `embeddings` entry of config.json no longer mixes two
+models' vectors in participant_embeddings: a canary text embedded at startup flags a service
+that stopped returning the active model's vectors, and moving to another model is a migration:
+
+  copy      the target version gets tables of its own, participant_embeddings__migrate and its
+            chunk table with vector(target dimension), and saved searches an embedding__migrate
+            column. Every live row is re-embedded into them from a server-side cursor, with a
+            checkpoint per batch, while index writes go to both versions (dual-write).
+  sync      rows that differ between the versions (edited during the copy, or a failed
+            dual-write) are repaired until a pass finds none; the target gets a check that admits
+            the target model's rows only, copies of the live table's secondary indexes and its
+            own ANN indexes, and the saved-search column its ANN index and a validated NOT NULL
+            check, all built without blocking searches.
+  shadow    SEARCH_MIGRATION_SHADOW_RATE of the searches run again against the target after
+            their response is sent, and both rankings are compared (overlap@k, rank-biased
+            overlap) in `search_migration_shadow`.
+  cut-over  one transaction checks that the versions agree, swaps the target tables in for the
+            live ones and the saved-search column for the old one by renaming, and activates the
+            target version. Nothing is built or scanned under its exclusive locks. Its NOTIFY
+            moves every replica to the new model as it commits.
+
+A migration can be cancelled until its cut-over, dropping the target tables. A session advisory
+lock keeps one runner per table across replicas; an interrupted copy resumes from its
+checkpoint on startup.
+"""
+import asyncio
+import json
+import logging
+import random
+import time
+import uuid
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+import asyncpg
+import numpy as np
+from src.core.config import settings
+from src.database.pgvector_codec import register_vector
+from src.services.embedding_service import EmbeddingService, embedding_service
+from src.services.index_service import _index_chunks, _text_to_embed
+from src.services.reindex_service import _progress
+from src.services.result_cache import result_cache
+from src.services.vector_service import VectorService, vector_service
+
+
+logger = logging.getLogger(__name__)
+
+# Suffix of the target tables (and their indexes and constraints) until the cut-over renames them
+MIGRATION_SUFFIX = "__migrate"
+# Saved searches keep the target version's query embedding next to the live one
+SAVED_SEARCH_COLUMN = "embedding__migrate"
+# Validated before the cut-over, so its SET NOT NULL needs no scan under the exclusive lock
+SAVED_SEARCH_CHECK = "search_saved_searches_embedding__migrate_not_null"
+# Cut-overs and migration state changes; replicas re-read the versions when it fires
+CHANNEL = "search_embedding_version"
+CANARY_TEXT = "AI Profile: canary for the search embedding version, organic coffee exporter"
+# Providers are not bit-exact between calls; another model scores far lower
+CANARY_MIN_SIMILARITY = 0.99
+# Shadow queries in flight per replica; samples beyond it are dropped, never queued
+SHADOW_MAX_IN_FLIGHT = 4
+RBO_P = 0.9
+_SAVED_SEARCHES_PENDING_SQL = f"SELECT id, query FROM search_saved_searches WHERE {SAVED_SEARCH_COLUMN} IS NULL"
+# Profile text of a live row `l`: the text it was indexed from, or for rows indexed before the
+# `document` column existed, the source tables' (read as reindex_service._SOURCE_SQL reads them)
+_SOURCE_JOINS = "LEFT JOIN participants pt ON pt.id = l.id LEFT JOIN producers pr ON pr.id = l.id"
+_DOCUMENT_SQL = "COALESCE(NULLIF(l.document, ''), pr.ai_profile, pt.data ->> 'ai_profile', '')"
+
+_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS search_embedding_versions (
+      model TEXT PRIMARY KEY,
+      service_name TEXT NOT NULL,    -- orchestrator embeddings service (config.json)
+      dimension INT NOT NULL,
+      status TEXT NOT NULL,          -- active | candidate | retired
+      canary REAL[],                 -- embedding of CANARY_TEXT when the version was registered
+      created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+      activated_at TIMESTAMPTZ,
+      retired_at TIMESTAMPTZ
+    )
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_search_embedding_versions_active ON search_embedding_versions (status) WHERE status = 'active'",
+    """
+    CREATE TABLE IF NOT EXISTS search_embedding_migrations (
+      id TEXT PRIMARY KEY,
+      live_table TEXT NOT NULL,
+      target_table TEXT NOT NULL,
+      source_model TEXT NOT NULL,
+      target_model TEXT NOT NULL,
+      target_service TEXT NOT NULL,
+      target_dimension INT NOT NULL,
+      status TEXT NOT NULL,          -- running | shadow | completed | failed | cancelled
+      phase TEXT NOT NULL,           -- copy | sync | shadow | done
+      last_id TEXT,                  -- checkpoint: every live id <= last_id is in the target table
+      total BIGINT NOT NULL DEFAULT 0,
+      processed BIGINT NOT NULL DEFAULT 0,
+      skipped BIGINT NOT NULL DEFAULT 0,  -- live rows without profile text, stored or in the source tables
+      run_started_at TIMESTAMPTZ,
+      run_processed BIGINT NOT NULL DEFAULT 0,
+      error TEXT,
+      started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+      updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+      finished_at TIMESTAMPTZ
+    )
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_search_embedding_migrations_open ON search_embedding_migrations (live_table) WHERE status IN ('running', 'shadow')",
+    """
+    CREATE TABLE IF NOT EXISTS search_migration_shadow (
+      id BIGSERIAL PRIMARY KEY,
+      migration_id TEXT NOT NULL REFERENCES search_embedding_migrations(id) ON DELETE CASCADE,
+      query TEXT NOT NULL,
+      live_ids TEXT[] NOT NULL,
+      target_ids TEXT[] NOT NULL,
+      overlap DOUBLE PRECISION NOT NULL,
+      rbo DOUBLE PRECISION NOT NULL,
+      target_ms DOUBLE PRECISION NOT NULL,
+      created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_search_migration_shadow_migration ON search_migration_shadow (migration_id, created_at DESC)",
+]
+
+
+class EmbeddingVersion(NamedTuple):
+    model: str
+    service_name: str
+    dimension: int
+
+
+class OutOfSync(Exception):
+    """Rows changed between the last sync pass and the cut-over lock."""
+
+
+def overlap_at_k(live: List[str], target: List[str]) -> float:
+    """Share of the live page the target page also returned."""
+    if not live:
+        return 1.0 if not target else 0.0
+    return len(set(live) & set(target)) / len(live)
+
+
+def rank_biased_overlap(live: List[str], target: List[str], p: float = RBO_P) -> float:
+    """
+    Rank-biased overlap of two rankings, truncated at the longer one and normalized so that
+    identical rankings score 1: agreement at every depth, weighted towards the top by p.
+    """
+    depth = max(len(live), len(target))
+    if not depth:
+        return 1.0
+    seen_live, seen_target, score = set(), set(), 0.0
+    for d in range(1, depth + 1):
+        if d <= len(live):
+            seen_live.add(live[d - 1])
+        if d <= len(target):
+            seen_target.add(target[d - 1])
+        score += p ** (d - 1) * len(seen_live & seen_target) / d
+    return score * (1 - p) / (1 - p ** depth)
+
+
+def _metadata(raw: Any) -> Dict[str, Any]:
+    return json.loads(raw) if isinstance(raw, str) else (raw or {})
+
+
+class MigrationService:
+    def __init__(self, target: Optional[VectorService] = None):
+        self.target = target
+        self._task: Optional[asyncio.Task] = None
+        self._watcher: Optional[asyncio.Task] = None
+        self._listener: Optional[asyncpg.Connection] = None
+        self._shadows: set = set()
+        # Active version, and the open migration this replica dual-writes and shadows for
+        self.active: Optional[EmbeddingVersion] = None
+        self.migration: Optional[Dict[str, Any]] = None
+        self._mirror: Optional[Tuple[VectorService, EmbeddingService]] = None
+        self.canary_similarity: Optional[float] = None
+
+    @property
+    def table(self) -> str:
+        return (self.target or vector_service).table
+
+    @property
+    def target_table(self) -> str:
+        return f"{self.table}{MIGRATION_SUFFIX}"
+
+    def _vectors(self) -> VectorService:
+        target = self.target or vector_service
+        if not isinstance(target, VectorService):
+            raise RuntimeError("Embedding migrations need the pgvector backend (SEARCH_VECTOR_BACKEND=pgvector).")
+        return target
+
+    async def _pool(self) -> asyncpg.Pool:
+        pool = await self._vectors()._pool_or_create()
+        async with pool.acquire() as conn:
+            for ddl in _DDL:
+                await conn.execute(ddl)
+        return pool
+
+    def _lock_sql(self, fn: str) -> str:
+        return f"SELECT {fn}(hashtext('search_embedding_migration'), hashtext('{self.table}'))"
+
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _target_service(self, migration: Dict[str, Any]) -> VectorService:
+        live = self._vectors()
+        target = VectorService(
+            table=migration["target_table"], metric=live.metric_name, index_type=live.index_type,
+            precision=live.precision, invalidate_results=False, dimension=migration["target_dimension"],
+        )
+        target.model = migration["target_model"]
+        return target
+
+    @staticmethod
+    def _embedder(migration: Dict[str, Any]) -> EmbeddingService:
+        return embedding_service.variant(migration["target_model"], migration["target_service"], migration["target_dimension"])
+
+    # --- Active version ---
+
+    async def startup(self) -> None:
+        """
+        Seed the first version from the settings, load the active one, check the orchestrator
+        still serves it, resume an interrupted copy and follow version changes from now on.
+        """
+        live = self._vectors()
+        pool = await self._pool()
+        async with pool.acquire() as conn:
+            await conn.execute(
+                "INSERT INTO search_embedding_versions (model, service_name, dimension, status, activated_at) "
+                "SELECT $1, $2, $3, 'active', NOW() WHERE NOT EXISTS (SELECT 1 FROM search_embedding_versions WHERE status = 'active') "
+                "ON CONFLICT DO NOTHING",
+                settings.SEARCH_EMBEDDING_MODEL, settings.SEARCH_EMBEDDING_SERVICE, int(settings.EMBEDDING_DIMENSION),
+            )
+        await self.refresh()
+        seeded = EmbeddingVersion(settings.SEARCH_EMBEDDING_MODEL, settings.SEARCH_EMBEDDING_SERVICE, int(settings.EMBEDDING_DIMENSION))
+        if self.active != seeded:
+            logger.warning(
+                f"Embedding settings name {seeded.model} ({seeded.service_name}, {seeded.dimension} dimensions), but the active "
+                f"embedding version is {self.active.model} ({self.active.service_name}, {self.active.dimension}); searching with "
+                f"the active version. Change models with a migration (POST /migrations)."
+            )
+        try:
+            await self.check_canary()
+        except Exception as e:
+            logger.error(f"Embedding canary check for {live.model} failed: {e}")
+        await self.resume_unfinished()
+        if self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def check_canary(self) -> Optional[float]:
+        """
+        Embed CANARY_TEXT with the active version and compare it with the vector stored when the
+        version was registered. A low similarity means the orchestrator service now embeds with
+        another model, whose vectors would silently mix with the stored ones.
+        """
+        vector = np.asarray(await embedding_service.get_embedding(CANARY_TEXT), dtype=np.float32)
+        pool = await self._pool()
+        async with pool.acquire() as conn:
+            stored = await conn.fetchval("SELECT canary FROM search_embedding_versions WHERE model = $1", self.active.model)
+            if stored is None:
+                await conn.execute("UPDATE search_embedding_versions SET canary = $2 WHERE model = $1", self.active.model, vector.tolist())
+                return None
+        stored = np.asarray(stored, dtype=np.float32)
+        self.canary_similarity = float(vector @ stored / (np.linalg.norm(vector) * np.linalg.norm(stored) or 1.0))
+        if self.canary_similarity < CANARY_MIN_SIMILARITY:
+            logger.error(
+                f"The '{self.active.service_name}' embeddings service no longer returns {self.active.model} vectors "
+                f"(canary similarity {self.canary_similarity:.3f}). New embeddings would not be comparable with the stored "
+                f"ones: restore its config.json entry, or register the new model as a migration target."
+            )
+        return self.canary_similarity
+
+    async def refresh(self) -> None:
+        """Apply the active version and the open migration as stored; every replica converges on them."""
+        pool = await self._pool()
+        async with pool.acquire() as conn:
+            active = await conn.fetchrow(
+                "SELECT model, service_name, dimension FROM search_embedding_versions WHERE status = 'active'"
+            )
+            migration = await conn.fetchrow(
+                "SELECT * FROM search_embedding_migrations WHERE live_table = $1 AND status IN ('running', 'shadow')",
+                self.table,
+            )
+        if active is not None:
+            await self._activate(EmbeddingVersion(active["model"], active["service_name"], int(active["dimension"])))
+        await self._follow(dict(migration) if migration else None)
+
+    async def _activate(self, version: EmbeddingVersion) -> None:
+        if version == self.active:
+            return
+        switched = self.active is not None
+        self.active = version
+        embedding_service.use(*version)
+        live = self._vectors()
+        live.model, live.dimension = version.model, version.dimension
+        if switched:
+            live._estimates.clear()
+            live._facet_summary.clear()
+            await result_cache.invalidate()
+            logger.info(f"Embedding version {version.model} ({version.dimension} dimensions) is now active.")
+
+    async def _follow(self, migration: Optional[Dict[str, Any]]) -> None:
+        if migration is None or (self.migration and self.migration["id"] != migration["id"]):
+            if self._mirror is not None:
+                await self._mirror[0].close()
+            self._mirror = None
+        if migration is not None and self._mirror is None:
+            self._mirror = self._target_service(migration), self._embedder(migration)
+        self.migration = migration
+
+    def mirror(self) -> Optional[Tuple[VectorService, EmbeddingService]]:
+        """(target store, target embedder) index writes are mirrored to, while a migration is open."""
+        return self._mirror if self.migration else None
+
+    async def _watch(self) -> None:
+        """Follow version changes: at once through LISTEN, and by polling should a notification be lost."""
+        while True:
+            try:
+                if self._listener is None or self._listener.is_closed():
+                    self._listener = await asyncpg.connect(settings.DATABASE_URL)
+                    await self._listener.add_listener(CHANNEL, self._notified)
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Could not refresh the embedding version: {e}")
+            await asyncio.sleep(max(1, settings.SEARCH_MIGRATION_POLL_INTERVAL))
+
+    def _notified(self, conn, pid, channel, payload) -> None:
+        asyncio.get_running_loop().create_task(self._refresh_logged())
+
+    async def _refresh_logged(self) -> None:
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.warning(f"Could not refresh the embedding version: {e}")
+
+    # --- Status ---
+
+    async def versions(self) -> List[Dict[str, Any]]:
+        pool = await self._pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT model, service_name, dimension, status, created_at, activated_at, retired_at "
+                "FROM search_embedding_versions ORDER BY created_at"
+            )
+        return [dict(r) for r in rows]
+
+    async def get_migration(self, migration_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """A migration's progress and shadow comparison; the most recent one when `migration_id` is None."""
+        pool = await self._pool()
+        async with pool.acquire() as conn:
+            if migration_id:
+                row = await conn.fetchrow("SELECT * FROM search_embedding_migrations WHERE id = $1", migration_id)
+            else:
+                row = await conn.fetchrow(
+                    "SELECT * FROM search_embedding_migrations WHERE live_table = $1 ORDER BY started_at DESC LIMIT 1", self.table
+                )
+            if row is None:
+                return None
+            migration = dict(row)
+            if migration["status"] == "running" and not self.is_running():
+                # Nobody holds the runner lock: the worker that owned the copy died
+                if await conn.fetchval(self._lock_sql("pg_try_advisory_lock")):
+                    await conn.fetchval(self._lock_sql("pg_advisory_unlock"))
+                    migration["status"] = "interrupted"
+            shadow = await conn.fetchrow(
+                "SELECT count(*) AS queries, avg(overlap) AS mean_overlap, min(overlap) AS min_overlap, "
+                "avg(rbo) AS mean_rbo, avg(target_ms) AS mean_target_ms FROM search_migration_shadow WHERE migration_id = $1",
+                migration["id"],
+            )
+        migration["shadow"] = {key: (round(value, 4) if isinstance(value, float) else value) for key, value in dict(shadow).items()}
+        return _progress(migration)
+
+    # --- Control ---
+
+    async def start(self, model: str, service_name: str, dimension: int) -> Dict[str, Any]:
+        """Register `model` as the target version, create its tables and start the copy in the background."""
+        live = self._vectors()
+        if self.is_running():
+            raise RuntimeError("An embedding migration is already running in this worker.")
+        await self.refresh()
+        if self.active and model == self.active.model:
+            raise ValueError(f"{model} is already the active embedding version.")
+        embedder = embedding_service.variant(model, service_name, dimension)
+        # The target service must answer, with vectors of the promised dimension, before anything is created
+        canary = await embedder.get_embedding(CANARY_TEXT)
+        migration_id = uuid.uuid4().hex
+        target = VectorService(table=self.target_table, dimension=dimension)
+        pool = await self._pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                open_id = await conn.fetchval(
+                    "SELECT id FROM search_embedding_migrations WHERE live_table = $1 AND status IN ('running', 'shadow')", self.table
+                )
+                if open_id:
+                    raise RuntimeError(f"Embedding migration '{open_id}' is still open; cut it over or cancel it first.")
+                await self._drop_target(conn, target)
+                await self._clone(conn, live.table, target.table, dimension)
+                if await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", live.chunk_table):
+                    await self._clone(conn, live.chunk_table, target.chunk_table, dimension)
+                if await conn.fetchval("SELECT to_regclass('search_saved_searches') IS NOT NULL"):
+                    await conn.execute(f"ALTER TABLE search_saved_searches ADD COLUMN {SAVED_SEARCH_COLUMN} vector({int(dimension)})")
+                await conn.execute(
+                    """
+                    INSERT INTO search_embedding_versions AS v (model, service_name, dimension, status, canary)
+                    VALUES ($1, $2, $3, 'candidate', $4)
+                    ON CONFLICT (model) DO UPDATE SET service_name = EXCLUDED.service_name, dimension = EXCLUDED.dimension,
+                      status = 'candidate', canary = EXCLUDED.canary, retired_at = NULL
+                    """,
+                    model, service_name, int(dimension), list(canary),
+                )
+                await conn.execute(
+                    "INSERT INTO search_embedding_migrations (id, live_table, target_table, source_model, target_model, "
+                    "target_service, target_dimension, status, phase) VALUES ($1, $2, $3, $4, $5, $6, $7, 'running', 'copy')",
+                    migration_id, self.table, target.table, live.model, model, service_name, int(dimension),
+                )
+                await conn.execute(f"NOTIFY {CHANNEL}")
+        # Dual-write from here on; other replicas follow on the notification
+        await self.refresh()
+        logger.info(f"Embedding migration {migration_id}: {live.model} -> {model} ({dimension} dimensions) started.")
+        return await self._launch(migration_id)
+
+    async def resume(self, migration_id: str) -> Dict[str, Any]:
+        migration = await self.get_migration(migration_id)
+        if migration is None:
+            raise LookupError(f"Embedding migration '{migration_id}' not found.")
+        if migration["status"] not in ("failed", "interrupted"):
+            raise RuntimeError(f"Embedding migration '{migration_id}' is {migration['status']}; only a failed or interrupted one resumes.")
+        if self.is_running():
+            raise RuntimeError("An embedding migration is already running in this worker.")
+        return await self._launch(migration_id)
+
+    async def resume_unfinished(self) -> None:
+        """Startup hook: pick up a copy whose worker died. Replicas race for the runner lock; one wins."""
+        migration = await self.get_migration()
+        if migration and migration["status"] == "interrupted":
+            try:
+                await self._launch(migration["id"])
+                logger.info(f"Resuming embedding migration {migration['id']} from checkpoint {migration['last_id']!r}.")
+            except RuntimeError:
+                pass
+
+    async def _launch(self, migration_id: str) -> Dict[str, Any]:
+        # Dedicated connection: it holds the runner lock and the copy cursor's transaction
+        conn = await asyncpg.connect(settings.DATABASE_URL)
+        if not await conn.fetchval(self._lock_sql("pg_try_advisory_lock")):
+            await conn.close()
+            raise RuntimeError(f"An embedding migration of {self.table} is already running in another worker.")
+        await register_vector(conn)
+        self._task = asyncio.create_task(self._run(migration_id, conn))
+        return await self.get_migration(migration_id)
+
+    async def cutover(self, migration_id: str) -> Dict[str, Any]:
+        """
+        Activate the target version: a last sync pass, then one transaction that checks both
+        versions agree, swaps the tables and the saved-search column and switches the active
+        version. Writes wait for it; searches only for the swap itself.
+        """
+        migration = await self.get_migration(migration_id)
+        if migration is None:
+            raise LookupError(f"Embedding migration '{migration_id}' not found.")
+        if migration["status"] != "shadow":
+            raise RuntimeError(f"Embedding migration '{migration_id}' is {migration['status']}; it can be cut over once its sync is done.")
+        conn = await asyncpg.connect(settings.DATABASE_URL)
+        if not await conn.fetchval(self._lock_sql("pg_try_advisory_lock")):
+            await conn.close()
+            raise RuntimeError(f"An embedding migration of {self.table} is already running in another worker.")
+        await register_vector(conn)
+        target, embedder = self._target_service(migration), self._embedder(migration)
+        try:
+            # Already done by the run; repeated for a migration that reached shadow without it
+            await self._pin_model(conn, migration, target)
+            await self._prepare_saved_searches(conn, embedder)
+            for _ in range(3):
+                await self._sync(migration, conn, target, embedder)
+                try:
+                    async with conn.transaction():
+                        await self._swap(conn, migration, target)
+                    break
+                except OutOfSync as e:
+                    logger.info(f"Embedding migration {migration_id}: {e} rows changed during the cut-over; syncing again.")
+            else:
+                raise RuntimeError("Rows kept changing during the cut-over; try again when writes are quieter.")
+        finally:
+            await target.close()
+            await conn.close()
+        await self.refresh()
+        live = self._vectors()
+        try:
+            # The swap dropped the facet triggers with the old table; install them and recount
+            await live.ensure_facets()
+        except Exception as e:
+            logger.error(f"Facet summaries of {self.table} could not be rebuilt after the cut-over: {e}")
+        await result_cache.invalidate()
+        logger.info(f"Embedding migration {migration_id} cut over: {migration['target_model']} is active.")
+        return await self.get_migration(migration_id)
+
+    async def cancel(self, migration_id: str) -> Dict[str, Any]:
+        """Abandon an open migration: drop the target tables and column; the live version never changed."""
+        migration = await self.get_migration(migration_id)
+        if migration is None:
+            raise LookupError(f"Embedding migration '{migration_id}' not found.")
+        if migration["status"] in ("completed", "cancelled"):
+            raise RuntimeError(f"Embedding migration '{migration_id}' is already {migration['status']}.")
+        await self.shutdown_runner()
+        conn = await asyncpg.connect(settings.DATABASE_URL)
+        try:
+            if not await conn.fetchval(self._lock_sql("pg_try_advisory_lock")):
+                raise RuntimeError(f"Embedding migration '{migration_id}' is running in another worker.")
+            async with conn.transaction():
+                await self._drop_target(conn, self._target_service(migration))
+                await conn.execute(
+                    "UPDATE search_embedding_versions SET status = 'retired', retired_at = NOW() WHERE model = $1 AND status = 'candidate'",
+                    migration["target_model"],
+                )
+                await conn.execute(
+                    "UPDATE search_embedding_migrations SET status = 'cancelled', finished_at = NOW(), updated_at = NOW() WHERE id = $1",
+                    migration_id,
+                )
+                await conn.execute(f"NOTIFY {CHANNEL}")
+        finally:
+            await conn.close()
+        await self.refresh()
+        return await self.get_migration(migration_id)
+
+    async def shutdown_runner(self) -> None:
+        """Stop the copy at its next await; its last checkpoint stays valid for resume."""
+        if self.is_running():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def shutdown(self) -> None:
+        await self.shutdown_runner()
+        for task in [self._watcher, *self._shadows]:
+            if task is not None and not task.done():
+                task.cancel()
+        self._watcher = None
+        if self._listener is not None and not self._listener.is_closed():
+            await self._listener.close()
+        if self._mirror is not None:
+            await self._mirror[0].close()
+            self._mirror = None
+
+    # --- Shadow queries ---
+
+    def shadow(self, query_text: str, top_k: int, filters: Optional[Dict[str, Any]], options: Dict[str, Any], live_ids: List[str]) -> None:
+        """
+        Sample a served search for comparison with the target version. The repeat runs in the
+        background after the response; with SHADOW_MAX_IN_FLIGHT already running, it is skipped.
+        """
+        migration = self.migration
+        if not migration or migration["status"] != "shadow" or self._mirror is None:
+            return
+        if len(self._shadows) >= SHADOW_MAX_IN_FLIGHT or random.random() >= settings.SEARCH_MIGRATION_SHADOW_RATE:
+            return
+        task = asyncio.create_task(self._shadow(migration["id"], query_text, top_k, filters, options, live_ids))
+        self._shadows.add(task)
+        task.add_done_callback(self._shadows.discard)
+
+    async def _shadow(self, migration_id, query_text, top_k, filters, options, live_ids) -> None:
+        target, embedder = self._mirror
+        try:
+            started = time.perf_counter()
+            vector = await embedder.get_query_embedding(query_text)
+            rows = await target.query(vector, top_k, filters, **{**options, "include": [], "with_embeddings": False})
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            target_ids = [row["id"] for row in rows]
+            async with (await self._vectors()._pool_or_create()).acquire() as conn:
+                await conn.execute(
+                    "INSERT INTO search_migration_shadow (migration_id, query, live_ids, target_ids, overlap, rbo, target_ms) "
+                    "VALUES ($1, $2, $3, $4, $5, $6, $7)",
+                    migration_id, query_text, list(live_ids), target_ids,
+                    overlap_at_k(live_ids, target_ids), rank_biased_overlap(live_ids, target_ids), elapsed_ms,
+                )
+        except Exception as e:
+            logger.warning(f"Shadow query for embedding migration {migration_id} failed: {e}")
+
+    # --- Migration run ---
+
+    async def _run(self, migration_id: str, conn: asyncpg.Connection) -> None:
+        pool = await self._pool()
+        target = embedder = None
+        try:
+            async with pool.acquire() as c:
+                migration = dict(await c.fetchrow(
+                    "UPDATE search_embedding_migrations SET status = 'running', error = NULL, run_started_at = NOW(), "
+                    "run_processed = processed, updated_at = NOW() WHERE id = $1 RETURNING *",
+                    migration_id,
+                ))
+            target, embedder = self._target_service(migration), self._embedder(migration)
+            if migration["phase"] == "copy":
+                await self._copy(migration, conn, pool, target, embedder)
+                migration["phase"] = "sync"
+            if migration["phase"] == "sync":
+                await self._pin_model(conn, migration, target)
+                await self._build_indexes(conn, target)
+                await self._sync(migration, conn, target, embedder)
+                await self._prepare_saved_searches(conn, embedder)
+            async with pool.acquire() as c:
+                await c.execute(
+                    "UPDATE search_embedding_migrations SET status = 'shadow', phase = 'shadow', updated_at = NOW() WHERE id = $1",
+                    migration_id,
+                )
+                await c.execute(f"NOTIFY {CHANNEL}")
+            await self.refresh()
+            logger.info(f"Embedding migration {migration_id}: {migration['processed']} rows copied; shadowing searches until the cut-over.")
+        except asyncio.CancelledError:
+            logger.info(f"Embedding migration {migration_id} stopped; it resumes from its last checkpoint.")
+            raise
+        except Exception as e:
+            logger.error(f"Embedding migration {migration_id} failed: {e}")
+            async with pool.acquire() as c:
+                await c.execute(
+                    "UPDATE search_embedding_migrations SET status = 'failed', error = $2, updated_at = NOW() WHERE id = $1",
+                    migration_id, str(e),
+                )
+        finally:
+            if target is not None:
+                await target.close()
+            await conn.close()  # also releases the runner lock
+
+    @staticmethod
+    async def _clone(conn: asyncpg.Connection, source: str, clone: str, dimension: int) -> None:
+        """Empty copy of `source` with vector(`dimension`) embeddings: columns, defaults, generated columns, primary and foreign keys."""
+        await conn.execute(f"CREATE TABLE {clone} (LIKE {source} INCLUDING DEFAULTS INCLUDING GENERATED INCLUDING STORAGE)")
+        await conn.execute(f"ALTER TABLE {clone} ALTER COLUMN embedding TYPE vector({int(dimension)})")
+        constraints = await conn.fetch(
+            "SELECT conname, pg_get_constraintdef(oid) AS definition FROM pg_constraint "
+            "WHERE conrelid = $1::regclass AND contype IN ('p', 'f', 'u') ORDER BY contype DESC",
+            source,
+        )
+        for c in constraints:
+            await conn.execute(f'ALTER TABLE {clone} ADD CONSTRAINT "{c["conname"]}{MIGRATION_SUFFIX}" {c["definition"]}')
+
+    @staticmethod
+    async def _drop_target(conn: asyncpg.Connection, target: VectorService) -> None:
+        await conn.execute(f"DROP TABLE IF EXISTS {target.chunk_table}")
+        await conn.execute(f"DROP TABLE IF EXISTS {target.table}")
+        if await conn.fetchval("SELECT to_regclass('search_saved_searches') IS NOT NULL"):
+            await conn.execute(f"ALTER TABLE search_saved_searches DROP COLUMN IF EXISTS {SAVED_SEARCH_COLUMN}")
+
+    async def _copy(self, migration, conn, pool, target: VectorService, embedder: EmbeddingService) -> None:
+        live = self._vectors()
+        if migration["last_id"] is None:
+            async with pool.acquire() as c:
+                migration["total"] = await c.fetchval(
+                    f"UPDATE search_embedding_migrations SET total = (SELECT count(*) FROM {live.table}), updated_at = NOW() "
+                    f"WHERE id = $1 RETURNING total",
+                    migration["id"],
+                )
+        batch_size = max(1, settings.SEARCH_REINDEX_BATCH_SIZE)
+        async with conn.transaction(isolation="repeatable_read", readonly=True):
+            cursor = await conn.cursor(
+                f"SELECT l.id, {_DOCUMENT_SQL} AS document, l.metadata, l.content_hash FROM {live.table} l {_SOURCE_JOINS} "
+                f"WHERE l.id > $1 ORDER BY l.id",
+                migration["last_id"] or "",
+            )
+            while True:
+                rows = await cursor.fetch(batch_size)
+                if not rows:
+                    break
+                migration["skipped"] += await self._copy_rows(rows, target, embedder)
+                migration["last_id"] = rows[-1]["id"]
+                migration["processed"] += len(rows)
+                async with pool.acquire() as c:
+                    await c.execute(
+                        "UPDATE search_embedding_migrations SET last_id = $2, processed = $3, skipped = $4, updated_at = NOW() WHERE id = $1",
+                        migration["id"], migration["last_id"], migration["processed"], migration["skipped"],
+                    )
+        async with pool.acquire() as c:
+            await c.execute("UPDATE search_embedding_migrations SET phase = 'sync', updated_at = NOW() WHERE id = $1", migration["id"])
+
+    async def _copy_rows(self, rows: List[asyncpg.Record], target: VectorService, embedder: EmbeddingService) -> int:
+        """
+        Re-embed live (id, document, metadata, content_hash) rows into the target, skipping rows a
+        dual-write already stored from the same text. Returns how many rows had no text to embed.
+        """
+        embeddable = [r for r in rows if r["document"]]
+        known = await target.fingerprints([r["id"] for r in embeddable])
+        todo = [
+            r for r in embeddable
+            if r["id"] not in known or known[r["id"]]["content_hash"] != r["content_hash"] or known[r["id"]]["embedding_model"] != target.model
+        ]
+        vectors = await embedder.get_embeddings([_text_to_embed(r["document"]) for r in todo]) if todo else []
+        await target.upsert_many([
+            (r["id"], vector, _metadata(r["metadata"]), r["document"], r["content_hash"]) for r, vector in zip(todo, vectors)
+        ])
+        await _index_chunks([(r["id"], r["document"]) for r in embeddable], target, embedder)
+        return len(rows) - len(embeddable)
+
+    async def _build_indexes(self, conn: asyncpg.Connection, target: VectorService) -> None:
+        """The live table's secondary indexes, built concurrently on the target, and the target's ANN indexes."""
+        live = self._vectors()
+        indexes = await conn.fetch(
+            "SELECT i.relname AS name, pg_get_indexdef(x.indexrelid) AS definition FROM pg_index x "
+            "JOIN pg_class i ON i.oid = x.indexrelid JOIN pg_am am ON am.oid = i.relam "
+            "WHERE x.indrelid = $1::regclass AND NOT x.indisprimary AND am.amname NOT IN ('hnsw', 'ivfflat') "
+            "AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)",
+            live.table,
+        )
+        for ix in indexes:
+            definition = ix["definition"].replace(
+                f"INDEX {ix['name']} ON", f"INDEX CONCURRENTLY IF NOT EXISTS {ix['name']}{MIGRATION_SUFFIX} ON", 1
+            )
+            definition = definition.replace(f" ON public.{live.table} ", f" ON public.{target.table} ", 1)
+            definition = definition.replace(f" ON {live.table} ", f" ON {target.table} ", 1)
+            await conn.execute(definition)
+        await target.ensure_index()
+
+    async def _pin_model(self, conn: asyncpg.Connection, migration: Dict[str, Any], target: VectorService) -> None:
+        """
+        Let the target tables hold the target model's vectors only, by a check the cut-over
+        renames with them. Writes still embedded with the old model once they are live, index
+        writes that waited on the cut-over's lock and replicas its NOTIFY has not reached yet,
+        then fail instead of mixing both models' vectors in one table.
+        """
+        live = self._vectors()
+        model = migration["target_model"].replace("'", "''")
+        for live_name, target_name in [(live.table, target.table), (live.chunk_table, target.chunk_table)]:
+            if not await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", target_name):
+                continue
+            name = f"{live_name}_embedding_model_check{MIGRATION_SUFFIX}"
+            if await conn.fetchval(
+                "SELECT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = $1 AND conrelid = $2::regclass)", name, target_name
+            ):
+                continue
+            await conn.execute(
+                f"ALTER TABLE {target_name} ADD CONSTRAINT {name} CHECK (embedding_model IS NOT DISTINCT FROM '{model}') NOT VALID"
+            )
+            await conn.execute(f"ALTER TABLE {target_name} VALIDATE CONSTRAINT {name}")
+
+    def _saved_search_index(self, column: str = "embedding") -> str:
+        name = f"idx_search_saved_searches_vec_hnsw_{self._vectors().metric_name}"
+        return name if column == "embedding" else f"{name}{MIGRATION_SUFFIX}"
+
+    async def _prepare_saved_searches(self, conn: asyncpg.Connection, embedder: EmbeddingService) -> None:
+        """
+        Ready the saved-search column for a cut-over that only renames: its ANN index, built
+        concurrently, and a NOT NULL check, validated without blocking writes. New saved searches
+        fill the column themselves from here on (StandingQueryService.create).
+        """
+        if not await conn.fetchval(
+            "SELECT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name = 'search_saved_searches' AND column_name = $1)",
+            SAVED_SEARCH_COLUMN,
+        ):
+            return
+        index = self._saved_search_index(SAVED_SEARCH_COLUMN)
+        if await conn.fetchval(
+            "SELECT NOT x.indisvalid FROM pg_index x WHERE x.indexrelid = to_regclass($1)", index
+        ):
+            # Left behind by an interrupted concurrent build
+            await conn.execute(f"DROP INDEX CONCURRENTLY {index}")
+        await conn.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index} ON search_saved_searches "
+            f"USING hnsw ({SAVED_SEARCH_COLUMN} {self._vectors().metric.opclass})"
+        )
+        if not await conn.fetchval(
+            "SELECT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = $1 AND conrelid = 'search_saved_searches'::regclass)",
+            SAVED_SEARCH_CHECK,
+        ):
+            await conn.execute(
+                f"ALTER TABLE search_saved_searches ADD CONSTRAINT {SAVED_SEARCH_CHECK} "
+                f"CHECK ({SAVED_SEARCH_COLUMN} IS NOT NULL) NOT VALID"
+            )
+        # Rows inserted before the check existed; then a validation that only takes SHARE UPDATE EXCLUSIVE
+        await self._sync_saved_searches(conn, embedder)
+        await conn.execute(f"ALTER TABLE search_saved_searches VALIDATE CONSTRAINT {SAVED_SEARCH_CHECK}")
+
+    async def _sync_saved_searches(self, conn: asyncpg.Connection, embedder: EmbeddingService) -> int:
+        saved = await conn.fetch(_SAVED_SEARCHES_PENDING_SQL)
+        if saved:
+            vectors = await embedder.get_embeddings([r["query"] for r in saved])
+            await conn.execute(
+                f"UPDATE search_saved_searches s SET {SAVED_SEARCH_COLUMN} = u.embedding::vector "
+                f"FROM unnest($1::text[], $2::text[]) AS u(id, embedding) WHERE s.id = u.id",
+                [r["id"] for r in saved], [json.dumps([float(x) for x in vector]) for vector in vectors],
+            )
+        return len(saved)
+
+    async def _sync(self, migration, conn, target: VectorService, embedder: EmbeddingService) -> None:
+        """Repair differences between the live and target versions until a pass finds none."""
+        while True:
+            fixed = await self._sync_pass(conn, target, embedder)
+            await conn.execute("UPDATE search_embedding_migrations SET updated_at = NOW() WHERE id = $1", migration["id"])
+            if not fixed:
+                return
+            logger.info(f"Embedding migration {migration['id']}: {fixed} rows re-synced.")
+
+    def _diff_sql(self, target: VectorService) -> Dict[str, str]:
+        """Rows that differ between the live and target versions, by kind."""
+        live = self._vectors()
+        return {
+            # re-embed: missing from the target, or embedded from other text
+            "stale": f"""
+                SELECT l.id, {_DOCUMENT_SQL} AS document, l.metadata, l.content_hash FROM {live.table} l
+                LEFT JOIN {target.table} t ON t.id = l.id
+                {_SOURCE_JOINS}
+                WHERE {_DOCUMENT_SQL} <> ''
+                  AND (t.id IS NULL OR t.content_hash IS DISTINCT FROM l.content_hash)
+            """,
+            "metadata": f"""
+                SELECT l.id, l.metadata FROM {live.table} l JOIN {target.table} t ON t.id = l.id
+                WHERE t.content_hash IS NOT DISTINCT FROM l.content_hash AND t.metadata IS DISTINCT FROM l.metadata
+            """,
+            "gone": f"SELECT t.id FROM {target.table} t WHERE NOT EXISTS (SELECT 1 FROM {live.table} l WHERE l.id = t.id)",
+            # chunks cut from other text than the live ones; rows indexed before chunking or before
+            # `document` have no live chunks to compare with, and keep the ones the copy cut
+            "chunks": f"""
+                SELECT l.id, l.document FROM {live.table} l
+                CROSS JOIN LATERAL (SELECT min(content_hash) AS hash FROM {live.chunk_table} c WHERE c.id = l.id) lc
+                WHERE l.document <> '' AND lc.hash IS NOT NULL
+                  AND lc.hash IS DISTINCT FROM (SELECT min(content_hash) FROM {target.chunk_table} c WHERE c.id = l.id)
+            """,
+            "saved_searches": _SAVED_SEARCHES_PENDING_SQL,
+        }
+
+    async def _applicable(self, conn: asyncpg.Connection, target: VectorService) -> Dict[str, str]:
+        live = self._vectors()
+        diff = self._diff_sql(target)
+        if not await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", target.chunk_table):
+            diff.pop("chunks")
+        if not await conn.fetchval(
+            "SELECT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name = 'search_saved_searches' AND column_name = $1)",
+            SAVED_SEARCH_COLUMN,
+        ):
+            diff.pop("saved_searches")
+        return diff
+
+    async def _sync_pass(self, conn: asyncpg.Connection, target: VectorService, embedder: EmbeddingService) -> int:
+        diff = await self._applicable(conn, target)
+        batch_size = max(1, settings.SEARCH_REINDEX_BATCH_SIZE)
+        stale = await conn.fetch(diff["stale"] + " ORDER BY l.id")
+        for start in range(0, len(stale), batch_size):
+            await self._copy_rows(stale[start:start + batch_size], target, embedder)
+        moved = await conn.fetch(diff["metadata"])
+        await target.update_metadata_many([(r["id"], _metadata(r["metadata"])) for r in moved])
+        gone = await conn.fetch(diff["gone"])
+        if gone:
+            await conn.execute(f"DELETE FROM {target.table} WHERE id = ANY($1::text[])", [r["id"] for r in gone])
+        chunks = await conn.fetch(diff["chunks"]) if "chunks" in diff else []
+        for start in range(0, len(chunks), batch_size):
+            await _index_chunks([(r["id"], r["document"]) for r in chunks[start:start + batch_size]], target, embedder)
+        saved = await self._sync_saved_searches(conn, embedder) if "saved_searches" in diff else 0
+        return len(stale) + len(moved) + len(gone) + len(chunks) + saved
+
+    async def _swap(self, conn: asyncpg.Connection, migration: Dict[str, Any], target: VectorService) -> None:
+        """The cut-over transaction. Raises OutOfSync (rolling it back) when a write slipped in since the last sync."""
+        live = self._vectors()
+        diff = await self._applicable(conn, target)
+        has_chunks = "chunks" in diff
+        has_saved = "saved_searches" in diff
+        tables = [live.table, target.table] + ([live.chunk_table, target.chunk_table] if has_chunks else [])
+        tables += ["search_saved_searches"] if has_saved else []
+        # Writes wait from here; searches keep reading the live tables until the swap below
+        await conn.execute(f"LOCK TABLE {', '.join(tables)} IN SHARE MODE")
+        pending = 0
+        for sql in diff.values():
+            pending += await conn.fetchval(f"SELECT count(*) FROM ({sql}) d")
+        if pending:
+            raise OutOfSync(pending)
+        # In sync, yet missing from the target: rows without profile text anywhere, which the swap would drop
+        missing = await conn.fetchval(
+            f"SELECT count(*) FROM {live.table} l WHERE NOT EXISTS (SELECT 1 FROM {target.table} t WHERE t.id = l.id)"
+        )
+        if missing:
+            raise RuntimeError(
+                f"{missing} live rows have no profile text to re-embed and would be lost by the cut-over; "
+                f"give their participants an AI profile or delete them from {live.table}, then cut over again."
+            )
+        await conn.execute(f"LOCK TABLE {', '.join(tables)} IN ACCESS EXCLUSIVE MODE")
+        swapped = [(live.table, target.table)] + ([(live.chunk_table, target.chunk_table)] if has_chunks else [])
+        for live_name, target_name in swapped:
+            await conn.execute(f"DROP TABLE {live_name}")
+            await conn.execute(f"ALTER TABLE {target_name} RENAME TO {live_name}")
+            for c in await conn.fetch("SELECT conname FROM pg_constraint WHERE conrelid = $1::regclass", live_name):
+                if c["conname"].endswith(MIGRATION_SUFFIX):
+                    await conn.execute(
+                        f'ALTER TABLE {live_name} RENAME CONSTRAINT "{c["conname"]}" TO "{c["conname"][:-len(MIGRATION_SUFFIX)]}"'
+                    )
+            for ix in await live.vector_indexes(conn, live_name):
+                name = live._index_name_for(live_name, ix["method"])
+                if ix["name"] != name:
+                    await conn.execute(f'ALTER INDEX "{ix["name"]}" RENAME TO "{name}"')
+            for ix in await conn.fetch(
+                "SELECT i.relname AS name FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid WHERE x.indrelid = $1::regclass",
+                live_name,
+            ):
+                if ix["name"].endswith(MIGRATION_SUFFIX):
+                    await conn.execute(f'ALTER INDEX "{ix["name"]}" RENAME TO "{ix["name"][:-len(MIGRATION_SUFFIX)]}"')
+        if has_saved:
+            # The old column's index goes with it; the new one was built during the sync phase.
+            # SET NOT NULL is proved by the validated check instead of a scan
+            await conn.execute("ALTER TABLE search_saved_searches DROP COLUMN embedding")
+            await conn.execute(f"ALTER TABLE search_saved_searches RENAME COLUMN {SAVED_SEARCH_COLUMN} TO embedding")
+            await conn.execute("ALTER TABLE search_saved_searches ALTER COLUMN embedding SET NOT NULL")
+            await conn.execute(f"ALTER TABLE search_saved_searches DROP CONSTRAINT {SAVED_SEARCH_CHECK}")
+            await conn.execute(f"ALTER INDEX IF EXISTS {self._saved_search_index(SAVED_SEARCH_COLUMN)} RENAME TO {self._saved_search_index()}")
+        await conn.execute(
+            "UPDATE search_embedding_versions SET status = 'retired', retired_at = NOW() WHERE status = 'active'"
+        )
+        await conn.execute(
+            "UPDATE search_embedding_versions SET status = 'active', activated_at = NOW() WHERE model = $1", migration["target_model"]
+        )
+        await conn.execute(
+            "UPDATE search_embedding_migrations SET status = 'completed', phase = 'done', finished_at = NOW(), updated_at = NOW() WHERE id = $1",
+            migration["id"],
+        )
+        await conn.execute(f"NOTIFY {CHANNEL}")
+
+
+migration_service = MigrationService()
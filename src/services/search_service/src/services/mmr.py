@@ -0,0 +1,76 @@
+"""
+Maximal Marginal Relevance reranking of search hits.
+
+Picks hits one at a time, each maximizing
+    lambda * sim(query, hit) - (1 - lambda) * max(sim(hit, already picked))
+so near-duplicate listings (same cooperative, same region boilerplate) stop crowding the page.
+Similarities are cosine over the stored embeddings. Selection is lazy (see `mmr_order`), so beyond
+one pass over the candidates for norms and relevance it costs a few small products per pick
+rather than a pass over all candidates.
+"""
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+# Stale candidates refreshed per step of the lazy selection
+_REFRESH = 16
+
+
+def mmr_order(query: np.ndarray, candidates: np.ndarray, k: int, lambda_: float) -> List[int]:
+    """
+    Row numbers of `candidates` (n x dim) in MMR order, at most k of them.
+
+    Lazy greedy: a candidate's MMR score can only fall as hits are picked, so the stale scores
+    are upper bounds. Each step refreshes the best few stale bounds against the picks they have
+    not been compared with yet, and takes the leader once its score is fresh. Same picks as
+    recomputing every score every step, at a fraction of the matrix-vector products.
+    """
+    n = len(candidates)
+    k = min(int(k), n)
+    if k <= 0:
+        return []
+    vectors = np.asarray(candidates, dtype=np.float32)
+    inv_norms = 1.0 / np.maximum(np.sqrt(np.einsum("ij,ij->i", vectors, vectors)), 1e-12)
+    q = np.asarray(query, dtype=np.float32)
+    relevance = (vectors @ q) * inv_norms / max(float(np.linalg.norm(q)), 1e-12)
+    if lambda_ >= 1.0:
+        return np.argsort(-relevance, kind="stable")[:k].tolist()
+
+    # The first pick is pure relevance. Similarity to it is computed for everyone, since a
+    # negative one raises a score; from then on redundancy only grows and the bounds hold
+    first = int(np.argmax(relevance))
+    picked: List[int] = [first]
+    redundancy = (vectors @ vectors[first]) * inv_norms * inv_norms[first]
+    compared = np.ones(n, dtype=np.int64)  # how many picks each candidate's redundancy covers
+    bound = lambda_ * relevance - (1.0 - lambda_) * redundancy
+    bound[first] = -np.inf
+    while len(picked) < k:
+        leader = int(np.argmax(bound))
+        if compared[leader] == len(picked):
+            picked.append(leader)
+            bound[leader] = -np.inf
+            continue
+        # Refresh the few best stale bounds in one small product. The leader is always among
+        # them: with more than _REFRESH tied bounds (duplicate listings) the partition may leave
+        # it out, and a leader that is never refreshed is never picked
+        top = np.argpartition(bound, -_REFRESH)[-_REFRESH:] if n > _REFRESH else np.arange(n)
+        top = np.union1d(top, [leader])
+        stale = top[(compared[top] < len(picked)) & np.isfinite(bound[top])]
+        since = int(compared[stale].min())
+        recent = picked[since:]
+        sims = (vectors[stale] @ vectors[recent].T) * inv_norms[stale, None] * inv_norms[recent]
+        redundancy[stale] = np.maximum(redundancy[stale], sims.max(axis=1))
+        compared[stale] = len(picked)
+        bound[stale] = lambda_ * relevance[stale] - (1.0 - lambda_) * redundancy[stale]
+    return picked
+
+
+def mmr_rerank(query: Sequence[float], hits: List[Dict[str, Any]], k: int, lambda_: float) -> List[Dict[str, Any]]:
+    """
+    The top `k` of `hits` (each carrying its "embedding") in MMR order, without the embeddings.
+    Scores stay the ones the search returned; only the order and the cut change.
+    """
+    if not hits:
+        return []
+    order = mmr_order(np.asarray(query), np.stack([h["embedding"] for h in hits]), k, lambda_)
+    return [{key: value for key, value in hits[i].items() if key != "embedding"} for i in order]
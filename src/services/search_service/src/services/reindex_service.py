@@ -0,0 +1,428 @@
+"""
+Full re-index of the search table from the source of truth (participants / producers).
+
+A job streams every eligible participant through a server-side cursor, embeds them in batches
+and bulk-upserts them into a shadow copy of the search table, recording a checkpoint (the last
+id written) after every batch, so a crashed or restarted job picks up where it stopped. Rows
+edited while the copy runs are re-embedded in a catch-up pass, then the shadow table replaces
+the live one in a single transaction: searches see either the old index or the new one, never
+a half-built table.
+
+Job state lives in `search_reindex_jobs`. A session advisory lock keeps a single runner per
+table across every search_service replica.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+import asyncpg
+from src.core.config import settings
+from src.services.embedding_service import embedding_service
+from src.services.index_service import _build_metadata, _content_hash, _index_chunks, _text_to_embed
+from src.services.result_cache import result_cache
+from src.services.vector_service import VectorService, vector_service
+
+
+logger = logging.getLogger(__name__)
+
+# Suffix for the shadow table and everything attached to it until the swap renames them back
+SHADOW_SUFFIX = "__reindex"
+
+# Active participants with an AI profile; producers only once approved. `participants` is the
+# parent table of participant_embeddings, so every id streamed here satisfies its foreign key.
+_SOURCE_SQL = """
+    SELECT pt.id,
+           COALESCE(pr.ai_profile, pt.data ->> 'ai_profile') AS ai_profile,
+           COALESCE(pr.region, pt.data ->> 'region') AS region,
+           COALESCE(to_jsonb(pr.certifications), pt.data -> 'certifications', '[]'::jsonb) AS certifications,
+           COALESCE(to_jsonb(pr.primary_crops), pt.data -> 'primary_crops', '[]'::jsonb) AS primary_crops,
+           pt.data #> '{location,coordinates}' AS coordinates  -- LocationModel in shared/events.py
+    FROM participants pt
+    LEFT JOIN producers pr ON pr.id = pt.id
+    WHERE pt.status = 'active'
+      AND (pr.id IS NULL OR pr.status = 'approved')
+      AND COALESCE(pr.ai_profile, pt.data ->> 'ai_profile', '') <> ''
+"""
+
+_JOBS_DDL = """
+    CREATE TABLE IF NOT EXISTS search_reindex_jobs (
+      id TEXT PRIMARY KEY,
+      target_table TEXT NOT NULL,
+      status TEXT NOT NULL,          -- running | completed | failed
+      phase TEXT NOT NULL,           -- copy | catchup | done
+      last_id TEXT,                  -- checkpoint: every source id <= last_id is in the shadow table
+      total BIGINT NOT NULL DEFAULT 0,
+      processed BIGINT NOT NULL DEFAULT 0,
+      skipped BIGINT NOT NULL DEFAULT 0,  -- rows whose stored embedding was reused instead of re-embedded
+      catchup_since TIMESTAMPTZ,     -- rows edited after this are re-embedded before the swap
+      run_started_at TIMESTAMPTZ,
+      run_processed BIGINT NOT NULL DEFAULT 0,
+      error TEXT,
+      started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+      updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+      finished_at TIMESTAMPTZ
+    )
+"""
+
+
+class OutOfSync(Exception):
+    """Participants changed between the last catch-up pass and the swap lock."""
+
+
+def _progress(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Add throughput (rows/s over the current run) and ETA to a job row."""
+    now = datetime.now(timezone.utc)
+    elapsed = (now - job["run_started_at"]).total_seconds() if job.get("run_started_at") else 0.0
+    done_this_run = job["processed"] - job["run_processed"]
+    throughput = done_this_run / elapsed if elapsed > 0 and job["status"] == "running" else None
+    remaining = max(job["total"] - job["processed"], 0)
+    job["percent"] = round(100.0 * min(job["processed"], job["total"]) / job["total"], 1) if job["total"] else None
+    job["throughput_per_sec"] = round(throughput, 2) if throughput else None
+    job["eta_seconds"] = round(remaining / throughput) if throughput and job["phase"] == "copy" else None
+    return job
+
+
+class ReindexService:
+    def __init__(self, target: Optional[VectorService] = None):
+        self.target = target
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def table(self) -> str:
+        return (self.target or vector_service).table
+
+    @property
+    def shadow_table(self) -> str:
+        return f"{self.table}{SHADOW_SUFFIX}"
+
+    def _vectors(self) -> VectorService:
+        target = self.target or vector_service
+        if not isinstance(target, VectorService):
+            raise RuntimeError("Re-index jobs need the pgvector backend (SEARCH_VECTOR_BACKEND=pgvector).")
+        return target
+
+    async def _pool(self) -> asyncpg.Pool:
+        pool = await self._vectors()._pool_or_create()
+        async with pool.acquire() as conn:
+            await conn.execute(_JOBS_DDL)
+            await conn.execute("ALTER TABLE search_reindex_jobs ADD COLUMN IF NOT EXISTS skipped BIGINT NOT NULL DEFAULT 0")
+        return pool
+
+    def _lock_sql(self, fn: str) -> str:
+        return f"SELECT {fn}(hashtext('search_reindex'), hashtext('{self.table}'))"
+
+    # --- Status ---
+
+    async def get_job(self, job_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """A job's progress; the most recent job when `job_id` is None."""
+        pool = await self._pool()
+        async with pool.acquire() as conn:
+            if job_id:
+                row = await conn.fetchrow("SELECT * FROM search_reindex_jobs WHERE id = $1", job_id)
+            else:
+                row = await conn.fetchrow(
+                    "SELECT * FROM search_reindex_jobs WHERE target_table = $1 ORDER BY started_at DESC LIMIT 1", self.table
+                )
+            if row is None:
+                return None
+            job = dict(row)
+            if job["status"] == "running" and not self.is_running():
+                # Nobody holds the runner lock: the worker that owned the job died
+                if await conn.fetchval(self._lock_sql("pg_try_advisory_lock")):
+                    await conn.fetchval(self._lock_sql("pg_advisory_unlock"))
+                    job["status"] = "interrupted"
+        return _progress(job)
+
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    # --- Control ---
+
+    async def start(self) -> Dict[str, Any]:
+        """Resume the unfinished job for this table, or start a new one."""
+        if self.is_running():
+            raise RuntimeError("A re-index job is already running in this worker.")
+        pool = await self._pool()
+        async with pool.acquire() as conn:
+            job_id = await conn.fetchval(
+                "SELECT id FROM search_reindex_jobs WHERE target_table = $1 AND status = 'running' ORDER BY started_at DESC LIMIT 1",
+                self.table,
+            )
+        return await self._launch(job_id or await self._create_job(pool))
+
+    async def resume(self, job_id: str) -> Dict[str, Any]:
+        job = await self.get_job(job_id)
+        if job is None:
+            raise LookupError(f"Re-index job '{job_id}' not found.")
+        if job["status"] == "completed":
+            raise RuntimeError(f"Re-index job '{job_id}' already completed.")
+        if self.is_running():
+            raise RuntimeError("A re-index job is already running in this worker.")
+        return await self._launch(job_id)
+
+    async def resume_unfinished(self) -> None:
+        """Startup hook: pick up a job whose worker died. Replicas race for the runner lock; one wins."""
+        job = await self.get_job()
+        if job and job["status"] == "interrupted":
+            try:
+                await self._launch(job["id"])
+                logger.info(f"Resuming re-index job {job['id']} from checkpoint {job['last_id']!r}.")
+            except RuntimeError:
+                pass
+
+    async def _create_job(self, pool: asyncpg.Pool) -> str:
+        job_id = uuid.uuid4().hex
+        async with pool.acquire() as conn:
+            await conn.execute(
+                "INSERT INTO search_reindex_jobs (id, target_table, status, phase) VALUES ($1, $2, 'running', 'copy')",
+                job_id, self.table,
+            )
+        return job_id
+
+    async def _launch(self, job_id: str) -> Dict[str, Any]:
+        # Dedicated connection: it holds the runner lock for the job's lifetime and the cursor's transaction
+        conn = await asyncpg.connect(settings.DATABASE_URL)
+        if not await conn.fetchval(self._lock_sql("pg_try_advisory_lock")):
+            await conn.close()
+            raise RuntimeError(f"A re-index of {self.table} is already running in another worker.")
+        self._task = asyncio.create_task(self._run(job_id, conn))
+        return await self.get_job(job_id)
+
+    async def shutdown(self) -> None:
+        """Stop the job at its next await; its last checkpoint stays valid for resume."""
+        if self.is_running():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    # --- Job ---
+
+    async def _run(self, job_id: str, conn: asyncpg.Connection) -> None:
+        pool = await self._pool()
+        live = self._vectors()
+        shadow = VectorService(
+            table=self.shadow_table, metric=live.metric_name, index_type=live.index_type, precision=live.precision,
+            invalidate_results=False, dimension=live.dimension,
+        )
+        # The active embedding version, which a migration may have moved off the settings
+        shadow.model = live.model
+        try:
+            async with pool.acquire() as c:
+                job = dict(await c.fetchrow(
+                    "UPDATE search_reindex_jobs SET status = 'running', error = NULL, run_started_at = NOW(), "
+                    "run_processed = processed, updated_at = NOW() WHERE id = $1 RETURNING *",
+                    job_id,
+                ))
+            if job["phase"] == "copy":
+                await self._copy(job, conn, pool, shadow)
+                job["phase"] = "catchup"
+            if job["phase"] == "catchup":
+                await self._catch_up(job, pool, shadow)
+            await self._swap(job, pool, shadow)
+            live._estimates.clear()
+            live._facet_summary.clear()
+            try:
+                # The swap dropped the facet triggers with the old table; install them and recount
+                await live.ensure_facets()
+            except Exception as e:
+                logger.error(f"Facet summaries of {self.table} could not be rebuilt after the swap: {e}")
+            await result_cache.invalidate()
+            async with pool.acquire() as c:
+                await c.execute(
+                    "UPDATE search_reindex_jobs SET status = 'completed', phase = 'done', finished_at = NOW(), updated_at = NOW() WHERE id = $1",
+                    job_id,
+                )
+            logger.info(f"Re-index job {job_id} completed: {job['processed']} rows swapped into {self.table}.")
+        except asyncio.CancelledError:
+            logger.info(f"Re-index job {job_id} stopped; it resumes from its last checkpoint.")
+            raise
+        except Exception as e:
+            logger.error(f"Re-index job {job_id} failed: {e}")
+            async with pool.acquire() as c:
+                await c.execute(
+                    "UPDATE search_reindex_jobs SET status = 'failed', error = $2, updated_at = NOW() WHERE id = $1",
+                    job_id, str(e),
+                )
+        finally:
+            await shadow.close()
+            await conn.close()  # also releases the runner lock
+
+    async def _create_shadow(self, pool: asyncpg.Pool) -> None:
+        """Empty copy of the live table: columns, defaults, generated columns, primary and foreign keys."""
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(f"DROP TABLE IF EXISTS {self.shadow_table}")
+                await conn.execute(
+                    f"CREATE TABLE {self.shadow_table} (LIKE {self.table} INCLUDING DEFAULTS INCLUDING GENERATED INCLUDING STORAGE)"
+                )
+                constraints = await conn.fetch(
+                    "SELECT conname, pg_get_constraintdef(oid) AS definition FROM pg_constraint "
+                    "WHERE conrelid = $1::regclass AND contype IN ('p', 'f', 'u') ORDER BY contype DESC",
+                    self.table,
+                )
+                for c in constraints:
+                    await conn.execute(
+                        f'ALTER TABLE {self.shadow_table} ADD CONSTRAINT "{c["conname"]}{SHADOW_SUFFIX}" {c["definition"]}'
+                    )
+
+    async def _copy(self, job: Dict[str, Any], conn: asyncpg.Connection, pool: asyncpg.Pool, shadow: VectorService) -> None:
+        if job["last_id"] is None:
+            await self._create_shadow(pool)
+            async with pool.acquire() as c:
+                job.update(dict(await c.fetchrow(
+                    f"UPDATE search_reindex_jobs SET total = (SELECT count(*) FROM ({_SOURCE_SQL}) s), "
+                    f"catchup_since = NOW(), updated_at = NOW() WHERE id = $1 RETURNING total, catchup_since",
+                    job["id"],
+                )))
+        batch_size = max(1, settings.SEARCH_REINDEX_BATCH_SIZE)
+        async with conn.transaction(isolation="repeatable_read", readonly=True):
+            cursor = await conn.cursor(_SOURCE_SQL + " AND pt.id > $1 ORDER BY pt.id", job["last_id"] or "")
+            while True:
+                rows = await cursor.fetch(batch_size)
+                if not rows:
+                    break
+                job["skipped"] += await self._index_batch(rows, shadow)
+                job["last_id"] = rows[-1]["id"]
+                job["processed"] += len(rows)
+                async with pool.acquire() as c:
+                    await c.execute(
+                        "UPDATE search_reindex_jobs SET last_id = $2, processed = $3, skipped = $4, updated_at = NOW() WHERE id = $1",
+                        job["id"], job["last_id"], job["processed"], job["skipped"],
+                    )
+        async with pool.acquire() as c:
+            await c.execute("UPDATE search_reindex_jobs SET phase = 'catchup', updated_at = NOW() WHERE id = $1", job["id"])
+
+    def _prune_sql(self) -> str:
+        """Delete shadow rows whose participant left the source (deactivated, unapproved, deleted, profile emptied)."""
+        return f"DELETE FROM {self.shadow_table} s WHERE NOT EXISTS (SELECT 1 FROM ({_SOURCE_SQL}) src WHERE src.id = s.id)"
+
+    async def _catch_up(self, job: Dict[str, Any], pool: asyncpg.Pool, shadow: VectorService) -> None:
+        """
+        Re-embed rows edited since the copy started (approvals, profile edits) until a pass finds
+        none, so the swap does not roll them back. Each pass only sees edits made during the last one,
+        and drops the shadow rows of participants that stopped being eligible after the copy read them.
+        """
+        since = job["catchup_since"]
+        batch_size = max(1, settings.SEARCH_REINDEX_BATCH_SIZE)
+        while True:
+            async with pool.acquire() as c:
+                pass_started = await c.fetchval("SELECT NOW()")
+                rows = await c.fetch(
+                    _SOURCE_SQL + " AND (pt.updated_at >= $1 OR pr.updated_at >= $1) ORDER BY pt.id", since
+                )
+                pruned = int((await c.execute(self._prune_sql())).split()[-1])
+                if pruned:
+                    logger.info(f"Re-index job {job['id']}: dropped {pruned} participant(s) no longer eligible from the shadow table.")
+            for start in range(0, len(rows), batch_size):
+                job["skipped"] += await self._index_batch(rows[start:start + batch_size], shadow)
+            async with pool.acquire() as c:
+                await c.execute(
+                    "UPDATE search_reindex_jobs SET catchup_since = $2, skipped = $3, updated_at = NOW() WHERE id = $1",
+                    job["id"], pass_started, job["skipped"],
+                )
+            job["catchup_since"] = since = pass_started
+            if not rows:
+                return
+
+    @staticmethod
+    def _edited_sql() -> str:
+        """Participants edited since $1, eligible or not: approvals, profile edits, deactivations."""
+        return (
+            "SELECT count(*) FROM participants pt LEFT JOIN producers pr ON pr.id = pt.id "
+            "WHERE pt.updated_at >= $1 OR pr.updated_at >= $1"
+        )
+
+    async def _index_batch(self, rows: List[asyncpg.Record], shadow: VectorService) -> int:
+        """
+        Write `rows` to the shadow table. Embeddings already stored for the same text and model,
+        in the live table or by an earlier pass into the shadow, are copied instead of recomputed.
+        Returns how many rows reused an embedding.
+        """
+        ids = [r["id"] for r in rows]
+        stored = {**await self._vectors().fingerprints(ids, with_embedding=True), **await shadow.fingerprints(ids, with_embedding=True)}
+        texts = [_text_to_embed(r["ai_profile"]) for r in rows]
+        digests = [_content_hash(text) for text in texts]
+        vectors = [
+            stored[r["id"]]["embedding"]
+            if r["id"] in stored and stored[r["id"]]["content_hash"] == digest and stored[r["id"]]["embedding_model"] == shadow.model
+            else None
+            for r, digest in zip(rows, digests)
+        ]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            for i, vector in zip(missing, await embedding_service.get_embeddings([texts[i] for i in missing])):
+                vectors[i] = vector
+        await shadow.upsert_many([
+            (
+                r["id"],
+                vector,
+                _build_metadata(
+                    r["id"], r["region"], json.loads(r["certifications"]), json.loads(r["primary_crops"]),
+                    json.loads(r["coordinates"]) if r["coordinates"] else None,
+                ),
+                r["ai_profile"],
+                digest,
+            )
+            for r, vector, digest in zip(rows, vectors, digests)
+        ])
+        # Chunks are keyed by participant, outside the swapped table, so they are refreshed in place
+        await _index_chunks([(r["id"], r["ai_profile"]) for r in rows], self._vectors())
+        return len(rows) - len(missing)
+
+    async def _swap(self, job: Dict[str, Any], pool: asyncpg.Pool, shadow: VectorService) -> None:
+        """
+        Build the live table's secondary indexes on the shadow (after loading, which is much
+        faster than maintaining them row by row), then replace the live table in one transaction.
+        Edits made while the indexes were built get a last catch-up; the transaction checks under
+        its lock that none came after it, and catches up again otherwise. Index writes follow the
+        participant edits, so writes to the live table are re-read from the source, not lost.
+        """
+        async with pool.acquire() as conn:
+            indexes = await conn.fetch(
+                "SELECT i.relname AS name, pg_get_indexdef(x.indexrelid) AS definition FROM pg_index x "
+                "JOIN pg_class i ON i.oid = x.indexrelid "
+                "WHERE x.indrelid = $1::regclass AND NOT x.indisprimary "
+                "AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)",
+                self.table,
+            )
+            shadow_indexes = []
+            for ix in indexes:
+                name = f"{ix['name']}{SHADOW_SUFFIX}"
+                definition = ix["definition"].replace(f"INDEX {ix['name']} ON", f"INDEX IF NOT EXISTS {name} ON", 1)
+                definition = definition.replace(f" ON public.{self.table} ", f" ON public.{self.shadow_table} ", 1)
+                definition = definition.replace(f" ON {self.table} ", f" ON {self.shadow_table} ", 1)
+                await conn.execute(definition)
+                shadow_indexes.append((name, ix["name"]))
+            await conn.execute(f"ANALYZE {self.shadow_table}")
+            constraints = await conn.fetch(
+                "SELECT conname FROM pg_constraint WHERE conrelid = $1::regclass", self.shadow_table
+            )
+            for _ in range(3):
+                await self._catch_up(job, pool, shadow)
+                try:
+                    async with conn.transaction():
+                        await conn.execute(f"LOCK TABLE {self.table} IN ACCESS EXCLUSIVE MODE")
+                        edited = await conn.fetchval(self._edited_sql(), job["catchup_since"])
+                        if edited:
+                            raise OutOfSync(edited)
+                        await conn.execute(f"DROP TABLE {self.table}")
+                        await conn.execute(f"ALTER TABLE {self.shadow_table} RENAME TO {self.table}")
+                        for shadow_name, live_name in shadow_indexes:
+                            await conn.execute(f'ALTER INDEX "{shadow_name}" RENAME TO "{live_name}"')
+                        for c in constraints:
+                            name = c["conname"]
+                            if name.endswith(SHADOW_SUFFIX):
+                                await conn.execute(
+                                    f'ALTER TABLE {self.table} RENAME CONSTRAINT "{name}" TO "{name[:-len(SHADOW_SUFFIX)]}"'
+                                )
+                    return
+                except OutOfSync as e:
+                    logger.info(f"Re-index job {job['id']}: {e} participant(s) changed before the swap; catching up again.")
+            raise RuntimeError("Participants kept changing before the swap; resume the job when writes are quieter.")
+
+
+reindex_service = ReindexService()
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import logging
+from typing import Any, Dict, Optional
+from src.core.config import settings
+from src.database.redis import get_redis
+from src.services.embedding_cache import LRUTTLCache, normalize_query
+
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "search:results:version"
+
+
+class ResultCache:
+    """
+    Two-tier cache of search result pages keyed by (normalized request, index version).
+
+    Every write to the vector store calls `invalidate`, which bumps the index version: a
+    process-local counter plus a shared one in Redis, so a write on any replica retires the
+    pages cached by all of them. Redis files pages under the shared counter alone, so every
+    replica finds the pages any of them stored; the local tier adds the local counter, which is
+    the whole version without Redis. Entries are never deleted on a write, they simply stop
+    being looked up and age out. A lookup reads the version first and a miss stores its page
+    under that version, so a page computed while a write lands is filed under the old version
+    and never served. When the shared version cannot be read the cache is bypassed, not trusted.
+
+    The guarantee covers the ranking only, which nothing but a vector-store write changes.
+    Profile fields (`include`) are edited by other services without bumping the version, so
+    pages are cached as (id, score) and the search routes re-read the fields on every hit
+    (VectorService.revalidate); an edit there shows at once, not after the TTL.
+    """
+
+    def __init__(self, maxsize: Optional[int] = None, ttl: Optional[int] = None, use_redis: Optional[bool] = None, enabled: Optional[bool] = None):
+        self.enabled = settings.SEARCH_RESULT_CACHE_ENABLED if enabled is None else enabled
+        self.ttl = int(ttl if ttl is not None else settings.SEARCH_RESULT_CACHE_TTL)
+        self.local = LRUTTLCache(maxsize if maxsize is not None else settings.SEARCH_RESULT_CACHE_SIZE, self.ttl)
+        self.use_redis = settings.SEARCH_RESULT_CACHE_REDIS if use_redis is None else use_redis
+        self.local_version = 0
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.invalidations = 0
+        self.redis_errors = 0
+
+    def _redis(self):
+        return get_redis() if self.use_redis else None
+
+    @staticmethod
+    def request_key(request: Dict[str, Any]) -> str:
+        """Digest of a search request with its query text normalized and its fields in a fixed order."""
+        normalized = {**request, "query": normalize_query(request.get("query") or "")}
+        payload = json.dumps({"model": settings.SEARCH_EMBEDDING_MODEL, **normalized}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def version(self) -> Optional[str]:
+        """Current index version, or None when the cache must be bypassed."""
+        if not self.enabled:
+            return None
+        client = self._redis()
+        if client is None:
+            return f"{self.local_version}"
+        try:
+            shared = await client.get(VERSION_KEY)
+        except Exception as e:
+            self.redis_errors += 1
+            self.bypassed += 1
+            logger.warning(f"Result cache version read failed: {e}")
+            return None
+        return f"{int(shared or 0)}.{self.local_version}"
+
+    async def invalidate(self) -> None:
+        """Bump the index version; called after every write to the vector store."""
+        self.local_version += 1
+        self.invalidations += 1
+        client = self._redis()
+        if client is not None:
+            try:
+                await client.incr(VERSION_KEY)
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"Result cache version bump failed; other replicas may serve pages for up to {self.ttl}s: {e}")
+
+    @staticmethod
+    def _key(request_key: str, version: str) -> str:
+        return f"search:results:{version}:{request_key}"
+
+    @classmethod
+    def _shared_key(cls, request_key: str, version: str) -> str:
+        return cls._key(request_key, version.split(".", 1)[0])
+
+    async def get(self, request_key: str, version: Optional[str]) -> Optional[Any]:
+        if version is None:
+            return None
+        key = self._key(request_key, version)
+        results = self.local.get(key)
+        if results is not None:
+            self.local_hits += 1
+            return results
+        client = self._redis()
+        if client is not None:
+            try:
+                raw = await client.get(self._shared_key(request_key, version))
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"Result cache Redis read failed: {e}")
+                raw = None
+            if raw is not None:
+                results = json.loads(raw)
+                self.local.set(key, results)
+                self.redis_hits += 1
+                return results
+        self.misses += 1
+        return None
+
+    async def set(self, request_key: str, version: Optional[str], results: Any) -> None:
+        if version is None:
+            return
+        key = self._key(request_key, version)
+        self.local.set(key, results)
+        client = self._redis()
+        if client is not None:
+            try:
+                await client.set(self._shared_key(request_key, version), json.dumps(results), ex=self.ttl)
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"Result cache Redis write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.local_hits + self.redis_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "local_size": len(self.local),
+            "local_maxsize": self.local.maxsize,
+            "ttl_seconds": self.ttl,
+            "redis_enabled": self._redis() is not None,
+            "local_version": self.local_version,
+            "invalidations": self.invalidations,
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "redis_errors": self.redis_errors,
+            "hit_ratio": (self.local_hits + self.redis_hits) / lookups if lookups else 0.0,
+        }
+
+
+result_cache = ResultCache()
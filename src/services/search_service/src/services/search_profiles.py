@@ -0,0 +1,63 @@
+"""
+Named recall/latency trade-offs for the ANN scan ("fast", "balanced", "exhaustive").
+
+A profile sets how much of the index one search walks: hnsw.ef_search (candidate list size of
+the HNSW graph walk) and ivfflat.probes (IVF lists scanned). VectorService applies them with
+SET LOCAL inside the search transaction, so they never leak to other statements on the pooled
+connection. SEARCH_PROFILES (JSON) overrides or adds profiles, e.g.
+{"balanced": {"ef_search": 80}, "nightly": {"ef_search": 600, "probes": 60}}.
+"""
+import json
+from typing import Dict, NamedTuple, Optional
+from src.core.config import settings
+
+# pgvector accepts ef_search up to 1000
+MAX_EF_SEARCH = 1000
+
+
+class SearchProfile(NamedTuple):
+    ef_search: int
+    probes: int
+
+
+DEFAULT_PROFILES: Dict[str, SearchProfile] = {
+    # pgvector's own defaults: what every search used before profiles existed
+    "fast": SearchProfile(ef_search=40, probes=1),
+    "balanced": SearchProfile(ef_search=100, probes=10),
+    # Every list of an IVF index sized for up to 100k rows, i.e. exact for ivfflat there
+    "exhaustive": SearchProfile(ef_search=400, probes=100),
+}
+
+
+def load_profiles(raw: Optional[str] = None) -> Dict[str, SearchProfile]:
+    """DEFAULT_PROFILES with SEARCH_PROFILES applied on top; a partial entry keeps the other defaults."""
+    raw = settings.SEARCH_PROFILES if raw is None else raw
+    profiles = dict(DEFAULT_PROFILES)
+    if not raw:
+        return profiles
+    try:
+        overrides = json.loads(raw)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"SEARCH_PROFILES is not valid JSON: {e}") from e
+    if not isinstance(overrides, dict):
+        raise ValueError("SEARCH_PROFILES must map profile names to {\"ef_search\": .., \"probes\": ..}.")
+    for name, values in overrides.items():
+        if not isinstance(values, dict) or set(values) - set(SearchProfile._fields):
+            raise ValueError(f"Search profile '{name}' takes only {list(SearchProfile._fields)}.")
+        base = profiles.get(name, DEFAULT_PROFILES["balanced"])
+        profile = base._replace(**{key: int(value) for key, value in values.items()})
+        if not 1 <= profile.ef_search <= MAX_EF_SEARCH or profile.probes < 1:
+            raise ValueError(f"Search profile '{name}' needs 1 <= ef_search <= {MAX_EF_SEARCH} and probes >= 1.")
+        profiles[name] = profile
+    return profiles
+
+
+def resolve(name: Optional[str]) -> str:
+    """The profile name a search runs with: `name`, or SEARCH_DEFAULT_PROFILE. Raises ValueError when unknown."""
+    name = name or settings.SEARCH_DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown search profile '{name}'. Expected one of {sorted(PROFILES)}")
+    return name
+
+
+PROFILES = load_profiles()
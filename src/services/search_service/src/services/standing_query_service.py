@@ -0,0 +1,242 @@
+"""
+Standing queries: saved searches that are matched against participants as they are indexed.
+
+A saved search keeps its query embedding, filters and minimum score in `search_saved_searches`,
+which has an ANN index of its own. When indexing writes new participant vectors, `notify` runs
+the search in reverse: every new vector probes that index for its SEARCH_STANDING_CANDIDATES
+nearest saved searches, all vectors of a batch in one LATERAL statement, so the cost of a new
+participant grows with the index depth, not with the number of saved searches. Candidates
+above their search's min_score whose filters accept the participant's metadata become rows of
+`search_notifications`, at most one per (saved search, participant).
+"""
+import json
+import logging
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+import asyncpg
+from src.core.config import settings
+from src.services.embedding_service import embedding_service
+from src.services.filter_compiler import compile_filters, match_filters
+from src.services.vector_service import VectorService, vector_service
+
+
+logger = logging.getLogger(__name__)
+
+
+def _ddl(service: VectorService) -> List[str]:
+    dim = service.dimension
+    return [
+        f"""
+        CREATE TABLE IF NOT EXISTS search_saved_searches (
+          id TEXT PRIMARY KEY,
+          owner_id TEXT NOT NULL REFERENCES participants(id) ON DELETE CASCADE,
+          query TEXT NOT NULL,
+          filters JSONB,
+          min_score DOUBLE PRECISION NOT NULL,
+          embedding vector({dim}) NOT NULL,
+          created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_search_saved_searches_owner ON search_saved_searches (owner_id)",
+        # Same operator class as the search index: the reverse probe orders by the search metric
+        f"""
+        CREATE INDEX IF NOT EXISTS idx_search_saved_searches_vec_hnsw_{service.metric_name}
+        ON search_saved_searches USING hnsw (embedding {service.metric.opclass})
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS search_notifications (
+          id BIGSERIAL PRIMARY KEY,
+          saved_search_id TEXT NOT NULL REFERENCES search_saved_searches(id) ON DELETE CASCADE,
+          owner_id TEXT NOT NULL,
+          participant_id TEXT NOT NULL REFERENCES participants(id) ON DELETE CASCADE,
+          score DOUBLE PRECISION NOT NULL,
+          created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+          read_at TIMESTAMPTZ,
+          UNIQUE (saved_search_id, participant_id)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_search_notifications_owner ON search_notifications (owner_id, created_at DESC)",
+    ]
+
+
+def select_matches(candidates: List[Dict[str, Any]], metadata: Dict[str, Dict[str, Any]]) -> List[Tuple[str, str, str, float]]:
+    """
+    (saved_search_id, owner_id, participant_id, score) of the probe candidates that clear their
+    saved search's min_score and filters, never notifying owners about themselves.
+    """
+    matches = []
+    for c in candidates:
+        if c["score"] < c["min_score"] or c["owner_id"] == c["participant_id"]:
+            continue
+        filters = json.loads(c["filters"]) if isinstance(c["filters"], str) else c["filters"]
+        if match_filters(filters, metadata.get(c["participant_id"]) or {}):
+            matches.append((c["saved_search_id"], c["owner_id"], c["participant_id"], float(c["score"])))
+    return matches
+
+
+class StandingQueryService:
+    def __init__(self, target: Optional[VectorService] = None):
+        self.target = target
+        self._ready = False
+
+    def _vectors(self) -> VectorService:
+        target = self.target or vector_service
+        if not isinstance(target, VectorService):
+            raise RuntimeError("Saved searches need the pgvector backend (SEARCH_VECTOR_BACKEND=pgvector).")
+        return target
+
+    @property
+    def enabled(self) -> bool:
+        return settings.SEARCH_STANDING_QUERIES_ENABLED and isinstance(self.target or vector_service, VectorService)
+
+    async def _pool(self) -> asyncpg.Pool:
+        service = self._vectors()
+        pool = await service._pool_or_create()
+        if not self._ready:
+            async with pool.acquire() as conn:
+                for ddl in _ddl(service):
+                    await conn.execute(ddl)
+            self._ready = True
+        return pool
+
+    def _probe_sql(self, candidates: int) -> str:
+        """The `candidates` saved searches nearest to each staged vector, best first."""
+        metric = self._vectors().metric
+        distance = f"s.embedding {metric.operator} p.embedding"
+        return f"""
+            SELECT p.id AS participant_id, s.id AS saved_search_id, s.owner_id, s.filters, s.min_score, s.score
+            FROM standing_probe p
+            CROSS JOIN LATERAL (
+                SELECT s.id, s.owner_id, s.filters, s.min_score, {metric.score_sql.format(distance=distance)} AS score
+                FROM search_saved_searches s
+                ORDER BY {distance} ASC
+                LIMIT {int(candidates)}
+            ) s
+        """
+
+    # --- Saved searches ---
+
+    async def create(self, owner_id: str, query: str, filters: Optional[Dict[str, Any]] = None, min_score: Optional[float] = None) -> Dict[str, Any]:
+        compile_filters(filters)  # a bad filter fails now, not on every later index write
+        # migration_service builds on index_service, which imports this module
+        from src.services.migration_service import SAVED_SEARCH_COLUMN, migration_service
+
+        embedding = await embedding_service.get_query_embedding(query)
+        columns = ["id", "owner_id", "query", "filters", "min_score", "embedding"]
+        values = [
+            uuid.uuid4().hex, owner_id, query, json.dumps(filters) if filters else None,
+            settings.SEARCH_STANDING_MIN_SCORE if min_score is None else float(min_score), embedding,
+        ]
+        # During an embedding migration the target version's embedding is written too: the
+        # column is checked NOT NULL before the cut-over, which then only renames it
+        mirror = migration_service.mirror()
+        if mirror is not None:
+            columns.append(SAVED_SEARCH_COLUMN)
+            values.append(await mirror[1].get_query_embedding(query))
+        pool = await self._pool()
+        async with pool.acquire() as conn:
+            try:
+                row = await conn.fetchrow(self._insert_sql(columns), *values)
+            except asyncpg.UndefinedColumnError:
+                # The migration was cut over or cancelled a moment ago, before this replica heard of it
+                row = await conn.fetchrow(self._insert_sql(columns[:6]), *values[:6])
+        return self._saved(row)
+
+    @staticmethod
+    def _insert_sql(columns: List[str]) -> str:
+        params = ["$1", "$2", "$3", "$4::jsonb", "$5"] + [f"${n}::vector" for n in range(6, len(columns) + 1)]
+        return f"""
+            INSERT INTO search_saved_searches ({", ".join(columns)})
+            VALUES ({", ".join(params)})
+            RETURNING id, owner_id, query, filters, min_score, created_at
+        """
+
+    async def saved_searches(self, owner_id: str) -> List[Dict[str, Any]]:
+        pool = await self._pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT id, owner_id, query, filters, min_score, created_at FROM search_saved_searches "
+                "WHERE owner_id = $1 ORDER BY created_at",
+                owner_id,
+            )
+        return [self._saved(r) for r in rows]
+
+    async def delete(self, saved_search_id: str) -> bool:
+        pool = await self._pool()
+        async with pool.acquire() as conn:
+            res = await conn.execute("DELETE FROM search_saved_searches WHERE id = $1", saved_search_id)
+        return res.split()[-1] != "0"
+
+    @staticmethod
+    def _saved(row) -> Dict[str, Any]:
+        saved = dict(row)
+        if isinstance(saved["filters"], str):
+            saved["filters"] = json.loads(saved["filters"])
+        return saved
+
+    # --- Notifications ---
+
+    async def notify(self, rows: List[Tuple[str, Any, Dict[str, Any]]]) -> int:
+        """
+        Match newly written (participant_id, embedding, metadata) rows against every saved
+        search and record the hits. Returns the number of new notifications.
+        """
+        if not rows or not self.enabled:
+            return 0
+        latest = {_id: (_id, embedding, metadata) for _id, embedding, metadata in rows}
+        candidates = settings.SEARCH_STANDING_CANDIDATES
+        pool = await self._pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("CREATE TEMP TABLE standing_probe (id TEXT, embedding vector) ON COMMIT DROP")
+                await conn.copy_records_to_table(
+                    "standing_probe", records=[(_id, embedding) for _id, embedding, _ in latest.values()], columns=["id", "embedding"]
+                )
+                await conn.execute(f"SET LOCAL hnsw.ef_search = {min(int(candidates), 1000)}")
+                probed = await conn.fetch(self._probe_sql(candidates))
+                matches = select_matches([dict(r) for r in probed], {_id: metadata for _id, _, metadata in latest.values()})
+                if not matches:
+                    return 0
+                inserted = await conn.fetch(
+                    """
+                    INSERT INTO search_notifications (saved_search_id, owner_id, participant_id, score)
+                    SELECT * FROM unnest($1::text[], $2::text[], $3::text[], $4::float8[])
+                    ON CONFLICT (saved_search_id, participant_id) DO NOTHING
+                    RETURNING id
+                    """,
+                    *[list(column) for column in zip(*matches)],
+                )
+        if inserted:
+            logger.info(f"Saved searches: {len(inserted)} new notification(s) for {len(latest)} indexed participant(s).")
+        return len(inserted)
+
+    async def notifications(self, owner_id: str, unread_only: bool = False, limit: int = 50) -> List[Dict[str, Any]]:
+        """An owner's notifications, newest first, for participants that are still active."""
+        pool = await self._pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT n.id, n.saved_search_id, n.participant_id, n.score, n.created_at, n.read_at
+                FROM search_notifications n
+                JOIN participants p ON p.id = n.participant_id AND p.status = 'active'
+                WHERE n.owner_id = $1 AND (NOT $2 OR n.read_at IS NULL)
+                ORDER BY n.created_at DESC, n.id DESC
+                LIMIT $3
+                """,
+                owner_id, unread_only, int(limit),
+            )
+        return [dict(r) for r in rows]
+
+    async def mark_read(self, owner_id: str, ids: Optional[List[int]] = None) -> int:
+        """Mark the listed notifications of `owner_id` (all of them when `ids` is None) as read."""
+        pool = await self._pool()
+        async with pool.acquire() as conn:
+            res = await conn.execute(
+                "UPDATE search_notifications SET read_at = NOW() "
+                "WHERE owner_id = $1 AND read_at IS NULL AND ($2::bigint[] IS NULL OR id = ANY($2::bigint[]))",
+                owner_id, ids,
+            )
+        return int(res.split()[-1])
+
+
+standing_query_service = StandingQueryService()
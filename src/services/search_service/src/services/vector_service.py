@@ -1,64 +1,1165 @@
-import asyncio
-from typing import List, Optional, Dict, Any
+import itertools
+import json
+import logging
+import math
+from typing import List, Optional, Dict, Any, NamedTuple, Tuple
 import asyncpg
+import numpy as np
 from src.core.config import settings
+from src.database.pgvector_codec import register_vector
+from src.services import facets as facet_sql
+from src.services import search_profiles
+from src.services.embedding_cache import LRUTTLCache
+from src.services.filter_compiler import compile_filters, range_filter_fields
+from src.services.geo import GEO_FIELD, coordinate_sql, haversine_sql
+from src.services.result_cache import result_cache
+
+
+logger = logging.getLogger(__name__)
+
+
+class DistanceMetric(NamedTuple):
+    operator: str  # pgvector distance operator used in ORDER BY
+    opclass: str  # operator class the ANN index must be built with for the operator to use it
+    score_sql: str  # similarity derived from the distance, higher is better
+
+
+METRICS: Dict[str, DistanceMetric] = {
+    "cosine": DistanceMetric("<=>", "vector_cosine_ops", "1 - ({distance})"),
+    # <#> returns the *negative* inner product so that ASC ordering is most-similar first
+    "inner_product": DistanceMetric("<#>", "vector_ip_ops", "-({distance})"),
+    "l2": DistanceMetric("<->", "vector_l2_ops", "-({distance})"),
+}
+
+INDEX_TYPES = ("hnsw", "ivfflat")
+# SEARCH_INDEX_TYPE=auto: IVFFlat until the table reaches SEARCH_MAINTENANCE_HNSW_ROWS rows, HNSW from then on
+AUTO_INDEX = "auto"
+
+# Storage of the ANN candidate pass. The table always keeps full-precision vectors; reduced modes
+# index an expression over them, so switching needs no rewrite, and rescore candidates exactly.
+PRECISIONS = ("full", "half", "binary")
+
+# The query vector in every ranking statement; `similar` swaps in a stored participant's vector
+QUERY_VECTOR = "$1::vector"
+
+
+class Projection(NamedTuple):
+    sql: str  # expression over the ranked hit r, its embedding row e, producers pr and participants pt
+    is_json: bool = False
+
+
+_IMAGE_URL_RE = r"\.(jpe?g|png|gif|webp|bmp|tiff?)$"
+
+# Fields a search can return alongside each hit (`include`). Producers registered through
+# profile_service live in `producers`; other participant types keep the same keys in `participants.data`.
+PROJECTIONS: Dict[str, Projection] = {
+    "farm_name": Projection("COALESCE(pr.farm_name, pt.data ->> 'farm_name')"),
+    "region": Projection("COALESCE(pr.region, pt.data ->> 'region', e.metadata ->> 'region')"),
+    "country": Projection("COALESCE(pr.country, pt.data ->> 'country')"),
+    "participant_type": Projection("pt.type"),
+    "primary_crops": Projection("COALESCE(to_jsonb(pr.primary_crops), pt.data -> 'primary_crops', e.metadata -> 'primary_crops')", True),
+    "certifications": Projection("COALESCE(to_jsonb(pr.certifications), pt.data -> 'certifications', e.metadata -> 'certifications')", True),
+    "ai_profile_excerpt": Projection("left(COALESCE(e.document, pr.ai_profile), {excerpt_chars})"),
+    "thumbnails": Projection(
+        f"""(SELECT COALESCE(jsonb_agg(f.url ORDER BY f.priority DESC NULLS LAST, f.created_at), '[]'::jsonb)
+            FROM (SELECT url, priority, created_at FROM producer_files
+                  WHERE profile_id = r.id AND privacy = 'public' AND lower(url) ~ '{_IMAGE_URL_RE}'
+                  ORDER BY priority DESC NULLS LAST, created_at
+                  LIMIT {{thumbnails}}) f)""",
+        True,
+    ),
+}
+
+
+def ivfflat_lists(rows: int) -> int:
+    """IVFFlat list count for a table of `rows` rows: rows / 1000 up to 1M rows, sqrt(rows) beyond (pgvector's guidance)."""
+    if rows <= 1_000_000:
+        return max(10, int(rows) // 1000)
+    return int(math.sqrt(rows))
+
+
+def _plan_index_names(plan: Dict[str, Any]) -> List[str]:
+    """Collect every index name referenced anywhere in an EXPLAIN (FORMAT JSON) plan tree."""
+    names = [plan["Index Name"]] if "Index Name" in plan else []
+    for child in plan.get("Plans", []):
+        names.extend(_plan_index_names(child))
+    return names
 
 
 class VectorService:
-    def __init__(self):
+    # Stores per-section chunk embeddings next to the whole-profile ones (see src/services/chunker.py)
+    supports_chunks = True
+
+    def __init__(
+        self,
+        table: str = "participant_embeddings",
+        metric: Optional[str] = None,
+        index_type: Optional[str] = None,
+        precision: Optional[str] = None,
+        invalidate_results: bool = True,
+        dimension: Optional[int] = None,
+    ):
         self._pool: Optional[asyncpg.Pool] = None
+        self.table = table
+        self.chunk_table = f"{table}_chunks"
+        self.metric_name = (metric or settings.SEARCH_DISTANCE_METRIC).lower()
+        self.index_type = (index_type or settings.SEARCH_INDEX_TYPE).lower()
+        if self.metric_name not in METRICS:
+            raise ValueError(f"Unsupported distance metric '{self.metric_name}'. Expected one of {sorted(METRICS)}")
+        if self.index_type not in INDEX_TYPES + (AUTO_INDEX,):
+            raise ValueError(f"Unsupported vector index type '{self.index_type}'. Expected one of {list(INDEX_TYPES + (AUTO_INDEX,))}")
+        # With "auto" the concrete type is settled by ensure_index (and switched by index maintenance)
+        self.auto_index = self.index_type == AUTO_INDEX
+        if self.auto_index:
+            self.index_type = "ivfflat"
+        self.precision = (precision or settings.SEARCH_VECTOR_PRECISION).lower()
+        if self.precision not in PRECISIONS:
+            raise ValueError(f"Unsupported vector precision '{self.precision}'. Expected one of {list(PRECISIONS)}")
+        self.metric = METRICS[self.metric_name]
+        # Stored with every embedding; a row embedded by another model is never reused. Both follow
+        # the active embedding version (src/services/migration_service.py) once it is loaded.
+        self.model = settings.SEARCH_EMBEDDING_MODEL
+        self.dimension = int(dimension or settings.EMBEDDING_DIMENSION)
+        # Planner row estimates per filter shape; they only drift as the table grows
+        self._estimates = LRUTTLCache(maxsize=512, ttl=300)
+        # Whether the facet summary triggers are installed; a re-index swap drops them until ensure_facets
+        self._facet_summary = LRUTTLCache(maxsize=1, ttl=30)
+        # Whether document_tsv exists; db/init.sql creates it, tables built from an older one lack it
+        self._lexical = LRUTTLCache(maxsize=1, ttl=30)
+        # Writes retire cached search pages; off for tables that are not searched (re-index shadow)
+        self.invalidate_results = invalidate_results
+
+    @property
+    def index_name(self) -> str:
+        return self._index_name_for(self.table)
+
+    def _index_name_for(self, table: str, index_type: Optional[str] = None) -> str:
+        # Short suffixes: the re-index shadow appends "__reindex" and names stop at 63 bytes
+        index_type = index_type or self.index_type
+        if self.precision == "binary":
+            return f"idx_{table}_vec_{index_type}_bit"
+        suffix = "_f16" if self.precision == "half" else ""
+        return f"idx_{table}_vec_{index_type}_{self.metric_name}{suffix}"
+
+    @property
+    def index_opclass(self) -> str:
+        if self.precision == "half":
+            return self.metric.opclass.replace("vector_", "halfvec_", 1)
+        if self.precision == "binary":
+            return "bit_hamming_ops"
+        return self.metric.opclass
+
+    def _ann_key(self) -> Tuple[str, str, str]:
+        """(indexed expression, operator, query expression) of the ANN candidate pass."""
+        dim = self.dimension
+        if self.precision == "half":
+            return f"(embedding::halfvec({dim}))", self.metric.operator, f"{QUERY_VECTOR}::halfvec({dim})"
+        if self.precision == "binary":
+            return f"(binary_quantize(embedding)::bit({dim}))", "<~>", f"binary_quantize({QUERY_VECTOR})::bit({dim})"
+        return "embedding", self.metric.operator, QUERY_VECTOR
+
+    def rerank_candidates(self, limit: int) -> int:
+        """ANN rows fetched for `limit` results: oversampled when the pass is reduced-precision."""
+        if self.precision == "full" or not limit:
+            return int(limit)
+        return max(int(limit), math.ceil(int(limit) * settings.SEARCH_RERANK_OVERSAMPLE))
 
     async def _pool_or_create(self) -> asyncpg.Pool:
         if self._pool is None:
-            self._pool = await asyncpg.create_pool(settings.DATABASE_URL, min_size=1, max_size=10)
+            self._pool = await asyncpg.create_pool(
+                settings.DATABASE_URL, min_size=1, max_size=10, init=register_vector
+            )
         return self._pool
 
-    async def upsert(self, _id: str, embedding: List[float], metadata: Dict[str, Any]) -> None:
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    async def _written(self) -> None:
+        if self.invalidate_results:
+            await result_cache.invalidate()
+
+    def _distance_sql(self) -> str:
+        return f"embedding {self.metric.operator} {QUERY_VECTOR}"
+
+    def _nearest_sql(self, table: str, limit: int, columns: str = "id") -> str:
+        """
+        `columns` and the exact distance of the `limit` rows of `table` nearest to $1, in index
+        order. A reduced-precision pass walks the halfvec/binary index for rerank_candidates(limit)
+        rows, which are then rescored against their full-precision vectors.
+        """
+        distance = self._distance_sql()
+        if self.precision == "full":
+            return f"SELECT {columns}, {distance} AS distance FROM {table} ORDER BY {distance} ASC LIMIT {int(limit)}"
+        key, operator, probe = self._ann_key()
+        return f"""
+            SELECT {columns}, {distance} AS distance FROM (
+                SELECT {columns}, embedding FROM {table}
+                ORDER BY {key} {operator} {probe} ASC
+                LIMIT {self.rerank_candidates(limit)}
+            ) quantized
+            ORDER BY distance ASC
+            LIMIT {int(limit)}
+        """
+
+    def _ann_sql(self, conds: List[str], limit: int, strategy: str = "pre", candidates: int = 0) -> str:
+        """
+        (id, distance) of the `limit` nearest rows that satisfy `conds`.
+        "post" walks the ANN index for `candidates` rows and filters those; "pre" filters first
+        (through the metadata indexes) and ranks the survivors exactly. MATERIALIZED keeps the
+        planner from folding the filter back into an ANN scan that could come back short.
+        """
+        distance = self._distance_sql()
+        if not conds:
+            return self._nearest_sql(self.table, limit)
+        where = " AND ".join(conds)
+        if strategy == "post":
+            return f"""
+                SELECT id, distance FROM (
+                    {self._nearest_sql(self.table, candidates, "id, metadata")}
+                ) candidates
+                WHERE {where}
+                ORDER BY distance ASC
+                LIMIT {int(limit)}
+            """
+        return f"""
+            WITH filtered AS MATERIALIZED (
+                SELECT id, embedding FROM {self.table} WHERE {where}
+            )
+            SELECT id, {distance} AS distance FROM filtered
+            ORDER BY distance ASC
+            LIMIT {int(limit)}
+        """
+
+    def _search_sql(self, conds: List[str], top_k: int, strategy: str = "pre", candidates: int = 0) -> str:
+        return f"""
+            SELECT id, {self.metric.score_sql.format(distance="distance")} AS score
+            FROM ({self._ann_sql(conds, top_k, strategy, candidates)}) ann
+            ORDER BY distance ASC
+        """
+
+    def _similar_sql(self, conds: List[str], top_k: int, strategy: str = "pre", candidates: int = 0) -> str:
+        """
+        "More like this": (id, score) of the `top_k` rows nearest to the stored vector of
+        participant $1, excluding $1 itself. A scalar subquery reads that vector inside the
+        statement, so the ANN scan runs as usual and the vector never leaves the database.
+        """
+        probe = f"(SELECT embedding FROM {self.table} WHERE id = $1)"
+        ranked = self._search_sql(conds, top_k + 1, strategy, candidates).replace(QUERY_VECTOR, probe)
+        return f"""
+            SELECT id, score FROM ({ranked}) ranked
+            WHERE id <> $1 AND score IS NOT NULL
+            ORDER BY score DESC
+            LIMIT {int(top_k)}
+        """
+
+    def _chunk_sql(self, conds: List[str], top_k: int, strategy: str = "pre", candidates: int = 0, aggregate: str = "max", top_n: int = 3) -> str:
+        """
+        Multi-vector ranking: the nearest chunks pick the candidate participants, each scored by
+        its best chunk ("max", max-sim) or the mean of its best `top_n` chunks ("mean"). Filters
+        apply to the participant row; "pre" ranks the chunks of matching participants exactly.
+        """
+        distance = self._distance_sql()
+        limit = self.chunk_candidates(top_k)
+        where = " AND ".join(conds)
+        if not conds:
+            hits = self._nearest_sql(self.chunk_table, limit)
+        elif strategy == "post":
+            hits = f"""
+                SELECT c.id, c.distance FROM (
+                    {self._nearest_sql(self.chunk_table, max(int(candidates), limit))}
+                ) c
+                JOIN {self.table} USING (id)
+                WHERE {where}
+            """
+        else:
+            hits = f"""
+                WITH filtered AS MATERIALIZED (
+                    SELECT id FROM {self.table} WHERE {where}
+                )
+                SELECT id, {distance} AS distance FROM {self.chunk_table}
+                WHERE id IN (SELECT id FROM filtered)
+                ORDER BY distance ASC
+                LIMIT {limit}
+            """
+        score = self.metric.score_sql.format(distance="distance")
+        if aggregate == "max":
+            return f"""
+                SELECT id, max({score}) AS score FROM ({hits}) hits
+                GROUP BY id
+                ORDER BY score DESC
+                LIMIT {int(top_k)}
+            """
+        # A candidate's other chunks may have missed the ANN page; score all of them (by primary key)
+        # so the mean is over its real best `top_n`, not just the ones that happened to be fetched
+        return f"""
+            SELECT id, avg({score}) AS score
+            FROM (
+                SELECT id, distance, ROW_NUMBER() OVER (PARTITION BY id ORDER BY distance) AS rn
+                FROM (
+                    SELECT id, {distance} AS distance FROM {self.chunk_table}
+                    WHERE id IN (SELECT id FROM ({hits}) hits)
+                ) scored
+            ) ranked
+            WHERE rn <= {max(1, int(top_n))}
+            GROUP BY id
+            ORDER BY score DESC
+            LIMIT {int(top_k)}
+        """
+
+    def _hybrid_sql(self, where: List[str], top_k: int, first_param: int, strategy: str = "pre", candidates: int = 0) -> str:
+        """
+        Reciprocal-rank fusion of the ANN candidates and the full-text candidates in one statement.
+        Each leg is capped at `hybrid_candidates(top_k)` rows so both stay index-driven;
+        a row's fused score is sum(weight / (rrf_k + rank)) over the legs it appears in.
+        Parameters from `first_param`: query text, vector weight, lexical weight, rrf_k.
+        """
+        text_p, vec_w, lex_w, rrf_k = (f"${first_param + i}" for i in range(4))
+        leg = self.hybrid_candidates(top_k)
+        ts_config = settings.SEARCH_TEXT_SEARCH_CONFIG
+        lex_where = " AND ".join(["document_tsv @@ q.query"] + where)
+        return f"""
+            WITH vec AS (
+                SELECT id, ROW_NUMBER() OVER (ORDER BY ann.distance) AS rank
+                FROM ({self._ann_sql(where, leg, strategy, candidates)}) ann
+            ),
+            lex AS (
+                SELECT id, ROW_NUMBER() OVER (ORDER BY ts_rank_cd(document_tsv, q.query) DESC) AS rank
+                FROM {self.table}, websearch_to_tsquery('{ts_config}'::regconfig, {text_p}::text) AS q(query)
+                WHERE {lex_where}
+                ORDER BY rank
+                LIMIT {leg}
+            )
+            SELECT COALESCE(vec.id, lex.id) AS id,
+                   COALESCE({vec_w}::float8 / ({rrf_k}::int + vec.rank), 0)
+                 + COALESCE({lex_w}::float8 / ({rrf_k}::int + lex.rank), 0) AS score
+            FROM vec FULL OUTER JOIN lex ON vec.id = lex.id
+            ORDER BY score DESC
+            LIMIT {int(top_k)}
+        """
+
+    def _hydrate_sql(self, ranked_sql: str, include: List[str], with_embedding: bool = False) -> str:
+        """
+        Wrap a ranked (id, score) statement so each hit carries the `include` fields, joined
+        server-side by primary key. Saves the caller one profile lookup per hit.
+        `with_embedding` adds the stored vector, for reranking in-process.
+        """
+        columns = ["r.id", "r.score"] + [
+            PROJECTIONS[name].sql.format(
+                excerpt_chars=int(settings.SEARCH_EXCERPT_CHARS),
+                thumbnails=int(settings.SEARCH_THUMBNAILS_PER_RESULT),
+            ) + f" AS {name}"
+            for name in include
+        ]
+        if with_embedding:
+            columns.append("e.embedding")
+        columns = ",\n                   ".join(columns)
+        return f"""
+            SELECT {columns}
+            FROM ({ranked_sql}) r
+            JOIN {self.table} e ON e.id = r.id
+            LEFT JOIN producers pr ON pr.id = r.id
+            LEFT JOIN participants pt ON pt.id = r.id
+            ORDER BY r.score DESC
+        """
+
+    def _geo_blend_sql(self, ranked_sql: str, top_k: int, first_param: int) -> str:
+        """
+        Rescore a ranked (id, score) statement by similarity and distance decay, as in
+        geo.blended_score, and keep the best `top_k`. Parameters from `first_param`: latitude,
+        longitude, distance weight, decay scale in km.
+        """
+        lat_p, lon_p, weight, scale = (f"${first_param + i}::float8" for i in range(4))
+        lat, lon = coordinate_sql("g.metadata", GEO_FIELD)
+        distance = haversine_sql(lat, lon, lat_p, lon_p)
+        return f"""
+            SELECT r.id, (1 - {weight}) * r.score + {weight} * COALESCE(exp(-least({distance} / {scale}, 700)), 0) AS score
+            FROM ({ranked_sql}) r
+            JOIN {self.table} g ON g.id = r.id
+            ORDER BY score DESC
+            LIMIT {int(top_k)}
+        """
+
+    @staticmethod
+    def geo_candidates(top_k: int) -> int:
+        """Hits ranked by similarity alone that distance-weighted ranking reorders for a page of `top_k`."""
+        return max(int(top_k) * settings.SEARCH_GEO_OVERSAMPLE, 50)
+
+    @staticmethod
+    def hybrid_candidates(top_k: int) -> int:
+        return max(int(top_k) * settings.SEARCH_HYBRID_OVERSAMPLE, 20)
+
+    @staticmethod
+    def chunk_candidates(top_k: int) -> int:
+        """Chunk hits fetched for `top_k` participants; a participant usually owns several of them."""
+        return max(int(top_k) * settings.SEARCH_CHUNK_CANDIDATES, 40)
+
+    async def _estimate_matches(self, conn: asyncpg.Connection, filters: Dict[str, Any]) -> Tuple[float, float]:
+        """Planner estimate of (rows matching `filters`, rows in table), cached per filter shape."""
+        key = json.dumps(filters, sort_keys=True)
+        cached = self._estimates.get(key)
+        if cached is not None:
+            return cached
+        conds, args = compile_filters(filters)
+        raw = await conn.fetchval(
+            f"EXPLAIN (FORMAT JSON) SELECT 1 FROM {self.table} WHERE {' AND '.join(conds)}", *args
+        )
+        matching = float((json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]["Plan Rows"])
+        total = float(await conn.fetchval("SELECT reltuples FROM pg_class WHERE oid = $1::regclass", self.table) or 0)
+        self._estimates.set(key, (matching, total))
+        return matching, total
+
+    async def _plan_filtering(self, conn: asyncpg.Connection, filters: Optional[Dict[str, Any]], limit: int, strategy: str) -> Tuple[str, int]:
+        """
+        Pick pre- or post-filtering for an ANN leg returning `limit` rows.
+        Post-filtering needs roughly limit / selectivity ANN candidates to still fill the page;
+        when that is more than SEARCH_POSTFILTER_MAX_CANDIDATES, or the filter matches few
+        enough rows to rank them exactly, filter first.
+        """
+        if not filters or strategy == "pre":
+            return "pre", 0
+        matching, total = await self._estimate_matches(conn, filters)
+        if total > 0:
+            selectivity = min(1.0, matching / total)
+            candidates = math.ceil(limit * settings.SEARCH_POSTFILTER_OVERSAMPLE / max(selectivity, 1e-9))
+            candidates = max(candidates, limit)
+        else:
+            # Never analyzed: no basis for an oversampling factor
+            candidates = settings.SEARCH_POSTFILTER_MAX_CANDIDATES
+        if strategy == "post":
+            return "post", min(candidates, settings.SEARCH_POSTFILTER_MAX_CANDIDATES)
+        if total <= 0 or matching <= settings.SEARCH_PREFILTER_MAX_ROWS or candidates > settings.SEARCH_POSTFILTER_MAX_CANDIDATES:
+            return "pre", 0
+        return "post", candidates
+
+    def scan_settings_sql(self, profile: Optional[str] = None, ann_rows: int = 0, index_types: Optional[Tuple[str, ...]] = None) -> str:
+        """
+        SET LOCAL statements for the profile's scan parameters. HNSW returns at most
+        hnsw.ef_search rows per scan, so it is raised to `ann_rows` when a statement needs more.
+        With SEARCH_INDEX_TYPE=auto both are set: another replica may have switched the index type.
+        """
+        params = search_profiles.PROFILES[search_profiles.resolve(profile)]
+        index_types = index_types or (INDEX_TYPES if self.auto_index else (self.index_type,))
+        statements = []
+        if "hnsw" in index_types:
+            statements.append(f"SET LOCAL hnsw.ef_search = {min(max(params.ef_search, int(ann_rows)), search_profiles.MAX_EF_SEARCH)}")
+        if "ivfflat" in index_types:
+            statements.append(f"SET LOCAL ivfflat.probes = {int(params.probes)}")
+        return "; ".join(statements)
+
+    def ann_settings(self, profile: Optional[str] = None) -> Dict[str, Any]:
+        """The search profile a search runs with and the index parameter it sets, for reporting."""
+        name = search_profiles.resolve(profile)
+        params = search_profiles.PROFILES[name]
+        if self.index_type == "hnsw":
+            return {"profile": name, "index_type": "hnsw", "ef_search": params.ef_search}
+        return {"profile": name, "index_type": "ivfflat", "probes": params.probes}
+
+    async def _fetch_ann(self, conn: asyncpg.Connection, sql: str, args: List[Any], ann_rows: int, profile: Optional[str] = None):
+        """
+        Run an ANN statement with the search profile's scan parameters (scan_settings_sql), SET
+        LOCAL for this transaction only. Statements that never touch the ANN index (`ann_rows`
+        0: exact ranking of pre-filtered rows) run as they are.
+        """
+        if not ann_rows:
+            return await conn.fetch(sql, *args)
+        async with conn.transaction():
+            await conn.execute(self.scan_settings_sql(profile, ann_rows))
+            return await conn.fetch(sql, *args)
+
+    async def upsert(
+        self, _id: str, embedding: List[float], metadata: Dict[str, Any], document: Optional[str] = None, content_hash: Optional[str] = None
+    ) -> None:
         pool = await self._pool_or_create()
-        values = "[" + ",".join(str(float(x)) for x in embedding) + "]"
         async with pool.acquire() as conn:
             await conn.execute(
-                """
-                INSERT INTO participant_embeddings (id, embedding, metadata)
-                VALUES ($1, $2::vector, $3::jsonb)
+                f"""
+                INSERT INTO {self.table} (id, embedding, metadata, document, content_hash, embedding_model)
+                VALUES ($1, $2::vector, $3::jsonb, $4, $5, $6)
                 ON CONFLICT (id) DO UPDATE SET
                   embedding = EXCLUDED.embedding,
-                  metadata = EXCLUDED.metadata
+                  metadata = EXCLUDED.metadata,
+                  document = EXCLUDED.document,
+                  content_hash = EXCLUDED.content_hash,
+                  embedding_model = EXCLUDED.embedding_model
                 """,
                 _id,
-                values,
+                embedding,
                 json.dumps(metadata),
+                document,
+                content_hash,
+                self.model,
             )
+        await self._written()
 
-    async def query(self, embedding: List[float], top_k: int, filters: Optional[Dict[str, Any]] = None):
+    async def upsert_many(self, rows: List[Tuple[str, List[float], Dict[str, Any], Optional[str], Optional[str]]]) -> int:
+        """
+        Bulk upsert (id, embedding, metadata, document, content_hash) rows: COPY into a
+        transaction-scoped staging table, then a single INSERT ... SELECT ... ON CONFLICT.
+        """
+        # ON CONFLICT cannot touch the same row twice in one statement; the last occurrence wins
+        latest = {row[0]: row for row in rows}
+        records = [
+            (_id, embedding, json.dumps(metadata), document, content_hash)
+            for _id, embedding, metadata, document, content_hash in latest.values()
+        ]
+        if not records:
+            return 0
         pool = await self._pool_or_create()
-        values = "[" + ",".join(str(float(x)) for x in embedding) + "]"
-        where = []
-        args = [values]
-        
-        # Generic JSONB filtering using @> (contains) or other operators
-        if filters:
-            # We assume filters is a dict that should match against metadata
-            where.append("metadata @> $" + str(len(args) + 1) + "::jsonb")
-            args.append(json.dumps(filters))
-            
-        where_sql = (" WHERE " + " AND ".join(where)) if where else ""
-        sql = f"""
-            SELECT id, 1 - (embedding <#> $1::vector) AS score
-            FROM participant_embeddings
-            {where_sql}
-            ORDER BY embedding <#> $1::vector ASC
-            LIMIT {int(top_k)}
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    "CREATE TEMP TABLE embeddings_stage "
+                    "(id TEXT, embedding vector, metadata TEXT, document TEXT, content_hash TEXT) ON COMMIT DROP"
+                )
+                await conn.copy_records_to_table(
+                    "embeddings_stage", records=records, columns=["id", "embedding", "metadata", "document", "content_hash"]
+                )
+                await conn.execute(
+                    f"""
+                    INSERT INTO {self.table} (id, embedding, metadata, document, content_hash, embedding_model)
+                    SELECT id, embedding, metadata::jsonb, document, content_hash, $1 FROM embeddings_stage
+                    ON CONFLICT (id) DO UPDATE SET
+                      embedding = EXCLUDED.embedding,
+                      metadata = EXCLUDED.metadata,
+                      document = EXCLUDED.document,
+                      content_hash = EXCLUDED.content_hash,
+                      embedding_model = EXCLUDED.embedding_model
+                    """,
+                    self.model,
+                )
+        await self._written()
+        return len(records)
+
+    async def fingerprints(self, ids: List[str], with_embedding: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        What is stored for `ids`: content_hash, embedding_model and metadata (plus the embedding
+        when asked), so callers can skip re-embedding text that has not changed.
+        """
+        if not ids:
+            return {}
+        columns = "id, content_hash, embedding_model, metadata" + (", embedding" if with_embedding else "")
+        pool = await self._pool_or_create()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(f"SELECT {columns} FROM {self.table} WHERE id = ANY($1::text[])", list(ids))
+        return {
+            r["id"]: {**dict(r), "metadata": json.loads(r["metadata"]) if isinstance(r["metadata"], str) else r["metadata"]}
+            for r in rows
+        }
+
+    async def update_metadata_many(self, rows: List[Tuple[str, Dict[str, Any]]]) -> int:
+        """Replace only the metadata of existing (id, metadata) rows, leaving their embeddings alone."""
+        if not rows:
+            return 0
+        pool = await self._pool_or_create()
+        async with pool.acquire() as conn:
+            res = await conn.execute(
+                f"""
+                UPDATE {self.table} t SET metadata = u.metadata::jsonb
+                FROM unnest($1::text[], $2::text[]) AS u(id, metadata)
+                WHERE t.id = u.id
+                """,
+                [_id for _id, _ in rows],
+                [json.dumps(metadata) for _, metadata in rows],
+            )
+        await self._written()
+        return int(res.split()[-1])
+
+    async def replace_chunks(self, rows: List[Tuple[str, List[Tuple[str, str, List[float]]], str]]) -> int:
+        """
+        Replace the chunk embeddings of (id, [(heading, content, embedding)], content_hash) rows.
+        The old chunks are deleted and the new ones COPYed in one transaction. Returns the number
+        of chunks written.
         """
+        latest = {row[0]: row for row in rows}
+        records = [
+            (_id, chunk_no, heading, content, embedding, content_hash, self.model)
+            for _id, chunks, content_hash in latest.values()
+            for chunk_no, (heading, content, embedding) in enumerate(chunks)
+        ]
+        if not latest:
+            return 0
+        pool = await self._pool_or_create()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(f"DELETE FROM {self.chunk_table} WHERE id = ANY($1::text[])", list(latest))
+                if records:
+                    await conn.copy_records_to_table(
+                        self.chunk_table,
+                        records=records,
+                        columns=["id", "chunk_no", "heading", "content", "embedding", "content_hash", "embedding_model"],
+                    )
+        await self._written()
+        return len(records)
+
+    async def chunk_fingerprints(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """content_hash and embedding_model the stored chunks of `ids` were built from."""
+        if not ids:
+            return {}
+        pool = await self._pool_or_create()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                f"SELECT DISTINCT ON (id) id, content_hash, embedding_model FROM {self.chunk_table} WHERE id = ANY($1::text[])",
+                list(ids),
+            )
+        return {r["id"]: dict(r) for r in rows}
+
+    async def query(
+        self,
+        embedding: List[float],
+        top_k: int,
+        filters: Optional[Dict[str, Any]] = None,
+        *,
+        mode: str = "vector",
+        query_text: Optional[str] = None,
+        vector_weight: float = 1.0,
+        lexical_weight: float = 1.0,
+        rrf_k: int = 60,
+        filter_strategy: str = "auto",
+        include: Optional[List[str]] = None,
+        chunk_aggregate: str = "max",
+        chunk_top_n: int = 3,
+        with_embeddings: bool = False,
+        geo_blend: Optional[Tuple[float, float, float, float]] = None,
+        profile: Optional[str] = None,
+    ):
+        """
+        `geo_blend` (latitude, longitude, weight, scale_km) reorders the similarity ranking by
+        distance decay (geo.blended_score) inside the same statement. `profile` names the
+        search profile (src/services/search_profiles.py) whose scan parameters the ANN pass uses.
+        """
+        profile = search_profiles.resolve(profile)
+        if mode not in ("vector", "hybrid", "chunks"):
+            raise ValueError(f"Unsupported search mode '{mode}'.")
+        if geo_blend and mode == "hybrid":
+            raise ValueError("Distance-weighted ranking needs a similarity score; hybrid ranks are not one.")
+        include = list(dict.fromkeys(include or []))
+        unknown = [name for name in include if name not in PROJECTIONS]
+        if unknown:
+            raise ValueError(f"Unknown include field(s) {unknown}. Expected any of {sorted(PROJECTIONS)}")
+        if mode == "hybrid" and not query_text:
+            raise ValueError("Hybrid search needs the query text for the lexical leg.")
+        if chunk_aggregate not in ("max", "mean"):
+            raise ValueError(f"Unsupported chunk aggregate '{chunk_aggregate}'. Expected 'max' or 'mean'")
+
+        args: List[Any] = [embedding]
+        where, filter_args = compile_filters(filters, start_param=2)
+        args.extend(filter_args)
+        ann_limit = self._leg_size(mode, self.geo_candidates(top_k) if geo_blend else top_k)
+
         async with (await self._pool_or_create()).acquire() as conn:
-            rows = await conn.fetch(sql, *args)
-            return [{"id": r["id"], "score": float(r["score"]) } for r in rows]
+            if mode == "hybrid" and not await self._lexical_ready(conn):
+                raise ValueError(
+                    f"Hybrid search is unavailable: {self.table} has no document_tsv column. "
+                    f"Add it and its GIN index as db/init.sql defines them."
+                )
+            strategy, candidates = await self._plan_filtering(conn, filters, ann_limit, filter_strategy)
+            mode_args = {
+                "hybrid": [query_text, float(vector_weight), float(lexical_weight), int(rrf_k)],
+                "chunks": (chunk_aggregate, int(chunk_top_n)),
+            }.get(mode)
+            rows = await self._run_query(conn, mode, where, args, top_k, strategy, candidates, mode_args, include, with_embeddings, geo_blend, profile)
+            if strategy == "post" and filter_strategy == "auto" and len(rows) < top_k:
+                # The estimate was too optimistic and the ANN page ran dry; rank the filtered set exactly
+                rows = await self._run_query(conn, mode, where, args, top_k, "pre", 0, mode_args, include, with_embeddings, geo_blend, profile)
+        return self._hits(rows, include, with_embeddings)
+
+    async def query_batch(
+        self,
+        embeddings: List[List[float]],
+        top_k: int,
+        filters: Optional[Dict[str, Any]] = None,
+        *,
+        filter_strategy: str = "auto",
+        include: Optional[List[str]] = None,
+        profile: Optional[str] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Vector search for many query vectors in one statement: the vectors are unnested and each
+        one drives the usual ranking (`_search_sql`, with the same filters and `include`)
+        through a LATERAL join. Returns one hit list per vector, in input order.
+        """
+        profile = search_profiles.resolve(profile)
+        include = list(dict.fromkeys(include or []))
+        unknown = [name for name in include if name not in PROJECTIONS]
+        if unknown:
+            raise ValueError(f"Unknown include field(s) {unknown}. Expected any of {sorted(PROJECTIONS)}")
+        if not embeddings:
+            return []
+        where, args = compile_filters(filters, start_param=2)
+        vectors = [np.asarray(embedding, dtype=np.float32) for embedding in embeddings]
+        dim = len(vectors[0])
+        if any(vector.shape != (dim,) for vector in vectors):
+            raise ValueError("Every query vector of a batch needs the same dimension.")
+        pages: List[List[Dict[str, Any]]] = [[] for _ in embeddings]
+
+        async with (await self._pool_or_create()).acquire() as conn:
+            strategy, candidates = await self._plan_filtering(conn, filters, int(top_k), filter_strategy)
+            pending = list(range(len(embeddings)))
+            while pending:
+                rows = await self._fetch_ann(
+                    conn,
+                    self._batch_sql(where, top_k, strategy, candidates, include, dim),
+                    [np.concatenate([vectors[i] for i in pending]).tolist(), *args],
+                    self.rerank_candidates(candidates if strategy == "post" else (0 if where else top_k)),
+                    profile,
+                )
+                for n, hits in itertools.groupby(rows, key=lambda r: r["n"]):
+                    pages[pending[n - 1]] = self._hits(list(hits), include)
+                if strategy != "post" or filter_strategy != "auto":
+                    break
+                # As in `query`: the queries whose post-filtered page ran dry are ranked exactly
+                pending = [i for i in pending if len(pages[i]) < top_k]
+                strategy, candidates = "pre", 0
+        return pages
+
+    def _batch_sql(self, conds: List[str], top_k: int, strategy: str, candidates: int, include: List[str], dim: int) -> str:
+        """
+        (n, id, score, include fields...) for each query vector (n counts from 1): the
+        single-query ranking, with the n-th vector in place of the query vector, per LATERAL row.
+        The vectors arrive concatenated in one real[] ($1), which asyncpg encodes without
+        per-vector type ambiguity; the CTE slices them once, before any distance is computed.
+        """
+        ranked = self._search_sql(conds, top_k, strategy, candidates)
+        if include:
+            ranked = self._hydrate_sql(ranked, include)
+        return f"""
+            WITH q AS MATERIALIZED (
+                SELECT n, (($1::real[])[(n - 1) * {int(dim)} + 1 : n * {int(dim)}])::vector AS probe
+                FROM generate_series(1, cardinality($1::real[]) / {int(dim)}) AS n
+            )
+            SELECT q.n, hit.*
+            FROM q CROSS JOIN LATERAL ({ranked.replace(QUERY_VECTOR, "q.probe")}) hit
+            ORDER BY q.n, hit.score DESC
+        """
+
+    async def similar(
+        self,
+        participant_id: str,
+        top_k: int,
+        filters: Optional[Dict[str, Any]] = None,
+        *,
+        filter_strategy: str = "auto",
+        include: Optional[List[str]] = None,
+        profile: Optional[str] = None,
+    ):
+        """
+        The `top_k` participants most similar to `participant_id`, ranked by its stored embedding
+        in one statement (no embedding call), without the participant itself. Raises LookupError
+        when the participant is not indexed.
+        """
+        profile = search_profiles.resolve(profile)
+        include = list(dict.fromkeys(include or []))
+        unknown = [name for name in include if name not in PROJECTIONS]
+        if unknown:
+            raise ValueError(f"Unknown include field(s) {unknown}. Expected any of {sorted(PROJECTIONS)}")
+        args: List[Any] = [participant_id]
+        where, filter_args = compile_filters(filters, start_param=2)
+        args.extend(filter_args)
+
+        async with (await self._pool_or_create()).acquire() as conn:
+            strategy, candidates = await self._plan_filtering(conn, filters, self._leg_size("similar", top_k), filter_strategy)
+            rows = await self._run_query(conn, "similar", where, args, top_k, strategy, candidates, include=include, profile=profile)
+            if strategy == "post" and filter_strategy == "auto" and len(rows) < top_k:
+                rows = await self._run_query(conn, "similar", where, args, top_k, "pre", 0, include=include, profile=profile)
+            # Only an empty page needs telling "nothing similar" apart from "never indexed"
+            if not rows and not await conn.fetchval(
+                f"SELECT EXISTS (SELECT 1 FROM {self.table} WHERE id = $1 AND embedding IS NOT NULL)", participant_id
+            ):
+                raise LookupError(f"Participant '{participant_id}' is not indexed.")
+        return self._hits(rows, include)
+
+    async def revalidate(self, ids: List[str], include: Optional[List[str]] = None) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Current `include` fields of the `ids` still indexed, keyed by id (None without `include`),
+        joined as `_hydrate_sql` joins them. Cached result pages are served through this: profile
+        fields change in other services, without a write to this store. Like `query`, it does not
+        filter on participant status, so a cached page matches the one a miss would compute.
+        """
+        include = list(dict.fromkeys(include or []))
+        if not ids:
+            return {}
+        columns = ["r.id"] + [
+            PROJECTIONS[name].sql.format(
+                excerpt_chars=int(settings.SEARCH_EXCERPT_CHARS),
+                thumbnails=int(settings.SEARCH_THUMBNAILS_PER_RESULT),
+            ) + f" AS {name}"
+            for name in include
+        ]
+        pool = await self._pool_or_create()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                f"""
+                SELECT {", ".join(columns)}
+                FROM unnest($1::text[]) AS r(id)
+                JOIN {self.table} e ON e.id = r.id
+                LEFT JOIN producers pr ON pr.id = r.id
+                LEFT JOIN participants pt ON pt.id = r.id
+                """,
+                list(dict.fromkeys(ids)),
+            )
+        return {
+            r["id"]: {
+                name: json.loads(r[name]) if PROJECTIONS[name].is_json and r[name] is not None else r[name]
+                for name in include
+            } if include else None
+            for r in rows
+        }
+
+    async def facets(self, fields: List[str], filters: Optional[Dict[str, Any]] = None, limit: Optional[int] = None) -> Dict[str, Dict[str, int]]:
+        """
+        Participants per value of each facet field among the rows matching `filters`, the
+        SEARCH_FACET_LIMIT most frequent values per field. No filter or a single facet value is
+        read from the summary tables (src/services/facets.py); other filters count their rows.
+        """
+        fields = list(dict.fromkeys(fields))
+        unknown = [name for name in fields if name not in facet_sql.FACET_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown facet field(s) {unknown}. Expected any of {list(facet_sql.FACET_FIELDS)}")
+        if not fields:
+            return {}
+        limit = int(limit or settings.SEARCH_FACET_LIMIT)
+        counts, pairs = facet_sql.summary_tables(self.table)
+        single = facet_sql.single_facet(filters)
+        async with (await self._pool_or_create()).acquire() as conn:
+            if (not filters or single) and await self._facet_summary_ready(conn):
+                if single:
+                    source = f"SELECT facet AS field, facet_value AS value, n FROM {pairs} WHERE field = $3 AND value = $4"
+                    args = list(single)
+                else:
+                    source = f"SELECT field, value, n FROM {counts}"
+                    args = []
+            else:
+                where, args = compile_filters(filters, start_param=3)
+                source = (
+                    f"SELECT f.field, f.value, count(*) AS n FROM {self.table} e "
+                    f"CROSS JOIN LATERAL {facet_sql.values_sql('e.metadata', fields)} f "
+                    f"{'WHERE ' + ' AND '.join(where) if where else ''} GROUP BY f.field, f.value"
+                )
+            rows = await conn.fetch(facet_sql.ranked_sql(source, "$1", "$2"), fields, limit, *args)
+        return facet_sql.collect([(r["field"], r["value"], r["n"]) for r in rows], fields)
+
+    async def _facet_triggers_installed(self, conn: asyncpg.Connection) -> bool:
+        return bool(await conn.fetchval(
+            "SELECT count(*) = 3 FROM pg_trigger WHERE tgrelid = to_regclass($1) AND tgname = ANY($2::text[])",
+            self.table, list(facet_sql.trigger_names(self.table)),
+        ))
+
+    async def _facet_summary_ready(self, conn: asyncpg.Connection) -> bool:
+        ready = self._facet_summary.get(self.table)
+        if ready is None:
+            ready = await self._facet_triggers_installed(conn)
+            self._facet_summary.set(self.table, ready)
+        return ready
+
+    async def _lexical_ready(self, conn: asyncpg.Connection) -> bool:
+        ready = self._lexical.get(self.table)
+        if ready is None:
+            ready = bool(await conn.fetchval(
+                "SELECT EXISTS (SELECT 1 FROM pg_attribute WHERE attrelid = to_regclass($1) AND attname = 'document_tsv' AND NOT attisdropped)",
+                self.table,
+            ))
+            self._lexical.set(self.table, ready)
+        return ready
+
+    @staticmethod
+    def _hits(rows, include: List[str], with_embeddings: bool = False) -> List[Dict[str, Any]]:
+        results = []
+        for r in rows:
+            hit = {"id": r["id"], "score": float(r["score"])}
+            if include:
+                hit["fields"] = {
+                    name: json.loads(r[name]) if PROJECTIONS[name].is_json and r[name] is not None else r[name]
+                    for name in include
+                }
+            if with_embeddings:
+                hit["embedding"] = r["embedding"]
+            results.append(hit)
+        return results
+
+    def _leg_size(self, mode: str, top_k: int) -> int:
+        """Rows the ANN leg of a `mode` search returns for a page of `top_k`."""
+        if mode == "hybrid":
+            return self.hybrid_candidates(top_k)
+        if mode == "chunks":
+            return self.chunk_candidates(top_k)
+        if mode == "similar":
+            return int(top_k) + 1  # the source participant is its own nearest neighbour
+        return int(top_k)
+
+    async def _run_query(self, conn, mode, where, args, top_k, strategy, candidates, mode_args=None, include=None, with_embeddings=False, geo_blend=None, profile=None):
+        # Distance-weighted ranking reorders a deeper similarity ranking, then keeps top_k
+        ranked_k = self.geo_candidates(top_k) if geo_blend else top_k
+        leg = self._leg_size(mode, ranked_k)
+        if mode == "hybrid":
+            sql = self._hybrid_sql(where, ranked_k, len(args) + 1, strategy, candidates)
+            args = args + mode_args
+        elif mode == "chunks":
+            sql = self._chunk_sql(where, ranked_k, strategy, candidates, *mode_args)
+        elif mode == "similar":
+            sql = self._similar_sql(where, ranked_k, strategy, candidates)
+        else:
+            sql = self._search_sql(where, ranked_k, strategy, candidates)
+        if geo_blend:
+            sql = self._geo_blend_sql(sql, top_k, len(args) + 1)
+            args = args + [float(v) for v in geo_blend]
+        if include or with_embeddings:
+            sql = self._hydrate_sql(sql, include, with_embeddings)
+        # Pre-filtered legs rank the filtered rows exactly and never touch the ANN index
+        ann_rows = candidates if strategy == "post" else (0 if where else leg)
+        return await self._fetch_ann(conn, sql, args, self.rerank_candidates(ann_rows), profile)
 
     async def delete_all(self) -> int:
         pool = await self._pool_or_create()
         async with pool.acquire() as conn:
-            res = await conn.execute("DELETE FROM participant_embeddings")
-            return int(res.split()[-1])
+            async with conn.transaction():
+                if await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", self.chunk_table):
+                    await conn.execute(f"DELETE FROM {self.chunk_table}")
+                res = await conn.execute(f"DELETE FROM {self.table}")
+        await self._written()
+        return int(res.split()[-1])
+
+    # --- Schema & ANN index management ---
+
+    async def ensure_schema(self) -> None:
+        """
+        Add the columns and indexes newer search features rely on to tables created
+        from an older db/init.sql. Every statement is idempotent. The generated `document_tsv`
+        column is not among them: adding it rewrites the whole table, so it belongs to
+        db/init.sql or a migration, and this only checks it was built with the configured
+        text search configuration.
+        """
+        pool = await self._pool_or_create()
+        async with pool.acquire() as conn:
+            await conn.execute(f"ALTER TABLE {self.table} ADD COLUMN IF NOT EXISTS document TEXT")
+            await conn.execute(f"ALTER TABLE {self.table} ADD COLUMN IF NOT EXISTS content_hash TEXT")
+            await conn.execute(f"ALTER TABLE {self.table} ADD COLUMN IF NOT EXISTS embedding_model TEXT")
+            if await self._check_text_search_config(conn):
+                await conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{self.table}_tsv ON {self.table} USING gin (document_tsv)"
+                )
+            # jsonb_path_ops is smaller and faster than the default opclass for @> containment,
+            # which is what equality and membership filters compile to
+            await conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{self.table}_meta_path ON {self.table} USING gin (metadata jsonb_path_ops)"
+            )
+            # Bounding boxes of `$near` radius filters (src/services/geo.py)
+            lat, lon = coordinate_sql("metadata", GEO_FIELD)
+            await conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_geo ON {self.table} ({lat}, {lon})")
+            for field in range_filter_fields():
+                await conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{self.table}_meta_{field} ON {self.table} ((metadata -> '{field}'))"
+                )
+            # Chunks belong to the participant, not to this table, so a re-index can drop and swap
+            # the table without touching them; its ANN index is managed by ensure_index
+            await conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {self.chunk_table} (
+                    id TEXT NOT NULL REFERENCES participants(id) ON DELETE CASCADE,
+                    chunk_no INT NOT NULL,
+                    heading TEXT,
+                    content TEXT NOT NULL,
+                    embedding vector({self.dimension}) NOT NULL,
+                    content_hash TEXT,
+                    embedding_model TEXT,
+                    PRIMARY KEY (id, chunk_no)
+                )
+                """
+            )
+
+    async def _check_text_search_config(self, conn) -> bool:
+        """
+        Log an error when `document_tsv` is missing, or was generated with another text search
+        configuration than SEARCH_TEXT_SEARCH_CONFIG: hybrid queries parse with the configured
+        one, so stems would silently stop matching. Returns whether the column exists.
+        """
+        row = await conn.fetchrow(
+            """
+            SELECT substring(pg_get_expr(d.adbin, d.adrelid) FROM $$to_tsvector\\('([^']+)'::regconfig$$) AS config
+            FROM pg_attribute a
+            JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+            WHERE a.attrelid = to_regclass($1) AND a.attname = 'document_tsv' AND NOT a.attisdropped
+            """,
+            self.table,
+        )
+        self._lexical.set(self.table, row is not None)
+        if row is None:
+            logger.error(
+                f"{self.table}.document_tsv is missing; hybrid searches are refused until it and its GIN index "
+                f"are added as db/init.sql defines them."
+            )
+            return False
+        configured = settings.SEARCH_TEXT_SEARCH_CONFIG
+        built = row["config"]
+        if (built or "").removeprefix("pg_catalog.") != configured.removeprefix("pg_catalog."):
+            logger.error(
+                f"{self.table}.document_tsv is generated with text search configuration '{built}' but "
+                f"SEARCH_TEXT_SEARCH_CONFIG is '{configured}'; hybrid matches will be wrong until the column "
+                f"is rebuilt by a migration or the setting is restored."
+            )
+        return True
+
+    async def ensure_facets(self) -> None:
+        """
+        Install the facet summary tables and their maintenance triggers, and recount the
+        summaries when the triggers were missing (first run, or after a re-index swap replaced
+        the table). Writes wait for the recount; searches do not.
+        """
+        pool = await self._pool_or_create()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(f"LOCK TABLE {self.table} IN SHARE ROW EXCLUSIVE MODE")
+                installed = await self._facet_triggers_installed(conn)
+                for statement in facet_sql.maintenance_sql(self.table):
+                    await conn.execute(statement)
+                if not installed:
+                    logger.info(f"Recounting the facet summaries of {self.table}.")
+                    for statement in facet_sql.rebuild_sql(self.table):
+                        await conn.execute(statement)
+        self._facet_summary.set(self.table, True)
+
+    def _create_index_sql(self, name: Optional[str] = None, table: Optional[str] = None, lists: Optional[int] = None, index_type: Optional[str] = None) -> str:
+        """`lists` sizes an IVFFlat index; default SEARCH_IVFFLAT_LISTS, or 100 when that is 0 (sized from the rows)."""
+        index_type = index_type or self.index_type
+        if index_type == "hnsw":
+            params = f"m = {int(settings.SEARCH_HNSW_M)}, ef_construction = {int(settings.SEARCH_HNSW_EF_CONSTRUCTION)}"
+        else:
+            params = f"lists = {int(lists or settings.SEARCH_IVFFLAT_LISTS or 100)}"
+        return (
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name or self._index_name_for(table or self.table, index_type)} ON {table or self.table} "
+            f"USING {index_type} ({self._ann_key()[0]} {self.index_opclass}) WITH ({params})"
+        )
+
+    async def row_estimate(self, conn: asyncpg.Connection, table: Optional[str] = None) -> int:
+        """
+        Rows in the table: the planner's count, or the live-row counter of the statistics collector
+        when that is ahead (reltuples stays 0 after an index build on the empty table until the
+        next ANALYZE), and an exact count when neither knows yet.
+        """
+        table = table or self.table
+        estimate = await conn.fetchval(
+            "SELECT GREATEST(c.reltuples, COALESCE(s.n_live_tup, 0)) FROM pg_class c "
+            "LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid WHERE c.oid = $1::regclass",
+            table,
+        )
+        if estimate is None or estimate <= 0:
+            return int(await conn.fetchval(f"SELECT count(*) FROM {table}"))
+        return int(estimate)
+
+    async def vector_indexes(self, conn: asyncpg.Connection, table: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        List the ANN indexes on the embedding column of this table (or `table`): plain vector
+        indexes and the halfvec / binary expression indexes of the reduced-precision modes.
+        """
+        rows = await conn.fetch(
+            """
+            SELECT i.relname AS name, am.amname AS method, opc.opcname AS opclass, x.indisvalid AS valid
+            FROM pg_index x
+            JOIN pg_class i ON i.oid = x.indexrelid
+            JOIN pg_class t ON t.oid = x.indrelid
+            JOIN pg_am am ON am.oid = i.relam
+            JOIN pg_opclass opc ON opc.oid = x.indclass[0]
+            WHERE t.relname = $1
+              AND am.amname IN ('hnsw', 'ivfflat')
+              AND (x.indexprs IS NULL OR opc.opcname LIKE 'halfvec%' OR opc.opcname = 'bit_hamming_ops')
+            """,
+            table or self.table,
+        )
+        return [dict(r) for r in rows]
+
+    async def ensure_index(self) -> str:
+        """
+        Make sure exactly one valid ANN index matching the configured metric and precision exists,
+        on this table and on its chunk table when there is one. Indexes built for another operator
+        class can never serve our ORDER BY, so they are dropped rather than left to slow down every
+        write, but only once the replacement is built: switching metric or precision never leaves
+        the table without an ANN index. Returns the name of this table's index.
+        """
+        pool = await self._pool_or_create()
+        async with pool.acquire() as conn:
+            if self.precision != "full" and not await conn.fetchval("SELECT to_regtype('halfvec') IS NOT NULL"):
+                # halfvec and binary_quantize both arrived in pgvector 0.7
+                logger.error(f"pgvector is older than 0.7; precision '{self.precision}' is unavailable, searching at full precision.")
+                self.precision = "full"
+            if self.auto_index:
+                await self._resolve_auto_index(conn)
+            if await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", self.chunk_table):
+                await self._ensure_index_on(conn, self.chunk_table)
+            return await self._ensure_index_on(conn, self.table)
+
+    async def _resolve_auto_index(self, conn: asyncpg.Connection) -> None:
+        """SEARCH_INDEX_TYPE=auto: keep the type of the ANN index in place, else pick one by table size."""
+        existing = [ix for ix in await self.vector_indexes(conn) if ix["valid"] and ix["opclass"] == self.index_opclass]
+        if existing:
+            self.index_type = existing[0]["method"]
+        else:
+            rows = await self.row_estimate(conn)
+            self.index_type = "hnsw" if rows >= settings.SEARCH_MAINTENANCE_HNSW_ROWS else "ivfflat"
+
+    async def _ensure_index_on(self, conn: asyncpg.Connection, table: str) -> str:
+        existing = await self.vector_indexes(conn, table)
+        matching = [
+            ix for ix in existing
+            if ix["valid"] and ix["method"] == self.index_type and ix["opclass"] == self.index_opclass
+        ]
+        # Leftovers of an interrupted CONCURRENTLY build go first; one could hold the name we need
+        for ix in existing:
+            if not ix["valid"]:
+                logger.info(f"Dropping invalid vector index {ix['name']}.")
+                await conn.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{ix["name"]}"')
+        if matching:
+            name = matching[0]["name"]
+        else:
+            name = self._index_name_for(table)
+            logger.info(f"Building vector index {name} ({self.index_type}, {self.index_opclass}).")
+            lists = None
+            if self.index_type == "ivfflat" and not settings.SEARCH_IVFFLAT_LISTS:
+                lists = ivfflat_lists(await self.row_estimate(conn, table))
+            await conn.execute(self._create_index_sql(name, table, lists))
+        for ix in existing:
+            if ix["valid"] and ix not in matching:
+                logger.info(
+                    f"Dropping vector index {ix['name']} ({ix['method']}, {ix['opclass']}); "
+                    f"it does not match metric '{self.metric_name}' at precision '{self.precision}'."
+                )
+                await conn.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{ix["name"]}"')
+        return name
+
+    async def verify_index_usage(self) -> bool:
+        """
+        EXPLAIN the exact SQL that `query` issues and confirm the planner picks the ANN index.
+        Sequential scans are disabled for the check only, because on a small table the planner
+        rightly prefers them; what we want to know is whether the index *can* serve the query.
+        """
+        pool = await self._pool_or_create()
+        probe = [1.0] + [0.0] * (self.dimension - 1)
+        async with pool.acquire() as conn:
+            expected = {ix["name"] for ix in await self.vector_indexes(conn) if ix["valid"]}
+            async with conn.transaction():
+                await conn.execute("SET LOCAL enable_seqscan = off")
+                raw = await conn.fetchval("EXPLAIN (FORMAT JSON) " + self._search_sql([], 10), probe)
+        plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+        used = expected.intersection(_plan_index_names(plan))
+        if used:
+            logger.info(f"Vector search plan uses index {', '.join(sorted(used))}.")
+            return True
+        logger.warning(
+            f"Vector search on {self.table} does not use an ANN index (metric '{self.metric_name}', "
+            f"precision '{self.precision}'); every search will scan the whole table."
+        )
+        return False
+
+
+def create_vector_service():
+    """The vector store selected by SEARCH_VECTOR_BACKEND."""
+    backend = settings.SEARCH_VECTOR_BACKEND.lower()
+    if backend == "memory":
+        from src.services.memory_vector_service import MemoryVectorService
+        return MemoryVectorService()
+    if backend != "pgvector":
+        raise ValueError(f"Unsupported vector backend '{backend}'. Expected 'pgvector' or 'memory'")
+    return VectorService()
 
 
-vector_service = VectorService()
+vector_service = create_vector_service()
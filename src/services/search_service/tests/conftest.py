@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Mirror the container layout: the shared src/core package sits next to the service's own src/
+SERVICE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+REPO_ROOT = os.path.abspath(os.path.join(SERVICE_DIR, "..", "..", ".."))
+for path in (SERVICE_DIR, REPO_ROOT):
+    if path not in sys.path:
+        sys.path.insert(0, path)
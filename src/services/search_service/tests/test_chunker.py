@@ -0,0 +1,45 @@
+from src.services.chunker import Chunk, split_profile
+
+
+PROFILE = """# Prairie Pulse Farms
+
+Family farm near Regina.
+
+## Products
+
+### Lentils
+Red and green lentils, 2,000 t a year.
+
+### Durum
+Amber durum for pasta mills.
+
+## Certifications
+
+Organic (COR), Non-GMO Project.
+"""
+
+
+def test_split_profile_follows_heading_path():
+    chunks = split_profile(PROFILE)
+    assert [c.heading for c in chunks] == [
+        "Prairie Pulse Farms",
+        "Prairie Pulse Farms > Products > Lentils",
+        "Prairie Pulse Farms > Products > Durum",
+        "Prairie Pulse Farms > Certifications",
+    ]
+    assert chunks[1].content == "Red and green lentils, 2,000 t a year."
+    assert chunks[1].text.startswith("Prairie Pulse Farms > Products > Lentils\n\n")
+
+
+def test_long_sections_split_between_paragraphs():
+    paragraphs = [f"Paragraph {i}. " + "word " * 60 for i in range(6)]
+    chunks = split_profile("## Story\n\n" + "\n\n".join(paragraphs), max_chars=700)
+    assert len(chunks) > 1 and all(len(c.content) <= 700 for c in chunks)
+    assert all(c.heading == "Story" for c in chunks)
+    assert chunks[0].content.startswith("Paragraph 0.")
+
+
+def test_plain_text_and_empty_profiles():
+    assert split_profile("Just one line about oats.") == [Chunk("", "Just one line about oats.")]
+    assert split_profile("") == []
+    assert len(split_profile("\n\n".join(f"# H{i}\ntext {i}" for i in range(50)), max_chunks=5)) == 5
@@ -0,0 +1,39 @@
+import asyncio
+
+from src.services.embedding_cache import EmbeddingCache, LRUTTLCache, normalize_query
+
+
+def test_normalize_query():
+    assert normalize_query("  Organic  Durum\tWheat ") == "organic durum wheat"
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUTTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_lru_expires_entries():
+    cache = LRUTTLCache(maxsize=2, ttl=-1)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_embedding_cache_keys_on_normalized_text_and_model():
+    cache = EmbeddingCache(model="m1", maxsize=8, ttl=60, use_redis=False)
+    assert cache.key("Organic wheat") == cache.key("organic   WHEAT")
+    assert cache.key("organic wheat") != EmbeddingCache(model="m2", use_redis=False).key("organic wheat")
+
+    async def run():
+        assert await cache.get("organic wheat") is None
+        await cache.set("organic wheat", [0.5, 0.25])
+        return await cache.get("Organic Wheat")
+
+    assert asyncio.run(run()) == [0.5, 0.25]
+    stats = cache.stats()
+    assert stats["local_hits"] == 1 and stats["misses"] == 1 and stats["hit_ratio"] == 0.5
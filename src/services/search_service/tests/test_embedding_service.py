@@ -0,0 +1,97 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from src.services.embedding_cache import EmbeddingCache
+from src.services.embedding_service import EmbeddingService
+
+
+def _service_with_transport(handler) -> EmbeddingService:
+    svc = EmbeddingService()
+    svc.dimension = 2
+    svc.batch_size = 2
+    svc._client = httpx.AsyncClient(base_url="http://orchestrator", transport=httpx.MockTransport(handler))
+    return svc
+
+
+def test_get_embeddings_batches_and_preserves_order():
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        texts = json.loads(request.content)["texts"]
+        seen.append(texts)
+        return httpx.Response(200, json={"result": [[float(t), 0.0] for t in texts]})
+
+    async def run():
+        svc = _service_with_transport(handler)
+        try:
+            return await svc.get_embeddings(["1", "2", "3", "4", "5"])
+        finally:
+            await svc.shutdown()
+
+    vectors = asyncio.run(run())
+    assert [v[0] for v in vectors] == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert sorted(len(chunk) for chunk in seen) == [1, 2, 2]
+
+
+def test_get_embedding_rejects_wrong_dimension():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"result": [0.1, 0.2, 0.3]})
+
+    async def run():
+        svc = _service_with_transport(handler)
+        try:
+            await svc.get_embedding("wheat")
+        finally:
+            await svc.shutdown()
+
+    with pytest.raises(ValueError, match="dimension mismatch"):
+        asyncio.run(run())
+
+
+def test_get_query_embeddings_embeds_only_uncached_queries_once():
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        texts = json.loads(request.content)["texts"]
+        seen.append(texts)
+        return httpx.Response(200, json={"result": [[float(len(t)), 0.0] for t in texts]})
+
+    async def run():
+        svc = _service_with_transport(handler)
+        svc.cache = EmbeddingCache(use_redis=False)
+        await svc.cache.set("oats", [9.0, 9.0])
+        try:
+            return await svc.get_query_embeddings(["lentils", "oats", "peas", "lentils"])
+        finally:
+            await svc.shutdown()
+
+    vectors = asyncio.run(run())
+    assert vectors == [[7.0, 0.0], [9.0, 9.0], [4.0, 0.0], [7.0, 0.0]]
+    assert seen == [["lentils", "peas"]]
+
+
+def test_variant_follows_its_model_version():
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(json.loads(request.content)["service_name"])
+        return httpx.Response(200, json={"result": [0.1, 0.2, 0.3]})
+
+    async def run():
+        svc = _service_with_transport(handler)
+        other = svc.variant("large-v3", "embeddings-large", 3)
+        try:
+            assert await other.get_embedding("wheat") == [0.1, 0.2, 0.3]
+            # The original client keeps its version and still rejects the other dimension
+            with pytest.raises(ValueError, match="dimension mismatch"):
+                await svc.get_embedding("wheat")
+        finally:
+            await svc.shutdown()
+        return svc, other
+
+    svc, other = asyncio.run(run())
+    assert seen == ["embeddings-large", svc.service_name]
+    assert other.cache.model == "large-v3" and svc.cache.model == svc.model != "large-v3"
@@ -0,0 +1,29 @@
+from src.services import facets
+
+
+def test_single_facet_recognizes_summary_answerable_filters():
+    assert facets.single_facet({"region": "SK"}) == ("region", "SK")
+    assert facets.single_facet({"region": {"$eq": "SK"}}) == ("region", "SK")
+    assert facets.single_facet({"certifications": {"$in": ["organic"]}}) == ("certifications", "organic")
+    # Several values, other fields, array equality and compound filters count the matching rows instead
+    assert facets.single_facet({"certifications": {"$in": ["organic", "kosher"]}}) is None
+    assert facets.single_facet({"country": "CA"}) is None
+    assert facets.single_facet({"primary_crops": "oats"}) is None
+    assert facets.single_facet({"$and": [{"region": "SK"}]}) is None
+    assert facets.single_facet(None) is None
+
+
+def test_facet_values_and_top_counts():
+    metadata = {"region": "SK", "certifications": ["organic", "organic", ""], "primary_crops": "oats", "producer_id": "p1"}
+    assert facets.facet_values(metadata) == [("region", "SK"), ("certifications", "organic"), ("primary_crops", "oats")]
+    counts = {("region", "SK"): 4, ("region", "AB"): 4, ("region", "MB"): 1, ("certifications", "organic"): 0}
+    assert facets.top_counts(counts, ["region", "certifications"], 2) == {"region": {"AB": 4, "SK": 4}, "certifications": {}}
+
+
+def test_maintenance_sql_installs_one_trigger_per_event():
+    statements = facets.maintenance_sql("participant_embeddings")
+    triggers = [s for s in statements if s.startswith("CREATE TRIGGER")]
+    assert [t.split()[2] for t in triggers] == list(facets.trigger_names("participant_embeddings"))
+    assert all("FOR EACH STATEMENT" in t and "REFERENCING" in t for t in triggers)
+    function = next(s for s in statements if "CREATE OR REPLACE FUNCTION" in s)
+    assert "participant_embeddings_facet_pairs" in function and "ON CONFLICT (field, value) DO UPDATE SET n = c.n + EXCLUDED.n" in function
@@ -0,0 +1,93 @@
+import pytest
+
+from src.services.filter_compiler import FilterError, compile_filters, match_filters
+
+
+ARRAYS = {"certifications", "primary_crops"}
+
+
+def test_equality_and_membership_compile_to_containment():
+    conds, args = compile_filters(
+        {"region": "SK", "certifications": {"$in": ["organic", "kosher"]}},
+        start_param=2,
+        array_fields=ARRAYS,
+    )
+    assert conds == [
+        "metadata @> $2::jsonb",
+        "(metadata @> $3::jsonb OR metadata @> $4::jsonb)",
+    ]
+    assert args == ['{"region": "SK"}', '{"certifications": ["organic"]}', '{"certifications": ["kosher"]}']
+
+
+def test_all_ranges_and_exists():
+    conds, args = compile_filters(
+        {
+            "primary_crops": {"$all": ["wheat", "lentils"]},
+            "farm_size": {"$gte": 100, "$lt": 500},
+            "certifications": {"$exists": False},
+        },
+        array_fields=ARRAYS,
+    )
+    assert conds[0] == "metadata @> $1::jsonb"
+    assert args[0] == '{"primary_crops": ["wheat", "lentils"]}'
+    assert conds[1] == "(jsonb_typeof(metadata -> 'farm_size') = 'number' AND (metadata -> 'farm_size') >= $2::jsonb)"
+    assert conds[2].endswith("< $3::jsonb)")
+    assert conds[3] == "NOT (metadata ? $4::text)"
+    assert args[1:] == ["100", "500", "certifications"]
+
+
+def test_or_groups():
+    conds, _ = compile_filters({"$or": [{"region": "SK"}, {"region": "AB"}]}, array_fields=ARRAYS)
+    assert conds == ["((metadata @> $1::jsonb) OR (metadata @> $2::jsonb))"]
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [
+        {"region; DROP TABLE x": "SK"},
+        {"region": {"$regex": "S.*"}},
+        {"region": {"$in": []}},
+        {"region": {"$all": ["SK", "AB"]}},
+        {"farm_size": {"$gte": True}},
+        {"$or": []},
+    ],
+)
+def test_invalid_filters_rejected(filters):
+    with pytest.raises(FilterError):
+        compile_filters(filters, array_fields=ARRAYS)
+
+
+def test_match_filters_follows_jsonb_semantics():
+    meta = {"region": "SK", "certifications": ["organic"], "farm_size": 120, "verified": True}
+    assert match_filters({"region": "SK", "certifications": {"$in": ["kosher", "organic"]}}, meta, ARRAYS)
+    assert match_filters({"farm_size": {"$gte": 100, "$lt": 500}}, meta, ARRAYS)
+    assert not match_filters({"farm_size": {"$gte": "100"}}, meta, ARRAYS)  # strings never compare with numbers
+    assert not match_filters({"verified": 1}, meta, ARRAYS)  # booleans are not numbers in jsonb
+    assert not match_filters({"region": "SK", "primary_crops": {"$exists": True}}, meta, ARRAYS)
+    assert match_filters({"$or": [{"region": "AB"}, {"certifications": {"$all": ["organic"]}}]}, meta, ARRAYS)
+    with pytest.raises(FilterError):
+        match_filters({"region": "AB", "farm_size": {"$near": 1}}, meta, ARRAYS)
+
+
+def test_near_compiles_to_indexed_box_and_exact_distance():
+    conds, args = compile_filters({"coordinates": {"$near": {"latitude": 49.29, "longitude": -123.11, "radius_km": 300}}}, start_param=2)
+    lat = "((metadata #>> '{coordinates,latitude}')::double precision)"
+    assert conds[0].startswith(f"({lat} BETWEEN $2::float8 AND $3::float8 AND (")
+    assert conds[0].endswith("<= $8::float8)")
+    assert args[:2] == [pytest.approx(49.29 - 300 / 111.195, abs=1e-3), pytest.approx(49.29 + 300 / 111.195, abs=1e-3)]
+    assert args[-3:] == [49.29, -123.11, 300]
+    # Across the antimeridian the longitudes split into two ranges
+    conds, _ = compile_filters({"coordinates": {"$near": {"latitude": 0, "longitude": 179.5, "radius_km": 200}}})
+    assert conds[0].count("BETWEEN") == 3 and " OR " in conds[0]
+    with pytest.raises(FilterError):
+        compile_filters({"coordinates": {"$near": {"latitude": 95, "longitude": 0, "radius_km": 10}}})
+
+
+def test_match_near_uses_great_circle_distance():
+    vancouver = {"coordinates": {"latitude": 49.28, "longitude": -123.12}}
+    fiji = {"coordinates": {"latitude": -17.7, "longitude": 178.1}}
+    near_port = {"coordinates": {"$near": {"latitude": 49.29, "longitude": -123.11, "radius_km": 300}}}
+    assert match_filters(near_port, vancouver, ARRAYS)
+    assert not match_filters(near_port, {"region": "BC"}, ARRAYS)  # no coordinates, no match
+    # Longitudes -179.9 and 178.1 are about 200 km apart, not 40 000
+    assert match_filters({"coordinates": {"$near": {"latitude": -17.7, "longitude": -179.9, "radius_km": 250}}}, fiji, ARRAYS)
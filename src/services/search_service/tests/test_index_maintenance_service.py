@@ -0,0 +1,63 @@
+import pytest
+
+from src.services import index_maintenance_service as maintenance
+from src.services.index_maintenance_service import plan_rebuild, recall
+from src.services.vector_service import VectorService, ivfflat_lists
+
+
+@pytest.fixture(autouse=True)
+def _thresholds(monkeypatch):
+    monkeypatch.setattr(maintenance.settings, "SEARCH_MAINTENANCE_MIN_ROWS", 1000)
+    monkeypatch.setattr(maintenance.settings, "SEARCH_MAINTENANCE_MAX_DRIFT", 0.2)
+    monkeypatch.setattr(maintenance.settings, "SEARCH_MAINTENANCE_HNSW_ROWS", 1_000_000)
+    monkeypatch.setattr(maintenance.settings, "SEARCH_IVFFLAT_LISTS", 0)
+
+
+def test_ivfflat_lists_follow_table_size():
+    assert ivfflat_lists(0) == 10
+    assert ivfflat_lists(50_000) == 50
+    assert ivfflat_lists(1_000_000) == 1000
+    assert ivfflat_lists(4_000_000) == 2000
+
+
+def test_plan_rebuild_ivfflat_rules():
+    ivf = {"method": "ivfflat", "lists": 50}
+    built = {"row_count": 50_000, "changes_counter": 100}
+    # Too small to train meaningful centroids: leave it alone
+    assert plan_rebuild(500, 0, None, None) is None
+    assert plan_rebuild(50_000, 100, None, None) == ("missing", "ivfflat", 50)
+    # Built on the empty table at startup, never by maintenance
+    assert plan_rebuild(50_000, 100, ivf, None) == ("untracked", "ivfflat", 50)
+    assert plan_rebuild(50_000, 5_000, ivf, built) is None
+    assert plan_rebuild(50_000, 20_000, ivf, built) == ("drift", "ivfflat", 50)
+    # A statistics reset restarts the counter
+    assert plan_rebuild(50_000, 50, ivf, built) is None
+    assert plan_rebuild(300_000, 200, ivf, built) == ("lists", "ivfflat", 300)
+    assert plan_rebuild(50_000, 100, ivf, built, force=True) == ("forced", "ivfflat", 50)
+
+
+def test_plan_rebuild_switches_to_hnsw_only_in_auto(monkeypatch):
+    ivf = {"method": "ivfflat", "lists": 1000}
+    built = {"row_count": 1_000_000, "changes_counter": 0}
+    assert plan_rebuild(1_200_000, 0, ivf, built, "ivfflat") is None
+    assert plan_rebuild(1_200_000, 0, ivf, built, "ivfflat", auto=True) == ("switch", "hnsw", 0)
+    hnsw = {"method": "hnsw", "lists": None}
+    assert plan_rebuild(10_000, 10_000, hnsw, None, "hnsw", auto=True) is None
+    monkeypatch.setattr(maintenance.settings, "SEARCH_IVFFLAT_LISTS", 100)
+    assert plan_rebuild(50_000, 0, {"method": "ivfflat", "lists": 100}, {"row_count": 50_000, "changes_counter": 0}) is None
+
+
+def test_auto_index_type_and_scan_settings():
+    svc = VectorService(metric="cosine", index_type="auto")
+    assert svc.auto_index and svc.index_type == "ivfflat"
+    assert "hnsw.ef_search" in svc.scan_settings_sql(None, 10) and "ivfflat.probes" in svc.scan_settings_sql(None, 10)
+    hnsw = VectorService(metric="cosine", index_type="hnsw")
+    assert "ivfflat" not in hnsw.scan_settings_sql(None, 10)
+    sql = hnsw._create_index_sql("idx_next", lists=250, index_type="ivfflat")
+    assert "idx_next ON participant_embeddings USING ivfflat (embedding vector_cosine_ops) WITH (lists = 250)" in sql
+    assert hnsw._index_name_for("participant_embeddings", "ivfflat") == "idx_participant_embeddings_vec_ivfflat_cosine"
+
+
+def test_recall_is_overlap_share():
+    assert recall([1, 2, 3, 4], [4, 3, 9, 8]) == 0.5
+    assert recall([], []) == 1.0
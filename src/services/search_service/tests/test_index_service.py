@@ -0,0 +1,178 @@
+import asyncio
+
+from src.schema.search_schema import IndexRequest
+from src.services import index_service
+
+
+def test_index_producers_embeds_once_and_bulk_upserts(monkeypatch):
+    monkeypatch.setattr(index_service.settings, "SEARCH_CHUNKS_ENABLED", False)
+    calls = {"embed": [], "upsert": [], "notify": []}
+
+    async def fake_get_embeddings(texts):
+        calls["embed"].append(list(texts))
+        return [[float(i)] for i in range(len(texts))]
+
+    async def fake_upsert_many(rows):
+        calls["upsert"].append(rows)
+        return len(rows)
+
+    async def no_fingerprints(ids):
+        return {}
+
+    async def fake_update_metadata_many(rows):
+        return len(rows)
+
+    monkeypatch.setattr(index_service.embedding_service, "get_embeddings", fake_get_embeddings)
+    monkeypatch.setattr(index_service.vector_service, "upsert_many", fake_upsert_many)
+    monkeypatch.setattr(index_service.vector_service, "fingerprints", no_fingerprints)
+    monkeypatch.setattr(index_service.vector_service, "update_metadata_many", fake_update_metadata_many)
+
+    async def fake_notify(rows):
+        calls["notify"].append(rows)
+        return 0
+
+    monkeypatch.setattr(index_service.standing_query_service, "notify", fake_notify)
+
+    items = [
+        IndexRequest(profile_id="p1", ai_profile="Durum wheat", region="SK"),
+        IndexRequest(profile_id="p2", ai_profile="", region="AB"),
+        IndexRequest(profile_id="p3", ai_profile="Lentils", region="MB", primary_crops=["lentils"]),
+    ]
+    result = asyncio.run(index_service.index_producers(items))
+
+    assert result.success and result.indexed == 2
+    assert result.failed == {"p2": "AI profile is empty."}
+    assert len(calls["embed"]) == 1 and len(calls["upsert"]) == 1
+    assert [row[0] for row in calls["upsert"][0]] == ["p1", "p3"]
+    assert calls["upsert"][0][1][2]["primary_crops"] == ["lentils"]
+    assert calls["upsert"][0][1][3] == "Lentils"
+    # Saved searches see the new vectors with their metadata
+    assert [(row[0], row[1]) for row in calls["notify"][0]] == [("p1", [0.0]), ("p3", [1.0])]
+    assert calls["notify"][0][1][2]["primary_crops"] == ["lentils"]
+
+
+def test_unchanged_profiles_skip_embedding_and_write(monkeypatch):
+    monkeypatch.setattr(index_service.settings, "SEARCH_CHUNKS_ENABLED", False)
+    model = index_service.vector_service.model
+    stored_meta = index_service._build_metadata("p1", "SK", [], [])
+    stored = {
+        "p1": {"content_hash": index_service._content_hash(index_service._text_to_embed("Durum wheat")), "embedding_model": model, "metadata": stored_meta},
+        "p2": {"content_hash": index_service._content_hash(index_service._text_to_embed("Oats")), "embedding_model": model,
+               "metadata": index_service._build_metadata("p2", "SK", [], [])},
+        "p3": {"content_hash": index_service._content_hash(index_service._text_to_embed("Lentils")), "embedding_model": "old-model", "metadata": {}},
+    }
+    calls = {"embed": [], "upsert": [], "metadata": []}
+
+    async def fake_fingerprints(ids):
+        return {i: stored[i] for i in ids if i in stored}
+
+    async def fake_get_embeddings(texts):
+        calls["embed"].append(list(texts))
+        return [[0.0] for _ in texts]
+
+    async def fake_upsert_many(rows):
+        calls["upsert"].append(rows)
+        return len(rows)
+
+    async def fake_update_metadata_many(rows):
+        calls["metadata"].append(rows)
+        return len(rows)
+
+    monkeypatch.setattr(index_service.vector_service, "fingerprints", fake_fingerprints)
+    monkeypatch.setattr(index_service.embedding_service, "get_embeddings", fake_get_embeddings)
+    monkeypatch.setattr(index_service.vector_service, "upsert_many", fake_upsert_many)
+    monkeypatch.setattr(index_service.vector_service, "update_metadata_many", fake_update_metadata_many)
+
+    async def failing_notify(rows):  # a saved-search failure must not fail the indexing
+        raise ConnectionError("database unavailable")
+
+    monkeypatch.setattr(index_service.standing_query_service, "notify", failing_notify)
+
+    items = [
+        IndexRequest(profile_id="p1", ai_profile="Durum wheat", region="SK"),  # unchanged
+        IndexRequest(profile_id="p2", ai_profile="Oats", region="AB"),  # same text, new region
+        IndexRequest(profile_id="p3", ai_profile="Lentils", region="MB"),  # embedded by another model
+        IndexRequest(profile_id="p4", ai_profile="Canola", region="MB"),  # new
+    ]
+    result = asyncio.run(index_service.index_producers(items))
+
+    assert result.indexed == 2 and result.skipped == 2
+    assert calls["embed"] == [["AI Profile: Lentils", "AI Profile: Canola"]]
+    assert [row[0] for row in calls["upsert"][0]] == ["p3", "p4"]
+    assert calls["upsert"][0][0][4] == stored["p3"]["content_hash"]
+    assert [row[0] for row in calls["metadata"][0]] == ["p2"]
+
+
+def test_index_chunks_embeds_only_changed_profiles(monkeypatch):
+    model = index_service.vector_service.model
+    stored = {"p1": {"content_hash": index_service._chunks_hash("## Oats\nHulless oats."), "embedding_model": model}}
+    calls = {"embed": [], "replace": []}
+
+    async def fake_chunk_fingerprints(ids):
+        return {i: stored[i] for i in ids if i in stored}
+
+    async def fake_get_embeddings(texts):
+        calls["embed"].append(list(texts))
+        return [[float(i)] for i in range(len(texts))]
+
+    async def fake_replace_chunks(rows):
+        calls["replace"].append(rows)
+        return sum(len(chunks) for _, chunks, _ in rows)
+
+    monkeypatch.setattr(index_service.settings, "SEARCH_CHUNKS_ENABLED", True)
+    monkeypatch.setattr(index_service.vector_service, "chunk_fingerprints", fake_chunk_fingerprints)
+    monkeypatch.setattr(index_service.vector_service, "replace_chunks", fake_replace_chunks)
+    monkeypatch.setattr(index_service.embedding_service, "get_embeddings", fake_get_embeddings)
+
+    changed = asyncio.run(index_service._index_chunks([
+        ("p1", "## Oats\nHulless oats."),  # unchanged
+        ("p2", "## Lentils\nRed lentils.\n## Peas\nYellow peas."),
+    ]))
+
+    assert changed == 1
+    assert calls["embed"] == [["Lentils\n\nRed lentils.", "Peas\n\nYellow peas."]]
+    (row,) = calls["replace"][0]
+    assert row[0] == "p2" and row[2] == index_service._chunks_hash("## Lentils\nRed lentils.\n## Peas\nYellow peas.")
+    assert row[1] == [("Lentils", "Red lentils.", [0.0]), ("Peas", "Yellow peas.", [1.0])]
+
+
+def test_failed_chunking_does_not_fail_the_indexing(monkeypatch):
+    monkeypatch.setattr(index_service.settings, "SEARCH_CHUNKS_ENABLED", True)
+    mirrored = []
+
+    async def no_fingerprints(ids):
+        return {}
+
+    async def fake_get_embeddings(texts):
+        if any(text.startswith("Oats") for text in texts):  # the chunk call
+            raise ConnectionError("embeddings service unavailable")
+        return [[0.0] for _ in texts]
+
+    async def fake_upsert_many(rows):
+        return len(rows)
+
+    async def fake_update_metadata_many(rows):
+        return len(rows)
+
+    async def no_notify(rows):
+        return 0
+
+    async def fake_mirror(embedded, metadata_only, entries):
+        mirrored.append([row[0] for row in embedded])
+
+    monkeypatch.setattr(index_service.vector_service, "fingerprints", no_fingerprints)
+    monkeypatch.setattr(index_service.vector_service, "chunk_fingerprints", no_fingerprints, raising=False)
+    monkeypatch.setattr(index_service.embedding_service, "get_embeddings", fake_get_embeddings)
+    monkeypatch.setattr(index_service.vector_service, "upsert_many", fake_upsert_many)
+    monkeypatch.setattr(index_service.vector_service, "update_metadata_many", fake_update_metadata_many)
+    monkeypatch.setattr(index_service.standing_query_service, "notify", no_notify)
+    monkeypatch.setattr(index_service, "_mirror_writes", fake_mirror)
+
+    items = [
+        IndexRequest(profile_id="p1", ai_profile="## Oats\nHulless oats.", region="SK"),
+        IndexRequest(profile_id="p2", ai_profile="## Peas\nYellow peas.", region="SK"),
+    ]
+    result = asyncio.run(index_service.index_producers(items))
+
+    assert result.success and result.indexed == 2
+    assert mirrored == [["p1", "p2"]]
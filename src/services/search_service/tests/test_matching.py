@@ -0,0 +1,40 @@
+import numpy as np
+
+from src.services.matching import overlap, top_k_matches
+
+
+def _brute_force(queries, corpus, k, allowed):
+    unit_q = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    unit_c = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+    sims = np.where(allowed, unit_q @ unit_c.T, -np.inf)
+    rows = np.argsort(-sims, axis=1, kind="stable")[:, :k]
+    return rows, np.take_along_axis(sims, rows, axis=1)
+
+
+def test_blocked_top_k_matches_brute_force_with_constraints():
+    rng = np.random.default_rng(3)
+    queries, corpus = rng.normal(size=(70, 12)).astype(np.float32), rng.normal(size=(230, 12)).astype(np.float32)
+    crops = ["wheat", "Lentils", "coffee"]
+    query_crops = [list(rng.choice(crops, size=rng.integers(0, 3), replace=False)) for _ in queries]
+    corpus_crops = [list(rng.choice(crops, size=rng.integers(0, 3), replace=False)) for _ in corpus]
+    allowed = np.array([
+        [not a or not b or bool({x.lower() for x in a} & {x.lower() for x in b}) for b in corpus_crops]
+        for a in query_crops
+    ])
+
+    rows, scores = top_k_matches(queries, corpus, 6, "cosine", [overlap(query_crops, corpus_crops)], block_rows=16, block_cols=50)
+    expected_rows, expected_scores = _brute_force(queries, corpus, 6, allowed)
+    assert np.allclose(scores, expected_scores, atol=1e-5)
+    assert (rows == expected_rows).all()
+
+
+def test_pairs_without_a_shared_value_are_left_out():
+    queries = np.eye(2, dtype=np.float32)
+    corpus = np.array([[1, 0], [0.9, 0.1], [0, 1]], dtype=np.float32)
+    rows, scores = top_k_matches(queries, corpus, 3, "cosine", [overlap(["coffee", ["teff"]], [["coffee"], "sesame", ["teff", "coffee"]])])
+    assert rows.tolist() == [[0, 2, -1], [2, -1, -1]]
+    assert np.isinf(scores[1, 1:]).all()
+    # Swapping the sides swaps the constraint with them
+    flipped = overlap(["coffee", ["teff"]], [["coffee"], "sesame", ["teff", "coffee"]]).transposed()
+    rows, _ = top_k_matches(corpus, queries, 2, "cosine", [flipped])
+    assert rows.tolist() == [[0, -1], [-1, -1], [1, 0]]
@@ -0,0 +1,138 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from src.core.config import settings
+from src.services.memory_vector_service import MemoryVectorService
+
+DIM = 8
+
+
+@pytest.fixture
+def small_dimension(monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_DIMENSION", DIM)
+
+
+def _rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, DIM)).astype(np.float32)
+    return [
+        (f"p{i}", vectors[i], {"region": ["SK", "AB"][i % 2], "certifications": ["organic"] if i % 3 == 0 else []}, f"farm {i} grows lentils", None)
+        for i in range(n)
+    ], vectors
+
+
+def _exact_cosine(vectors, query, k):
+    sims = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    order = np.argsort(-sims)[:k]
+    return [f"p{i}" for i in order], sims[order]
+
+
+def test_exact_search_matches_brute_force(small_dimension):
+    rows, vectors = _rows(200)
+    svc = MemoryVectorService(path="", metric="cosine", index_mode="exact")
+    asyncio.run(svc.upsert_many(rows))
+    hits = asyncio.run(svc.query(vectors[7], 5))
+    ids, sims = _exact_cosine(vectors, vectors[7], 5)
+    assert [h["id"] for h in hits] == ids
+    assert np.allclose([h["score"] for h in hits], sims, atol=1e-5)
+
+
+def test_filters_and_ivf_fallback(small_dimension, monkeypatch):
+    monkeypatch.setattr(settings, "SEARCH_MEMORY_IVF_PROBES", 1)
+    rows, vectors = _rows(400)
+    svc = MemoryVectorService(path="", metric="cosine", index_mode="ivf")
+    asyncio.run(svc.upsert_many(rows))
+    assert asyncio.run(svc.ensure_index()) == "memory-ivf"
+    hits = asyncio.run(svc.query(vectors[3], 50, {"region": "AB", "certifications": {"$in": ["organic"]}}))
+    # Rows 3, 9, 15, ... match (67 of them); one probed list cannot fill 50, so they are ranked exactly
+    ids, _ = _exact_cosine(vectors[3::6], vectors[3], 50)
+    assert [h["id"] for h in hits] == [f"p{6 * int(i[1:]) + 3}" for i in ids]
+
+
+def test_ivf_with_every_list_probed_is_exact(small_dimension, monkeypatch):
+    monkeypatch.setattr(settings, "SEARCH_MEMORY_IVF_PROBES", 1000)
+    rows, vectors = _rows(300)
+    svc = MemoryVectorService(path="", metric="l2", index_mode="ivf")
+    asyncio.run(svc.upsert_many(rows))
+    hits = asyncio.run(svc.query(vectors[0] + 0.01, 10))
+    expected = np.argsort(np.linalg.norm(vectors - (vectors[0] + 0.01), axis=1))[:10]
+    assert [h["id"] for h in hits] == [f"p{i}" for i in expected]
+
+
+def test_persists_and_reloads(small_dimension, tmp_path):
+    rows, vectors = _rows(50)
+    svc = MemoryVectorService(path=str(tmp_path), metric="inner_product")
+    asyncio.run(svc.upsert_many(rows[:30]))
+    asyncio.run(svc.upsert_many(rows[30:]))
+    asyncio.run(svc.upsert("p1", vectors[2], {"region": "MB"}, "moved", "hash-1"))
+    asyncio.run(svc.close())
+    with open(tmp_path / "rows.jsonl", "a") as f:
+        f.write('{"id": "torn')
+
+    reloaded = MemoryVectorService(path=str(tmp_path), metric="inner_product")
+    assert len(reloaded._ids) == 50
+    assert (tmp_path / "vectors.f32").stat().st_size == 50 * DIM * 4
+    hits = asyncio.run(reloaded.query(vectors[2], 2, {"region": "MB"}, include=["region", "ai_profile_excerpt"]))
+    assert hits == [{"id": "p1", "score": pytest.approx(float(vectors[2] @ vectors[2]), rel=1e-5),
+                     "fields": {"region": "MB", "ai_profile_excerpt": "moved"}}]
+    stored = asyncio.run(reloaded.fingerprints(["p1", "missing"], with_embedding=True))
+    assert list(stored) == ["p1"] and stored["p1"]["content_hash"] == "hash-1"
+    assert np.allclose(stored["p1"]["embedding"], vectors[2])
+    assert asyncio.run(reloaded.delete_all()) == 50
+    assert MemoryVectorService(path=str(tmp_path))._ids == []
+
+
+def test_hybrid_fuses_term_matches(small_dimension):
+    rows, vectors = _rows(20)
+    rows[11] = ("p11", rows[11][1], rows[11][2], "certified CERT-42 organic lentils", None)
+    svc = MemoryVectorService(path="")
+    asyncio.run(svc.upsert_many(rows))
+    hits = asyncio.run(svc.query(vectors[0], 3, mode="hybrid", query_text="cert-42"))
+    assert {h["id"] for h in hits[:2]} == {"p0", "p11"}
+
+
+def test_similar_excludes_the_source(small_dimension):
+    rows, vectors = _rows(100)
+    svc = MemoryVectorService(path="", metric="cosine", index_mode="exact")
+    asyncio.run(svc.upsert_many(rows))
+    hits = asyncio.run(svc.similar("p7", 5, {"region": "AB"}))
+    ids, _ = _exact_cosine(vectors, vectors[7], 100)
+    expected = [i for i in ids if i != "p7" and int(i[1:]) % 2 == 1][:5]
+    assert [h["id"] for h in hits] == expected
+    with pytest.raises(LookupError):
+        asyncio.run(svc.similar("missing", 5))
+
+
+def test_distance_weight_prefers_nearby_participants(small_dimension):
+    rows, vectors = _rows(60)
+    # Every other participant sits at the port, the rest 2000 km away
+    for i, row in enumerate(rows):
+        row[2]["coordinates"] = {"latitude": 49.29 if i % 2 else 31.3, "longitude": -123.11}
+    svc = MemoryVectorService(path="", metric="cosine", index_mode="exact")
+    asyncio.run(svc.upsert_many(rows))
+    plain = asyncio.run(svc.query(vectors[0], 10))
+    blended = asyncio.run(svc.query(vectors[0], 10, geo_blend=(49.29, -123.11, 0.9, 100.0)))
+    assert any(int(h["id"][1:]) % 2 == 0 for h in plain)
+    assert all(int(h["id"][1:]) % 2 == 1 for h in blended)
+    assert blended[0]["score"] <= 1.0 and blended == sorted(blended, key=lambda h: -h["score"])
+
+
+def test_facets_count_the_filtered_set(small_dimension):
+    rows, _ = _rows(30)
+    svc = MemoryVectorService(path="", metric="cosine", index_mode="exact")
+    asyncio.run(svc.upsert_many(rows))
+    assert asyncio.run(svc.facets(["region", "certifications"])) == {"region": {"AB": 15, "SK": 15}, "certifications": {"organic": 10}}
+    # Counts cover every match, not only a page of hits; the limit keeps the most frequent values
+    assert asyncio.run(svc.facets(["region"], {"certifications": {"$in": ["organic"]}}, limit=1)) == {"region": {"AB": 5}}
+    with pytest.raises(ValueError):
+        asyncio.run(svc.facets(["farm_name"]))
+
+
+def test_query_batch_matches_single_queries(small_dimension):
+    rows, vectors = _rows(40)
+    svc = MemoryVectorService(path="", metric="cosine", index_mode="exact")
+    asyncio.run(svc.upsert_many(rows))
+    pages = asyncio.run(svc.query_batch([vectors[1], vectors[2]], 3, {"region": "SK"}))
+    assert pages == [asyncio.run(svc.query(vectors[i], 3, {"region": "SK"})) for i in (1, 2)]
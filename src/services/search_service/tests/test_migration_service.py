@@ -0,0 +1,190 @@
+import asyncio
+
+import pytest
+
+from src.schema.search_schema import IndexRequest
+from src.services import index_service
+from src.services.migration_service import (
+    CHANNEL, SAVED_SEARCH_CHECK, SAVED_SEARCH_COLUMN, MigrationService, OutOfSync, migration_service, overlap_at_k, rank_biased_overlap,
+)
+from src.services.vector_service import VectorService
+
+
+def test_overlap_at_k():
+    assert overlap_at_k(["a", "b", "c", "d"], ["d", "x", "a", "y"]) == 0.5
+    assert overlap_at_k([], []) == 1.0
+    assert overlap_at_k([], ["a"]) == 0.0
+
+
+def test_rank_biased_overlap_weights_the_top():
+    assert rank_biased_overlap(["a", "b", "c"], ["a", "b", "c"]) == pytest.approx(1.0)
+    assert rank_biased_overlap(["a", "b"], ["c", "d"]) == 0.0
+    # Same members, swapped at the top vs. at the bottom
+    top = rank_biased_overlap(["a", "b", "c", "d"], ["b", "a", "c", "d"])
+    bottom = rank_biased_overlap(["a", "b", "c", "d"], ["a", "b", "d", "c"])
+    assert bottom > top > 0.5
+
+
+def test_target_store_uses_the_target_version():
+    live = VectorService(metric="l2", index_type="hnsw", precision="half")
+    svc = MigrationService(target=live)
+    target = svc._target_service({
+        "target_table": svc.target_table, "target_model": "large-v3", "target_dimension": 768,
+    })
+    assert target.table == "participant_embeddings__migrate"
+    assert target.chunk_table == "participant_embeddings__migrate_chunks"
+    assert (target.model, target.dimension, target.metric_name) == ("large-v3", 768, "l2")
+    assert target._ann_key()[0] == "(embedding::halfvec(768))"
+
+
+class _FakeConn:
+    """Records statements; answers the existence checks and the pending-row counts of a cut-over."""
+
+    def __init__(self, pending=0, chunks=True, saved=True, missing=0):
+        self.pending, self.chunks, self.saved, self.missing = pending, chunks, saved, missing
+        self.executed = []
+
+    async def fetchval(self, sql, *args):
+        if "to_regclass" in sql:
+            return self.chunks
+        if "information_schema.columns" in sql:
+            return self.saved
+        if sql.startswith("SELECT count(*) FROM ("):
+            return self.pending
+        if "count(*)" in sql:
+            return self.missing
+        return None
+
+    async def fetch(self, sql, *args):
+        return []
+
+    async def execute(self, sql, *args):
+        self.executed.append(" ".join(sql.split()))
+
+
+def _migration_service():
+    svc = MigrationService(target=VectorService(metric="cosine", index_type="hnsw"))
+    target = svc._target_service({"target_table": svc.target_table, "target_model": "large-v3", "target_dimension": 768})
+    return svc, target
+
+
+def test_applicable_skips_missing_chunk_table_and_saved_search_column():
+    svc, target = _migration_service()
+    assert set(asyncio.run(svc._applicable(_FakeConn(), target))) == {"stale", "metadata", "gone", "chunks", "saved_searches"}
+    assert set(asyncio.run(svc._applicable(_FakeConn(chunks=False, saved=False), target))) == {"stale", "metadata", "gone"}
+
+
+def test_swap_rolls_back_when_rows_changed_since_the_sync():
+    svc, target = _migration_service()
+    conn = _FakeConn(pending=2)
+    with pytest.raises(OutOfSync):
+        asyncio.run(svc._swap(conn, {"id": "m1", "target_model": "large-v3"}, target))
+    # Only the shared lock was taken: nothing dropped or renamed
+    assert len(conn.executed) == 1 and conn.executed[0].endswith("IN SHARE MODE")
+
+
+def test_swap_refuses_to_drop_rows_the_target_lacks():
+    svc, target = _migration_service()
+    conn = _FakeConn(missing=3)
+    with pytest.raises(RuntimeError, match="3 live rows"):
+        asyncio.run(svc._swap(conn, {"id": "m1", "target_model": "large-v3"}, target))
+    assert not any("DROP" in sql or "RENAME" in sql for sql in conn.executed)
+
+
+def test_rows_indexed_before_document_are_copied_from_the_source_text():
+    svc, target = _migration_service()
+    diff = {kind: " ".join(sql.split()) for kind, sql in svc._diff_sql(target).items()}
+    text = "COALESCE(NULLIF(l.document, ''), pr.ai_profile, pt.data ->> 'ai_profile', '')"
+    assert f"SELECT l.id, {text} AS document" in diff["stale"] and f"WHERE {text} <> ''" in diff["stale"]
+    assert "LEFT JOIN producers pr ON pr.id = l.id" in diff["stale"]
+    # Rows without live chunks keep the chunks the copy cut, instead of re-syncing forever
+    assert "lc.hash IS NOT NULL" in diff["chunks"]
+
+
+def test_swap_only_renames_under_the_exclusive_lock():
+    svc, target = _migration_service()
+    conn = _FakeConn()
+    asyncio.run(svc._swap(conn, {"id": "m1", "target_model": "large-v3"}, target))
+    locked = next(i for i, sql in enumerate(conn.executed) if "ACCESS EXCLUSIVE" in sql)
+    after = conn.executed[locked + 1:]
+    assert "ALTER TABLE participant_embeddings__migrate RENAME TO participant_embeddings" in after
+    assert "ALTER TABLE participant_embeddings__migrate_chunks RENAME TO participant_embeddings_chunks" in after
+    assert f"ALTER TABLE search_saved_searches RENAME COLUMN {SAVED_SEARCH_COLUMN} TO embedding" in after
+    assert f"ALTER TABLE search_saved_searches DROP CONSTRAINT {SAVED_SEARCH_CHECK}" in after
+    # The new column's index was built concurrently during the sync phase
+    assert not any("CREATE INDEX" in sql for sql in after)
+    assert after[-1] == f"NOTIFY {CHANNEL}"
+
+
+def test_target_tables_admit_the_target_model_only():
+    svc, target = _migration_service()
+    conn = _FakeConn()
+    asyncio.run(svc._pin_model(conn, {"target_model": "large-v3"}, target))
+    check = "participant_embeddings_embedding_model_check__migrate"
+    assert conn.executed == [
+        f"ALTER TABLE participant_embeddings__migrate ADD CONSTRAINT {check} "
+        f"CHECK (embedding_model IS NOT DISTINCT FROM 'large-v3') NOT VALID",
+        f"ALTER TABLE participant_embeddings__migrate VALIDATE CONSTRAINT {check}",
+        "ALTER TABLE participant_embeddings__migrate_chunks ADD CONSTRAINT participant_embeddings_chunks_embedding_model_check__migrate "
+        "CHECK (embedding_model IS NOT DISTINCT FROM 'large-v3') NOT VALID",
+        "ALTER TABLE participant_embeddings__migrate_chunks VALIDATE CONSTRAINT participant_embeddings_chunks_embedding_model_check__migrate",
+    ]
+
+
+def test_follow_opens_and_closes_the_mirror():
+    svc, _ = _migration_service()
+    migration = {
+        "id": "m1", "status": "running", "target_table": svc.target_table,
+        "target_model": "large-v3", "target_service": "embeddings-large", "target_dimension": 768,
+    }
+    asyncio.run(svc._follow(migration))
+    target, embedder = svc.mirror()
+    assert (target.table, target.dimension, embedder.model, embedder.dimension) == (svc.target_table, 768, "large-v3", 768)
+    # A reload that finds no open migration (cut over or cancelled) stops the dual-write
+    asyncio.run(svc._follow(None))
+    assert svc.mirror() is None
+
+
+def test_index_writes_are_mirrored_to_the_target(monkeypatch):
+    monkeypatch.setattr(index_service.settings, "SEARCH_CHUNKS_ENABLED", False)
+    calls = {"live": [], "target": [], "target_metadata": [], "target_embed": []}
+
+    async def live_embeddings(texts):
+        return [[1.0] for _ in texts]
+
+    async def no_fingerprints(ids):
+        return {}
+
+    async def live_upsert(rows):
+        calls["live"].append(rows)
+        return len(rows)
+
+    async def noop(rows):
+        return 0
+
+    class _Target:
+        async def upsert_many(self, rows):
+            calls["target"].append(rows)
+            return len(rows)
+
+        async def update_metadata_many(self, rows):
+            calls["target_metadata"].append(rows)
+            return len(rows)
+
+    class _Embedder:
+        async def get_embeddings(self, texts):
+            calls["target_embed"].append(list(texts))
+            return [[2.0, 2.0] for _ in texts]
+
+    monkeypatch.setattr(index_service.embedding_service, "get_embeddings", live_embeddings)
+    monkeypatch.setattr(index_service.vector_service, "fingerprints", no_fingerprints)
+    monkeypatch.setattr(index_service.vector_service, "upsert_many", live_upsert)
+    monkeypatch.setattr(index_service.vector_service, "update_metadata_many", noop)
+    monkeypatch.setattr(index_service.standing_query_service, "notify", noop)
+    monkeypatch.setattr(migration_service, "mirror", lambda: (_Target(), _Embedder()))
+
+    items = [IndexRequest(profile_id="p1", ai_profile="Durum wheat", region="SK"), IndexRequest(profile_id="p2", ai_profile="Oats", region="AB")]
+    asyncio.run(index_service.index_producers(items))
+    # Same texts, re-embedded by the target model, same ids, metadata and content hashes as the live rows
+    assert calls["target_embed"] == [[index_service._text_to_embed("Durum wheat"), index_service._text_to_embed("Oats")]]
+    assert [(r[0], r[1], r[2], r[4]) for r in calls["target"][0]] == [(r[0], [2.0, 2.0], r[2], r[4]) for r in calls["live"][0]]
@@ -0,0 +1,67 @@
+import numpy as np
+
+from src.services.mmr import mmr_order, mmr_rerank
+
+
+def _eager_mmr(query, vectors, k, lambda_):
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    relevance = unit @ (query / np.linalg.norm(query))
+    picked, redundancy = [], np.zeros(len(vectors))
+    for _ in range(min(k, len(vectors))):
+        scores = lambda_ * relevance - (1 - lambda_) * redundancy if picked else relevance.copy()
+        scores[picked] = -np.inf
+        best = int(np.argmax(scores))
+        picked.append(best)
+        sims = unit @ unit[best]
+        redundancy = sims if len(picked) == 1 else np.maximum(redundancy, sims)
+    return picked
+
+
+def test_lambda_one_keeps_relevance_order():
+    rng = np.random.default_rng(1)
+    vectors, query = rng.normal(size=(30, 16)), rng.normal(size=16)
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    assert mmr_order(query, vectors, 5, 1.0) == list(np.argsort(-(unit @ query))[:5])
+
+
+def test_matches_eager_mmr():
+    rng = np.random.default_rng(2)
+    for _ in range(50):
+        n, dim = int(rng.integers(2, 60)), int(rng.integers(2, 24))
+        centers = rng.normal(size=(max(1, n // 4), dim))
+        vectors = (centers[rng.integers(0, len(centers), n)] + rng.normal(size=(n, dim)) * 0.1).astype(np.float32)
+        query = rng.normal(size=dim).astype(np.float32)
+        k, lambda_ = int(rng.integers(1, 12)), float(rng.uniform(0, 0.95))
+        assert mmr_order(query, vectors, k, lambda_) == _eager_mmr(query.astype(np.float64), vectors.astype(np.float64), k, lambda_)
+
+
+def test_near_duplicates_are_spread():
+    query = np.array([1.0, 0.0, 0.0])
+    duplicate = np.array([0.9, 0.43, 0.0])
+    hits = [
+        {"id": "coop-a-1", "score": 0.91, "embedding": duplicate},
+        {"id": "coop-a-2", "score": 0.90, "embedding": duplicate + [0, 0.01, 0]},
+        {"id": "coop-a-3", "score": 0.90, "embedding": duplicate + [0, 0.02, 0]},
+        {"id": "other", "score": 0.80, "embedding": np.array([0.8, 0.0, 0.6])},
+    ]
+    assert [h["id"] for h in mmr_rerank(query, hits, 2, 1.0)] == ["coop-a-1", "coop-a-2"]
+    reranked = mmr_rerank(query, hits, 2, 0.5)
+    assert [h["id"] for h in reranked] == ["coop-a-1", "other"]
+    assert reranked[1] == {"id": "other", "score": 0.80}
+
+
+def test_k_larger_than_candidates():
+    vectors = np.eye(3)
+    assert sorted(mmr_order(np.ones(3), vectors, 10, 0.3)) == [0, 1, 2]
+    assert mmr_rerank(np.ones(3), [], 5, 0.5) == []
+
+
+def test_many_identical_candidates_terminate_and_spread():
+    # More tied bounds than one refresh covers: duplicate listings of 5 cooperatives
+    rng = np.random.default_rng(3)
+    bases = rng.normal(size=(5, 8)).astype(np.float32)
+    vectors = np.repeat(bases, 40, axis=0)
+    query = rng.normal(size=8).astype(np.float32)
+    order = mmr_order(query, vectors, 10, 0.5)
+    assert len(order) == len(set(order)) == 10
+    assert {i // 40 for i in order[:5]} == set(range(5))
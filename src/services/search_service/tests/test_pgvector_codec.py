@@ -0,0 +1,25 @@
+from array import array
+
+import numpy as np
+import pytest
+
+from src.database.pgvector_codec import decode_vector, encode_vector
+
+
+def test_round_trip_preserves_float32_values():
+    vec = np.array([0.25, -1.5, 3.0], dtype=np.float32)
+    decoded = decode_vector(encode_vector(vec))
+    assert decoded.dtype == np.float32
+    np.testing.assert_array_equal(decoded, vec)
+
+
+def test_encodes_pgvector_header_and_accepts_array_and_list():
+    wire = encode_vector(array("f", [1.0, 2.0]))
+    assert wire[:4] == b"\x00\x02\x00\x00"
+    assert len(wire) == 4 + 2 * 4
+    assert wire == encode_vector([1.0, 2.0])
+
+
+def test_rejects_matrix():
+    with pytest.raises(ValueError):
+        encode_vector(np.zeros((2, 2), dtype=np.float32))
@@ -0,0 +1,49 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.services.memory_vector_service import MemoryVectorService
+from src.services.reindex_service import ReindexService, _progress
+
+
+def _job(**overrides):
+    job = {
+        "status": "running", "phase": "copy", "total": 1000, "processed": 400, "run_processed": 100,
+        "run_started_at": datetime.now(timezone.utc) - timedelta(seconds=10),
+    }
+    job.update(overrides)
+    return job
+
+
+def test_progress_reports_throughput_of_current_run_and_eta():
+    job = _progress(_job())
+    assert job["percent"] == 40.0
+    assert job["throughput_per_sec"] == pytest.approx(30, rel=0.05)
+    assert job["eta_seconds"] == pytest.approx(20, abs=1)
+
+
+def test_progress_has_no_eta_once_copy_is_done_or_stopped():
+    assert _progress(_job(phase="catchup"))["eta_seconds"] is None
+    stopped = _progress(_job(status="interrupted"))
+    assert stopped["throughput_per_sec"] is None and stopped["eta_seconds"] is None
+
+
+def test_reindex_needs_pgvector_backend():
+    svc = ReindexService(target=MemoryVectorService(path=""))
+    with pytest.raises(RuntimeError):
+        asyncio.run(svc.start())
+
+
+def test_prune_drops_shadow_rows_outside_the_source():
+    sql = " ".join(ReindexService()._prune_sql().split())
+    assert sql.startswith("DELETE FROM participant_embeddings__reindex s WHERE NOT EXISTS")
+    # Same eligibility rule as the copy: deactivated or unapproved participants are pruned
+    assert "pt.status = 'active'" in sql and "pr.status = 'approved'" in sql and sql.endswith("WHERE src.id = s.id)")
+
+
+def test_swap_recheck_counts_every_participant_edit():
+    sql = ReindexService._edited_sql()
+    # Deactivations count too: they are not in the source, but the shadow must drop them
+    assert "status" not in sql
+    assert "pt.updated_at >= $1 OR pr.updated_at >= $1" in sql and "LEFT JOIN producers pr" in sql
@@ -0,0 +1,130 @@
+import asyncio
+
+from src.services.memory_vector_service import MemoryVectorService
+from src.services.result_cache import ResultCache, result_cache
+
+
+REQUEST = {"query": "Organic  Durum", "top_k": 5, "filters": {"region": "Saskatchewan", "certifications": {"$in": ["organic"]}}}
+
+
+def test_request_key_normalizes_query_and_field_order():
+    same = {"filters": {"certifications": {"$in": ["organic"]}, "region": "Saskatchewan"}, "top_k": 5, "query": "organic durum"}
+    assert ResultCache.request_key(REQUEST) == ResultCache.request_key(same)
+    assert ResultCache.request_key(REQUEST) != ResultCache.request_key({**REQUEST, "top_k": 6})
+
+
+def test_invalidate_retires_cached_pages():
+    cache = ResultCache(maxsize=8, ttl=60, use_redis=False, enabled=True)
+    key = cache.request_key(REQUEST)
+    page = [{"id": "p1", "score": 0.9, "fields": None}]
+
+    async def run():
+        version = await cache.version()
+        assert await cache.get(key, version) is None
+        await cache.set(key, version, page)
+        assert await cache.get(key, await cache.version()) == page
+        await cache.invalidate()
+        return await cache.get(key, await cache.version())
+
+    assert asyncio.run(run()) is None
+    stats = cache.stats()
+    assert stats["local_hits"] == 1 and stats["misses"] == 2 and stats["invalidations"] == 1
+
+
+def test_disabled_cache_never_answers():
+    cache = ResultCache(maxsize=8, ttl=60, use_redis=False, enabled=False)
+
+    async def run():
+        version = await cache.version()
+        await cache.set("k", version, [])
+        return version, await cache.get("k", version)
+
+    assert asyncio.run(run()) == (None, None)
+
+
+class _BrokenRedis:
+    async def get(self, key):
+        raise ConnectionError("down")
+
+    async def incr(self, key):
+        raise ConnectionError("down")
+
+
+def test_unreadable_shared_version_bypasses_cache(monkeypatch):
+    cache = ResultCache(maxsize=8, ttl=60, use_redis=True, enabled=True)
+    monkeypatch.setattr(cache, "_redis", lambda: _BrokenRedis())
+
+    async def run():
+        await cache.invalidate()
+        return await cache.version()
+
+    assert asyncio.run(run()) is None
+    assert cache.stats()["bypassed"] == 1 and cache.local_version == 1
+
+
+def test_vector_store_writes_bump_the_version():
+    svc = MemoryVectorService(path="", metric="cosine", index_mode="exact")
+    before = result_cache.local_version
+    asyncio.run(svc.upsert_many([("p1", [1.0] + [0.0] * (svc.dimension - 1), {}, "doc", None)]))
+    asyncio.run(svc.update_metadata_many([("p1", {"region": "Alberta"})]))
+    asyncio.run(svc.delete_all())
+    assert result_cache.local_version == before + 3
+
+
+def test_cached_pages_keep_the_ranking_and_revalidate_fields(monkeypatch):
+    from src.routes import search_route
+
+    seen = {}
+
+    async def revalidate(ids, include):
+        seen["ids"], seen["include"] = ids, include
+        # p2 left the index after the page was cached; p1's region was edited
+        return {"p1": {"region": "Alberta"}}
+
+    monkeypatch.setattr(search_route.vector_service, "revalidate", revalidate)
+    page = search_route._ranking([{"id": "p1", "score": 0.9, "fields": {"region": "Old"}}, {"id": "p2", "score": 0.8, "fields": None}])
+    assert page == [{"id": "p1", "score": 0.9}, {"id": "p2", "score": 0.8}]
+    pages = asyncio.run(search_route._revalidated([page], ["region"]))
+    assert pages == [[{"id": "p1", "score": 0.9, "fields": {"region": "Alberta"}}]]
+    assert seen == {"ids": ["p1", "p2"], "include": ["region"]}
+
+
+def test_memory_store_revalidates_indexed_ids():
+    svc = MemoryVectorService(path="", metric="cosine", index_mode="exact")
+    asyncio.run(svc.upsert_many([("p1", [1.0] + [0.0] * (svc.dimension - 1), {"region": "Alberta"}, "doc", None)]))
+    assert asyncio.run(svc.revalidate(["p1", "gone"], ["region"])) == {"p1": {"region": "Alberta"}}
+    assert asyncio.run(svc.revalidate(["p1"])) == {"p1": None}
+
+
+class _SharedRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def incr(self, key):
+        self.data[key] = int(self.data.get(key) or 0) + 1
+
+
+def test_replicas_share_pages_whatever_their_own_write_counts(monkeypatch):
+    redis = _SharedRedis()
+    writer = ResultCache(maxsize=8, ttl=60, use_redis=True, enabled=True)
+    reader = ResultCache(maxsize=8, ttl=60, use_redis=True, enabled=True)
+    for cache in (writer, reader):
+        monkeypatch.setattr(cache, "_redis", lambda: redis)
+    key = writer.request_key(REQUEST)
+    page = [{"id": "p1", "score": 0.9}]
+
+    async def run():
+        await writer.invalidate()  # only the writer's local counter moves
+        await writer.set(key, await writer.version(), page)
+        shared = await reader.get(key, await reader.version())
+        await reader.invalidate()
+        return shared, await writer.get(key, await writer.version())
+
+    assert asyncio.run(run()) == (page, None)
+    assert reader.stats()["redis_hits"] == 1
@@ -0,0 +1,41 @@
+import numpy as np
+
+from benchmarks.search.corpus import exact_top_k, fallback_embedding, participant
+from benchmarks.search.runner import find_regressions, latency_summary, recall_at_k
+
+
+def test_corpus_is_deterministic():
+    assert participant(7) == participant(7)
+    vec = fallback_embedding("AI Profile: " + participant(7)[1], 64)
+    assert vec == fallback_embedding("AI Profile: " + participant(7)[1], 64)
+    assert abs(np.linalg.norm(vec) - 1.0) < 1e-9
+
+
+def test_exact_top_k_merges_blocks():
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((500, 16)).astype(np.float32)
+    queries = rng.standard_normal((4, 16)).astype(np.float32)
+    for metric in ("cosine", "inner_product", "l2"):
+        if metric == "cosine":
+            scores = (queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).T
+        elif metric == "l2":
+            scores = -np.linalg.norm(vectors[None, :, :] - queries[:, None, :], axis=2)
+        else:
+            scores = queries @ vectors.T
+        expected = np.argsort(-scores, axis=1)[:, :5]
+        assert (exact_top_k(vectors, queries, 5, metric, block=64) == expected).all()
+
+
+def test_recall_and_latency_summary():
+    truth = np.array([[0, 1], [2, 3]])
+    assert recall_at_k([["bench-0000000", "bench-0000009"], ["bench-0000003", "bench-0000002"]], truth) == 0.75
+    summary = latency_summary([float(i) for i in range(1, 101)])
+    assert summary["p50"] == 50.5 and summary["p99"] > summary["p95"] > summary["p50"]
+
+
+def test_find_regressions():
+    base = {"results": [{"backend": "pgvector", "size": 10, "latency_ms": {"p95": 10, "p99": 20}, "qps": 100, "recall_at_10": 0.95}]}
+    same = {"results": [{"backend": "pgvector", "size": 10, "latency_ms": {"p95": 11, "p99": 21}, "qps": 95, "recall_at_10": 0.945}]}
+    worse = {"results": [{"backend": "pgvector", "size": 10, "latency_ms": {"p95": 15, "p99": 20}, "qps": 60, "recall_at_10": 0.9}]}
+    assert find_regressions(same, base, 0.2) == []
+    assert len(find_regressions(worse, base, 0.2)) == 3
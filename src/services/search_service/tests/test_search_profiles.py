@@ -0,0 +1,52 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from src.services import search_profiles
+from src.services.search_profiles import SearchProfile
+from src.services.vector_service import VectorService
+
+
+def test_load_profiles_overrides_and_adds():
+    profiles = search_profiles.load_profiles('{"balanced": {"ef_search": 80}, "nightly": {"ef_search": 600, "probes": 60}}')
+    assert profiles["balanced"] == SearchProfile(ef_search=80, probes=10)
+    assert profiles["nightly"] == SearchProfile(ef_search=600, probes=60)
+    assert profiles["fast"] == search_profiles.DEFAULT_PROFILES["fast"]
+    for raw in ('{"fast": {"ef_search": 5000}}', '{"fast": {"lists": 4}}', "[1]", "not json"):
+        with pytest.raises(ValueError):
+            search_profiles.load_profiles(raw)
+
+
+def test_resolve_defaults_and_rejects_unknown(monkeypatch):
+    monkeypatch.setattr(search_profiles.settings, "SEARCH_DEFAULT_PROFILE", "fast")
+    assert search_profiles.resolve(None) == "fast"
+    assert search_profiles.resolve("exhaustive") == "exhaustive"
+    with pytest.raises(ValueError, match="Unknown search profile"):
+        search_profiles.resolve("thorough")
+
+
+class _Conn:
+    def __init__(self):
+        self.executed = []
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def execute(self, sql):
+        self.executed.append(sql)
+
+    async def fetch(self, sql, *args):
+        return []
+
+
+def test_fetch_ann_sets_the_profile_for_the_transaction():
+    hnsw, ivf = VectorService(index_type="hnsw"), VectorService(index_type="ivfflat")
+    conn = _Conn()
+    asyncio.run(hnsw._fetch_ann(conn, "SELECT 1", [], 10, "exhaustive"))
+    asyncio.run(hnsw._fetch_ann(conn, "SELECT 1", [], 700, "fast"))  # a deeper page raises ef_search
+    asyncio.run(ivf._fetch_ann(conn, "SELECT 1", [], 10, "balanced"))
+    asyncio.run(ivf._fetch_ann(conn, "SELECT 1", [], 0, "balanced"))  # exact pre-filtered ranking: nothing to set
+    assert conn.executed == ["SET LOCAL hnsw.ef_search = 400", "SET LOCAL hnsw.ef_search = 700", "SET LOCAL ivfflat.probes = 10"]
+    assert ivf.ann_settings("balanced") == {"profile": "balanced", "index_type": "ivfflat", "probes": 10}
@@ -0,0 +1,39 @@
+from src.services.standing_query_service import StandingQueryService, select_matches
+from src.services.vector_service import VectorService
+
+
+def _candidate(search, participant, score, min_score=0.5, owner="buyer", filters=None):
+    return {
+        "saved_search_id": search, "owner_id": owner, "participant_id": participant,
+        "score": score, "min_score": min_score, "filters": filters,
+    }
+
+
+def test_select_matches_applies_min_score_filters_and_owner():
+    metadata = {
+        "p1": {"region": "SK", "primary_crops": ["lentils"]},
+        "p2": {"region": "AB", "primary_crops": ["canola"]},
+    }
+    candidates = [
+        _candidate("s1", "p1", 0.9),
+        _candidate("s2", "p1", 0.4),  # below its min_score
+        _candidate("s3", "p1", 0.8, filters='{"primary_crops": {"$in": ["lentils"]}}'),  # stored as jsonb text
+        _candidate("s3", "p2", 0.8, filters='{"primary_crops": {"$in": ["lentils"]}}'),  # filtered out
+        _candidate("s4", "p2", 0.7, min_score=0.7, filters={"region": "AB"}),
+        _candidate("s5", "p2", 0.99, owner="p2"),  # a participant's own saved search
+    ]
+
+    assert select_matches(candidates, metadata) == [
+        ("s1", "buyer", "p1", 0.9),
+        ("s3", "buyer", "p1", 0.8),
+        ("s4", "buyer", "p2", 0.7),
+    ]
+
+
+def test_probe_sql_walks_the_saved_search_index_per_vector():
+    service = StandingQueryService(VectorService(metric="inner_product"))
+    sql = " ".join(service._probe_sql(25).split())
+
+    assert "FROM standing_probe p CROSS JOIN LATERAL" in sql
+    assert "ORDER BY s.embedding <#> p.embedding ASC LIMIT 25" in sql
+    assert "-(s.embedding <#> p.embedding) AS score" in sql
@@ -0,0 +1,218 @@
+import pytest
+
+import asyncio
+from typing import get_args
+
+from src.schema.search_schema import IncludeField
+from src.services.vector_service import PROJECTIONS, VectorService, _plan_index_names
+
+
+def test_search_sql_uses_metric_operator():
+    svc = VectorService(metric="cosine", index_type="hnsw")
+    sql = svc._search_sql([], 5)
+    assert "ORDER BY embedding <=> $1::vector ASC LIMIT 5" in sql
+    assert "1 - (distance) AS score" in sql
+
+    assert "embedding <#> $1::vector" in VectorService(metric="inner_product")._search_sql([], 5)
+    assert "embedding <-> $1::vector" in VectorService(metric="l2")._search_sql([], 5)
+
+
+def test_filtered_search_sql_strategies():
+    svc = VectorService(metric="cosine")
+    pre = svc._search_sql(["metadata @> $2::jsonb"], 5, "pre")
+    assert "WITH filtered AS MATERIALIZED" in pre and "WHERE metadata @> $2::jsonb" in pre
+
+    post = svc._search_sql(["metadata @> $2::jsonb"], 5, "post", 200)
+    assert "LIMIT 200" in post and "MATERIALIZED" not in post
+    assert post.index("LIMIT 200") < post.index("WHERE metadata @> $2::jsonb")
+
+
+def test_create_index_sql_matches_metric():
+    sql = VectorService(metric="inner_product", index_type="ivfflat")._create_index_sql()
+    assert "USING ivfflat (embedding vector_ip_ops)" in sql
+    assert "idx_participant_embeddings_vec_ivfflat_inner_product" in sql
+
+
+def test_unknown_metric_rejected():
+    with pytest.raises(ValueError):
+        VectorService(metric="hamming")
+
+
+def test_plan_index_names_walks_tree():
+    plan = {
+        "Node Type": "Limit",
+        "Plans": [{"Node Type": "Index Scan", "Index Name": "idx_a", "Plans": [{"Index Name": "idx_b"}]}],
+    }
+    assert _plan_index_names(plan) == ["idx_a", "idx_b"]
+
+
+def test_hybrid_sql_fuses_both_legs_with_shared_filters():
+    svc = VectorService(metric="cosine")
+    sql = svc._hybrid_sql(["metadata @> $2::jsonb"], 5, 3)
+    assert "embedding <=> $1::vector AS distance" in sql
+    assert "websearch_to_tsquery('english'::regconfig, $3::text)" in sql
+    assert sql.count("metadata @> $2::jsonb") == 2
+    assert "$4::float8 / ($6::int + vec.rank)" in sql
+    assert "$5::float8 / ($6::int + lex.rank)" in sql
+    assert "FULL OUTER JOIN lex" in sql
+
+
+def test_hydrate_sql_joins_profiles_by_id():
+    svc = VectorService(metric="cosine")
+    sql = svc._hydrate_sql(svc._search_sql([], 5), ["farm_name", "thumbnails"])
+    assert "LEFT JOIN producers pr ON pr.id = r.id" in sql
+    assert "LEFT JOIN participants pt ON pt.id = r.id" in sql
+    assert "AS farm_name" in sql and "AS thumbnails" in sql
+    assert "AS region" not in sql
+    assert sql.rstrip().endswith("ORDER BY r.score DESC")
+
+
+def test_hydrate_sql_can_return_embeddings_alone():
+    svc = VectorService(metric="cosine")
+    sql = svc._hydrate_sql(svc._search_sql([], 50), [], with_embedding=True)
+    assert "SELECT r.id,\n                   r.score,\n                   e.embedding" in sql
+    assert f"JOIN {svc.table} e ON e.id = r.id" in sql
+
+
+def test_include_fields_match_projections():
+    assert set(get_args(IncludeField)) == set(PROJECTIONS)
+
+
+def test_unknown_include_rejected():
+    with pytest.raises(ValueError):
+        asyncio.run(VectorService().query([0.0], 5, include=["email"]))
+
+
+def test_chunk_sql_aggregates_per_participant():
+    svc = VectorService(metric="cosine")
+    best = svc._chunk_sql([], 5)
+    assert f"FROM {svc.chunk_table} ORDER BY embedding <=> $1::vector ASC LIMIT 40" in best
+    assert "max(1 - (distance))" in best and "GROUP BY id" in best
+
+    mean = svc._chunk_sql(["metadata @> $2::jsonb"], 10, "pre", aggregate="mean", top_n=3)
+    assert "avg(1 - (distance))" in mean and "rn <= 3" in mean and "LIMIT 80" in mean
+    assert mean.index(f"FROM {svc.chunk_table}\n") < mean.index("WHERE id IN (SELECT id FROM (")
+    assert f"SELECT id FROM {svc.table} WHERE metadata @> $2::jsonb" in mean
+
+    post = svc._chunk_sql(["metadata @> $2::jsonb"], 5, "post", 500)
+    assert "LIMIT 500" in post and f"JOIN {svc.table} USING (id)" in post
+
+
+def test_chunk_index_sql_targets_chunk_table():
+    svc = VectorService(metric="l2", index_type="hnsw")
+    sql = svc._create_index_sql(svc._index_name_for(svc.chunk_table), svc.chunk_table)
+    assert f"idx_{svc.chunk_table}_vec_hnsw_l2 ON {svc.chunk_table} USING hnsw (embedding vector_l2_ops)" in sql
+
+
+def test_reduced_precision_rescores_candidates(monkeypatch):
+    monkeypatch.setattr("src.services.vector_service.settings.SEARCH_RERANK_OVERSAMPLE", 4)
+    half = VectorService(metric="cosine", index_type="hnsw", precision="half")
+    sql = half._search_sql([], 10)
+    assert "ORDER BY (embedding::halfvec(1536)) <=> $1::vector::halfvec(1536) ASC" in sql and "LIMIT 40" in sql
+    # candidates come back in quantized order and are re-sorted by the full-precision distance
+    assert "embedding <=> $1::vector AS distance" in sql and sql.rstrip().endswith("ORDER BY distance ASC")
+    assert half.index_name.endswith("_vec_hnsw_cosine_f16") and half.index_opclass == "halfvec_cosine_ops"
+    assert "((embedding::halfvec(1536)) halfvec_cosine_ops)" in half._create_index_sql()
+    assert half.rerank_candidates(10) == 40 and half.rerank_candidates(0) == 0
+
+    binary = VectorService(metric="inner_product", precision="binary")
+    sql = binary._search_sql(["metadata @> $2::jsonb"], 5, "post", 100)
+    assert "(binary_quantize(embedding)::bit(1536)) <~> binary_quantize($1::vector)::bit(1536)" in sql
+    assert "LIMIT 400" in sql and "embedding <#> $1::vector AS distance" in sql
+    assert "((binary_quantize(embedding)::bit(1536)) bit_hamming_ops)" in binary._create_index_sql()
+
+    full = VectorService(metric="cosine", precision="full")
+    assert "quantized" not in full._search_sql([], 10) and full.rerank_candidates(10) == 10
+    with pytest.raises(ValueError):
+        VectorService(precision="int8")
+
+
+def test_similar_sql_probes_with_the_stored_vector():
+    svc = VectorService(metric="cosine")
+    sql = svc._similar_sql([], 5)
+    assert "$1::vector" not in sql
+    assert "embedding <=> (SELECT embedding FROM participant_embeddings WHERE id = $1)" in sql
+    assert "LIMIT 6" in sql and "WHERE id <> $1" in sql
+    assert sql.rstrip().endswith("LIMIT 5")
+
+
+def test_batch_sql_ranks_each_query_vector_in_one_statement():
+    svc = VectorService(metric="cosine")
+    sql = svc._batch_sql(["metadata @> $2::jsonb"], 5, "pre", 0, ["region"], 4)
+    assert "$1::vector" not in sql
+    assert "(($1::real[])[(n - 1) * 4 + 1 : n * 4])::vector AS probe" in sql
+    assert "CROSS JOIN LATERAL" in sql and "embedding <=> q.probe" in sql
+    assert "AS region" in sql and sql.rstrip().endswith("ORDER BY q.n, hit.score DESC")
+
+
+def test_geo_blend_sql_reranks_a_deeper_similarity_page(monkeypatch):
+    monkeypatch.setattr("src.services.vector_service.settings.SEARCH_GEO_OVERSAMPLE", 10)
+    svc = VectorService(metric="cosine")
+    ranked = svc._search_sql([], svc.geo_candidates(5))
+    sql = svc._geo_blend_sql(ranked, 5, 2)
+    assert "LIMIT 50" in ranked
+    assert "(1 - $4::float8) * r.score + $4::float8 * COALESCE(exp(-least(" in sql
+    assert "radians(((g.metadata #>> '{coordinates,latitude}')::double precision) - $2::float8)" in sql
+    assert sql.rstrip().endswith("LIMIT 5")
+
+
+def test_text_search_config_mismatch_is_reported(monkeypatch, caplog):
+    class _Conn:
+        def __init__(self, row):
+            self.row = row
+
+        async def fetchrow(self, sql, *args):
+            return self.row
+
+    svc = VectorService()
+    monkeypatch.setattr("src.services.vector_service.settings.SEARCH_TEXT_SEARCH_CONFIG", "english")
+    assert asyncio.run(svc._check_text_search_config(_Conn({"config": "pg_catalog.english"})))
+    assert not caplog.records
+
+    assert asyncio.run(svc._check_text_search_config(_Conn({"config": "simple"})))
+    assert "'simple'" in caplog.records[-1].getMessage()
+
+    assert not asyncio.run(svc._check_text_search_config(_Conn(None)))
+    assert "missing" in caplog.records[-1].getMessage()
+
+
+def test_hybrid_search_is_refused_without_document_tsv():
+    class _Conn:
+        def __init__(self):
+            self.lookups = 0
+
+        async def fetchval(self, sql, *args):
+            self.lookups += 1
+            return False
+
+    class _Pool:
+        def __init__(self, conn):
+            self.conn = conn
+
+        def acquire(self):
+            pool = self
+
+            class _Acquire:
+                async def __aenter__(self):
+                    return pool.conn
+
+                async def __aexit__(self, *exc):
+                    return False
+
+            return _Acquire()
+
+    conn = _Conn()
+    svc = VectorService()
+
+    async def pool():
+        return _Pool(conn)
+
+    svc._pool_or_create = pool
+
+    async def run():
+        for _ in range(2):
+            with pytest.raises(ValueError, match="document_tsv"):
+                await svc.query([0.0], 5, mode="hybrid", query_text="durum")
+
+    asyncio.run(run())
+    assert conn.lookups == 1  # cached